@@ -0,0 +1,117 @@
+# bench_clients.py
+#
+# Mede o efeito do registo de clientes partilhado: vários assistentes com a
+# mesma chave API enviam pedidos ao servidor falso, com um cliente partilhado
+# (registo) ou com um cliente por assistente (como antes do registo). Conta as ligações TCP abertas no servidor (contra
+# a API real, cada uma é também um handshake TLS, simulado aqui com
+# --handshake-latency) e os percentis da latência de send_prompt.
+#
+# Uso:
+#   python3 benchmarks/bench_clients.py [--assistants 8] [--requests 400] [--concurrency 8]
+#                                       [--handshake-latency 0.03] [--modes shared per_assistant]
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.client_registry import ClientRegistry, configure_client_registry  # noqa: E402
+from pythonAI_wrapper.metrics import get_metrics  # noqa: E402
+from pythonAI_wrapper.rate_limiter import configure_rate_limiter  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+MODES = ('shared', 'per_assistant')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def run(assistants=8, requests=400, concurrency=8, latency=0.0, handshake_latency=0.03, modes=MODES):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    get_metrics().path = None  # Não escreve o snapshot de métricas no disco
+    configure_rate_limiter(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+    # Cada pedido vai para um assistente sorteado (os mesmos em todos os modos)
+    rng = random.Random(1)
+    targets = [rng.randrange(assistants) for _ in range(requests)]
+    results = []
+    cwd = os.getcwd()
+    for mode in modes:
+        configure_client_registry()  # Nenhum cliente (nem ligação) da execução anterior
+        with FakeOpenAIServer(latency=latency, handshake_latency=handshake_latency) as server:
+            os.environ['OPENAI_BASE_URL'] = server.base_url
+            workdir = tempfile.mkdtemp(prefix='bench_clients_')
+            os.chdir(workdir)
+            try:
+                manager = AssistantManager(storage=create_storage('jsonl'))
+                names = [f"bench_{i}" for i in range(assistants)]
+                for name in names:
+                    manager.create_assistant('sk-bench', name)
+                    if mode == 'per_assistant':
+                        # Um registo só para este assistente: cliente e pool de ligações próprios
+                        manager.get_assistant(name).client = ClientRegistry().acquire('sk-bench', base_url=server.base_url)
+                for i in range(requests):
+                    manager.create_thread(names[targets[i]], f"thread_{i}")
+                latencies = []
+
+                def send(worker):
+                    for i in range(worker, requests, concurrency):
+                        assistant = manager.get_assistant(names[targets[i]])
+                        start = time.perf_counter()
+                        manager.send_prompt(assistant.name, f"thread_{i}", "olá")
+                        latencies.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(concurrency) as executor:
+                    list(executor.map(send, range(concurrency)))
+                elapsed = time.perf_counter() - start
+                connections = server.counters['connections']
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        results.append({
+            "benchmark": "clients",
+            "mode": mode,
+            "assistants": assistants,
+            "requests": requests,
+            "concurrency": concurrency,
+            "connections": connections,
+            "p50_s": percentile(latencies, 0.5),
+            "p95_s": percentile(latencies, 0.95),
+            "elapsed_s": elapsed,
+        })
+        r = results[-1]
+        print(f"{mode}: {connections} ligações, p50 {r['p50_s'] * 1000:.2f} ms, "
+              f"p95 {r['p95_s'] * 1000:.2f} ms", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do registo de clientes partilhado")
+    parser.add_argument("--assistants", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="Server latency per request (seconds)")
+    parser.add_argument("--handshake-latency", type=float, default=0.03,
+                        help="Delay of each new connection, standing in for the TLS handshake (seconds)")
+    parser.add_argument("--modes", nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.assistants, args.requests, args.concurrency, args.latency,
+                                args.handshake_latency, args.modes), indent=4))
+
+
+if __name__ == "__main__":
+    main()
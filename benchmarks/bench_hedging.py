@@ -0,0 +1,120 @@
+# bench_hedging.py
+#
+# Mede a latência de send_prompt (p50/p95/p99) com e sem hedging contra o
+# servidor falso com uma cauda lenta: uma fração dos pedidos demora
+# --slow-latency segundos a mais. Com hedging, um pedido que ultrapasse o
+# percentil das latências recentes é repetido e fica a primeira resposta.
+#
+# Uso:
+#   python3 benchmarks/bench_hedging.py [--requests 300] [--concurrency 8] [--latency 0.02]
+#                                       [--slow-fraction 0.05] [--slow-latency 1.0] [--quantile 0.95] [--stream]
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.metrics import get_metrics  # noqa: E402
+from pythonAI_wrapper.rate_limiter import configure_rate_limiter  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def run(requests=300, concurrency=8, latency=0.02, slow_fraction=0.05, slow_latency=1.0, quantile=0.95,
+        stream=False, modes=('off', 'on')):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    get_metrics().path = None  # Não escreve o snapshot de métricas no disco
+    configure_rate_limiter(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+    results = []
+    cwd = os.getcwd()
+    for mode in modes:
+        with FakeOpenAIServer(latency=latency, slow_fraction=slow_fraction, slow_latency=slow_latency,
+                              seed=1) as server:
+            os.environ['OPENAI_BASE_URL'] = server.base_url
+            workdir = tempfile.mkdtemp(prefix='bench_hedging_')
+            os.chdir(workdir)
+            try:
+                manager = AssistantManager(storage=create_storage('jsonl'))
+                # Uma chave por execução: o registo de clientes não reutiliza o cliente do servidor anterior
+                manager.create_assistant(f"sk-bench-{mode}-{int(stream)}", 'bench',
+                                         hedging={'quantile': quantile} if mode == 'on' else None)
+                if mode == 'on':
+                    # Atraso inicial curto: as primeiras latências não entram na cauda medida
+                    manager.assistants['bench'].hedge_policy.initial_delay = latency * 5
+                for worker in range(concurrency):
+                    manager.create_thread('bench', f"thread_{worker}")
+                latencies = []
+
+                def send(worker):
+                    for i in range(worker, requests, concurrency):
+                        start = time.perf_counter()
+                        response = manager.send_prompt('bench', f"thread_{worker}", f"pergunta {i}", stream=stream)
+                        if stream:
+                            "".join(response)
+                        latencies.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(concurrency) as executor:
+                    list(executor.map(send, range(concurrency)))
+                elapsed = time.perf_counter() - start
+                policy = manager.assistants['bench'].hedge_policy
+                hedges = policy.stats()['hedges'] if policy is not None else 0
+                messages = sum(len(manager.get_thread_history('bench', f"thread_{worker}"))
+                               for worker in range(concurrency))
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+            server_counters = dict(server.counters)
+
+        results.append({
+            "benchmark": "hedging",
+            "hedging": mode,
+            "stream": stream,
+            "requests": requests,
+            "slow_fraction": slow_fraction,
+            "p50_s": percentile(latencies, 0.5),
+            "p95_s": percentile(latencies, 0.95),
+            "p99_s": percentile(latencies, 0.99),
+            "max_s": max(latencies),
+            "elapsed_s": elapsed,
+            "hedge_rate": hedges / requests,  # Pedidos repetidos por pedido (float: não identifica o resultado)
+            "messages_saved": messages,
+        })
+        r = results[-1]
+        print(f"hedging {mode}: p50 {r['p50_s'] * 1000:.0f} ms, p95 {r['p95_s'] * 1000:.0f} ms, "
+              f"p99 {r['p99_s'] * 1000:.0f} ms, {hedges} pedidos repetidos, "
+              f"{server_counters['requests']} pedidos ao servidor, {server_counters['cancelled']} cancelados, "
+              f"{messages} mensagens guardadas", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos pedidos repetidos (hedging)")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="Latency of the fake server")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="Fraction of slow requests")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="Extra seconds of the slow requests")
+    parser.add_argument("--quantile", type=float, default=0.95, help="Hedge after this percentile of the latency")
+    parser.add_argument("--stream", action="store_true", help="Stream the responses (hedge on the first token)")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.requests, args.concurrency, args.latency, args.slow_fraction, args.slow_latency,
+                         args.quantile, args.stream), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench_key_pool.py
+#
+# Mede o débito de send_prompt com um pool de 1, 2, 4... chaves API contra o
+# servidor falso com limites por chave (como a OpenAI): com uma só chave o
+# débito fica preso ao RPM dessa chave. Opcionalmente, uma das chaves é
+# inválida (401) para medir o custo de a retirar do pool.
+#
+# Uso:
+#   python3 benchmarks/bench_key_pool.py [--keys 1 2 4] [--requests 200] [--requests-per-minute 1200]
+#                                        [--concurrency 8] [--strategy least_loaded|weighted] [--invalid-key]
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.key_pool import KeyPool  # noqa: E402
+from pythonAI_wrapper.metrics import get_metrics  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+def run(keys, requests=200, requests_per_minute=1200, concurrency=8, strategy='least_loaded', invalid_key=False):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    get_metrics().path = None  # Não escreve o snapshot de métricas no disco
+    results = []
+    cwd = os.getcwd()
+    for count in keys:
+        api_keys = [f"sk-bench-{i:04d}" for i in range(count)]
+        invalid = {api_keys[-1]} if invalid_key and count > 1 else set()
+        with FakeOpenAIServer(requests_per_minute=requests_per_minute, per_key_limits=True,
+                              invalid_keys=invalid) as server:
+            os.environ['OPENAI_BASE_URL'] = server.base_url
+            workdir = tempfile.mkdtemp(prefix='bench_key_pool_')
+            os.chdir(workdir)
+            try:
+                storage = create_storage('jsonl')
+                storage.save_assistant('bench', {'api_key': api_keys[0], 'model': 'gpt-4', 'instructions': ''})
+                # O servidor só limita pedidos: sem limite de tokens do lado do cliente
+                pool = KeyPool(api_keys, strategy=strategy, requests_per_minute=requests_per_minute,
+                               tokens_per_minute=10 ** 12)
+                manager = AssistantManager(storage=storage, key_pool=pool)
+                for worker in range(concurrency):
+                    manager.create_thread('bench', f"thread_{worker}")
+
+                def send(worker):
+                    for i in range(worker, requests, concurrency):
+                        manager.send_prompt('bench', f"thread_{worker}", f"pergunta {i}")
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(concurrency) as executor:
+                    list(executor.map(send, range(concurrency)))
+                elapsed = time.perf_counter() - start
+                usage = pool.stats()
+                pool.close()
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+            server_counters = dict(server.counters)
+
+        results.append({
+            "benchmark": "key_pool",
+            "keys": count,
+            "strategy": strategy,
+            "invalid_key": bool(invalid),
+            "requests": requests,
+            "throughput_per_s": requests / elapsed,
+            "elapsed_s": elapsed,
+            "rate_limited": server_counters['rate_limited'],
+            "unauthorized": server_counters['unauthorized'],
+            "requests_per_key": [row['requests'] for row in usage],
+        })
+        r = results[-1]
+        print(f"{count} chave(s): {r['throughput_per_s']:.1f} pedidos/s, {r['rate_limited']} x 429, "
+              f"{r['unauthorized']} x 401, pedidos por chave {r['requests_per_key']}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pool de chaves API")
+    parser.add_argument("--keys", type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--requests-per-minute", type=int, default=1200, help="Limit of each key on the fake server")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--strategy", choices=["least_loaded", "weighted"], default="least_loaded")
+    parser.add_argument("--invalid-key", action="store_true", help="Make the last key of the pool invalid (401)")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.keys, args.requests, args.requests_per_minute, args.concurrency, args.strategy,
+                         args.invalid_key), indent=4))
+
+
+if __name__ == "__main__":
+    main()
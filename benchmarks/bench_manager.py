@@ -0,0 +1,83 @@
+# bench_manager.py
+#
+# Mede o tempo de construção do AssistantManager (e o do primeiro acesso a
+# uma thread) à medida que os dados guardados crescem, dentro do processo e
+# sem arranque do interpretador.
+#
+# Uso:
+#   python3 benchmarks/bench_manager.py [--sizes 100 1000 10000 100000] [--repeat 5] [--backend jsonl]
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from bench_startup import populate  # noqa: E402
+
+
+def stored_bytes(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return total
+
+
+def run(sizes, repeat=5, backend='jsonl'):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    results = []
+    cwd = os.getcwd()
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix='bench_manager_')
+        os.chdir(workdir)
+        try:
+            assistants = populate(create_storage(backend), size)
+            construct, first_thread = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                manager = AssistantManager(storage=create_storage(backend))
+                construct.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                manager.get_thread_history('assistant_0', 'thread_0', limit=20)
+                first_thread.append(time.perf_counter() - start)
+            data_bytes = stored_bytes(workdir)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        results.append({
+            "benchmark": "manager_construction",
+            "backend": backend,
+            "messages": size,
+            "assistants": assistants,
+            "stored_bytes": data_bytes,
+            "median_s": statistics.median(construct),
+            "first_thread_median_s": statistics.median(first_thread),
+            "samples_s": construct,
+        })
+        print(f"{size:>8} mensagens ({data_bytes / 1e6:.1f} MB): construção {results[-1]['median_s'] * 1000:.2f} ms, "
+              f"primeira thread {results[-1]['first_thread_median_s'] * 1000:.2f} ms", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de construção do AssistantManager")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite", "json"])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.sizes, args.repeat, args.backend), indent=4))
+
+
+if __name__ == "__main__":
+    main()
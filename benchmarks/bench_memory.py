@@ -0,0 +1,130 @@
+# bench_memory.py
+#
+# Mede a memória ocupada por um histórico grande em que os mesmos documentos
+# (texto de PDFs) foram enviados para muitas threads: com dicionários simples,
+# como eram guardadas as threads, e com Message + BlobStore. Também compara o
+# espaço em disco.
+#
+# Uso:
+#   python3 benchmarks/bench_memory.py [--threads 200] [--turns 10] [--documents 5] [--document-kb 64] [--backend jsonl]
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from bench_manager import stored_bytes  # noqa: E402
+
+
+def fixture(threads, turns, documents, document_kb):
+    """Histórico {thread_id: [mensagens]}: cada thread recebe os mesmos documentos e perguntas curtas."""
+    docs = [(f"Documento {i}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20 * document_kb)[:document_kb * 1024]
+            for i in range(documents)]
+    history = {}
+    for t in range(threads):
+        messages = []
+        for turn in range(turns):
+            if turn < documents:
+                messages.append({"role": "user", "content": docs[turn]})
+            else:
+                messages.append({"role": "user", "content": f"Pergunta {turn} da thread {t}?"})
+            messages.append({"role": "assistant", "content": f"Resposta {turn} da thread {t}."})
+        history[f"thread_{t}"] = messages
+    return history
+
+
+def measure(load):
+    """Memória (bytes) alocada pelo resultado de load(), que é mantido vivo durante a medição."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = load()
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del value
+    return current
+
+
+def run(threads=200, turns=10, documents=5, document_kb=64, backend='jsonl'):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    history = fixture(threads, turns, documents, document_kb)
+    messages = sum(len(thread) for thread in history.values())
+    serialized = json.dumps(history)
+    del history
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='bench_memory_')
+    os.chdir(workdir)
+    try:
+        # Antes: cada thread lida do disco como lista de dicionários, com uma cópia de cada documento
+        dict_bytes = measure(lambda: json.loads(serialized))
+
+        storage = create_storage(backend)
+        manager = AssistantManager(storage=storage)
+        manager.create_assistant('sk-bench', 'bench')
+        for thread_id, thread in json.loads(serialized).items():
+            manager.create_thread('bench', thread_id)
+            storage.append_messages('bench', thread_id, thread)
+        if hasattr(storage, 'close'):
+            storage.close()
+
+        # Depois: as threads como ficam em memória no assistente (Message + BlobStore);
+        # get_thread_history retorna cópias em dicionários simples
+        def load(read=False):
+            manager = AssistantManager(storage=create_storage(backend))
+            assistant = manager.get_assistant('bench')
+            threads = [assistant.threads[thread_id] for thread_id in manager.list_threads('bench')]
+            if read:  # Lê todos os conteúdos (os documentos passam a estar na cache do BlobStore)
+                sum(len(message['content']) for thread in threads for message in thread)
+            return manager, threads
+        message_bytes = measure(load)
+        message_read_bytes = measure(lambda: load(read=True))
+        data_bytes = stored_bytes(workdir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "benchmark": "memory",
+        "backend": backend,
+        "threads": threads,
+        "messages": messages,
+        "documents": documents,
+        "document_kb": document_kb,
+        "dict_memory_bytes": dict_bytes,
+        "message_memory_bytes": message_bytes,
+        "message_memory_read_bytes": message_read_bytes,
+        "dict_stored_bytes": len(serialized.encode('utf-8')),
+        "message_stored_bytes": data_bytes,
+    }
+    print(f"{messages} mensagens: memória {dict_bytes / 1e6:.1f} MB -> {message_bytes / 1e6:.1f} MB "
+          f"({message_read_bytes / 1e6:.1f} MB depois de ler todos os conteúdos), "
+          f"disco {result['dict_stored_bytes'] / 1e6:.1f} MB -> {data_bytes / 1e6:.1f} MB", file=sys.stderr)
+    return [result]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória do histórico de mensagens")
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--document-kb", type=int, default=64)
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite", "json"])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.threads, args.turns, args.documents, args.document_kb, args.backend), indent=4))
+
+
+if __name__ == "__main__":
+    main()
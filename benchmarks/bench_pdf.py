@@ -0,0 +1,110 @@
+# bench_pdf.py
+#
+# Mede o débito de PDFHandler.read_folder (páginas/s e MB/s) numa pasta de
+# PDFs gerados, sem cache, com a cache vazia (primeira leitura) e com a cache
+# já preenchida.
+#
+# Uso:
+#   python3 benchmarks/bench_pdf.py [--files 20] [--pages 10] [--workers 1 4] [--repeat 3]
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.pdfHandler import PDFHandler  # noqa: E402
+
+LINES_PER_PAGE = 40
+
+
+def write_pdf(path, pages, seed=0):
+    """Escreve um PDF simples (Helvetica, texto por linhas) com `pages` páginas."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [f"Documento {seed} pagina {page} linha {line} texto de exemplo para extrair" for line in range(LINES_PER_PAGE)]
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({text}) Tj T*" for text in lines) + " ET").encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_number = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % content_number)
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), pages)
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def run(files=20, pages=10, workers=(1, 4), repeat=3):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    results = []
+    workdir = tempfile.mkdtemp(prefix='bench_pdf_')
+    try:
+        folder = os.path.join(workdir, 'pdfs')
+        os.makedirs(folder)
+        for i in range(files):
+            write_pdf(os.path.join(folder, f"doc_{i:04d}.pdf"), pages, seed=i)
+        total_bytes = sum(os.path.getsize(path) for path in PDFHandler().list_pdfs(folder))
+
+        for max_workers in workers:
+            for mode in ('no_cache', 'cold_cache', 'warm_cache'):
+                samples = []
+                for _ in range(repeat):
+                    cache_dir = None if mode == 'no_cache' else os.path.join(workdir, 'cache')
+                    if mode == 'cold_cache':
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+                    handler = PDFHandler(cache_dir=cache_dir, max_workers=max_workers)
+                    start = time.perf_counter()
+                    text = handler.read_folder(folder)
+                    samples.append(time.perf_counter() - start)
+                    assert text.strip(), "Nenhum texto extraído"
+
+                median = statistics.median(samples)
+                results.append({
+                    "benchmark": "pdf_read_folder",
+                    "mode": mode,
+                    "workers": max_workers,
+                    "files": files,
+                    "pages": files * pages,
+                    "bytes": total_bytes,
+                    "median_s": median,
+                    "pages_per_s": files * pages / median,
+                    "mb_per_s": total_bytes / 1e6 / median,
+                    "samples_s": samples,
+                })
+                print(f"{mode:>10}, {max_workers} processo(s): {results[-1]['pages_per_s']:.0f} páginas/s "
+                      f"({results[-1]['mb_per_s']:.1f} MB/s)", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de PDFHandler.read_folder")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs='+', default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.files, args.pages, args.workers, args.repeat), indent=4))
+
+
+if __name__ == "__main__":
+    main()
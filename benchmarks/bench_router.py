@@ -0,0 +1,130 @@
+# bench_router.py
+#
+# Mede a latência de send_prompt com um modelo fixo e com o router de
+# modelos, contra o servidor falso com uma latência por modelo: a maioria
+# dos prompts são perguntas curtas e alguns trazem um documento grande. A
+# latência é atribuída a cada modelo a partir das mensagens guardadas
+# (chaves 'model', 'route' e 'latency' de cada resposta). No modo
+# 'degraded', o modelo pequeno fica lento a meio e o router passa os
+# pedidos para o outro modelo.
+#
+# Uso:
+#   python3 benchmarks/bench_router.py [--requests 200] [--concurrency 8] [--document-share 0.1]
+#                                      [--document-tokens 12000] [--modes fixed router degraded]
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.metrics import get_metrics  # noqa: E402
+from pythonAI_wrapper.rate_limiter import configure_rate_limiter  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+SMALL_MODEL = 'gpt-4o-mini'
+LARGE_MODEL = 'gpt-4o'
+MODEL_LATENCY = {SMALL_MODEL: 0.03, LARGE_MODEL: 0.15}
+DEGRADED_LATENCY = 0.4
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def run(requests=200, concurrency=8, document_share=0.1, document_tokens=12000,
+        modes=('fixed', 'router', 'degraded')):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    get_metrics().path = None  # Não escreve o snapshot de métricas no disco
+    configure_rate_limiter(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+    rng = random.Random(1)
+    # Cada pedido é uma pergunta numa thread nova (curta) ou com um documento grande
+    prompts = [("documento " * (document_tokens * 4 // 10)) if rng.random() < document_share else "pergunta curta"
+               for _ in range(requests)]
+    results = []
+    cwd = os.getcwd()
+    for mode in modes:
+        with FakeOpenAIServer(model_latency=MODEL_LATENCY) as server:
+            os.environ['OPENAI_BASE_URL'] = server.base_url
+            workdir = tempfile.mkdtemp(prefix='bench_router_')
+            os.chdir(workdir)
+            try:
+                manager = AssistantManager(storage=create_storage('jsonl'))
+                routing = None
+                if mode != 'fixed':
+                    routing = {'models': [{'model': SMALL_MODEL, 'max_prompt_tokens': 8000, 'max_latency': 0.2},
+                                          {'model': LARGE_MODEL}]}
+                # Uma chave por execução: o registo de clientes não reutiliza o cliente do servidor anterior
+                manager.create_assistant(f"sk-bench-{mode}", 'bench', model=LARGE_MODEL, routing=routing)
+                for i in range(requests):
+                    manager.create_thread('bench', f"thread_{i}")
+                latencies = []
+
+                def send(worker):
+                    for i in range(worker, requests, concurrency):
+                        if mode == 'degraded' and i == requests // 2:
+                            server.model_latency[SMALL_MODEL] = DEGRADED_LATENCY
+                        start = time.perf_counter()
+                        manager.send_prompt('bench', f"thread_{i}", prompts[i])
+                        latencies.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(concurrency) as executor:
+                    list(executor.map(send, range(concurrency)))
+                elapsed = time.perf_counter() - start
+
+                # Atribuição da latência a cada modelo, a partir do histórico guardado
+                by_model = {}
+                for record in manager.iter_records():
+                    if record['role'] == 'assistant':
+                        by_model.setdefault(record.get('model', LARGE_MODEL), []).append(record.get('latency'))
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        results.append({
+            "benchmark": "router",
+            "mode": mode,
+            "requests": requests,
+            "document_share": document_share,
+            "p50_s": percentile(latencies, 0.5),
+            "p95_s": percentile(latencies, 0.95),
+            "mean_s": sum(latencies) / len(latencies),
+            "elapsed_s": elapsed,
+            "models": [{"model": model, "requests": len(values),
+                        "mean_latency": (sum(v for v in values if v is not None) / len(values)
+                                         if None not in values else None)}
+                       for model, values in sorted(by_model.items())],
+        })
+        r = results[-1]
+        shares = ", ".join(f"{row['model']} {row['requests']}" for row in r['models'])
+        print(f"{mode}: p50 {r['p50_s'] * 1000:.0f} ms, p95 {r['p95_s'] * 1000:.0f} ms, "
+              f"média {r['mean_s'] * 1000:.0f} ms ({shares})", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do router de modelos")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--document-share", type=float, default=0.1, help="Fraction of prompts with a large document")
+    parser.add_argument("--document-tokens", type=int, default=12000, help="Approximate size of the large prompts")
+    parser.add_argument("--modes", nargs='+', choices=["fixed", "router", "degraded"], default=["fixed", "router", "degraded"])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.requests, args.concurrency, args.document_share, args.document_tokens, args.modes),
+                     indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# bench_search.py
+#
+# Mede o índice de pesquisa (SearchIndex): tempo de indexação de cada
+# send_prompt (pergunta + resposta) e latência das pesquisas à medida que o
+# número de mensagens indexadas cresce.
+#
+# Uso:
+#   python3 benchmarks/bench_search.py [--sizes 10000 100000 1000000] [--queries 50]
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.search_index import SearchIndex  # noqa: E402
+
+WORDS = [f"palavra{i}" for i in range(20000)]
+THREADS_PER_ASSISTANT = 100
+
+
+def message(rng):
+    # Distribuição de Zipf: algumas palavras muito frequentes, a maioria rara
+    return ' '.join(WORDS[min(int(rng.paretovariate(1.0)) - 1, len(WORDS) - 1)] for _ in range(rng.randint(8, 40)))
+
+
+def populate(index, size, rng, batch=5000):
+    """Indexa `size` mensagens, em transações grandes, em threads de 100 mensagens."""
+    done = 0
+    while done < size:
+        n = min(batch, size - done)
+        with index._transaction() as conn:
+            for i in range(n):
+                seq = done + i
+                index._insert(conn, f"assistant_{seq // (100 * THREADS_PER_ASSISTANT)}", f"thread_{seq // 100}",
+                              seq % 100, [{"role": "user" if seq % 2 == 0 else "assistant", "content": message(rng)}],
+                              time.time())
+        done += n
+
+
+def measure(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(sizes, queries=50):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    results = []
+    for size in sizes:
+        rng = random.Random(size)
+        workdir = tempfile.mkdtemp(prefix='bench_search_')
+        try:
+            index = SearchIndex(os.path.join(workdir, 'search.db'))
+            start = time.perf_counter()
+            populate(index, size, rng)
+            build_s = time.perf_counter() - start
+
+            add = measure(lambda: index.add("assistant_0", "thread_new", [
+                {"role": "user", "content": message(rng)}, {"role": "assistant", "content": message(rng)}]), queries)
+            rare = measure(lambda: index.search(rng.choice(WORDS[1000:])), queries)
+            common = measure(lambda: index.search(rng.choice(WORDS[:10])), queries)
+            two_terms = measure(lambda: index.search(f"{rng.choice(WORDS[:100])} {rng.choice(WORDS[100:1000])}"), queries)
+            filtered = measure(lambda: index.search(rng.choice(WORDS[:10]), assistant_name="assistant_0",
+                                                    thread_id=f"thread_{rng.randrange(THREADS_PER_ASSISTANT)}"), queries)
+            index.close()
+            data_bytes = sum(os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        results.append({
+            "benchmark": "search",
+            "messages": size,
+            "index_bytes": data_bytes,
+            "build_messages_per_s": size / build_s,
+            "add_median_s": statistics.median(add),
+            "rare_term_median_s": statistics.median(rare),
+            "common_term_median_s": statistics.median(common),
+            "two_terms_median_s": statistics.median(two_terms),
+            "thread_filter_median_s": statistics.median(filtered),
+        })
+        r = results[-1]
+        print(f"{size:>8} mensagens ({data_bytes / 1e6:.0f} MB): add {r['add_median_s'] * 1000:.2f} ms, "
+              f"termo raro {r['rare_term_median_s'] * 1000:.2f} ms, frequente {r['common_term_median_s'] * 1000:.2f} ms, "
+              f"dois termos {r['two_terms_median_s'] * 1000:.2f} ms, "
+              f"thread {r['thread_filter_median_s'] * 1000:.2f} ms", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do índice de pesquisa")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.sizes, args.queries), indent=4))
+
+
+if __name__ == "__main__":
+    main()
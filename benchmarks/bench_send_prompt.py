@@ -0,0 +1,125 @@
+# bench_send_prompt.py
+#
+# Mede o débito de AssistantManager.send_prompt contra o servidor falso
+# (benchmarks/fake_openai.py) e o custo de persistir cada mensagem à medida
+# que a thread cresce. Com --latency 0 (padrão), o tempo medido é quase só
+# overhead da biblioteca: construção das mensagens, cliente HTTP e escrita.
+#
+# Uso:
+#   python3 benchmarks/bench_send_prompt.py [--lengths 0 100 1000 10000] [--requests 100]
+#                                           [--backend jsonl] [--latency 0] [--stream]
+#                                           [--max-context-tokens N]
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.metrics import Metrics, get_metrics  # noqa: E402
+from pythonAI_wrapper.rate_limiter import configure_rate_limiter  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+def _histogram(metrics, name):
+    """Junta as séries de um histograma (todas as labels) e retorna (p50, p95, p99)."""
+    total = Metrics(path=None)
+    total.merge({'histograms': [dict(entry, labels={}) for entry in metrics.snapshot()['histograms']
+                                if entry['name'] == name]})
+    rows = total.summary()
+    return (rows[0]['p50'], rows[0]['p95'], rows[0]['p99']) if rows else (0.0, 0.0, 0.0)
+
+
+def run(lengths, requests=100, backend='jsonl', latency=0.0, stream=False, max_context_tokens=None, warmup=3):
+    """
+    Corre o benchmark e retorna uma lista de resultados (dicionários).
+
+    Os primeiros `warmup` pedidos de cada thread não contam (importação do
+    openai, criação do cliente e das ligações).
+    """
+    # Sem limites do lado do cliente: mede-se a biblioteca, não o limitador
+    configure_rate_limiter(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+    metrics = get_metrics()
+    metrics.path = None  # Não escreve o snapshot de métricas no disco
+
+    results = []
+    cwd = os.getcwd()
+    with FakeOpenAIServer(latency=latency) as server:
+        os.environ['OPENAI_BASE_URL'] = server.base_url
+        for length in lengths:
+            workdir = tempfile.mkdtemp(prefix='bench_send_')
+            os.chdir(workdir)
+            try:
+                storage = create_storage(backend)
+                storage.save_assistant('bench', {'api_key': 'sk-bench', 'model': 'gpt-4', 'instructions': 'És um assistente.',
+                                                 'max_context_tokens': max_context_tokens})
+                storage.replace_thread('bench', 'thread', [
+                    {"role": "user" if i % 2 == 0 else "assistant", "content": f"mensagem {i} " * 20}
+                    for i in range(length)
+                ])
+                manager = AssistantManager(storage=storage)
+
+                def send(i):
+                    if stream:
+                        for _ in manager.send_prompt('bench', 'thread', f"pergunta {i}", stream=True):
+                            pass
+                    else:
+                        manager.send_prompt('bench', 'thread', f"pergunta {i}")
+
+                for i in range(warmup):
+                    send(i)
+                metrics.clear()
+                start = time.perf_counter()
+                for i in range(requests):
+                    send(i)
+                elapsed = time.perf_counter() - start
+                manager.assistants['bench'].release_client()
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+
+            write_p50, write_p95, write_p99 = _histogram(metrics, 'storage_write_seconds')
+            request_p50, _, _ = _histogram(metrics, 'request_seconds')
+            results.append({
+                "benchmark": "send_prompt",
+                "backend": backend,
+                "thread_length": length,
+                "stream": stream,
+                "latency": latency,
+                "max_context_tokens": max_context_tokens,
+                "requests": requests,
+                "throughput_per_s": requests / elapsed,
+                "mean_s": elapsed / requests,
+                "request_p50_s": request_p50,
+                "persist_p50_s": write_p50,
+                "persist_p95_s": write_p95,
+                "persist_p99_s": write_p99,
+            })
+            print(f"thread com {length:>6} mensagens: {results[-1]['throughput_per_s']:.1f} pedidos/s, "
+                  f"escrita p50 {write_p50 * 1000:.3f} ms, p99 {write_p99 * 1000:.3f} ms", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de send_prompt contra o servidor falso")
+    parser.add_argument("--lengths", type=int, nargs='+', default=[0, 100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite", "json"])
+    parser.add_argument("--latency", type=float, default=0.0, help="Latency of the fake server, in seconds")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--max-context-tokens", type=int, default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.lengths, args.requests, args.backend, args.latency, args.stream,
+                         args.max_context_tokens), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# bench_startup.py
+#
+# Mede o tempo de arranque de `cli_tool.py list_assistants` (ou de um `send`
+# contra o servidor falso) à medida que o armazenamento cresce (assistentes e
+# mensagens de 10 a 100k).
+#
+# Uso:
+#   python3 benchmarks/bench_startup.py [--sizes 10 100 1000 10000 100000] [--repeat 5] [--backend jsonl]
+#                                       [--command list_assistants|send]
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+MESSAGES_PER_THREAD = 100
+
+
+def populate(storage, size):
+    """Cria `size` mensagens repartidas por até `size` assistentes."""
+    assistants = min(size, 1000)
+    for i in range(assistants):
+        storage.save_assistant(f"assistant_{i}", {'api_key': 'sk-bench', 'model': 'gpt-4', 'instructions': ''})
+
+    remaining = size
+    thread_number = 0
+    while remaining > 0:
+        count = min(MESSAGES_PER_THREAD, remaining)
+        assistant_name = f"assistant_{thread_number % assistants}"
+        messages = [
+            {"role": "user" if j % 2 == 0 else "assistant", "content": f"mensagem {j} " * 20}
+            for j in range(count)
+        ]
+        storage.replace_thread(assistant_name, f"thread_{thread_number}", messages)
+        remaining -= count
+        thread_number += 1
+    return assistants
+
+
+COMMANDS = {
+    'list_assistants': ['list_assistants'],
+    'send': ['send', 'assistant_0', 'thread_0', 'Olá'],
+}
+
+
+def time_cli(workdir, backend, repeat, command='list_assistants', base_url=None):
+    config = os.path.join(workdir, 'config.py')
+    with open(config, 'w') as f:
+        f.write(f'OPENAI_API_KEY = "sk-bench"\nSTORAGE_BACKEND = "{backend}"\nSTORAGE_PATH = None\n')
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([workdir, ROOT]))
+    if base_url:
+        env['OPENAI_BASE_URL'] = base_url
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, 'cli_tool.py'), *COMMANDS[command]],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, check=True,
+        )
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(sizes, repeat=5, backend='jsonl', command='list_assistants'):
+    """Corre o benchmark e retorna uma lista de resultados (dicionários)."""
+    server = FakeOpenAIServer().start() if command == 'send' else None
+    results = []
+    try:
+        for size in sizes:
+            workdir = tempfile.mkdtemp(prefix='bench_startup_')
+            try:
+                cwd = os.getcwd()
+                os.chdir(workdir)
+                try:
+                    assistants = populate(create_storage(backend), size)
+                finally:
+                    os.chdir(cwd)
+                samples = time_cli(workdir, backend, repeat, command, server.base_url if server else None)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+            results.append({
+                "benchmark": f"cli_{command}_startup",
+                "backend": backend,
+                "messages": size,
+                "assistants": assistants,
+                "median_s": statistics.median(samples),
+                "min_s": min(samples),
+                "samples_s": samples,
+            })
+            print(f"{size:>8} mensagens / {assistants:>5} assistentes: mediana {results[-1]['median_s'] * 1000:.1f} ms", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque da CLI (list_assistants)")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite", "json"])
+    parser.add_argument("--command", default="list_assistants", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.backend, args.command)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+# fake_openai.py
+#
+# Servidor HTTP local que imita a API da OpenAI (chat completions, com e sem
+# streaming, ficheiros, embeddings, batches e mensagens de threads), para
+# medir o overhead da biblioteca sem a latência da rede.
+#
+# Uso em código:
+#   with FakeOpenAIServer(latency=0.05, completion_tokens=50) as server:
+#       os.environ['OPENAI_BASE_URL'] = server.base_url
+#       ...
+#
+# Uso como processo separado:
+#   python3 benchmarks/fake_openai.py [--port 8099] [--latency 0.05] [--requests-per-minute 600] [--per-key-limits]
+#                                     [--slow-fraction 0.05 --slow-latency 2.0] [--model-latency gpt-4o=0.5 gpt-4o-mini=0.1]
+#   OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python3 cli_tool.py send ...
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _multipart_fields(content_type, body):
+    """Extrai {nome: bytes} de um corpo multipart/form-data."""
+    match = re.search(r'boundary="?([^";]+)"?', content_type or '')
+    if not match:
+        return {}
+    fields = {}
+    for part in body.split(b'--' + match.group(1).encode())[1:]:
+        if part.startswith(b'--'):
+            break
+        headers, _, value = part.partition(b'\r\n\r\n')
+        name = re.search(rb'name="([^"]*)"', headers)
+        if name:
+            fields[name.group(1).decode()] = value[:-2] if value.endswith(b'\r\n') else value
+    return fields
+
+
+class _Window:
+    """Janela deslizante de 60 s para os limites RPM/TPM do servidor."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.events = deque()
+        self.total = 0
+
+    def _expire(self, now):
+        while self.events and now - self.events[0][0] >= 60:
+            self.total -= self.events.popleft()[1]
+
+    def remaining(self, now):
+        self._expire(now)
+        return self.limit - self.total
+
+    def reset_after(self, now, amount):
+        """Segundos até haver `amount` disponível."""
+        needed = self.total + amount - self.limit
+        for timestamp, value in self.events:
+            needed -= value
+            if needed <= 0:
+                return max(0.0, timestamp + 60 - now)
+        return 60.0
+
+    def add(self, now, amount):
+        self.events.append((now, amount))
+        self.total += amount
+
+
+class FakeOpenAIServer:
+    """
+    Servidor falso da API da OpenAI, a correr numa thread do processo.
+
+    Args:
+        latency (float): Atraso antes de cada resposta (e antes do primeiro token em streaming).
+        completion_tokens (int): Número de tokens de cada resposta.
+        token_delay (float): Atraso entre tokens em streaming.
+        requests_per_minute (int, optional): Se definido, responde 429 acima deste limite.
+        tokens_per_minute (int, optional): Idem, para tokens (prompt + resposta).
+        per_key_limits (bool): Aplica os limites a cada chave API em separado, como
+            a OpenAI (por omissão são partilhados por todos os pedidos).
+        invalid_keys (iterable, optional): Chaves API respondidas com 401.
+        model_latency (dict, optional): Latência de cada modelo ({'gpt-4o-mini': 0.05, ...}),
+            em vez de `latency`.
+        slow_fraction (float): Fração dos pedidos que demoram `slow_latency` segundos
+            a mais (a cauda lenta da latência).
+        slow_latency (float): Atraso adicional dos pedidos lentos.
+        seed (int, optional): Semente do sorteio dos pedidos lentos.
+        handshake_latency (float): Atraso de cada ligação nova (simula o handshake TLS).
+        port (int): Porta a usar; 0 escolhe uma livre.
+    """
+
+    def __init__(self, latency: float = 0.0, completion_tokens: int = 20, token_delay: float = 0.0,
+                 requests_per_minute: int = None, tokens_per_minute: int = None,
+                 per_key_limits: bool = False, invalid_keys=(), model_latency: dict = None, slow_fraction: float = 0.0,
+                 slow_latency: float = 0.0, seed: int = None, handshake_latency: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.token_delay = token_delay
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.per_key_limits = per_key_limits
+        self.invalid_keys = set(invalid_keys)
+        self.model_latency = dict(model_latency or {})
+        self.requests_by_model = {}
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.handshake_latency = handshake_latency
+        self._random = random.Random(seed)
+        self.windows = {}  # chave API (ou None, sem per_key_limits) -> (janela de pedidos, janela de tokens)
+        self.injected = {}  # chave API (ou None, qualquer chave) -> [429 por responder, retry_after]
+        self.requests_by_key = {}
+        self.files = {}
+        self.batches = {}
+        self.counters = {'requests': 0, 'chat': 0, 'stream': 0, 'files': 0, 'embeddings': 0,
+                         'batches': 0, 'rate_limited': 0, 'unauthorized': 0, 'slow': 0, 'cancelled': 0,
+                         'connections': 0}
+        self._lock = threading.Lock()
+        self._ids = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _new_id(self, prefix):
+        with self._lock:
+            self._ids += 1
+            return f"{prefix}-{self._ids}"
+
+    @staticmethod
+    def count_tokens(messages):
+        return sum(4 + len(str(message.get('content', ''))) // 4 for message in messages)
+
+    def _windows(self, api_key):
+        key = api_key if self.per_key_limits else None
+        if key not in self.windows:
+            self.windows[key] = (_Window(self.requests_per_minute) if self.requests_per_minute else None,
+                                 _Window(self.tokens_per_minute) if self.tokens_per_minute else None)
+        return self.windows[key]
+
+    def _check_limits(self, tokens, api_key=None):
+        """Retorna (cabeçalhos x-ratelimit, segundos até poder repetir ou None)."""
+        headers = {}
+        now = time.monotonic()
+        with self._lock:
+            self.counters['requests'] += 1
+            self.requests_by_key[api_key] = self.requests_by_key.get(api_key, 0) + 1
+            requests_window, tokens_window = self._windows(api_key)
+            waits = []
+            for window, kind, amount in ((requests_window, 'requests', 1), (tokens_window, 'tokens', tokens)):
+                if window is None:
+                    continue
+                remaining = window.remaining(now)
+                if remaining < amount:
+                    waits.append(window.reset_after(now, amount))
+                headers[f'x-ratelimit-limit-{kind}'] = str(window.limit)
+                headers[f'x-ratelimit-remaining-{kind}'] = str(max(0, remaining - amount))
+            if waits:
+                self.counters['rate_limited'] += 1
+                return headers, max(waits)
+            for window, amount in ((requests_window, 1), (tokens_window, tokens)):
+                if window is not None:
+                    window.add(now, amount)
+        return headers, None
+
+    def inject_rate_limits(self, count: int, retry_after: float = 0.0, api_key: str = None):
+        """
+        Responde 429 aos próximos `count` pedidos de chat (só os desta chave,
+        se for dada), com um Retry-After de `retry_after` segundos, sem esperar
+        pelos limites da janela de 60 s.
+        """
+        with self._lock:
+            self.injected[api_key] = [count, retry_after]
+
+    def _injected_rate_limit(self, api_key):
+        """Retry-After de um 429 injetado para este pedido, ou None."""
+        with self._lock:
+            for key in (api_key, None):
+                entry = self.injected.get(key)
+                if entry and entry[0] > 0:
+                    entry[0] -= 1
+                    self.counters['requests'] += 1
+                    self.counters['rate_limited'] += 1
+                    self.requests_by_key[api_key] = self.requests_by_key.get(api_key, 0) + 1
+                    return entry[1]
+        return None
+
+    def response_delay(self, model: str = None) -> float:
+        """
+        Atraso de um pedido: `latency` (ou a do modelo, em `model_latency`),
+        mais `slow_latency` numa fração `slow_fraction` dos pedidos.
+        """
+        with self._lock:
+            self.requests_by_model[model] = self.requests_by_model.get(model, 0) + 1
+            slow = self.slow_fraction and self._random.random() < self.slow_fraction
+            if slow:
+                self.counters['slow'] += 1
+        return self.model_latency.get(model, self.latency) + (self.slow_latency if slow else 0.0)
+
+    def completion(self, body):
+        """Resposta (não streaming) a um pedido de chat completion."""
+        prompt_tokens = self.count_tokens(body.get('messages', []))
+        last = str(body.get('messages', [{}])[-1].get('content', ''))[:40]
+        content = " ".join(["eco"] * max(0, self.completion_tokens - 1) + [last]).strip()
+        return {
+            "id": self._new_id('chatcmpl'),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'gpt-4'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": self.completion_tokens,
+                      "total_tokens": prompt_tokens + self.completion_tokens},
+        }
+
+    def embedding(self, text, dimensions):
+        seed = hashlib.sha256(text.encode('utf-8')).digest()
+        return [((seed[i % 32] + i) % 255) / 255.0 - 0.5 for i in range(dimensions)]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.counters['connections'] += 1  # Ligações TCP novas (com TLS, um handshake cada)
+                if server.handshake_latency:
+                    time.sleep(server.handshake_latency)
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b''
+
+            def do_GET(self):
+                match = re.fullmatch(r'/v1/files/([^/]+)/content', self.path)
+                if match and match.group(1) in server.files:
+                    data = server.files[match.group(1)]['content']
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/octet-stream')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                match = re.fullmatch(r'/v1/batches/([^/]+)', self.path)
+                if match and match.group(1) in server.batches:
+                    self._send_json(200, server.batches[match.group(1)])
+                    return
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            def do_POST(self):
+                raw = self._body()
+                path = self.path.split('?')[0]
+                if path == '/v1/chat/completions':
+                    self._chat(json.loads(raw))
+                elif path == '/v1/embeddings':
+                    self._embeddings(json.loads(raw))
+                elif path == '/v1/files':
+                    self._file(raw)
+                elif path == '/v1/batches':
+                    self._batch(json.loads(raw))
+                elif re.fullmatch(r'/v1/threads/[^/]+/messages', path):
+                    self._send_json(200, {"id": server._new_id('msg'), "object": "thread.message"})
+                else:
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            def _chat(self, body):
+                api_key = (self.headers.get('Authorization') or '').removeprefix('Bearer ')
+                if api_key in server.invalid_keys:
+                    with server._lock:
+                        server.counters['unauthorized'] += 1
+                    self._send_json(401, {"error": {"message": "Incorrect API key provided", "type": "invalid_request_error",
+                                                    "code": "invalid_api_key"}})
+                    return
+                tokens = server.count_tokens(body.get('messages', [])) + server.completion_tokens
+                retry_after = server._injected_rate_limit(api_key)
+                if retry_after is None:
+                    headers, retry_after = server._check_limits(tokens, api_key)
+                else:
+                    headers = {}
+                if retry_after is not None:
+                    headers['retry-after-ms'] = str(int(retry_after * 1000) + 1)
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                                    "code": "rate_limit_exceeded"}}, headers)
+                    return
+                delay = server.response_delay(body.get('model'))
+                if delay:
+                    time.sleep(delay)
+
+                response = server.completion(body)
+                if not body.get('stream'):
+                    with server._lock:
+                        server.counters['chat'] += 1
+                    try:
+                        self._send_json(200, response, headers)
+                    except (BrokenPipeError, ConnectionResetError):
+                        with server._lock:
+                            server.counters['cancelled'] += 1  # O cliente desistiu do pedido
+                    return
+
+                with server._lock:
+                    server.counters['stream'] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+
+                def event(payload):
+                    data = f"data: {payload}\n\n".encode('utf-8')
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+
+                base = {"id": response['id'], "object": "chat.completion.chunk",
+                        "created": response['created'], "model": response['model']}
+                words = response['choices'][0]['message']['content'].split(" ")
+                try:
+                    for i, word in enumerate(words):
+                        if i and server.token_delay:
+                            time.sleep(server.token_delay)
+                        delta = {"content": word if i == 0 else " " + word}
+                        event(json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+                    event(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+                    if (body.get('stream_options') or {}).get('include_usage'):
+                        event(json.dumps({**base, "choices": [], "usage": response['usage']}))
+                    event("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.counters['cancelled'] += 1  # O cliente cancelou o stream
+
+            def _embeddings(self, body):
+                texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+                dimensions = body.get('dimensions') or 1536
+                data = []
+                for i, text in enumerate(texts):
+                    vector = server.embedding(str(text), dimensions)
+                    if body.get('encoding_format') == 'base64':
+                        vector = base64.b64encode(struct.pack(f'<{dimensions}f', *vector)).decode()
+                    data.append({"object": "embedding", "index": i, "embedding": vector})
+                with server._lock:
+                    server.counters['embeddings'] += 1
+                tokens = sum(len(str(text)) // 4 for text in texts)
+                self._send_json(200, {"object": "list", "data": data, "model": body.get('model'),
+                                      "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+            def _file(self, raw):
+                fields = _multipart_fields(self.headers.get('Content-Type'), raw)
+                file_id = server._new_id('file')
+                content = fields.get('file', b'')
+                purpose = fields.get('purpose', b'assistants').decode()
+                server.files[file_id] = {'content': content, 'purpose': purpose}
+                with server._lock:
+                    server.counters['files'] += 1
+                self._send_json(200, {"id": file_id, "object": "file", "bytes": len(content),
+                                      "created_at": int(time.time()), "filename": "upload",
+                                      "purpose": purpose, "status": "processed"})
+
+            def _batch(self, body):
+                # O batch é processado logo: fica "completed" com o ficheiro de saída pronto
+                lines = server.files[body['input_file_id']]['content'].decode('utf-8').splitlines()
+                output = []
+                for line in filter(None, lines):
+                    request = json.loads(line)
+                    output.append(json.dumps({
+                        "id": server._new_id('batch_req'),
+                        "custom_id": request['custom_id'],
+                        "response": {"status_code": 200, "body": server.completion(request['body'])},
+                        "error": None,
+                    }))
+                output_id = server._new_id('file')
+                server.files[output_id] = {'content': ("\n".join(output) + "\n").encode('utf-8'),
+                                           'purpose': 'batch_output'}
+                batch_id = server._new_id('batch')
+                server.batches[batch_id] = {
+                    "id": batch_id, "object": "batch", "endpoint": body['endpoint'],
+                    "input_file_id": body['input_file_id'], "completion_window": body['completion_window'],
+                    "status": "completed", "output_file_id": output_id, "error_file_id": None,
+                    "created_at": int(time.time()),
+                    "request_counts": {"total": len(output), "completed": len(output), "failed": 0},
+                }
+                with server._lock:
+                    server.counters['batches'] += 1
+                self._send_json(200, server.batches[batch_id])
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API da OpenAI")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--completion-tokens", type=int, default=20)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    parser.add_argument("--tokens-per-minute", type=int, default=None)
+    parser.add_argument("--per-key-limits", action="store_true", help="Apply the limits to each API key separately")
+    parser.add_argument("--invalid-keys", nargs='*', default=(), help="API keys answered with 401")
+    parser.add_argument("--model-latency", nargs='*', default=(), help="Latency per model, as model=seconds")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="Fraction of requests that are slow")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="Extra seconds of the slow requests")
+    parser.add_argument("--handshake-latency", type=float, default=0.0, help="Delay of each new connection (seconds)")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.latency, args.completion_tokens, args.token_delay,
+                              args.requests_per_minute, args.tokens_per_minute,
+                              per_key_limits=args.per_key_limits, invalid_keys=args.invalid_keys,
+                              model_latency={item.split('=')[0]: float(item.split('=')[1]) for item in args.model_latency},
+                              slow_fraction=args.slow_fraction, slow_latency=args.slow_latency,
+                              handshake_latency=args.handshake_latency, port=args.port)
+    print(f"OPENAI_BASE_URL={server.base_url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+# loadtest.py
+#
+# Teste de carga a partir de conversas reais: lê as threads de um histórico
+# guardado (threads.json do layout antigo, uma pasta jsonl ou um ficheiro
+# .db) e volta a enviar as perguntas de cada thread, pela mesma ordem, com
+# o AssistantManager, contra o servidor falso (benchmarks/fake_openai.py).
+#
+# Cada utilizador virtual reproduz uma conversa de cada vez, com um tempo
+# de reflexão entre perguntas; --concurrency é o número de utilizadores e
+# --qps limita o ritmo total de pedidos. Mede o débito, os percentis da
+# latência (e quanto dela é o pedido à API e quanto é a escrita no
+# armazenamento e no índice de pesquisa), a amplificação de escrita (bytes escritos no disco por
+# byte de mensagem guardada) e o crescimento da memória do processo. A
+# evolução destes valores ao longo do teste (--windows) mostra a partir de
+# que tamanho do histórico a persistência passa a ser o gargalo.
+#
+# Uso:
+#   python3 benchmarks/loadtest.py --source threads.json [--source-backend json|jsonl|sqlite]
+#                                  [--backend jsonl|sqlite|json] [--conversations 100] [--concurrency 8]
+#                                  [--qps 20] [--think-model constant|exponential] [--think-time 0]
+#                                  [--max-turns N] [--duration S] [--preload] [--stream] [--use-cache]
+#                                  [--latency 0.02] [--base-url http://127.0.0.1:8099/v1] [--windows 10]
+#
+# Sem --source, reproduz um histórico gerado (threads com documentos e
+# perguntas curtas, como em bench_memory.py).
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pythonAI_wrapper.archive import TieredStorage  # noqa: E402
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.metrics import get_metrics  # noqa: E402
+from pythonAI_wrapper.rate_limiter import configure_rate_limiter  # noqa: E402
+from pythonAI_wrapper.storage import JSONStorage, create_storage  # noqa: E402
+from bench_manager import stored_bytes  # noqa: E402
+from bench_memory import fixture  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+API_KEY = 'sk-loadtest'
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def rss_bytes():
+    """Memória residente do processo (ou o máximo até agora, onde /proc não existe)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def written_bytes():
+    """Bytes escritos pelo processo em ficheiros (wchar de /proc/self/io; None se não existir)."""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def open_source(source, backend=None):
+    """
+    Abre (só para leitura) o histórico a reproduzir.
+
+    Args:
+        source (str): threads.json, pasta jsonl ou ficheiro .db.
+        backend (str, optional): 'json', 'jsonl' ou 'sqlite' (por omissão, pela extensão).
+
+    Returns:
+        (storage, nomes dos assistentes)
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"Histórico '{source}' não encontrado.")
+    backend = backend or ('jsonl' if os.path.isdir(source) else 'sqlite' if source.endswith('.db') else 'json')
+    if backend == 'json':
+        directory = os.path.dirname(os.path.abspath(source))
+        storage = JSONStorage(os.path.join(directory, 'assistants.json'), source)
+        with open(source, 'r', encoding='utf-8') as f:
+            names = list(json.load(f))
+    else:
+        storage = create_storage(backend, source)
+        names = list(storage.load_assistants())
+    # As threads arquivadas também são lidas (sem as rehidratar: o histórico não é alterado)
+    return TieredStorage(storage), names
+
+
+def load_trace(storage, names, max_turns=None):
+    """Conversas a reproduzir: [{'assistant', 'thread_id', 'prompts'}], só com as perguntas do utilizador."""
+    conversations = []
+    for name in names:
+        for thread_id in storage.list_threads(name):
+            prompts = [str(message['content']) for message in storage.iter_thread(name, thread_id)
+                       if message['role'] == 'user' and message['content']]
+            if prompts:
+                conversations.append({'assistant': name, 'thread_id': thread_id, 'prompts': prompts[:max_turns]})
+    return conversations
+
+
+def synthetic_source(path, threads=50, turns=10, documents=2, document_kb=16):
+    """Grava em `path` (pasta jsonl) um histórico gerado, para correr o teste sem um histórico real."""
+    storage = create_storage('jsonl', path)
+    storage.save_assistant('bench', {'api_key': API_KEY, 'model': 'gpt-4', 'instructions': 'És um assistente.'})
+    for thread_id, messages in fixture(threads, turns, documents, document_kb).items():
+        storage.create_thread('bench', thread_id)
+        storage.append_messages('bench', thread_id, messages)
+    return path
+
+
+class Pacer:
+    """Limita o ritmo total de pedidos a `qps` por segundo (None: sem limite)."""
+
+    def __init__(self, qps: float = None):
+        self.interval = 1 / qps if qps else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.perf_counter()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def think(rng, model, mean):
+    """Tempo de reflexão entre duas perguntas da mesma conversa."""
+    if not mean:
+        return 0.0
+    if model == 'exponential':
+        return rng.expovariate(1 / mean)
+    return mean
+
+
+def summarize(requests):
+    """Latências e tempos de API/escrita de uma lista de pedidos."""
+    latencies = [r['latency'] for r in requests]
+    persist = [r['persist'] for r in requests]
+    index = [r['index'] for r in requests]
+    total = sum(latencies)
+    return {
+        "p50_s": percentile(latencies, 0.5),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+        "api_p50_s": percentile([r['api'] for r in requests], 0.5),
+        "persist_p50_s": percentile(persist, 0.5),
+        "persist_p95_s": percentile(persist, 0.95),
+        "index_p50_s": percentile(index, 0.5),
+        # Fração da latência gasta a escrever as mensagens e a indexá-las para a pesquisa
+        "persist_share": sum(persist) / total if total else 0.0,
+        "index_share": sum(index) / total if total else 0.0,
+    }
+
+
+def run(source=None, source_backend=None, backend='jsonl', conversations=None, concurrency=8, qps=None,
+        think_model='constant', think_time=0.0, max_turns=None, duration=None, preload=False, stream=False,
+        use_cache=False, latency=0.02, base_url=None, windows=10, seed=1):
+    """
+    Corre o teste de carga e retorna uma lista de resultados (dicionários).
+
+    Args:
+        source (str, optional): Histórico a reproduzir (ver open_source); None gera um.
+        backend (str): Backend onde as conversas reproduzidas são guardadas.
+        conversations (int, optional): Número de conversas (as do histórico são
+            repetidas, em threads novas, até chegar a este número).
+        concurrency (int): Utilizadores virtuais (conversas em simultâneo).
+        qps (float, optional): Ritmo máximo de pedidos por segundo.
+        think_model (str): 'constant' ou 'exponential' (tempo de reflexão com média `think_time`).
+        max_turns (int, optional): Perguntas por conversa, no máximo.
+        duration (float, optional): Segundos depois dos quais não são feitos pedidos novos.
+        preload (bool): Copia o histórico para o armazenamento antes de começar, e as
+            perguntas são acrescentadas às threads gravadas (em vez de threads vazias).
+        base_url (str, optional): Servidor a usar (por omissão, um FakeOpenAIServer neste processo).
+        windows (int): Número de intervalos da evolução ao longo do teste.
+    """
+    get_metrics().path = None  # Não escreve o snapshot de métricas no disco
+    configure_rate_limiter(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+    cwd = os.getcwd()
+    source = os.path.abspath(source) if source is not None else None
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    os.chdir(workdir)
+    try:
+        if source is None:
+            source_storage, names = open_source(synthetic_source(os.path.join(workdir, 'source')), 'jsonl')
+        else:
+            source_storage, names = open_source(source, source_backend)
+        trace = load_trace(source_storage, names, max_turns)
+        if not trace:
+            raise ValueError("O histórico não tem perguntas para reproduzir.")
+        assistants = source_storage.load_assistants()
+
+        # Conversas a reproduzir: as do histórico, repetidas em threads novas se forem precisas mais
+        plan = []
+        for i in range(conversations or len(trace)):
+            conversation = trace[i % len(trace)]
+            copy = i // len(trace)
+            plan.append(dict(conversation, target=conversation['thread_id'] + (f"~{copy}" if copy else "")))
+
+        target = os.path.join(workdir, 'target')
+        os.makedirs(target)
+        if backend == 'json':
+            storage = JSONStorage(os.path.join(target, 'assistants.json'), os.path.join(target, 'threads.json'))
+        else:
+            storage = create_storage(backend, os.path.join(target, 'conversations.db') if backend == 'sqlite' else target)
+        for name in {conversation['assistant'] for conversation in plan}:
+            # A configuração gravada, mas com uma chave falsa e sem base_url (os pedidos vão para o servidor falso)
+            data = dict(assistants.get(name) or {'model': 'gpt-4', 'instructions': ''}, api_key=API_KEY, base_url=None)
+            storage.save_assistant(name, data)
+        for conversation in plan:
+            if preload:
+                storage.replace_thread(conversation['assistant'], conversation['target'],
+                                       list(source_storage.iter_thread(conversation['assistant'],
+                                                                       conversation['thread_id'])))
+            else:
+                storage.create_thread(conversation['assistant'], conversation['target'])
+        manager = AssistantManager(filename=os.path.join(workdir, 'assistants.json'),
+                                   threads_filename=os.path.join(workdir, 'threads.json'), storage=storage)
+
+        # Tempo de API e de escrita de cada pedido, pelas métricas observadas na thread que o faz
+        local = threading.local()
+
+        def hook(kind, name, value, labels):
+            if name == 'request_seconds':
+                local.api = getattr(local, 'api', 0.0) + value
+            elif name == 'storage_write_seconds' and labels.get('backend') == 'SearchIndex':
+                local.index = getattr(local, 'index', 0.0) + value
+            elif name == 'storage_write_seconds':
+                local.persist = getattr(local, 'persist', 0.0) + value
+        get_metrics().add_hook(hook)
+
+        pacer = Pacer(qps)
+        requests, errors = [], []
+        queue = iter(plan)
+        queue_lock = threading.Lock()
+        rss = {'start': None, 'peak': None}
+        done = threading.Event()
+
+        def sample_memory():
+            while not done.wait(0.2):
+                value = rss_bytes()
+                if value is not None:
+                    rss['peak'] = max(rss['peak'] or 0, value)
+
+        def user(worker):
+            rng = random.Random(seed + worker)
+            while True:
+                with queue_lock:
+                    conversation = next(queue, None)
+                if conversation is None:
+                    return
+                name, thread_id = conversation['assistant'], conversation['target']
+                for turn, prompt in enumerate(conversation['prompts']):
+                    if turn:
+                        time.sleep(think(rng, think_model, think_time))
+                    if deadline is not None and time.perf_counter() > deadline:
+                        return
+                    pacer.wait()
+                    history = len(manager.assistants[name].threads[thread_id])
+                    local.api = local.persist = local.index = 0.0
+                    start = time.perf_counter()
+                    try:
+                        response = manager.send_prompt(name, thread_id, prompt, stream=stream, use_cache=use_cache)
+                        if stream:
+                            response = "".join(response)
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    requests.append({'latency': time.perf_counter() - start, 'api': local.api,
+                                     'persist': local.persist, 'index': local.index, 'history': history, 'finished': time.perf_counter(),
+                                     'bytes': len(prompt.encode('utf-8')) + len((response or "").encode('utf-8'))})
+
+        server = FakeOpenAIServer(latency=latency) if base_url is None else None
+        with server if server is not None else nullcontext():
+            os.environ['OPENAI_BASE_URL'] = base_url or server.base_url
+            for name in {conversation['assistant'] for conversation in plan}:
+                manager.assistants[name].client  # Importa o openai e cria o cliente antes da medição da memória
+            stored_before = stored_bytes(target)
+            written_before = written_bytes()
+            rss['start'] = rss['peak'] = rss_bytes()
+            sampler = threading.Thread(target=sample_memory, daemon=True)
+            sampler.start()
+            started = time.perf_counter()
+            deadline = started + duration if duration else None
+            try:
+                with ThreadPoolExecutor(concurrency) as executor:
+                    list(executor.map(user, range(concurrency)))
+            finally:
+                elapsed = time.perf_counter() - started
+                done.set()
+                sampler.join()
+                get_metrics().remove_hook(hook)
+            written_after = written_bytes()
+            rss_end = rss_bytes()
+            if hasattr(storage, 'close'):
+                storage.close()
+            stored_after = stored_bytes(target)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if not requests:
+        raise ValueError(f"Nenhum pedido terminou ({len(errors)} erros; o primeiro: {errors[0] if errors else None}).")
+    logical = sum(r['bytes'] for r in requests)
+    written = written_after - written_before if written_before is not None else stored_after - stored_before
+    requests.sort(key=lambda r: r['finished'])
+    size = max(len(requests) // max(windows, 1), 1)
+    timeline = []
+    for i in range(0, len(requests), size):
+        window = requests[i:i + size]
+        span = window[-1]['finished'] - (requests[i - 1]['finished'] if i else started)
+        timeline.append(dict(summarize(window), requests=len(window),
+                             throughput_per_s=len(window) / span if span > 0 else 0.0,
+                             history_mean=sum(r['history'] for r in window) / len(window)))
+
+    result = {
+        "benchmark": "loadtest",
+        "source": os.path.basename(source) if source else "synthetic",
+        "backend": backend,
+        "conversations": len(plan),
+        "concurrency": concurrency,
+        "qps": qps,
+        "think_model": think_model,
+        "think_time": think_time,
+        "preload": preload,
+        "stream": stream,
+        "requests": len(requests),
+        "error_rate": len(errors) / (len(requests) + len(errors)),
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(requests) / elapsed,
+        **summarize(requests),
+        "logical_bytes": logical,
+        "written_bytes": written,
+        "write_amplification": written / logical if logical else 0.0,
+        "stored_growth_bytes": stored_after - stored_before,
+        "rss_start_bytes": rss['start'],
+        "rss_peak_bytes": rss['peak'],
+        "rss_growth_bytes": (rss_end - rss['start']) if rss_end is not None and rss['start'] is not None else None,
+        "timeline": timeline,
+    }
+
+    r = result
+    print(f"{r['requests']} pedidos em {elapsed:.1f} s ({r['throughput_per_s']:.1f}/s, {len(errors)} erros): "
+          f"p50 {r['p50_s'] * 1000:.0f} ms, p95 {r['p95_s'] * 1000:.0f} ms, p99 {r['p99_s'] * 1000:.0f} ms; "
+          f"escrita {r['persist_share']:.0%} e índice {r['index_share']:.0%} da latência; amplificação de escrita {r['write_amplification']:.1f}x; "
+          f"memória +{(r['rss_growth_bytes'] or 0) / 1e6:.1f} MB", file=sys.stderr)
+    print(f"{'pedidos':>8} {'histórico':>10} {'pedidos/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'API ms':>8} "
+          f"{'escrita ms':>11} {'escrita %':>10} {'índice ms':>10}", file=sys.stderr)
+    for row in timeline:
+        print(f"{row['requests']:>8} {row['history_mean']:>10.1f} {row['throughput_per_s']:>10.1f} "
+              f"{row['p50_s'] * 1000:>8.1f} {row['p95_s'] * 1000:>8.1f} {row['api_p50_s'] * 1000:>8.1f} "
+              f"{row['persist_p50_s'] * 1000:>11.2f} {row['persist_share']:>10.0%} {row['index_p50_s'] * 1000:>10.2f}", file=sys.stderr)
+    if errors:
+        print(f"Primeiro erro: {errors[0]!r}", file=sys.stderr)
+    return [result]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga que reproduz conversas gravadas")
+    parser.add_argument("--source", default=None, help="threads.json, jsonl folder or .db file to replay (default: generated)")
+    parser.add_argument("--source-backend", default=None, choices=["json", "jsonl", "sqlite"],
+                        help="Storage format of --source (default: from the path)")
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite", "json"],
+                        help="Storage backend the replayed conversations are written to")
+    parser.add_argument("--conversations", type=int, default=None,
+                        help="Number of conversations (recorded ones are repeated in new threads)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users (conversations in flight)")
+    parser.add_argument("--qps", type=float, default=None, help="Maximum requests per second, across all users")
+    parser.add_argument("--think-model", default="constant", choices=["constant", "exponential"])
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between two turns of a conversation")
+    parser.add_argument("--max-turns", type=int, default=None, help="Replay at most this many turns per conversation")
+    parser.add_argument("--duration", type=float, default=None, help="Stop starting requests after this many seconds")
+    parser.add_argument("--preload", action="store_true",
+                        help="Copy the recorded history first and continue those threads")
+    parser.add_argument("--stream", action="store_true", help="Stream the responses")
+    parser.add_argument("--use-cache", action="store_true", help="Allow the response cache (off: every turn hits the API)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latency of the in-process fake server")
+    parser.add_argument("--base-url", default=None, help="Use this server instead (e.g. a separate fake_openai.py)")
+    parser.add_argument("--windows", type=int, default=10, help="Number of intervals in the timeline")
+    args = parser.parse_args()
+
+    try:
+        results = run(args.source, args.source_backend, args.backend, args.conversations, args.concurrency, args.qps,
+                      args.think_model, args.think_time, args.max_turns, args.duration, args.preload, args.stream,
+                      args.use_cache, args.latency, args.base_url, args.windows)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# run_all.py
+#
+# Corre todos os benchmarks e grava um único ficheiro JSON com os resultados
+# e o commit/ambiente em que foram obtidos. Com --baseline, compara com um
+# ficheiro anterior e assinala as regressões.
+#
+# Uso:
+#   python3 benchmarks/run_all.py [--quick] [--output results.json] [--baseline old.json] [--threshold 0.2]
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import bench_clients
+import bench_hedging
+import bench_key_pool
+import bench_manager
+import bench_memory
+import bench_pdf
+import bench_router
+import bench_search
+import bench_send_prompt
+import bench_startup
+import loadtest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUITES = {
+    'startup': lambda quick: bench_startup.run([10, 1000] if quick else [10, 1000, 100000], repeat=3 if quick else 5),
+    'startup_send': lambda quick: bench_startup.run([10] if quick else [10, 10000], repeat=3 if quick else 5, command='send'),
+    'manager': lambda quick: bench_manager.run([100, 10000] if quick else [100, 10000, 100000], repeat=3 if quick else 5),
+    'send_prompt': lambda quick: bench_send_prompt.run([0, 100] if quick else [0, 100, 1000, 10000], requests=20 if quick else 100),
+    'send_prompt_sqlite': lambda quick: bench_send_prompt.run([0, 100] if quick else [0, 1000], requests=20 if quick else 100, backend='sqlite'),
+    'clients': lambda quick: bench_clients.run(requests=200 if quick else 400),
+    'key_pool': lambda quick: bench_key_pool.run([1, 2] if quick else [1, 2, 4], requests=100 if quick else 300),
+    'hedging': lambda quick: bench_hedging.run(requests=200 if quick else 400, quantile=0.95),
+    'router': lambda quick: bench_router.run(requests=100 if quick else 200),
+    'loadtest': lambda quick: loadtest.run(conversations=50 if quick else 200, concurrency=8),
+    'memory': lambda quick: bench_memory.run(threads=20 if quick else 200),
+    'search': lambda quick: bench_search.run([10000, 100000] if quick else [10000, 100000, 1000000], queries=20 if quick else 50),
+    'pdf': lambda quick: bench_pdf.run(files=5 if quick else 20, pages=5 if quick else 10, repeat=2 if quick else 3),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    """Identifica um resultado pelos seus parâmetros (campos que não são medidas)."""
+    return json.dumps({key: value for key, value in result.items()
+                       if not isinstance(value, (float, list)) and not key.endswith(('_s', '_bytes'))}, sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """
+    Compara as medidas com as de um ficheiro anterior. Os campos *_s são
+    tempos e os *_bytes tamanhos (mais baixo é melhor); os *_per_s são
+    débitos (mais alto é melhor).
+
+    Returns:
+        list: Descrições das regressões acima de `threshold` (fração).
+    """
+    previous = {result_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        for field, value in result.items():
+            if not isinstance(value, (int, float)) or not isinstance(old.get(field), (int, float)) or not old[field]:
+                continue
+            if field.endswith('_per_s'):
+                change = old[field] / value - 1 if value else float('inf')
+            elif field.endswith(('_s', '_bytes')):
+                change = value / old[field] - 1
+            else:
+                continue
+            line = f"{result['benchmark']} {result_key(result)} {field}: {old[field]:.6g} -> {value:.6g} ({change:+.1%})"
+            print(line, file=sys.stderr)
+            if change > threshold:
+                regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corre todos os benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a quick check")
+    parser.add_argument("--only", nargs='+', choices=sorted(SUITES), default=None, help="Run only these suites")
+    parser.add_argument("--output", default=None, help="Write the results to this file (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "quick": args.quick,
+        "results": [],
+    }
+    for name in args.only or SUITES:
+        print(f"== {name}", file=sys.stderr)
+        report["results"].extend(SUITES[name](args.quick))
+
+    data = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressões acima de {args.threshold:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
 import argparse
-from pythonAI_wrapper.assistant_manager import AssistantManager
-from config import OPENAI_API_KEY
-from pythonAI_wrapper.pdfHandler import PDFHandler
+import getpass
+import hashlib
+import json
 import os
-def main():
+import socket
+import sys
+import tempfile
+from datetime import datetime
+from typing import Optional
+import config
+from config import OPENAI_API_KEY, STORAGE_BACKEND, STORAGE_PATH
+
+DAEMON_SOCKET = getattr(config, 'DAEMON_SOCKET', None)
+ARCHIVE_AFTER_DAYS = getattr(config, 'ARCHIVE_AFTER_DAYS', None)
+OPENAI_API_KEYS = getattr(config, 'OPENAI_API_KEYS', [])
+KEY_POOL_STRATEGY = getattr(config, 'KEY_POOL_STRATEGY', 'least_loaded')
+METRICS_PATH = getattr(config, 'METRICS_PATH', None)
+RESPONSE_CACHE_DIR = getattr(config, 'RESPONSE_CACHE_DIR', None)
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description="CLI tool for OpenAI Assistant")
+    parser.add_argument("--socket", default=None,
+                        help="Unix socket of the daemon (default: $PYTHONAI_SOCKET, DAEMON_SOCKET in config.py "
+                             "or a per-user socket for the current folder)")
 
     # Definindo os comandos
     subparsers = parser.add_subparsers(dest="command")
@@ -13,7 +32,12 @@ def main():
     create_parser = subparsers.add_parser("create_assistant", help="Create a new assistant")
     create_parser.add_argument("name", help="Name of the assistant")
     create_parser.add_argument("--model", default="gpt-4", help="OpenAI model to use")
-    create_parser.add_argument("--instructions", help="Instructions for the assistant")
+    create_parser.add_argument("--instructions", default='', help="Path to a file or folder with instructions")
+    create_parser.add_argument("--max-context-tokens", type=int, default=None, help="Token budget for the context sent on each request")
+    create_parser.add_argument("--summarize", action="store_true", help="Summarize messages that fall out of the context window")
+    create_parser.add_argument("--retrieval", choices=["openai", "hashing"], default=None, help="Embedder used to search documents added to threads")
+    create_parser.add_argument("--top-k", type=int, default=4, help="Number of document excerpts sent with each prompt")
+    create_parser.add_argument("--cache", action="store_true", help="Cache responses to identical requests")
 
     # Comando para criar uma thread
     create_thread_parser = subparsers.add_parser("create_thread", help="Create a new conversation thread")
@@ -24,8 +48,36 @@ def main():
     prompt_parser = subparsers.add_parser("send", help="Send a prompt to the assistant")
     prompt_parser.add_argument("assistant_name", help="Name of the assistant to use")
     prompt_parser.add_argument("thread_id", help="ID of the conversation thread")
-    prompt_parser.add_argument("prompt", help="Prompt to send")
+    prompt_parser.add_argument("prompt", help="Path to a text file, folder, or prompt text")
+    prompt_parser.add_argument("--stream", action="store_true", help="Print the response as it arrives")
+    prompt_parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache for this prompt")
     
+    # Comando para enviar o mesmo prompt a vários assistentes
+    fan_out_parser = subparsers.add_parser("fan_out", help="Send one prompt to several assistants concurrently")
+    fan_out_parser.add_argument("thread_id", help="ID of the thread (created in each assistant if missing)")
+    fan_out_parser.add_argument("prompt", help="Path to a text file, folder, or prompt text")
+    fan_out_parser.add_argument("--assistants", nargs='+', required=True, help="Names of the assistants")
+    fan_out_parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache for this prompt")
+
+    # Comando para repetir os pedidos lentos (hedging)
+    hedge_parser = subparsers.add_parser("hedge", help="Re-send slow requests of an assistant and keep the first answer")
+    hedge_parser.add_argument("assistant_name", help="Name of the assistant")
+    hedge_parser.add_argument("--quantile", type=float, default=0.95, help="Re-send after this percentile of the recent latencies")
+    hedge_parser.add_argument("--fallback-model", default=None, help="Model of the second request (default: the same)")
+    hedge_parser.add_argument("--budget", type=float, default=0.1, help="Maximum fraction of requests that are re-sent")
+    hedge_parser.add_argument("--off", action="store_true", help="Disable hedging")
+
+    # Comando para escolher o modelo de cada pedido (router)
+    route_parser = subparsers.add_parser("route", help="Pick the model of each request by prompt size and latency")
+    route_parser.add_argument("assistant_name", help="Name of the assistant")
+    route_parser.add_argument("--models", nargs='+', default=None, type=parse_route_model,
+                              help="Models in order of preference, as model[:max_prompt_tokens[:max_latency_seconds]]")
+    route_parser.add_argument("--thread", default=None, help="Set constraints for this thread only")
+    route_parser.add_argument("--pin", default=None, help="With --thread: always use this model")
+    route_parser.add_argument("--allow", nargs='+', default=None, help="With --thread: only these models")
+    route_parser.add_argument("--max-latency", type=float, default=None, help="With --thread: avoid models slower than this (seconds)")
+    route_parser.add_argument("--off", action="store_true", help="Disable routing (or, with --thread, clear its constraints)")
+
     # Comando para listar assistentes
     list_assistants_parser = subparsers.add_parser("list_assistants", help="List all assistants")
 
@@ -37,37 +89,154 @@ def main():
     history_parser = subparsers.add_parser("history", help="View the history of a thread")
     history_parser.add_argument("assistant_name", help="Name of the assistant")
     history_parser.add_argument("thread_id", help="ID of the conversation thread")
+    history_parser.add_argument("--limit", type=int, default=None, help="Show only the last N messages")
+    history_parser.add_argument("--before", type=int, default=None, help="Show only messages before this position")
+    history_parser.add_argument("--since", type=int, default=None, help="Start at this position (with --limit, the page size)")
     
     # Comando para ver o histórico de assistentes
     assistant_history_parser = subparsers.add_parser("assistant_history", help="View the history of an assistant")
     assistant_history_parser.add_argument("assistant_name", help="Name of the assistant")
+    assistant_history_parser.add_argument("--limit", type=int, default=None, help="Show only the last N messages of each thread")
+    assistant_history_parser.add_argument("--since", type=int, default=None, help="Start each thread at this position")
+
+    # Comando para exportar o histórico
+    export_parser = subparsers.add_parser("export", help="Export the history to JSONL, gzip-JSONL or Parquet (streamed)")
+    export_parser.add_argument("output", help="Output file ('-' for stdout); the format follows the extension (.jsonl, .jsonl.gz, .parquet)")
+    export_parser.add_argument("--assistant", nargs='+', default=None, help="Only these assistants (default: all)")
+    export_parser.add_argument("--thread", default=None, help="Only this thread")
+    export_parser.add_argument("--format", choices=["jsonl", "jsonl.gz", "parquet"], default=None, help="Output format")
+    export_parser.add_argument("--since", type=parse_date, default=None, help="Only threads written since this date (YYYY-MM-DD)")
 
     #  Comando para adicionar um arquivo PDF
     add_file_parser = subparsers.add_parser("add_file", help="Add a PDF file to a thread")
     add_file_parser.add_argument("thread_id", help="ID of the thread")
     add_file_parser.add_argument("file", type=str, help="Path to the PDF file to add")
+    add_file_parser.add_argument("--assistant", default=None, help="Name of the assistant that owns the thread")
 
     # Comando para adicionar uma pasta com arquivos PDF
     add_folder_parser = subparsers.add_parser("add_folder", help="Add all PDF files from a folder to a thread")
     add_folder_parser.add_argument("thread_id", help="ID of the thread")
     add_folder_parser.add_argument("folder", type=str, help="Path to the folder containing PDF files")
+    add_folder_parser.add_argument("--assistant", default=None, help="Name of the assistant that owns the thread")
     
-    # Comando para criar um assistente
-    create_parser = subparsers.add_parser("create_assistant", help="Create a new assistant")
-    create_parser.add_argument("name", help="Name of the assistant")
-    create_parser.add_argument("--model", default="gpt-4", help="OpenAI model to use")
-    create_parser.add_argument("--instructions", help="Path to a file or folder with instructions")
+    # Comando para sincronizar uma pasta (só os ficheiros novos ou alterados)
+    sync_parser = subparsers.add_parser("sync", help="Send only new or changed files of a folder to a thread")
+    sync_parser.add_argument("assistant_name", help="Name of the assistant")
+    sync_parser.add_argument("folder", help="Path to the folder")
+    sync_parser.add_argument("--thread", default=None, help="ID of the thread (not used with --as instructions)")
+    sync_parser.add_argument("--as", dest="target", choices=["context", "files", "prompt", "instructions"], default="context",
+                             help="Add the files to the search index (context), upload them to OpenAI (files), send them as a prompt or reload the instructions")
+    sync_parser.add_argument("--prune", action="store_true", help="Remove documents of deleted files from the search index")
+    sync_parser.add_argument("--dry-run", action="store_true", help="Only show what changed")
+    sync_parser.add_argument("--watch", action="store_true", help="Keep watching the folder and sync changes as they land")
+    sync_parser.add_argument("--interval", type=float, default=2.0, help="Seconds between checks in watch mode")
 
-    # Comando para enviar um prompt
-    prompt_parser = subparsers.add_parser("send", help="Send a prompt to the assistant")
-    prompt_parser.add_argument("assistant_name", help="Name of the assistant to use")
-    prompt_parser.add_argument("thread_id", help="ID of the conversation thread")
-    prompt_parser.add_argument("prompt", help="Path to a text file, folder, or prompt text")
+    # Comando para ver as estatísticas da cache de respostas
+    cache_parser = subparsers.add_parser("cache", help="Show response cache statistics")
+    cache_parser.add_argument("--clear", action="store_true", help="Remove all cached responses")
 
-    args = parser.parse_args()
+    # Comando para ver as métricas de latência, tokens e escrita
+    stats_parser = subparsers.add_parser("stats", help="Show latency, token and storage metrics")
+    stats_parser.add_argument("--format", choices=["text", "json", "prometheus"], default="text", help="Output format")
+    stats_parser.add_argument("--output", default=None, help="Write the snapshot to this file instead of printing it")
+    stats_parser.add_argument("--clear", action="store_true", help="Remove the recorded metrics")
+
+    # Comando para ver o uso de cada chave do pool
+    subparsers.add_parser("keys", help="Show requests, tokens and errors per API key of the pool (OPENAI_API_KEYS)")
+
+    # Comando para arquivar threads inativas
+    compact_parser = subparsers.add_parser("compact", help="Archive (compressed) threads without new messages for a while")
+    compact_parser.add_argument("--older-than", type=float, default=None, help="Minimum idle time in days (default: ARCHIVE_AFTER_DAYS in config.py)")
+    compact_parser.add_argument("--dry-run", action="store_true", help="Only list the threads that would be archived")
+    compact_parser.add_argument("--report", action="store_true", help="Only show how many threads are live and archived")
+
+    # Comando para pesquisar o histórico de todas as threads
+    search_parser = subparsers.add_parser("search", help="Search the messages of all threads (full-text, ranked by relevance)")
+    search_parser.add_argument("query", help="Words to search for (word* searches by prefix)")
+    search_parser.add_argument("--assistant", default=None, help="Only this assistant")
+    search_parser.add_argument("--thread", default=None, help="Only this thread")
+    search_parser.add_argument("--role", choices=["user", "assistant"], default=None, help="Only messages with this role")
+    search_parser.add_argument("--since", type=parse_date, default=None, help="Only messages from this date on (YYYY-MM-DD)")
+    search_parser.add_argument("--until", type=parse_date, default=None, help="Only messages before this date (YYYY-MM-DD)")
+    search_parser.add_argument("--limit", type=int, default=20, help="Maximum number of results")
+    search_parser.add_argument("--reindex", action="store_true", help="Rebuild the index from the stored threads first")
+
+    # Comandos para a Batch API
+    batch_parser = subparsers.add_parser("batch", help="Send prompts through the OpenAI Batch API")
+    batch_subparsers = batch_parser.add_subparsers(dest="batch_command")
+    batch_submit_parser = batch_subparsers.add_parser("submit", help="Submit prompts from files or folders")
+    batch_submit_parser.add_argument("assistant_name", help="Name of the assistant to use")
+    batch_submit_parser.add_argument("sources", nargs='+', help="Files or folders with prompts (.txt, .pdf, .jsonl)")
+    batch_submit_parser.add_argument("--thread", default=None, help="Thread for all prompts (default: one thread per file)")
+    batch_status_parser = batch_subparsers.add_parser("status", help="Show the status of a batch job")
+    batch_status_parser.add_argument("job_id", nargs='?', default=None, help="ID of the job (default: list all jobs)")
+    batch_collect_parser = batch_subparsers.add_parser("collect", help="Merge finished results into the threads")
+    batch_collect_parser.add_argument("job_id", help="ID of the job")
+
+    # Comando para manter um processo com o AssistantManager já carregado
+    serve_parser = subparsers.add_parser("serve", help="Run a daemon that keeps the manager loaded; other commands are forwarded to it")
+    serve_parser.add_argument("--socket", default=argparse.SUPPRESS, help="Path of the Unix socket")
+    serve_parser.add_argument("--stop", action="store_true", help="Stop the running daemon")
 
-    # Instancia o gerenciador de assistentes
-    manager = AssistantManager()
+    parser.batch_parser = batch_parser
+    return parser
+
+
+def parse_date(value):
+    """Converte uma data YYYY-MM-DD (hora local) num timestamp."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Data inválida: '{value}' (use YYYY-MM-DD)")
+
+
+def parse_route_model(value):
+    """Converte 'modelo[:max_prompt_tokens[:max_latency]]' na entrada de um modelo do router."""
+    model, _, limits = value.partition(':')
+    max_prompt_tokens, _, max_latency = limits.partition(':')
+    try:
+        return {'model': model, 'max_prompt_tokens': int(max_prompt_tokens) if max_prompt_tokens else None,
+                'max_latency': float(max_latency) if max_latency else None}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Modelo inválido: '{value}' (use modelo[:max_prompt_tokens[:max_latency]])")
+
+
+def print_message(message):
+    """Mostra uma mensagem do histórico ("Usuário: ..." / "Assistente (modelo, latência): ...")."""
+    if isinstance(message, dict):
+        role = message.get('role', 'Desconhecido')
+        content = message.get('content', 'Sem conteúdo')
+        role_name = "Usuário" if role == "user" else "Assistente"
+        if message.get('model'):
+            latency = f", {message['latency']:.2f}s" if message.get('latency') is not None else ''
+            role_name += f" ({message['model']}{latency})"
+        print(f"{role_name}: {content}")
+    else:
+        print(message)  # Caso seja apenas uma string
+
+
+def create_manager():
+    """Instancia o gerenciador de assistentes com o armazenamento do config.py."""
+    from pythonAI_wrapper.assistant_manager import AssistantManager
+    from pythonAI_wrapper.key_pool import KeyPool
+    from pythonAI_wrapper.metrics import get_metrics
+    from pythonAI_wrapper.response_cache import get_default_cache
+    from pythonAI_wrapper.storage import create_storage
+    if METRICS_PATH:
+        get_metrics().enable_persistence(METRICS_PATH)
+    if RESPONSE_CACHE_DIR:
+        get_default_cache().enable_persistence(RESPONSE_CACHE_DIR)
+    key_pool = KeyPool(OPENAI_API_KEYS, strategy=KEY_POOL_STRATEGY) if OPENAI_API_KEYS else None
+    return AssistantManager(storage=create_storage(STORAGE_BACKEND, STORAGE_PATH), archive_after_days=ARCHIVE_AFTER_DAYS,
+                            key_pool=key_pool)
+
+
+def run_command(args, parser, manager):
+    """Executa um comando já analisado (no processo da CLI ou no daemon)."""
+    from pythonAI_wrapper.pdfHandler import PDFHandler
+    from pythonAI_wrapper.batch import BatchManager
+    from pythonAI_wrapper.response_cache import get_default_cache
+    from pythonAI_wrapper.metrics import Metrics, get_metrics
 
     if args.command == "create_assistant":
         if not OPENAI_API_KEY:
@@ -75,7 +244,11 @@ def main():
             return
         
         try:
-            manager.create_assistant(OPENAI_API_KEY, args.name, args.model, args.instructions)
+            manager.create_assistant(OPENAI_API_KEY, args.name, args.model, args.instructions,
+                                     max_context_tokens=args.max_context_tokens,
+                                     summarize_evicted=args.summarize,
+                                     retrieval={'embedder': args.retrieval, 'top_k': args.top_k} if args.retrieval else None,
+                                     cache_responses=args.cache)
             print(f"Assistente '{args.name}' criado com sucesso!")
         except ValueError as e:
             print(e)
@@ -104,19 +277,28 @@ def main():
                     print("A pasta está vazia.")
                     return
                 
-                # Ler todos os arquivos de texto na pasta
-                for file_name in files:
-                    file_path = os.path.join(args.prompt, file_name)
-                    if file_name.endswith('.pdf'):  
-                        pdf_handler = PDFHandler()
-                        prompt = pdf_handler.read_folder(args.prompt)
-                    
+                # Ler todos os PDFs da pasta (uma única vez)
+                if any(file_name.endswith('.pdf') for file_name in files):
+                    pdf_handler = PDFHandler()
+                    prompt = pdf_handler.read_folder(args.prompt)
+
                 if not prompt.strip():
                     print("Nenhum conteúdo válido encontrado nos arquivos de texto.")
                     return
 
-            # Aqui é onde corrigimos a chamada do método
-            response = manager.send_prompt(args.assistant_name, args.thread_id, prompt)
+            if args.stream:
+                fragments = manager.send_prompt(args.assistant_name, args.thread_id, prompt, stream=True,
+                                                use_cache=not args.no_cache)
+                print("Resposta: ", end="", flush=True)
+                try:
+                    for fragment in fragments:
+                        print(fragment, end="", flush=True)
+                except (KeyboardInterrupt, BrokenPipeError):
+                    fragments.close()  # Guarda a resposta parcial
+                print()
+                return
+
+            response = manager.send_prompt(args.assistant_name, args.thread_id, prompt, use_cache=not args.no_cache)
             print(f"Resposta: {response}")
         except Exception as e:
             print(f"Ocorreu um erro: {e}")
@@ -124,6 +306,61 @@ def main():
 
 
 
+    elif args.command == "fan_out":
+        try:
+            responses = manager.fan_out(args.assistants, args.thread_id, args.prompt, use_cache=not args.no_cache,
+                                        return_exceptions=True)
+        except ValueError as e:
+            print(e)
+            return
+        for assistant_name, response in responses.items():
+            if isinstance(response, Exception):
+                print(f"{assistant_name}: Ocorreu um erro: {response}")
+            else:
+                print(f"{assistant_name}: {response}")
+
+    elif args.command == "hedge":
+        try:
+            manager.set_hedging(args.assistant_name, not args.off, args.quantile, args.fallback_model, args.budget)
+        except ValueError as e:
+            print(e)
+            return
+        if args.off:
+            print(f"Hedging desativado para o assistente '{args.assistant_name}'.")
+        else:
+            fallback = f" com o modelo '{args.fallback_model}'" if args.fallback_model else ''
+            print(f"Os pedidos do assistente '{args.assistant_name}' mais lentos do que o p{args.quantile * 100:g} "
+                  f"são repetidos{fallback} (no máximo {args.budget:.0%} dos pedidos).")
+
+    elif args.command == "route":
+        try:
+            if args.thread is not None:
+                if args.off:
+                    manager.set_thread_route(args.assistant_name, args.thread)
+                else:
+                    manager.set_thread_route(args.assistant_name, args.thread, args.pin, args.allow, args.max_latency)
+            elif args.off or args.models:
+                manager.set_routing(args.assistant_name, None if args.off else args.models)
+            routing = manager.get_assistant(args.assistant_name).routing
+            rows = manager.routing_stats(args.assistant_name)
+        except ValueError as e:
+            print(e)
+            return
+        if routing is None:
+            print(f"O assistente '{args.assistant_name}' usa sempre o modelo '{manager.get_assistant(args.assistant_name).model}'.")
+            return
+        print(f"Modelos do assistente '{args.assistant_name}', por ordem de preferência:")
+        for row in rows:
+            limits = []
+            if row['max_prompt_tokens'] is not None:
+                limits.append(f"até {row['max_prompt_tokens']} tokens")
+            if row['max_latency'] is not None:
+                limits.append(f"latência máxima {row['max_latency']:g}s")
+            latency = f"{row['latency']:.2f}s" if row['latency'] is not None else "desconhecida"
+            print(f"  {row['model']}: {', '.join(limits) or 'sem limites'}; latência média {latency}, {row['requests']} pedidos")
+        for thread_id, constraints in routing['threads'].items():
+            print(f"  thread {thread_id}: " + ", ".join(f"{key}={value}" for key, value in constraints.items()))
+
     elif args.command == "list_assistants":
         assistants = manager.list_assistants()
         print("Assistentes disponíveis:")
@@ -141,51 +378,451 @@ def main():
 
     elif args.command == 'history':
         try:
-            history = manager.get_thread_history(args.assistant_name, args.thread_id)
+            history = manager.iter_thread_history(args.assistant_name, args.thread_id, since=args.since,
+                                                  limit=args.limit, before=args.before)
             print("Histórico da Thread:")
+            shown = 0
             for message in history:
-                if isinstance(message, dict):
-                    role = message.get('role', 'Desconhecido')
-                    content = message.get('content', 'Sem conteúdo')
-                    role_name = "Usuário" if role == "user" else "Assistente"
-                    print(f"{role_name}: {content}")
-                else:
-                    print(message)  # Caso seja apenas uma string
+                print_message(message)
+                shown += 1
+            if args.since is not None and args.limit is not None and shown == args.limit:
+                print(f"\nPróxima página: --since {args.since + shown} --limit {args.limit}")
         except ValueError as e:
             print(e)
 
 
     elif args.command == "assistant_history":
         try:
-            history = manager.get_assistant_history(args.assistant_name)
-            print(f"Histórico do Assistente: {history['assistant_name']}")
-            for thread_id, messages in history["threads"].items():
+            print(f"Histórico do Assistente: {args.assistant_name}")
+            for thread_id, messages in manager.iter_assistant_history(args.assistant_name, since=args.since,
+                                                                     limit=args.limit):
                 print(f"\nThread ID: {thread_id}")
                 for message in messages:
-                    role = message['role']
-                    content = message['content']
-                    role_name = "Usuário" if role == "user" else "Assistente"
-                    print(f"{role_name}: {content}")
+                    print_message(message)
         except ValueError as e:
             print(e)
 
+    elif args.command == "export":
+        from pythonAI_wrapper.export import export_records
+        try:
+            records = manager.iter_records(args.assistant, thread_id=args.thread, updated_since=args.since)
+            count = export_records(records, args.output, args.format)
+        except ValueError as e:
+            print(e)
+            return
+        if args.output != '-':
+            print(f"{count} mensagens exportadas para '{args.output}'.")
+
 
     elif args.command == "add_file":
         try:
-            manager.add_context_file(args.file, args.thread_id)
-            print(f"Arquivo '{args.file}' adicionado à thread '{args.thread_id}'.")
+            chunks = manager.add_context_file(args.file, args.thread_id, args.assistant)
+            print(f"Arquivo '{args.file}' adicionado à thread '{args.thread_id}' ({chunks} excertos indexados).")
         except ValueError as e:
             print(e)
 
     elif args.command == "add_folder":
         try:
-            manager.add_context_folder(args.folder, args.thread_id)
-            print(f"Todos os arquivos PDF na pasta '{args.folder}' foram adicionados à thread '{args.thread_id}'.")
-        except ValueError as e:
+            chunks = manager.add_context_folder(args.folder, args.thread_id, args.assistant)
+            print(f"Todos os arquivos PDF na pasta '{args.folder}' foram adicionados à thread '{args.thread_id}' ({chunks} excertos indexados).")
+        except (ValueError, NotADirectoryError) as e:
             print(e)
     
+    elif args.command == "sync":
+        def show(report):
+            for label, key in (("Novos", "added"), ("Alterados", "changed"), ("Removidos", "removed")):
+                if report[key]:
+                    print(f"{label}: {', '.join(report[key])}")
+            if not (report['added'] or report['changed'] or report['removed']):
+                print(f"Sem alterações ({len(report['unchanged'])} ficheiros já sincronizados).")
+            if 'chunks' in report and (report['added'] or report['changed']):
+                print(f"{report['chunks']} excertos indexados.")
+            if report.get('removed_chunks'):
+                print(f"{report['removed_chunks']} excertos antigos removidos do índice.")
+            if 'file_ids' in report:
+                print(f"{len(report['file_ids'])} ficheiros enviados.")
+            if 'response' in report:
+                print(f"Resposta do assistente: {report['response']}")
+            if 'instructions' in report:
+                print("Instruções do assistente atualizadas.")
+            sys.stdout.flush()
+
+        if args.target != "instructions" and args.thread is None:
+            print("Indique a thread com --thread.")
+            return
+        try:
+            if args.watch:
+                print(f"A acompanhar a pasta '{args.folder}' (Ctrl+C para terminar).", flush=True)
+                manager.watch_folder(args.assistant_name, args.folder, args.thread, args.target,
+                                     prune=args.prune, interval=args.interval, on_sync=show)
+            else:
+                show(manager.sync_folder(args.assistant_name, args.folder, args.thread, args.target,
+                                         prune=args.prune, dry_run=args.dry_run))
+        except (ValueError, NotADirectoryError) as e:
+            print(e)
+
+    elif args.command == "cache":
+        if args.clear:
+            get_default_cache().clear()
+            print("Cache de respostas limpa.")
+        stats = manager.cache_stats()
+        print("Cache de respostas:")
+        print(f"  Hits: {stats['hits']} (memória: {stats['memory_hits']}, disco: {stats['disk_hits']})")
+        print(f"  Misses: {stats['misses']}")
+        print(f"  Taxa de acerto: {stats['hit_rate']:.1%}")
+        print(f"  Tamanho em disco: {stats['disk_bytes']} bytes")
+
+    elif args.command == "stats":
+        if args.clear:
+            get_metrics().clear()
+            print("Métricas apagadas.")
+            return
+        metrics = Metrics(path=None)
+        metrics.merge(get_metrics().load())
+        metrics.merge(get_metrics().snapshot())
+
+        if args.format == "json":
+            output = json.dumps({'summary': metrics.summary(), **metrics.snapshot()}, indent=2)
+        elif args.format == "prometheus":
+            output = metrics.to_prometheus()
+        else:
+            rows = metrics.summary()
+            names = []
+            for row in rows:
+                labels = ",".join(f"{key}={value}" for key, value in row['labels'].items())
+                names.append(f"{row['name']}{{{labels}}}" if labels else row['name'])
+            width = max([len('métrica')] + [len(name) for name in names])
+            lines = [f"{'métrica':<{width}} {'n':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9} {'/min':>8}"]
+            for name, row in zip(names, rows):
+                rate = f"{row['rate'] * 60:8.1f}" if row['rate'] is not None else f"{'-':>8}"
+                lines.append(f"{name:<{width}} {row['count']:>7} {row['p50']:>9.4f} {row['p95']:>9.4f} "
+                             f"{row['p99']:>9.4f} {row['max']:>9.4f} {rate}")
+            for entry in metrics.snapshot()['counters']:
+                labels = ",".join(f"{key}={value}" for key, value in entry['labels'].items())
+                lines.append(f"{entry['name']}{{{labels}}}: {entry['value']:g}")
+            output = "\n".join(lines) if len(lines) > 1 else "Ainda não há métricas registadas."
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + "\n")
+            print(f"Métricas guardadas em '{args.output}'.")
+        else:
+            print(output)
+
+    elif args.command == "keys":
+        usage = manager.key_usage()
+        if not usage:
+            print("Nenhum pool de chaves configurado (OPENAI_API_KEYS no config.py).")
+        for row in usage:
+            organization = f" ({row['organization']})" if row['organization'] else ''
+            state = f"fora do pool durante {row['ejected_seconds']:.0f}s" if row['ejected_seconds'] else "disponível"
+            print(f"{row['key']}{organization}: {row['requests']} pedidos, {row['tokens']} tokens, "
+                  f"{row['rate_limited']} x 429, {row['unauthorized']} x 401, {row['errors']} erros, "
+                  f"{row['in_flight']} em curso, {row['threads']} threads, capacidade livre {row['free_capacity']:.0%}, {state}")
+
+    elif args.command == "compact":
+        if not args.report:
+            try:
+                archived = manager.compact(args.older_than, dry_run=args.dry_run)
+            except ValueError as e:
+                print(e)
+                return
+            verb = "Seriam arquivadas" if args.dry_run else "Arquivadas"
+            print(f"{verb} {len(archived)} threads.")
+            for row in archived:
+                size = f", {row['bytes']} -> {row['archived_bytes']} bytes" if 'bytes' in row else ''
+                print(f"  {row['assistant']}/{row['thread_id']}: {row['messages']} mensagens, "
+                      f"inativa há {row['idle_days']:.0f} dias{size}")
+        report = manager.archive_report()
+        print(f"Threads ativas: {report['live_threads']}")
+        print(f"Threads arquivadas: {report['archived_threads']} ({report['archived_messages']} mensagens, "
+              f"{report['bytes']} -> {report['archived_bytes']} bytes comprimidos)")
+
+    elif args.command == "search":
+        # Realce a negrito num terminal; parêntesis retos quando a saída é redirecionada
+        highlight = ('\033[1m', '\033[0m') if sys.stdout.isatty() else ('[', ']')
+        try:
+            if args.reindex:
+                print(f"{manager.reindex()} threads indexadas de novo.")
+            results = manager.search(args.query, assistant_name=args.assistant, thread_id=args.thread, role=args.role,
+                                     since=args.since, until=args.until, limit=args.limit, highlight=highlight)
+        except ValueError as e:
+            print(e)
+            return
+        if not results:
+            print("Nenhuma mensagem encontrada.")
+        for result in results:
+            role_name = "Usuário" if result['role'] == "user" else "Assistente"
+            date = datetime.fromtimestamp(result['created_at']).strftime("%Y-%m-%d %H:%M") if result['created_at'] else "sem data"
+            print(f"{result['assistant']}/{result['thread_id']} #{result['position']} ({date}) {role_name}: {result['snippet']}")
+
+    elif args.command == "batch":
+        batch_manager = BatchManager(manager)
+        try:
+            if args.batch_command == "submit":
+                job_id = batch_manager.submit(args.assistant_name, args.sources, args.thread)
+                job = batch_manager.load_job(job_id)
+                total = sum(part['requests'] for part in job['parts'])
+                print(f"Job '{job_id}' criado com {total} pedidos em {len(job['parts'])} batch(es).")
+
+            elif args.batch_command == "status":
+                job_ids = [args.job_id] if args.job_id else batch_manager.list_jobs()
+                for job_id in job_ids:
+                    job = batch_manager.status(job_id)
+                    print(f"Job '{job_id}' (assistente '{job['assistant']}'):")
+                    for part in job['parts']:
+                        counts = part.get('request_counts', {})
+                        print(f"  {part['batch_id']}: {part['status']} "
+                              f"({counts.get('completed', 0)}/{counts.get('total', part['requests'])} concluídos, "
+                              f"{counts.get('failed', 0)} falhados)")
+
+            elif args.batch_command == "collect":
+                summary = batch_manager.collect(args.job_id)
+                print(f"{summary['collected']} respostas adicionadas às threads, {summary['failed']} falhadas, "
+                      f"{summary['pending']} batch(es) por concluir.")
+
+            else:
+                parser.batch_parser.print_help()
+        except ValueError as e:
+            print(e)
+
     else:
         parser.print_help()
 
+
+# Argumentos que são caminhos, por comando: (comando, argumento, pode ser texto em vez de um caminho)
+PATH_ARGUMENTS = [
+    ("create_assistant", "instructions", True),
+    ("send", "prompt", True),
+    ("fan_out", "prompt", True),
+    ("export", "output", False),
+    ("add_file", "file", False),
+    ("add_folder", "folder", False),
+    ("sync", "folder", False),
+    ("stats", "output", False),
+    ("batch", "sources", False),
+]
+
+
+def resolve_paths(args, cwd):
+    """
+    Torna absolutos os caminhos relativos de um comando recebido pelo
+    daemon, a partir do diretório `cwd` do cliente. Um prompt ou instruções
+    que não existam como ficheiro em `cwd` ficam como texto.
+    """
+    def resolve(value, may_be_text):
+        if not value or value == '-' or os.path.isabs(value):
+            return value
+        path = os.path.join(cwd, value)
+        return value if may_be_text and not os.path.exists(path) else path
+
+    for command, name, may_be_text in PATH_ARGUMENTS:
+        value = getattr(args, name, None)
+        if args.command != command or value is None:
+            continue
+        if isinstance(value, list):
+            setattr(args, name, [resolve(item, may_be_text) for item in value])
+        else:
+            setattr(args, name, resolve(value, may_be_text))
+    return args
+
+
+def socket_path(value=None) -> str:
+    """
+    Caminho absoluto do socket do daemon: `value` (--socket), a variável
+    de ambiente PYTHONAI_SOCKET ou DAEMON_SOCKET do config.py; sem nenhum,
+    um socket do utilizador para a pasta atual, em $XDG_RUNTIME_DIR ou numa
+    pasta só do utilizador dentro da pasta temporária do sistema.
+    """
+    value = value or os.environ.get("PYTHONAI_SOCKET") or DAEMON_SOCKET
+    if value:
+        return os.path.abspath(os.path.expanduser(value))
+
+    folder = os.environ.get("XDG_RUNTIME_DIR")
+    if not folder or not os.path.isdir(folder):
+        folder = os.path.join(tempfile.gettempdir(), f"pythonai-{getpass.getuser()}")
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+        if hasattr(os, 'getuid') and os.stat(folder).st_uid != os.getuid():
+            raise ValueError(f"A pasta '{folder}' pertence a outro utilizador: defina PYTHONAI_SOCKET.")
+    # Um daemon por pasta: o armazenamento (e o config.py) são os da pasta onde o daemon arrancou
+    digest = hashlib.sha1(os.getcwd().encode('utf-8')).hexdigest()[:12]
+    return os.path.join(folder, f"pythonai-{digest}.sock")
+
+
+def forward(argv, socket_path) -> Optional[int]:
+    """
+    Envia o comando ao daemon (`serve`) e mostra a sua saída à medida que chega.
+
+    Returns:
+        int: O código de saída do comando no daemon, ou None se não houver
+            um daemon a correr (o comando deve ser executado aqui).
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None  # Socket antigo de um daemon que já terminou
+
+    status = None
+    with client:
+        # O diretório atual segue com o comando: os caminhos relativos são do cliente, não do daemon
+        client.sendall((json.dumps({"argv": argv, "cwd": os.getcwd()}) + "\n").encode('utf-8'))
+        try:
+            for data in iter(lambda: client.recv(65536), b''):
+                if status is None and EXIT_MARKER in data:
+                    data, status = data.split(EXIT_MARKER, 1)
+                elif status is not None:
+                    status, data = status + data, b''
+                sys.stdout.buffer.write(data)
+                sys.stdout.buffer.flush()
+        except KeyboardInterrupt:
+            return 130  # Fechar a ligação cancela o comando no daemon (por exemplo um send --stream)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return 1  # O daemon terminou sem enviar o código de saída
+
+
+# Separa a saída do comando do seu código de saída, no fim da resposta do daemon
+EXIT_MARKER = b"\0"
+
+
+def daemon_running(socket_path) -> bool:
+    """Indica se há um daemon a aceitar ligações no socket."""
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            return False
+        probe.sendall(b"{}\n")
+    return True
+
+
+def serve(parser, socket_path):
+    """
+    Corre o daemon: mantém um AssistantManager carregado e executa, um de
+    cada vez, os comandos recebidos no socket Unix.
+    """
+    import contextlib
+    import io
+    import socketserver
+    import threading
+    import traceback
+    from pythonAI_wrapper.metrics import get_metrics
+    from pythonAI_wrapper.response_cache import get_default_cache
+
+    if not hasattr(socket, 'AF_UNIX'):
+        print("O daemon precisa de sockets Unix, que não existem neste sistema.")
+        return
+    if daemon_running(socket_path):
+        print(f"Já existe um daemon a correr em '{socket_path}'.")
+        return
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    manager = create_manager()
+    # Importa o openai e cria já os clientes (e o pool de ligações) de cada assistente
+    for assistant in manager.assistants.values():
+        try:
+            assistant.client
+        except Exception as e:
+            print(f"Não foi possível criar o cliente do assistente '{assistant.name}': {e}")
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = json.loads(self.rfile.readline())
+            except ValueError:
+                return
+            if "argv" not in request and not request.get("stop"):
+                return  # Apenas a verificar se o daemon está a correr
+            if request.get("stop"):
+                self.wfile.write("Daemon terminado.\n".encode('utf-8'))
+                threading.Thread(target=server.shutdown).start()
+                return
+
+            output = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+            try:
+                status = 0
+                with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                    try:
+                        args = parser.parse_args(request["argv"])
+                        if request.get("cwd"):
+                            resolve_paths(args, request["cwd"])
+                        # Outros processos (sync --watch, PYTHONAI_NO_DAEMON=1) podem ter escrito no armazenamento
+                        manager.refresh()
+                        run_command(args, parser, manager)
+                    except SystemExit as e:
+                        # Erro de argumentos ou --help: a mensagem já foi escrita
+                        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                    except Exception:
+                        traceback.print_exc()  # Como o comando no próprio processo
+                        status = 1
+                self.wfile.write(EXIT_MARKER + str(status).encode('ascii'))
+            except BrokenPipeError:
+                pass  # O cliente desligou-se
+            finally:
+                output.detach()
+                get_metrics().flush()
+                get_default_cache().flush_stats()
+
+    old_umask = os.umask(0o177)  # Só o utilizador pode ligar-se ao socket
+    try:
+        server = socketserver.UnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(old_umask)
+    print(f"Daemon à escuta em '{socket_path}' (Ctrl+C para terminar).", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def stop_daemon(socket_path):
+    """Pede ao daemon para terminar."""
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        print("Nenhum daemon a correr.")
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            print("Nenhum daemon a correr.")
+            return
+        client.sendall(b'{"stop": true}\n')
+        print(client.recv(1024).decode('utf-8'), end="")
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    path = socket_path(args.socket)
+    if args.command == "serve":
+        if args.stop:
+            stop_daemon(path)
+        else:
+            serve(parser, path)
+        return
+
+    # Se houver um daemon a correr, é ele que executa o comando (sem arranque do openai nem leitura dos dados)
+    # O modo --watch corre até ser interrompido: não pode ocupar o daemon
+    status = None
+    if not os.environ.get("PYTHONAI_NO_DAEMON") and not getattr(args, 'watch', False):
+        status = forward(sys.argv[1:], path)
+    if status is None:
+        run_command(args, parser, create_manager())
+    elif status:
+        sys.exit(status)
+
 if __name__ == "__main__":
     main()
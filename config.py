@@ -1,3 +1,24 @@
 # config.py
 
-OPENAI_API_KEY = "a_sua_chave_api"
\ No newline at end of file
+OPENAI_API_KEY = "a_sua_chave_api"
+
+# Pool de chaves para distribuir os pedidos (vazio usa só a chave de cada assistente). Cada
+# entrada é uma chave ou {"api_key", "organization", "weight", "requests_per_minute", "tokens_per_minute"}
+OPENAI_API_KEYS = []
+KEY_POOL_STRATEGY = "least_loaded"  # "least_loaded" ou "weighted"
+
+# Backend de armazenamento: "jsonl" (append-only), "sqlite" ou "json" (layout antigo)
+STORAGE_BACKEND = "jsonl"
+STORAGE_PATH = None  # Caminho do armazenamento (None usa o padrão do backend)
+
+# Threads sem mensagens novas há mais do que estes dias são arquivadas comprimidas (None desativa)
+ARCHIVE_AFTER_DAYS = None
+
+# Persistência das métricas (`stats`) e do nível de disco da cache de respostas: pastas onde
+# a CLI as guarda entre execuções, por exemplo ".metrics" e ".response_cache" (None desativa)
+METRICS_PATH = None
+RESPONSE_CACHE_DIR = None
+
+# Socket Unix do daemon (`cli_tool.py serve`); os comandos são enviados ao daemon quando está a correr.
+# None usa um socket por utilizador e por pasta em $XDG_RUNTIME_DIR (ou na pasta temporária do sistema)
+DAEMON_SOCKET = None
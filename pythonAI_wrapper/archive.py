@@ -0,0 +1,312 @@
+# archive.py
+
+import gzip
+import json
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterator, List
+from urllib.parse import quote
+
+from pythonAI_wrapper.message import Message
+from pythonAI_wrapper.metrics import get_metrics
+from pythonAI_wrapper.storage import BaseStorage, atomic_write, file_lock, file_version, paginate
+
+DAY = 24 * 60 * 60
+
+
+class ThreadArchive:
+    """
+    Threads arquivadas, comprimidas com gzip.
+
+    Layout em disco:
+        <root>/index.json                              threads arquivadas e última compactação
+        <root>/<assistente>/<thread>.jsonl.gz          uma mensagem por linha
+
+    As mensagens são guardadas como no backend de origem: conteúdos grandes
+    continuam no BlobStore e o arquivo guarda só a referência.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self.lock_path = os.path.join(root, '.lock')
+        self._index = None
+        self._index_version = None
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {"threads": {}, "compacted_at": None}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def index(self) -> Dict:
+        """O índice, relido só quando o ficheiro muda (não alterar o resultado)."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return {"threads": {}, "compacted_at": None}
+        # atomic_write cria sempre um ficheiro novo (inode diferente)
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version != self._index_version:
+            self._index = self._read_index()
+            self._index_version = version
+        return self._index
+
+    def _update_index(self, update):
+        # Chamado com o lock do arquivo já adquirido
+        index = self._read_index()
+        update(index)
+        atomic_write(self.index_path, json.dumps(index, indent=4))
+
+    def _path(self, assistant_name, thread_id):
+        return os.path.join(self.root, quote(assistant_name, safe=''), quote(thread_id, safe='') + '.jsonl.gz')
+
+    def threads(self, assistant_name: str) -> List[str]:
+        """IDs das threads arquivadas de um assistente."""
+        return list(self.index()["threads"].get(assistant_name, {}))
+
+    def entry(self, assistant_name: str, thread_id: str) -> Dict:
+        """Informação de uma thread arquivada, ou None se não estiver arquivada."""
+        return self.index()["threads"].get(assistant_name, {}).get(thread_id)
+
+    def write(self, assistant_name: str, thread_id: str, records: List[Dict], updated_at: float = None,
+              state: Dict = None):
+        """Arquiva os registos e o estado de uma thread (chamar com o lock do arquivo)."""
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        path = self._path(assistant_name, thread_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        def update(index):
+            index["threads"].setdefault(assistant_name, {})[thread_id] = {
+                "archived_at": time.time(),
+                "updated_at": updated_at,
+                "messages": len(records),
+                "bytes": len(data),
+                "archived_bytes": os.path.getsize(path),
+                "state": state or {},
+            }
+        self._update_index(update)
+
+    def read(self, assistant_name: str, thread_id: str) -> List[Dict]:
+        """Registos de uma thread arquivada."""
+        return list(self.iter_records(assistant_name, thread_id))
+
+    def iter_records(self, assistant_name: str, thread_id: str) -> Iterator[Dict]:
+        """Percorre os registos de uma thread arquivada, descomprimindo à medida que são lidos."""
+        try:
+            f = gzip.open(self._path(assistant_name, thread_id), 'rt', encoding='utf-8')
+        except FileNotFoundError:
+            raise ValueError(f"Thread {thread_id} não encontrada no arquivo.")
+
+        def records():
+            with f:
+                for line in f:
+                    yield json.loads(line)
+        return records()
+
+    def remove(self, assistant_name: str, thread_id: str):
+        """Retira uma thread do arquivo (chamar com o lock do arquivo)."""
+        def update(index):
+            threads = index["threads"].get(assistant_name, {})
+            threads.pop(thread_id, None)
+            if not threads:
+                index["threads"].pop(assistant_name, None)
+        self._update_index(update)
+        path = self._path(assistant_name, thread_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def mark_compacted(self):
+        self._update_index(lambda index: index.update(compacted_at=time.time()))
+
+
+class TieredStorage(BaseStorage):
+    """
+    Backend em dois níveis: as threads ativas ficam no backend `storage` e
+    as que não são escritas há muito tempo podem ser movidas (compact) para
+    um ThreadArchive comprimido.
+
+    As threads arquivadas continuam a aparecer em list_threads, são lidas
+    diretamente do arquivo e só voltam para o backend (rehidratação) quando
+    são escritas, por isso o resto do código não precisa de saber onde estão.
+    """
+
+    def __init__(self, storage: BaseStorage, root: str = None):
+        self.storage = storage
+        self.archive = ThreadArchive(root or storage.archive_root or 'archive')
+        self.blobs = storage.blobs
+        self.archive_root = self.archive.root
+        self.search_path = storage.search_path
+        self.backend = type(storage).__name__
+
+    def __getattr__(self, name):
+        # Métodos próprios de um backend (count_messages, close, ...)
+        if name == 'storage':
+            raise AttributeError(name)
+        return getattr(self.storage, name)
+
+    def rehydrate(self, assistant_name: str, thread_id: str) -> bool:
+        """
+        Devolve uma thread arquivada ao backend.
+
+        Returns:
+            bool: True se a thread estava arquivada.
+        """
+        if self.archive.entry(assistant_name, thread_id) is None:
+            return False
+        with file_lock(self.archive.lock_path):
+            if self.archive.entry(assistant_name, thread_id) is None:
+                return False  # Rehidratada entretanto por outro processo
+            with get_metrics().timer('storage_write_seconds', backend=self.backend, operation='rehydrate'):
+                records = self.archive.read(assistant_name, thread_id)
+                self.storage.replace_thread(assistant_name, thread_id,
+                                            [Message.from_record(record, self.blobs) for record in records])
+                state = self.archive.entry(assistant_name, thread_id).get("state")
+                if state:
+                    self.storage.save_thread_state(assistant_name, thread_id, state)
+                self.archive.remove(assistant_name, thread_id)
+        return True
+
+    def read_thread(self, assistant_name: str, thread_id: str) -> List[Dict]:
+        """Mensagens de uma thread, ativa ou arquivada, sem a rehidratar."""
+        if self.archive.entry(assistant_name, thread_id) is not None:
+            try:
+                return [Message.from_record(record, self.blobs) for record in self.archive.read(assistant_name, thread_id)]
+            except ValueError:
+                pass  # Rehidratada entretanto
+        return self.storage.get_thread(assistant_name, thread_id)
+
+    def iter_thread(self, assistant_name, thread_id, start=0):
+        """Como read_thread, mas percorre as mensagens sem as carregar todas."""
+        if self.archive.entry(assistant_name, thread_id) is not None:
+            try:
+                records = islice(self.archive.iter_records(assistant_name, thread_id), start, None)
+                return (Message.from_record(record, self.blobs) for record in records)
+            except ValueError:
+                pass  # Rehidratada entretanto
+        return self.storage.iter_thread(assistant_name, thread_id, start)
+
+    def compact(self, max_idle_seconds: float, dry_run: bool = False) -> List[Dict]:
+        """
+        Arquiva as threads sem escritas há mais de `max_idle_seconds`.
+
+        Args:
+            max_idle_seconds (float): Idade mínima da última escrita.
+            dry_run (bool): Só indica o que seria arquivado.
+
+        Returns:
+            List[Dict]: Uma linha por thread arquivada (assistente, thread,
+                mensagens, bytes antes e depois da compressão).
+        """
+        now = time.time()
+        archived = []
+        with file_lock(self.archive.lock_path):
+            for assistant_name in self.storage.load_assistants():
+                for thread_id in self.storage.list_threads(assistant_name):
+                    updated_at = self.storage.thread_updated_at(assistant_name, thread_id)
+                    if updated_at is None or now - updated_at < max_idle_seconds:
+                        continue
+                    records = [self._record(message) for message in self.storage.get_thread(assistant_name, thread_id)]
+                    row = {"assistant": assistant_name, "thread_id": thread_id, "messages": len(records),
+                           "idle_days": (now - updated_at) / DAY}
+                    if not dry_run:
+                        with get_metrics().timer('storage_write_seconds', backend=self.backend, operation='archive'):
+                            self.archive.write(assistant_name, thread_id, records, updated_at,
+                                               self.storage.load_thread_state(assistant_name, thread_id))
+                            # Verificação e remoção com o lock de escrita do backend
+                            if not self.storage.delete_thread_if_unchanged(assistant_name, thread_id, updated_at):
+                                self.archive.remove(assistant_name, thread_id)  # Escrita concorrente: fica ativa
+                                continue
+                        entry = self.archive.entry(assistant_name, thread_id)
+                        row.update(bytes=entry["bytes"], archived_bytes=entry["archived_bytes"])
+                    archived.append(row)
+            if not dry_run:
+                self.archive.mark_compacted()
+        return archived
+
+    def report(self) -> Dict:
+        """Resumo dos dois níveis: threads ativas e arquivadas, e tamanhos do arquivo."""
+        entries = [entry for threads in self.archive.index()["threads"].values() for entry in threads.values()]
+        return {
+            "live_threads": sum(len(self.storage.list_threads(name)) for name in self.storage.load_assistants()),
+            "archived_threads": len(entries),
+            "archived_messages": sum(entry["messages"] for entry in entries),
+            "bytes": sum(entry["bytes"] for entry in entries),
+            "archived_bytes": sum(entry["archived_bytes"] for entry in entries),
+            "compacted_at": self.archive.index()["compacted_at"],
+        }
+
+    def load_assistants(self):
+        return self.storage.load_assistants()
+
+    def save_assistant(self, name, data):
+        self.storage.save_assistant(name, data)
+
+    def list_threads(self, assistant_name):
+        threads = self.storage.list_threads(assistant_name)
+        live = set(threads)
+        return threads + [thread_id for thread_id in self.archive.threads(assistant_name) if thread_id not in live]
+
+    def create_thread(self, assistant_name, thread_id):
+        if not self.rehydrate(assistant_name, thread_id):
+            self.storage.create_thread(assistant_name, thread_id)
+
+    def get_thread(self, assistant_name, thread_id, limit=None, before=None):
+        if self.archive.entry(assistant_name, thread_id) is not None:
+            return paginate(self.read_thread(assistant_name, thread_id), limit, before)
+        return self.storage.get_thread(assistant_name, thread_id, limit=limit, before=before)
+
+    def load_threads(self, assistant_name):
+        threads = self.storage.load_threads(assistant_name)
+        for thread_id in self.archive.threads(assistant_name):
+            if thread_id not in threads:
+                threads[thread_id] = self.read_thread(assistant_name, thread_id)
+        return threads
+
+    def append_messages(self, assistant_name, thread_id, messages):
+        self.rehydrate(assistant_name, thread_id)
+        self.storage.append_messages(assistant_name, thread_id, messages)
+
+    def replace_thread(self, assistant_name, thread_id, messages):
+        self.storage.replace_thread(assistant_name, thread_id, messages)
+        if self.archive.entry(assistant_name, thread_id) is not None:
+            with file_lock(self.archive.lock_path):
+                self.archive.remove(assistant_name, thread_id)
+
+    def thread_updated_at(self, assistant_name, thread_id):
+        entry = self.archive.entry(assistant_name, thread_id)
+        if entry is not None:
+            return entry["updated_at"]
+        return self.storage.thread_updated_at(assistant_name, thread_id)
+
+    def load_thread_state(self, assistant_name, thread_id):
+        entry = self.archive.entry(assistant_name, thread_id)
+        if entry is not None:
+            return entry.get("state", {})
+        return self.storage.load_thread_state(assistant_name, thread_id)
+
+    def save_thread_state(self, assistant_name, thread_id, state):
+        self.rehydrate(assistant_name, thread_id)
+        self.storage.save_thread_state(assistant_name, thread_id, state)
+
+    def assistants_version(self):
+        version = self.storage.assistants_version()
+        return None if version is None else (version, file_version(self.archive.index_path))
+
+    def thread_version(self, assistant_name, thread_id):
+        if self.archive.entry(assistant_name, thread_id) is not None:
+            return file_version(self.archive._path(assistant_name, thread_id))
+        return self.storage.thread_version(assistant_name, thread_id)
+
+    def delete_thread(self, assistant_name, thread_id):
+        self.storage.delete_thread(assistant_name, thread_id)
+        if self.archive.entry(assistant_name, thread_id) is not None:
+            with file_lock(self.archive.lock_path):
+                self.archive.remove(assistant_name, thread_id)
@@ -1,58 +1,500 @@
 # assistant.py
 
 import os
-from typing import List, Dict
-from openai import OpenAI
-from openai import OpenAI
+import time
+from typing import List, Dict, Optional, Tuple
+
+from pythonAI_wrapper.client_registry import get_client_registry
+from pythonAI_wrapper.context_window import ContextWindow, TokenCounter, estimate_tokens
+from pythonAI_wrapper.hedging import HedgePolicy, PrimedStream, hedged_call
+from pythonAI_wrapper.key_pool import KeyPool
+from pythonAI_wrapper.message import BlobStore, Message
+from pythonAI_wrapper.metrics import get_metrics
+from pythonAI_wrapper.rate_limiter import RateLimiter, get_rate_limiter
+from pythonAI_wrapper.response_cache import ResponseCache, get_default_cache
+from pythonAI_wrapper.retrieval import DEFAULT_TOP_K, Retriever, create_embedder
+from pythonAI_wrapper.router import ModelRouter
+from pythonAI_wrapper.storage import LazyThreads
+from pythonAI_wrapper.uploads import get_file_uploader
+
+SUMMARY_PROMPT = (
+    "Resume de forma concisa a conversa seguinte, mantendo factos, decisões e "
+    "pedidos pendentes. Integra o resumo anterior, se existir."
+)
+
+
+def raw_create(completions):
+    """create que retorna a resposta "raw" (com os cabeçalhos de rate limit), se o cliente o suportar."""
+    return getattr(completions, 'with_raw_response', completions).create
 
 
 class OpenAIAssistant:
-    def __init__(self, api_key: str, name: str, model: str = 'gpt-4', instructions: str = '', threads=None):
+    def __init__(self, api_key: str, name: str, model: str = 'gpt-4', instructions: str = '', threads=None,
+                 max_context_tokens: int = None, summarize_evicted: bool = False, retrieval: Dict = None,
+                 response_cache: ResponseCache = None, base_url: str = None, blob_store: BlobStore = None,
+                 key_pool: KeyPool = None, hedging: Dict = None, routing: Dict = None):
         """
         Inicializa o assistente OpenAI com a chave API, nome, modelo e instruções iniciais.
 
+        O cliente OpenAI só é obtido no primeiro acesso a `client`, a partir do
+        registo de clientes partilhados do processo (ver client_registry).
+
         Args:
             api_key (str): A chave API da OpenAI para autenticação.
             name (str): O nome do assistente.
             model (str, optional): O modelo de linguagem a ser usado. Padrão é 'gpt-4'.
             instructions (str, optional): Instruções iniciais para o assistente. Padrão é uma string vazia.
-            threads (dict, optional): Dicionário de threads associadas ao assistente.
+            threads (dict, optional): Dicionário de threads associadas ao assistente
+                (pode ser um LazyThreads, carregado sob pedido).
+            max_context_tokens (int, optional): Orçamento de tokens do contexto enviado
+                em cada pedido. Padrão é None (envia o histórico completo).
+            summarize_evicted (bool, optional): Resume as mensagens que saem da janela
+                de contexto em vez de as descartar.
+            retrieval (dict, optional): {'embedder', 'top_k'} para ativar a pesquisa nos
+                documentos da thread (ver set_retrieval).
+            response_cache (ResponseCache, optional): Cache de respostas para pedidos
+                idênticos. Padrão é None (sem cache).
+            base_url (str, optional): URL base da API. Padrão é o da OpenAI.
+            blob_store (BlobStore, optional): Onde ficam os conteúdos grandes das
+                mensagens novas (normalmente o do armazenamento do AssistantManager).
+            key_pool (KeyPool, optional): Pool de chaves para os pedidos de chat
+                completion. Padrão é None (usa sempre `api_key`).
+            hedging (dict, optional): {'quantile', 'fallback_model', 'budget'} para
+                repetir os pedidos lentos (ver set_hedging).
+            routing (dict, optional): {'models', 'threads'} para escolher o modelo de
+                cada pedido (ver set_routing).
+
+        Os pedidos passam pelo limitador de RPM/TPM partilhado do processo
+        (ver rate_limiter), que também trata das novas tentativas; com um
+        key_pool, cada chave do pool tem o seu limitador.
         """
         self.api_key = api_key
-        self.client = OpenAI(api_key= self.api_key)
+        self.base_url = base_url
+        self.blob_store = blob_store
+        self._client = None
+        self._client_registry = None
+        self._rate_limiter = None
+        self.key_pool = key_pool
 
         self.name = name
         self.model = model
         self.instructions = instructions
         self.context_files: List[str] = []
         self.threads: Dict[str, List[Dict]] = threads if threads is not None else {}  # Inicializa threads, se não houver
+        self.context_window = None
+        self.set_context_window(max_context_tokens, summarize_evicted)
+        self.retriever = None
+        self.retrieval = None
+        if retrieval:
+            self.set_retrieval(**retrieval)
+        self.response_cache = response_cache
+        self.hedging = None
+        self.hedge_policy = None
+        if hedging:
+            self.set_hedging(**hedging)
+        self.router = None
+        if routing:
+            self.set_routing(**routing)
+
+    @property
+    def client(self):
+        """Cliente da API OpenAI, emprestado do registo partilhado no primeiro uso."""
+        if self._client is None:
+            self._client_registry = get_client_registry()
+            self._client = self._client_registry.acquire(self.api_key, base_url=self.base_url)
+        return self._client
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """Limitador de pedidos usado (por omissão, o partilhado do processo)."""
+        return self._rate_limiter or get_rate_limiter()
+
+    @rate_limiter.setter
+    def rate_limiter(self, limiter: RateLimiter):
+        self._rate_limiter = limiter
+
+    def create_completion(self, messages: List[Dict], stream: bool = False, model: str = None, thread_id: str = None):
+        """
+        Faz um pedido de chat completion através do limitador de pedidos:
+        espera por capacidade de RPM/TPM, ajusta os limites com os cabeçalhos
+        da resposta e repete erros 429/5xx com backoff.
+
+        Args:
+            messages (List[Dict]): As mensagens a enviar.
+            stream (bool, optional): Pede a resposta em streaming.
+            model (str, optional): Modelo a usar. Padrão é o do assistente.
+            thread_id (str, optional): Thread do pedido (mantém-na na mesma chave do key_pool).
+        """
+        kwargs = {"model": model or self.model, "messages": messages}
+        if stream:
+            kwargs["stream"] = True
+            kwargs["stream_options"] = {"include_usage": True}
+            return self._request(kwargs, estimate_tokens(messages), thread_id)
+
+        # Os pedidos em streaming são medidos em _stream (inclui o tempo até ao primeiro token)
+        metrics = get_metrics()
+        labels = {"assistant": self.name, "model": kwargs["model"]}
+        start = time.perf_counter()
+        try:
+            response = self._request(kwargs, estimate_tokens(messages), thread_id)
+        except Exception:
+            metrics.increment('request_errors_total', **labels)
+            raise
+        metrics.observe('request_seconds', time.perf_counter() - start, stream=False, **labels)
+        metrics.record_usage(getattr(response, 'usage', None), **labels)
+        return response
+
+    def _request(self, kwargs, estimated_tokens, thread_id=None):
+        """Faz o pedido, repetindo-o se for lento (com hedging ativo)."""
+        if self.hedge_policy is None:
+            return self._call(kwargs, estimated_tokens, thread_id)
+        stream = kwargs.get("stream", False)
+
+        def attempt(model, sent):
+            result = self._call(dict(kwargs, model=model), estimated_tokens, thread_id, on_send=sent)
+            return PrimedStream(result) if stream else result
+
+        # O atraso do hedge conta a partir do envio: a espera no limitador não torna o pedido "lento"
+        return hedged_call(self.hedge_policy, attempt, kwargs["model"], stream=stream,
+                           discard=(lambda primed: primed.close()) if stream else None,
+                           labels={"assistant": self.name, "model": kwargs["model"]}, notify_sent=True)
+
+    def _call(self, kwargs, estimated_tokens, thread_id=None, on_send=None):
+        """
+        Faz o pedido de chat completion numa chave do key_pool ou com a chave
+        do assistente. `on_send` é chamada quando o pedido sai, depois da
+        espera no limitador.
+        """
+        def request(client):
+            if on_send is not None:
+                on_send()
+            return raw_create(client.chat.completions)(**kwargs)
+        return self.call_api(request, estimated_tokens, thread_id)
 
-        # Inicializa o cliente da API OpenAI
+    def call_api(self, request, estimated_tokens: int = 0, thread_id: str = None):
+        """
+        Executa um pedido à API pelo limitador de pedidos: numa chave do
+        key_pool, se houver, ou com o cliente e o limitador do assistente.
+
+        Args:
+            request (callable): Função (cliente OpenAI) -> resposta (pode ser "raw").
+            estimated_tokens (int, optional): Estimativa de tokens do pedido.
+            thread_id (str, optional): Thread do pedido (mantém-na na mesma chave do key_pool).
+        """
+        if self.key_pool is not None:
+            return self.key_pool.call(lambda key: request(key.client(self.base_url)),
+                                      estimated_tokens, sticky_key=(self.name, thread_id) if thread_id else None)
+        client = self.client
+        return self.rate_limiter.call(lambda: request(client), estimated_tokens)
+
+    @client.setter
+    def client(self, client):
+        self.release_client()
+        self._client = client
+
+    def release_client(self):
+        """Devolve o cliente emprestado ao registo (sem o fechar para os outros assistentes)."""
+        if self._client is not None and self._client_registry is not None:
+            self._client_registry.release(self._client)
+        self._client = None
+        self._client_registry = None
+
+    def get_response(self, prompt: str, thread_id: str, use_cache: bool = True):
+        """
+        Obtém uma resposta do assistente e atualiza o histórico da thread.
 
-    def get_response(self, prompt: str, thread_id: str):
-        """Obtém uma resposta do assistente e atualiza o histórico da thread."""
+        Args:
+            prompt (str): A pergunta.
+            thread_id (str): O ID da thread.
+            use_cache (bool, optional): Se False, ignora a cache de respostas neste pedido.
+        """
         if thread_id not in self.threads:
             raise ValueError(f"Thread '{thread_id}' não encontrada.")
 
         # Adiciona a pergunta do usuário ao histórico da thread
-        self.threads[thread_id].append({"role": "user", "content": prompt})
-
-        # Chamada à API para obter a resposta do assistente
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": self.instructions},
-                *self.threads[thread_id]  # Envia o histórico completo como contexto
-            ]
-        )
-
-        assistant_response = response.choices[0].message.content
+        self.threads[thread_id].append(self.new_message("user", prompt))
+
+        messages = self.build_messages(thread_id)
+        model, route = self.choose_model(messages, thread_id)
+        cache_key = self.cache_key(messages, model) if use_cache and self.response_cache is not None else None
+        assistant_response = self.response_cache.get(cache_key) if cache_key else None
+
+        seconds = None
+        if assistant_response is None:
+            # Chamada à API para obter a resposta do assistente
+            start = time.perf_counter()
+            response = self.create_completion(messages, model=model, thread_id=thread_id)
+            seconds = time.perf_counter() - start
+            assistant_response = response.choices[0].message.content
+            if cache_key:
+                self.response_cache.set(cache_key, assistant_response)
 
         # Adiciona a resposta do assistente ao histórico da thread
-        self.threads[thread_id].append({"role": "assistant", "content": assistant_response})
+        self.threads[thread_id].append(self.answer_message(assistant_response, model, route, seconds))
 
         return assistant_response
 
+    def new_message(self, role: str, content: str, **extra) -> Message:
+        """Cria uma mensagem para as threads (conteúdos grandes vão para o blob_store)."""
+        return Message(role, content, store=self.blob_store, **extra)
+
+    def choose_model(self, messages: List[Dict], thread_id: str = None) -> Tuple[str, Optional[str]]:
+        """
+        Modelo de um pedido: o escolhido pelo router, pelo tamanho das
+        mensagens e pela latência recente de cada modelo, ou o do assistente.
+
+        Returns:
+            (modelo, razão): a razão é None sem router (ver ModelRouter.choose).
+        """
+        if self.router is None:
+            return self.model, None
+        model, route = self.router.choose(estimate_tokens(messages, completion_tokens=0), thread_id)
+        get_metrics().increment('routed_requests_total', assistant=self.name, model=model, route=route)
+        return model, route
+
+    def answer_message(self, content: str, model: str, route: Optional[str], seconds: Optional[float]) -> Message:
+        """
+        Mensagem com a resposta do modelo. Com o router ativo, a mensagem
+        guarda o modelo, a razão da escolha e a latência do pedido ('model',
+        'route', 'latency'), e a latência entra na média do modelo.
+        """
+        if route is None:
+            return self.new_message("assistant", content)
+        if seconds is None:
+            return self.new_message("assistant", content, model=model, route=route)  # Resposta da cache
+        self.router.observe(model, seconds)
+        return self.new_message("assistant", content, model=model, route=route, latency=round(seconds, 4))
+
+    def cache_key(self, messages: List[Dict], model: str = None) -> str:
+        """Chave de cache de um pedido (modelo + mensagens, incluindo as instruções)."""
+        return ResponseCache.key({"model": model or self.model, "messages": messages})
+
+    def stream_response(self, prompt: str, thread_id: str, use_cache: bool = True):
+        """
+        Obtém uma resposta do assistente em streaming.
+
+        Retorna um gerador que produz os fragmentos de texto à medida que
+        chegam. A resposta completa é acrescentada ao histórico da thread
+        quando o stream termina ou é cancelado (gerador fechado); nesse
+        caso fica guardado o texto recebido até ao momento.
+
+        Raises:
+            ValueError: Se a thread não existir.
+        """
+        if thread_id not in self.threads:
+            raise ValueError(f"Thread '{thread_id}' não encontrada.")
+
+        # Adiciona a pergunta do usuário ao histórico da thread
+        self.threads[thread_id].append(self.new_message("user", prompt))
+        return self._stream(thread_id, use_cache)
+
+    def _stream(self, thread_id: str, use_cache: bool = True):
+        messages = self.build_messages(thread_id)
+        model, route = self.choose_model(messages, thread_id)
+        cache_key = self.cache_key(messages, model) if use_cache and self.response_cache is not None else None
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            self.threads[thread_id].append(self.answer_message(cached, model, route, None))
+            yield cached
+            return
+
+        metrics = get_metrics()
+        labels = {"assistant": self.name, "model": model}
+        start = time.perf_counter()
+        try:
+            stream = self.create_completion(messages, stream=True, model=model, thread_id=thread_id)
+        except Exception:
+            metrics.increment('request_errors_total', **labels)
+            raise
+        parts = []
+        completed = False
+        try:
+            for chunk in stream:
+                metrics.record_usage(getattr(chunk, 'usage', None), **labels)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        metrics.observe('time_to_first_token_seconds', time.perf_counter() - start, **labels)
+                    parts.append(delta)
+                    yield delta
+            completed = True
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+            seconds = time.perf_counter() - start
+            metrics.observe('request_seconds', seconds, stream=True, **labels)
+            if completed and cache_key and parts:
+                self.response_cache.set(cache_key, "".join(parts))
+            if parts:
+                # Adiciona a resposta (completa ou parcial) ao histórico da thread
+                self.threads[thread_id].append(
+                    self.answer_message("".join(parts), model, route, seconds if completed else None))
+
+    def build_messages(self, thread_id: str) -> List[Dict]:
+        """
+        Constrói as mensagens a enviar à API: instruções mais o histórico da
+        thread, limitado pela janela de contexto se estiver configurada.
+        """
+        messages = self.threads[thread_id]
+        instructions = self.instructions
+        if self.retriever is not None:
+            query = next((message["content"] for message in reversed(messages) if message["role"] == "user"), '')
+            excerpts = self.retriever.context_for(self.name, thread_id, query) if query else ''
+            if excerpts:
+                instructions = f"{instructions}\n\n{excerpts}" if instructions else excerpts
+
+        if self.context_window is None:
+            return [
+                {"role": "system", "content": instructions},
+                *({"role": message["role"], "content": message["content"]} for message in messages)
+            ]
+        return self.context_window.build(instructions, thread_id, messages)
+
+    def set_response_cache(self, enabled: bool = True, cache: ResponseCache = None):
+        """
+        Ativa ou desativa a cache de respostas.
+
+        Args:
+            enabled (bool, optional): Se True, usa `cache` (ou a cache partilhada do processo).
+            cache (ResponseCache, optional): Cache a usar.
+        """
+        self.response_cache = (cache or get_default_cache()) if enabled else None
+
+    def set_hedging(self, enabled: bool = True, quantile: float = 0.95, fallback_model: str = None,
+                    budget: float = 0.1):
+        """
+        Ativa ou desativa a repetição dos pedidos lentos: se a resposta (ou
+        o primeiro token, em streaming) demorar mais do que o percentil
+        `quantile` das latências recentes, é feito um segundo pedido e fica
+        a resposta que chegar primeiro. Só essa é guardada na thread.
+
+        Args:
+            enabled (bool, optional): Se False, desativa.
+            quantile (float, optional): Percentil das latências (por exemplo 0.95).
+            fallback_model (str, optional): Modelo do segundo pedido (por omissão, o mesmo).
+            budget (float, optional): Fração máxima dos pedidos que são repetidos.
+        """
+        if not enabled:
+            self.hedging = None
+            self.hedge_policy = None
+            return
+        self.hedge_policy = HedgePolicy(quantile, fallback_model, budget)
+        self.hedging = self.hedge_policy.config()
+
+    @property
+    def routing(self) -> Optional[Dict]:
+        """Configuração do router ({'models', 'threads'}), guardada com o assistente."""
+        return self.router.config() if self.router is not None else None
+
+    def set_routing(self, models: List = None, threads: Dict = None):
+        """
+        Ativa a escolha do modelo de cada pedido de entre `models` (ver
+        ModelRouter); sem modelos, volta a usar sempre `model`.
+
+        Args:
+            models (list, optional): Nomes ou {'model', 'max_prompt_tokens', 'max_latency'},
+                por ordem de preferência.
+            threads (dict, optional): Restrições por thread (ver set_thread_route).
+        """
+        self.router = ModelRouter(models, threads) if models else None
+
+    def set_thread_route(self, thread_id: str, model: str = None, models: List[str] = None,
+                         max_latency: float = None):
+        """
+        Define as restrições do router numa thread: um modelo fixo, os
+        modelos permitidos e/ou uma latência máxima (sem argumentos, remove-as).
+
+        Raises:
+            ValueError: Se o router não estiver ativo.
+        """
+        if self.router is None:
+            raise ValueError(f"O assistente '{self.name}' não tem router de modelos (ver set_routing).")
+        self.router.set_thread(thread_id, model, models, max_latency)
+
+    def set_retrieval(self, embedder: str = 'openai', top_k: int = DEFAULT_TOP_K):
+        """
+        Ativa a pesquisa nos documentos da thread: em cada pedido, só os
+        top_k excertos mais relevantes para a última pergunta são enviados.
+
+        Args:
+            embedder (str, optional): 'openai' ou 'hashing' (local, determinístico).
+            top_k (int, optional): Número de excertos enviados.
+        """
+        self.retrieval = {'embedder': embedder, 'top_k': top_k}
+        self.retriever = Retriever(create_embedder(embedder, self.call_api), top_k=top_k)
+
+    def ingest_document(self, thread_id: str, text: str, source: str = '') -> int:
+        """
+        Adiciona um documento ao índice de pesquisa da thread.
+
+        Returns:
+            int: O número de excertos indexados.
+        """
+        if self.retriever is None:
+            self.set_retrieval()
+        return self.retriever.ingest(self.name, thread_id, text, source)
+
+    def remove_documents(self, thread_id: str, sources) -> int:
+        """
+        Remove documentos (pela origem, o nome do ficheiro) do índice de pesquisa da thread.
+
+        Returns:
+            int: O número de excertos removidos.
+        """
+        if self.retriever is None:
+            return 0
+        return self.retriever.remove(self.name, thread_id, sources)
+
+    def set_context_window(self, max_context_tokens: int = None, summarize_evicted: bool = False):
+        """
+        Define o orçamento de tokens do contexto enviado em cada pedido.
+
+        Args:
+            max_context_tokens (int, optional): Orçamento de tokens; None envia o histórico completo.
+            summarize_evicted (bool, optional): Resume as mensagens que saem da janela.
+        """
+        self.max_context_tokens = max_context_tokens
+        self.summarize_evicted = summarize_evicted
+        if max_context_tokens is None:
+            self.context_window = None
+        else:
+            self.context_window = ContextWindow(
+                max_context_tokens,
+                counter=TokenCounter(self.model),
+                summarizer=self.summarize if summarize_evicted else None,
+                load_state=self._load_thread_state,
+                save_state=self._save_thread_state,
+            )
+
+    def _load_thread_state(self, thread_id: str) -> Dict:
+        # Só as threads lidas do armazenamento (LazyThreads) têm estado guardado
+        return self.threads.load_state(thread_id) if isinstance(self.threads, LazyThreads) else {}
+
+    def _save_thread_state(self, thread_id: str, state: Dict):
+        if isinstance(self.threads, LazyThreads):
+            self.threads.save_state(thread_id, state)
+
+    def summarize(self, previous_summary: str, messages: List[Dict]) -> str:
+        """
+        Resume mensagens que saíram da janela de contexto.
+
+        Args:
+            previous_summary (str): O resumo anterior (pode ser vazio).
+            messages (List[Dict]): As mensagens a resumir.
+
+        Returns:
+            str: O novo resumo.
+        """
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        if previous_summary:
+            transcript = f"Resumo anterior: {previous_summary}\n\n{transcript}"
+        response = self.create_completion([
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ])
+        return response.choices[0].message.content
 
     def set_model(self, model: str):
         """
@@ -66,58 +508,83 @@ class OpenAIAssistant:
         """
         self.model = model
 
-    def add_context_file(self, file_path, thread_id):
-        thread_dir = os.path.join("thread_files", thread_id)
-        os.makedirs(thread_dir, exist_ok=True)
-
-        # Obter o nome do arquivo a partir do caminho original
-        file_name = os.path.basename(file_path)
-
-        # Criar o novo caminho do arquivo no diretório da thread
-        new_file_path = os.path.join(thread_dir, file_name)
-
-        # Copiar o arquivo para o diretório da thread
-        with open(file_path, "rb") as source_file:
-            with open(new_file_path, "wb") as dest_file:
-                dest_file.write(source_file.read())
-
-        # Adiciona o arquivo ao sistema
-        file_object = self.client.files.create(
-            file=open(new_file_path, "rb"),
-            purpose="assistants"
-        )
-
-        # Adicionar o arquivo à thread
+    def _attach_file(self, thread_id: str, result: Dict):
+        """Adiciona um ficheiro enviado à thread."""
         self.client.beta.threads.messages.create(
             thread_id=thread_id,
             role="user",
             content="",
-            file_ids=[file_object.id]
+            file_ids=[result['file_id']]
         )
 
-        return file_object.id
+    def add_context_file(self, file_path, thread_id):
+        """
+        Envia um ficheiro e adiciona-o à thread.
 
+        O ficheiro é ligado (hard link) ou copiado em blocos para
+        thread_files/<thread_id>; se o mesmo conteúdo já tiver sido enviado,
+        o file_id existente é reutilizado (ver FileUploader).
 
-    def add_context_folder(self, folder_path: str, thread_id: str):
+        Returns:
+            str: O file_id do ficheiro.
+        """
+        result = get_file_uploader().upload(self.client, self.api_key, file_path, thread_id)
+        self._attach_file(thread_id, result)
+        return result['file_id']
+
+    def add_context_folder(self, folder_path: str, thread_id: str, progress=None):
         """
         Adiciona todos os arquivos PDF de uma pasta.
 
+        Os ficheiros são enviados em paralelo (ver FileUploader.max_workers).
+
         Args:
             folder_path (str): O caminho para a pasta a ser adicionada.
             thread_id (str): O ID da thread a ser usado para adicionar arquivos.
-        
+            progress (callable, optional): Chamada com (concluídos, total, resultado)
+                à medida que cada ficheiro termina.
+
+        Returns:
+            List[str]: Os file_id dos ficheiros, por ordem alfabética dos nomes.
+
         Raises:
             NotADirectoryError: Se o caminho fornecido não é um diretório.
         """
         if not os.path.isdir(folder_path):
             raise NotADirectoryError(f"{folder_path} não é um diretório.")
 
-        for file in os.listdir(folder_path):
-            if file.endswith('.pdf'):
-                # Chama o método add_context_file para cada PDF encontrado
-                self.add_context_file(os.path.join(folder_path, file), thread_id)
+        file_paths = [
+            os.path.join(folder_path, file)
+            for file in sorted(os.listdir(folder_path))
+            if file.endswith('.pdf')
+        ]
+        return self.add_context_files(file_paths, thread_id, progress)
 
+    def add_context_files(self, file_paths: List[str], thread_id: str, progress=None, on_attached=None):
+        """
+        Envia vários ficheiros em paralelo e adiciona-os à thread.
+
+        Args:
+            file_paths (List[str]): Os ficheiros a enviar.
+            thread_id (str): O ID da thread.
+            progress (callable, optional): Ver add_context_folder.
+            on_attached (callable, optional): Chamada com o resultado de cada
+                ficheiro depois de adicionado à thread.
 
+        Returns:
+            List[str]: Os file_id dos ficheiros, pela ordem de `file_paths`.
+        """
+        def attach(result):
+            self._attach_file(thread_id, result)
+            if on_attached is not None:
+                on_attached(result)
+
+        results = get_file_uploader().upload_many(
+            self.client, self.api_key, file_paths, thread_id,
+            on_uploaded=attach,
+            progress=progress,
+        )
+        return [result['file_id'] for result in results]
 
     def start_thread(self, thread_id: str):
         """
@@ -162,8 +629,11 @@ class OpenAIAssistant:
         Args:
             new_api_key (str): A nova chave API a ser usada.
         """
+        borrowed = self._client is not None
+        self.release_client()
         self.api_key = new_api_key
-        self.client = OpenAI(api_key=self.api_key)
+        if borrowed:
+            _ = self.client  # Troca já o cliente emprestado pelo da nova chave
     def set_api_key_for_all_assistants(self, new_api_key: str):
         """
         Atualiza a chave API para todos os assistentes gerenciados.
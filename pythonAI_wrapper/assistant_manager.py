@@ -1,46 +1,144 @@
 # assistant_manager.py
 
-import json
 import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List
+from pythonAI_wrapper.archive import DAY, TieredStorage
 from pythonAI_wrapper.assistant import OpenAIAssistant
+from pythonAI_wrapper.folder_sync import SYNC_EXTENSIONS, get_folder_sync
+from pythonAI_wrapper.key_pool import KeyPool
+from pythonAI_wrapper.metrics import get_metrics
 from pythonAI_wrapper.pdfHandler import PDFHandler
+from pythonAI_wrapper.response_cache import get_default_cache
+from pythonAI_wrapper.search_index import SearchIndex
+from pythonAI_wrapper.storage import AppendOnlyStorage, BaseStorage, LazyThreads, migrate_json_layout
 
 
 class AssistantManager:
-    def __init__(self, filename='assistants.json', threads_filename='threads.json'):
+    assistant_class = OpenAIAssistant
+
+    # Intervalo mínimo entre compactações automáticas (ver archive_after_days)
+    compact_interval = DAY
+
+    def __init__(self, filename='assistants.json', threads_filename='threads.json', storage: BaseStorage = None,
+                 archive_after_days: float = None, key_pool: KeyPool = None):
+        """
+        Inicializa o gestor de assistentes.
+
+        Args:
+            filename (str): Ficheiro assistants.json do layout antigo (migrado uma vez).
+            threads_filename (str): Ficheiro threads.json do layout antigo (migrado uma vez).
+            storage (BaseStorage, optional): Backend de armazenamento (ver
+                create_storage). Padrão é um AppendOnlyStorage na pasta 'conversations'
+                ao lado de `threads_filename`.
+            archive_after_days (float, optional): Threads sem mensagens novas há mais
+                do que estes dias são arquivadas comprimidas (no máximo uma vez por
+                dia, ao criar o gestor). None só arquiva com compact().
+            key_pool (KeyPool, optional): Pool de chaves API partilhado pelos pedidos
+                de todos os assistentes (ver key_pool). None usa a chave de cada assistente.
+        """
         self.assistants = {}
         self.filename = filename  
         self.threads_filename = threads_filename  
+        if storage is None:
+            storage = AppendOnlyStorage(os.path.join(os.path.dirname(threads_filename), 'conversations'))
+        migrate_json_layout(storage, filename, threads_filename)
+        self.storage = storage if isinstance(storage, TieredStorage) else TieredStorage(storage)
+        self.archive_after_days = archive_after_days
+        self.key_pool = key_pool
+        self._search_index = None
         self.load_assistants()
-        self.load_threads()  
+
+        compacted_at = self.storage.archive.index()["compacted_at"]
+        if archive_after_days is not None and (compacted_at is None or time.time() - compacted_at >= self.compact_interval):
+            self.compact()
+
+    def _assistant_data(self, assistant):
+        return {
+            'api_key': assistant.api_key,
+            'model': assistant.model,
+            'instructions': assistant.instructions,
+            'max_context_tokens': assistant.max_context_tokens,
+            'summarize_evicted': assistant.summarize_evicted,
+            'retrieval': assistant.retrieval,
+            'response_cache': assistant.response_cache is not None,
+            'base_url': assistant.base_url,
+            'hedging': assistant.hedging,
+            'routing': assistant.routing,
+        }
 
     def load_assistants(self):
-        """Carrega assistentes de um arquivo JSON."""
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r') as f:
-                data = json.load(f)
-                for name, assistant_data in data.items():
-                    self.assistants[name] = OpenAIAssistant(
-                        api_key=assistant_data['api_key'],
-                        name=name,
-                        model=assistant_data['model'],
-                        instructions=assistant_data['instructions'],
-                    )
+        """
+        Carrega assistentes do backend de armazenamento.
+
+        Apenas a configuração é lida: o cliente OpenAI e as threads de cada
+        assistente só são criados/carregados no primeiro uso.
+        """
+        self._assistants_version = self.storage.assistants_version()
+        for name, assistant_data in self.storage.load_assistants().items():
+            self._load_assistant(name, assistant_data)
+
+    def _load_assistant(self, name, assistant_data):
+        self.assistants[name] = self.assistant_class(
+            api_key=assistant_data['api_key'],
+            name=name,
+            model=assistant_data['model'],
+            instructions=assistant_data['instructions'],
+            threads=LazyThreads(self.storage, name),
+            max_context_tokens=assistant_data.get('max_context_tokens'),
+            summarize_evicted=assistant_data.get('summarize_evicted', False),
+            retrieval=assistant_data.get('retrieval'),
+            response_cache=get_default_cache() if assistant_data.get('response_cache') else None,
+            base_url=assistant_data.get('base_url'),
+            blob_store=self.storage.blobs,
+            key_pool=self.key_pool,
+            hedging=assistant_data.get('hedging'),
+            routing=assistant_data.get('routing'),
+        )
+
+    def refresh(self):
+        """
+        Volta a ler o que outro processo alterou no armazenamento desde a
+        última leitura: a configuração dos assistentes, as listas de threads
+        e as threads já carregadas que foram escritas entretanto. Usado pelo
+        daemon (serve), que mantém o gestor carregado, antes de cada comando.
+        """
+        version = self.storage.assistants_version()
+        if version is None or version != self._assistants_version:
+            self._assistants_version = version
+            stored = self.storage.load_assistants()
+            for name in [name for name in self.assistants if name not in stored]:
+                del self.assistants[name]
+            for name, assistant_data in stored.items():
+                assistant = self.assistants.get(name)
+                # Um assistente com a mesma configuração mantém o estado em memória (cliente, latências, ...)
+                if assistant is None or self._assistant_data(assistant) != assistant_data:
+                    self._load_assistant(name, assistant_data)
+        for assistant in self.assistants.values():
+            if isinstance(assistant.threads, LazyThreads):
+                assistant.threads.refresh()
+
+    def _mark_written(self, assistant_name, thread_id):
+        """A cópia em memória da thread já inclui a escrita feita agora (refresh não a volta a ler)."""
+        threads = self.assistants[assistant_name].threads
+        if isinstance(threads, LazyThreads):
+            threads.mark_written(thread_id)
 
     def save_assistants(self):
-        """Salva assistentes em um arquivo JSON."""
-        data = {
-            name: {
-                'api_key': assistant.api_key,
-                'model': assistant.model,
-                'instructions': assistant.instructions,
-            } for name, assistant in self.assistants.items()
-        }
-        with open(self.filename, 'w') as f:
-            json.dump(data, f, indent=4)
+        """Salva todos os assistentes no backend de armazenamento."""
+        for name, assistant in self.assistants.items():
+            self.storage.save_assistant(name, self._assistant_data(assistant))
             
     def get_assistant_history(self, assistant_name):
-        """Retorna o histórico das threads de um assistente específico."""
+        """
+        Retorna o histórico das threads de um assistente específico.
+
+        Carrega todas as threads em memória; para percorrer ou exportar
+        assistentes grandes use iter_assistant_history ou iter_records.
+        """
         if assistant_name not in self.assistants:
             raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
 
@@ -51,11 +149,13 @@ class AssistantManager:
         }
 
         for thread_id, messages in assistant.threads.items():
-            history["threads"][thread_id] = messages
+            history["threads"][thread_id] = [message.to_dict() for message in messages]
 
         return history
 
-    def create_assistant(self, api_key: str, name: str, model: str = 'gpt-4', instructions: str = ''):
+    def create_assistant(self, api_key: str, name: str, model: str = 'gpt-4', instructions: str = '',
+                         max_context_tokens: int = None, summarize_evicted: bool = False, retrieval: Dict = None,
+                         cache_responses: bool = False, hedging: Dict = None, routing: Dict = None):
         """Cria um novo assistente com o nome fornecido e carrega instruções de um arquivo ou pasta."""
         if name in self.assistants:
             raise ValueError(f"Já existe um assistente com o nome '{name}'.")
@@ -68,27 +168,122 @@ class AssistantManager:
                 instructions = f.read()
 
         # Criação de um novo assistente
-        self.assistants[name] = OpenAIAssistant(api_key=api_key, name=name, model=model, instructions=instructions)
-
-        # Salvar assistentes após a criação
-        self.save_assistants()
+        self.assistants[name] = self.assistant_class(api_key=api_key, name=name, model=model, instructions=instructions,
+                                                     max_context_tokens=max_context_tokens,
+                                                     summarize_evicted=summarize_evicted,
+                                                     retrieval=retrieval,
+                                                     response_cache=get_default_cache() if cache_responses else None,
+                                                     blob_store=self.storage.blobs,
+                                                     key_pool=self.key_pool,
+                                                     hedging=hedging,
+                                                     routing=routing)
+
+        # Salvar o assistente após a criação
+        self.storage.save_assistant(name, self._assistant_data(self.assistants[name]))
 
     def load_threads(self):
-        """Carrega threads de um arquivo JSON."""
-        if os.path.exists(self.threads_filename):
-            with open(self.threads_filename, 'r') as f:
-                data = json.load(f)
-                for assistant_name, threads in data.items():
-                    if assistant_name in self.assistants:
-                        self.assistants[assistant_name].threads = threads
+        """Carrega já todas as threads de todos os assistentes (normalmente são carregadas sob pedido)."""
+        for assistant_name, assistant in self.assistants.items():
+            assistant.threads = self.storage.load_threads(assistant_name)
 
     def save_threads(self):
-        """Salva threads em um arquivo JSON."""
-        data = {
-            name: assistant.threads for name, assistant in self.assistants.items()
-        }
-        with open(self.threads_filename, 'w') as f:
-            json.dump(data, f, indent=4)
+        """Reescreve todas as threads no backend de armazenamento."""
+        with get_metrics().timer('storage_write_seconds', backend=self.storage.backend, operation='replace'):
+            for name, assistant in self.assistants.items():
+                for thread_id, messages in assistant.threads.items():
+                    self.storage.replace_thread(name, thread_id, messages)
+                    self._index(self.search_index.replace_thread, name, thread_id, messages)
+
+    def _append_messages(self, assistant_name, thread_id, messages):
+        """Persiste mensagens novas, medindo o tempo de escrita, e indexa-as para a pesquisa."""
+        with get_metrics().timer('storage_write_seconds', backend=self.storage.backend, operation='append'):
+            self.storage.append_messages(assistant_name, thread_id, messages)
+        self._mark_written(assistant_name, thread_id)
+        self._index(self.search_index.add, assistant_name, thread_id, messages)
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """Índice de pesquisa das mensagens (aberto no primeiro uso)."""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.storage.search_path or 'search.db')
+        return self._search_index
+
+    def _index(self, update, assistant_name, thread_id, messages):
+        # As mensagens já estão guardadas: um erro no índice não pode fazer falhar o pedido
+        try:
+            with get_metrics().timer('storage_write_seconds', backend='SearchIndex', operation='index'):
+                update(assistant_name, thread_id, messages)
+        except sqlite3.Error:
+            get_metrics().increment('search_index_errors_total')
+            try:
+                self.search_index.mark_incomplete()  # Sincroniza de novo antes da próxima pesquisa
+            except sqlite3.Error:
+                pass
+
+    def search(self, query: str, assistant_name: str = None, thread_id: str = None, role: str = None,
+               since: float = None, until: float = None, limit: int = 20, highlight=('[', ']')):
+        """
+        Pesquisa o texto das mensagens de todas as threads (incluindo as arquivadas).
+
+        Args:
+            query (str): Palavras a procurar (todas têm de aparecer; "palavra*" procura por prefixo).
+            assistant_name (str, optional): Só mensagens deste assistente.
+            thread_id (str, optional): Só mensagens desta thread.
+            role (str, optional): 'user' ou 'assistant'.
+            since, until (float, optional): Intervalo de datas (time.time()) das mensagens.
+            limit (int, optional): Número máximo de resultados.
+            highlight (tuple, optional): Marcas à volta das palavras encontradas.
+
+        Returns:
+            List[Dict]: {'assistant', 'thread_id', 'position', 'role', 'created_at',
+                'snippet', 'score'}, do mais relevante para o menos relevante.
+        """
+        if assistant_name is not None and assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+        if not self.search_index.complete:
+            self.reindex()  # Primeira pesquisa: indexa as mensagens guardadas antes do índice existir
+        with get_metrics().timer('search_seconds'):
+            return self.search_index.search(query, assistant_name, thread_id, role, since, until, limit, highlight)
+
+    def reindex(self):
+        """
+        Sincroniza o índice de pesquisa com o armazenamento (volta a indexar
+        as threads que não coincidem).
+
+        Returns:
+            int: O número de threads indexadas de novo.
+        """
+        return self.search_index.update(self.storage, read_thread=self.storage.read_thread)
+
+    def compact(self, older_than_days: float = None, dry_run: bool = False):
+        """
+        Arquiva (comprimidas) as threads sem mensagens novas há mais de
+        `older_than_days` dias. As threads arquivadas continuam a ser listadas
+        e voltam ao armazenamento normal quando recebem mensagens novas.
+
+        Args:
+            older_than_days (float, optional): Idade mínima; por omissão archive_after_days.
+            dry_run (bool, optional): Só retorna as threads que seriam arquivadas.
+
+        Returns:
+            List[Dict]: Uma linha por thread arquivada.
+        """
+        if older_than_days is None:
+            older_than_days = self.archive_after_days
+        if older_than_days is None:
+            raise ValueError("Indique a idade mínima das threads a arquivar.")
+
+        archived = self.storage.compact(older_than_days * DAY, dry_run=dry_run)
+        if not dry_run:
+            for row in archived:
+                threads = self.assistants[row["assistant"]].threads if row["assistant"] in self.assistants else None
+                if isinstance(threads, LazyThreads):
+                    threads.unload(row["thread_id"])  # Liberta a memória
+        return archived
+
+    def archive_report(self):
+        """Número e tamanho das threads ativas e arquivadas."""
+        return self.storage.report()
 
     # As outras funções permanecem as mesmas...
     def create_thread(self, assistant_name: str, thread_id: str = None):
@@ -105,31 +300,105 @@ class AssistantManager:
         # Criação da nova thread
         self.assistants[assistant_name].threads[thread_id] = []  # Inicializa a thread como uma lista vazia
         
-        # Salvar assistentes e threads após a criação da thread
-        self.save_assistants()
-        self.save_threads()  # Salvar as mudanças após criar uma thread
+        # Regista a thread no armazenamento
+        self.storage.create_thread(assistant_name, thread_id)
+        self._mark_written(assistant_name, thread_id)
         
         return thread_id
     
-    def get_thread_history(self, assistant_name: str, thread_id: str):
+    def get_thread_history(self, assistant_name: str, thread_id: str, limit: int = None, before: int = None):
         """
         Retorna o histórico da thread de um assistente específico.
         
         Args:
             assistant_name (str): O nome do assistente.
             thread_id (str): O ID da thread a ser usada.
+            limit (int, optional): Número máximo de mensagens (as mais recentes).
+            before (int, optional): Só mensagens com posição inferior a esta, para paginar.
         
         Returns:
-            List[Dict]: O histórico da thread.
+            List[Dict]: O histórico da thread, como dicionários simples (cópias).
         """
         if assistant_name not in self.assistants:
             raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
         
-        if thread_id in self.assistants[assistant_name].threads:
-            return self.assistants[assistant_name].threads[thread_id]
+        if thread_id not in self.assistants[assistant_name].threads:
+            raise ValueError(f"Thread {thread_id} não encontrada.")
+
+        if limit is None and before is None:
+            messages = self.assistants[assistant_name].threads[thread_id]
         else:
+            messages = self.storage.get_thread(assistant_name, thread_id, limit=limit, before=before)
+        return [message.to_dict() for message in messages]
+
+    def iter_thread_history(self, assistant_name: str, thread_id: str, since: int = None, limit: int = None,
+                            before: int = None) -> Iterator[Dict]:
+        """
+        Percorre o histórico de uma thread diretamente do armazenamento, sem
+        o carregar todo em memória. Cada mensagem é um dicionário simples.
+
+        Args:
+            assistant_name (str): O nome do assistente.
+            thread_id (str): O ID da thread.
+            since (int, optional): Primeira posição a mostrar (páginas para a frente);
+                com since, limit é o tamanho da página.
+            limit (int, optional): Sem since, as últimas `limit` mensagens.
+            before (int, optional): Sem since, só mensagens com posição inferior a esta.
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+        if thread_id not in self.assistants[assistant_name].threads:
             raise ValueError(f"Thread {thread_id} não encontrada.")
 
+        if since is not None:
+            messages = islice(self.storage.iter_thread(assistant_name, thread_id, since), limit)
+        elif limit is not None or before is not None:
+            messages = self.storage.get_thread(assistant_name, thread_id, limit=limit, before=before)
+        else:
+            messages = self.storage.iter_thread(assistant_name, thread_id)
+        return (message.to_dict() for message in messages)
+
+    def iter_assistant_history(self, assistant_name: str, since: int = None, limit: int = None):
+        """
+        Percorre as threads de um assistente, uma de cada vez.
+
+        Yields:
+            (thread_id, mensagens): as mensagens são um iterador (ver iter_thread_history,
+                com since/limit aplicados a cada thread).
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+        for thread_id in self.storage.list_threads(assistant_name):
+            yield thread_id, self.iter_thread_history(assistant_name, thread_id, since=since, limit=limit)
+
+    def iter_records(self, assistant_names: List[str] = None, thread_id: str = None,
+                     updated_since: float = None) -> Iterator[Dict]:
+        """
+        Percorre todas as mensagens como registos planos, para exportação
+        (ver export.export_records).
+
+        Args:
+            assistant_names (List[str], optional): Assistentes a incluir (por omissão, todos).
+            thread_id (str, optional): Só esta thread.
+            updated_since (float, optional): Só threads escritas desde este momento (time.time()).
+
+        Yields:
+            Dict: {'assistant', 'thread_id', 'position', 'role', 'content', ...}.
+        """
+        for assistant_name in assistant_names or list(self.assistants):
+            if assistant_name not in self.assistants:
+                raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+            thread_ids = [thread_id] if thread_id is not None else self.storage.list_threads(assistant_name)
+            for thread in thread_ids:
+                if updated_since is not None:
+                    updated_at = self.storage.thread_updated_at(assistant_name, thread)
+                    if updated_at is not None and updated_at < updated_since:
+                        continue
+                for position, message in enumerate(self.storage.iter_thread(assistant_name, thread)):
+                    record = {'assistant': assistant_name, 'thread_id': thread, 'position': position}
+                    record.update(message)
+                    yield record
+
 
     def list_assistants(self):
         """
@@ -142,7 +411,7 @@ class AssistantManager:
         if assistant_name not in self.assistants:
             raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
         
-        return list(self.assistants[assistant_name].threads.keys())  # Corrigido para acessar threads como atributo
+        return self.storage.list_threads(assistant_name)
 
     def get_assistant(self, assistant_name):
         """Obtém o assistente especificado pelo nome."""
@@ -151,51 +420,387 @@ class AssistantManager:
         
         return self.assistants[assistant_name]
 
-    def send_prompt(self, assistant_name, thread_id, prompt):
-        """Envia um prompt para o assistente na thread especificada."""
+    def send_prompt(self, assistant_name, thread_id, prompt, stream: bool = False, use_cache: bool = True):
+        """
+        Envia um prompt para o assistente na thread especificada.
+
+        Args:
+            assistant_name (str): O nome do assistente.
+            thread_id (str): O ID da thread.
+            prompt (str): Texto, ou caminho para um ficheiro ou pasta com o prompt.
+            stream (bool, optional): Se True, retorna um gerador com os fragmentos
+                da resposta à medida que chegam. A resposta é guardada quando o
+                stream termina ou é cancelado.
+            use_cache (bool, optional): Se False, ignora a cache de respostas neste pedido.
+
+        Returns:
+            str: A resposta do assistente (ou um gerador de fragmentos, com stream=True).
+        """
         if assistant_name not in self.assistants:
             raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
         
         if thread_id not in self.assistants[assistant_name].threads:
             raise ValueError(f"Thread '{thread_id}' não encontrada.")
 
-        # Verifica se o prompt é um arquivo ou diretório
+        prompt_content = self._read_prompt(prompt)
+        assistant = self.assistants[assistant_name]
+        thread = assistant.threads[thread_id]
+        start = len(thread)
+
+        if stream:
+            return self._stream_prompt(assistant_name, thread_id, assistant.stream_response(prompt_content, thread_id, use_cache), start)
+
+        # Envia o prompt e obtém a resposta (get_response acrescenta a pergunta e a resposta à thread)
+        started = time.perf_counter()
+        try:
+            response = assistant.get_response(prompt_content, thread_id, use_cache)
+        except BaseException:
+            del thread[start:]  # Pedido falhou: descarta a pergunta
+            raise
+
+        # Persiste apenas as mensagens novas
+        self._append_messages(assistant_name, thread_id, thread[start:])
+        get_metrics().observe('prompt_seconds', time.perf_counter() - started, assistant=assistant_name)
+        
+        return response
+
+    def fan_out(self, assistant_names: List[str], thread_id: str, prompt, use_cache: bool = True,
+                return_exceptions: bool = False) -> Dict:
+        """
+        Envia o mesmo prompt a vários assistentes ao mesmo tempo, na thread
+        `thread_id` de cada um (criada se não existir), e junta as respostas.
+
+        Args:
+            assistant_names (List[str]): Os assistentes.
+            thread_id (str): O ID da thread (o mesmo em todos os assistentes).
+            prompt (str): Texto, ou caminho para um ficheiro ou pasta com o prompt.
+            use_cache (bool, optional): Se False, ignora a cache de respostas.
+            return_exceptions (bool, optional): Se True, o erro de um assistente
+                fica no resultado em vez de ser lançado.
+
+        Returns:
+            Dict: assistente -> resposta (ou a exceção, com return_exceptions=True).
+        """
+        assistant_names = list(dict.fromkeys(assistant_names))
+        for assistant_name in assistant_names:
+            if assistant_name not in self.assistants:
+                raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+        prompt_content = self._read_prompt(prompt)
+        for assistant_name in assistant_names:
+            if thread_id not in self.assistants[assistant_name].threads:
+                self.create_thread(assistant_name, thread_id)
+
+        with ThreadPoolExecutor(max_workers=max(len(assistant_names), 1)) as executor:
+            futures = {assistant_name: executor.submit(self.send_prompt, assistant_name, thread_id, prompt_content,
+                                                       use_cache=use_cache)
+                       for assistant_name in assistant_names}
+        responses = {}
+        for assistant_name, future in futures.items():
+            try:
+                responses[assistant_name] = future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                responses[assistant_name] = e
+        return responses
+
+    def _stream_prompt(self, assistant_name, thread_id, fragments, start):
+        thread = self.assistants[assistant_name].threads[thread_id]
+        try:
+            yield from fragments
+        finally:
+            fragments.close()
+            if len(thread) - start == 2:
+                # Pergunta e resposta (completa ou parcial)
+                self._append_messages(assistant_name, thread_id, thread[start:])
+            else:
+                del thread[start:]  # Nenhuma resposta recebida: descarta a pergunta
+
+    def _read_prompt(self, prompt):
+        """Retorna o conteúdo do prompt: texto simples, ficheiro ou pasta."""
         if os.path.isfile(prompt):
             with open(prompt, 'r') as f:
-                prompt_content = f.read()
+                return f.read()
         elif os.path.isdir(prompt):
-            prompt_content = self.load_prompts_from_folder(prompt)
+            return self.load_prompts_from_folder(prompt)
+        return prompt  # Caso seja um texto simples
+
+    
+    def _find_thread_owner(self, thread_id, assistant_name=None):
+        """Retorna o nome do assistente dono da thread (tem de ser único se não for indicado)."""
+        if assistant_name is not None:
+            if assistant_name not in self.assistants:
+                raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+            if thread_id not in self.assistants[assistant_name].threads:
+                raise ValueError(f"Thread '{thread_id}' não encontrada.")
+            return assistant_name
+
+        owners = [name for name, assistant in self.assistants.items() if thread_id in assistant.threads]
+        if not owners:
+            raise ValueError(f"Thread '{thread_id}' não encontrada.")
+        if len(owners) > 1:
+            raise ValueError(f"A thread '{thread_id}' existe em vários assistentes ({', '.join(owners)}); indique o assistente.")
+        return owners[0]
+
+    def add_context_file(self, file_path, thread_id, assistant_name=None):
+        """
+        Adiciona um documento (PDF ou texto) ao índice de pesquisa da thread.
+
+        O documento não é copiado para o histórico: em cada prompt, só os
+        excertos mais relevantes são enviados (ver OpenAIAssistant.set_retrieval).
+
+        Returns:
+            int: O número de excertos indexados.
+        """
+        assistant_name = self._find_thread_owner(thread_id, assistant_name)
+        assistant = self.assistants[assistant_name]
+
+        if file_path.endswith('.pdf'):
+            content = PDFHandler().read_pdf(file_path)
         else:
-            prompt_content = prompt  # Caso seja um texto simples
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
 
-        # Adiciona a pergunta do usuário ao histórico da thread
-        self.assistants[assistant_name].threads[thread_id].append({"role": "user", "content": prompt_content})
+        if not content.strip():
+            print("Erro: Nenhum conteúdo encontrado no documento.")
+            return 0
 
-        # Envia o prompt e obtém a resposta
-        response = self.assistants[assistant_name].get_response(prompt_content, thread_id)  # Corrigido aqui
+        retrieval = assistant.retrieval
+        chunks = assistant.ingest_document(thread_id, content, source=os.path.basename(file_path))
+        if assistant.retrieval != retrieval:
+            # A pesquisa foi ativada agora: guarda a configuração do assistente
+            self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+        return chunks
 
-        # Adiciona a resposta do assistente ao histórico da thread
-        self.assistants[assistant_name].threads[thread_id].append({"role": "assistant", "content": response})
+    def add_context_folder(self, folder_path, thread_id, assistant_name=None):
+        """
+        Adiciona todos os PDFs de uma pasta ao índice de pesquisa da thread.
 
-        # Salva as alterações após enviar o prompt
-        self.save_assistants()
-        self.save_threads()  # Salvar as mudanças após enviar um prompt
-        
-        return response
+        Returns:
+            int: O número total de excertos indexados.
 
-    
-    def add_context_file(self, file_path, thread_id):
-        """Adiciona o conteúdo de um arquivo PDF à thread especificada."""
+        Raises:
+            NotADirectoryError: Se o caminho fornecido não é um diretório.
+        """
+        if not os.path.isdir(folder_path):
+            raise NotADirectoryError(f"{folder_path} não é um diretório.")
+
+        assistant_name = self._find_thread_owner(thread_id, assistant_name)
+        assistant = self.assistants[assistant_name]
+        retrieval = assistant.retrieval
+
+        chunks = 0
         pdf_handler = PDFHandler()
-        pdf_content = pdf_handler.read_pdf(file_path)
+        for file_path, pages in pdf_handler.iter_folder(folder_path):
+            content = pdf_handler.join_pages(pages)
+            if content.strip():
+                chunks += assistant.ingest_document(thread_id, content, source=os.path.basename(file_path))
+
+        if assistant.retrieval != retrieval:
+            self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+        return chunks
+
+    def sync_folder(self, assistant_name: str, folder_path: str, thread_id: str = None, target: str = 'context',
+                    prune: bool = False, dry_run: bool = False, settle: float = 0.0):
+        """
+        Sincroniza uma pasta com uma thread: só os ficheiros novos ou
+        alterados desde a última sincronização (da mesma pasta, assistente e
+        thread) são lidos e enviados. Os ficheiros removidos são indicados.
 
-        if pdf_content:
-            # Adiciona o conteúdo lido ao histórico da thread
-            self.add_to_thread(thread_id, pdf_content)  # Certifique-se de que `add_to_thread` existe
-            print(f"Conteúdo do arquivo PDF adicionado à thread '{thread_id}':\n{pdf_content[:200]}...")  # Mostra os primeiros 200 caracteres do conteúdo
+        Args:
+            assistant_name (str): O nome do assistente (None procura o dono da thread).
+            folder_path (str): A pasta a sincronizar.
+            thread_id (str, optional): A thread (não é usada com target='instructions').
+            target (str, optional): O que fazer com os ficheiros:
+                'context' (índice de pesquisa, como add_context_folder),
+                'files' (envio para a OpenAI, como OpenAIAssistant.add_context_folder),
+                'prompt' (um prompt com o texto dos ficheiros novos/alterados) ou
+                'instructions' (recarrega as instruções do assistente).
+            prune (bool, optional): Com target='context', retira do índice os
+                documentos cujos ficheiros foram removidos.
+            dry_run (bool, optional): Só compara a pasta com o manifesto.
+            settle (float, optional): Ignora (por agora) ficheiros modificados há
+                menos destes segundos.
+
+        Returns:
+            Dict: 'added', 'changed', 'removed', 'unchanged' e 'pending' (nomes
+                de ficheiros), mais 'chunks' (context), 'file_ids' (files),
+                'response' (prompt) ou 'instructions' (instructions).
+
+        Raises:
+            NotADirectoryError: Se o caminho fornecido não é um diretório.
+        """
+        if target not in SYNC_EXTENSIONS:
+            raise ValueError(f"Modo de sincronização '{target}' desconhecido.")
+        if not os.path.isdir(folder_path):
+            raise NotADirectoryError(f"{folder_path} não é um diretório.")
+        if target == 'instructions':
+            if assistant_name not in self.assistants:
+                raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+            thread_id = None
         else:
-            print("Erro: Nenhum conteúdo encontrado no PDF.")
-            
+            assistant_name = self._find_thread_owner(thread_id, assistant_name)
+        assistant = self.assistants[assistant_name]
+
+        folder_sync = get_folder_sync()
+        manifest = folder_sync.load(assistant_name, thread_id, folder_path)
+        report = folder_sync.scan(folder_path, SYNC_EXTENSIONS[target], manifest, settle=settle)
+        entries = report.pop('entries')
+        pending = report['added'] + report['changed']
+        if dry_run:
+            return report
+        if not (pending or report['removed']):
+            if entries != manifest:
+                folder_sync.save(assistant_name, thread_id, folder_path, entries)  # Só mudaram mtimes
+            return report
+
+        # O manifesto só passa a incluir um ficheiro novo/alterado depois de ele ser enviado
+        synced = {name: entry for name, entry in entries.items() if name not in pending}
+        try:
+            if target == 'context':
+                retrieval = assistant.retrieval
+                stale = report['changed'] + (report['removed'] if prune else [])
+                if stale:
+                    report['removed_chunks'] = assistant.remove_documents(thread_id, stale)
+                report['chunks'] = 0
+                for name in pending:
+                    content = PDFHandler().read_pdf(os.path.join(folder_path, name))
+                    if content.strip():
+                        report['chunks'] += assistant.ingest_document(thread_id, content, source=name)
+                    synced[name] = entries[name]
+                if assistant.retrieval != retrieval:
+                    self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+
+            elif target == 'files':
+                report['file_ids'] = assistant.add_context_files(
+                    [os.path.join(folder_path, name) for name in pending], thread_id,
+                    on_attached=lambda result: synced.update({os.path.basename(result['path']): entries[os.path.basename(result['path'])]}),
+                )
+
+            elif target == 'prompt':
+                if pending:
+                    prompt = "".join(self._read_prompt(os.path.join(folder_path, name)) + "\n" for name in pending)
+                    report['response'] = self.send_prompt(assistant_name, thread_id, prompt)
+                synced.update({name: entries[name] for name in pending})
+
+            else:
+                assistant.instructions = self.load_instructions_from_folder(folder_path)
+                self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+                report['instructions'] = assistant.instructions
+                synced.update({name: entries[name] for name in pending})
+        finally:
+            folder_sync.save(assistant_name, thread_id, folder_path, synced)
+        return report
+
+    def watch_folder(self, assistant_name: str, folder_path: str, thread_id: str = None, target: str = 'context',
+                     prune: bool = False, interval: float = 2.0, on_sync=None, stop=None):
+        """
+        Sincroniza uma pasta sempre que há alterações (verifica a cada
+        `interval` segundos), até `stop` (threading.Event) ser ativado ou
+        Ctrl+C. Os ficheiros ainda a ser escritos esperam pela verificação seguinte.
+
+        Args:
+            on_sync (callable, optional): Chamada com o resultado de sync_folder
+                sempre que alguma coisa mudou.
+        """
+        try:
+            while stop is None or not stop.is_set():
+                report = self.sync_folder(assistant_name, folder_path, thread_id, target, prune=prune, settle=interval)
+                if on_sync is not None and (report['added'] or report['changed'] or report['removed']):
+                    on_sync(report)
+                if stop is not None:
+                    stop.wait(interval)
+                else:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    def set_response_cache(self, assistant_name: str, enabled: bool = True):
+        """
+        Ativa ou desativa a cache de respostas de um assistente.
+
+        Args:
+            assistant_name (str): O nome do assistente.
+            enabled (bool, optional): Se True, usa a cache partilhada do processo.
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+
+        assistant = self.assistants[assistant_name]
+        assistant.set_response_cache(enabled)
+        self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+
+    def set_hedging(self, assistant_name: str, enabled: bool = True, quantile: float = 0.95,
+                    fallback_model: str = None, budget: float = 0.1):
+        """
+        Ativa ou desativa a repetição dos pedidos lentos de um assistente
+        (ver OpenAIAssistant.set_hedging).
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+
+        assistant = self.assistants[assistant_name]
+        assistant.set_hedging(enabled, quantile, fallback_model, budget)
+        self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+
+    def set_routing(self, assistant_name: str, models: List = None):
+        """
+        Ativa a escolha do modelo de cada pedido de um assistente de entre
+        `models` (ver OpenAIAssistant.set_routing); sem modelos, desativa-a.
+        As restrições já definidas nas threads são mantidas.
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+
+        assistant = self.assistants[assistant_name]
+        threads = assistant.routing['threads'] if assistant.routing else None
+        if models and threads:
+            names = {entry if isinstance(entry, str) else entry.get('model') for entry in models}
+            for constraints in threads.values():
+                if 'models' in constraints:
+                    constraints['models'] = [name for name in constraints['models'] if name in names] or None
+        assistant.set_routing(models, threads)
+        self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+
+    def set_thread_route(self, assistant_name: str, thread_id: str, model: str = None, models: List[str] = None,
+                         max_latency: float = None):
+        """
+        Define as restrições do router numa thread (ver OpenAIAssistant.set_thread_route).
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+
+        assistant = self.assistants[assistant_name]
+        assistant.set_thread_route(thread_id, model, models, max_latency)
+        self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+
+    def routing_stats(self, assistant_name: str):
+        """Modelos do router de um assistente, com a latência média recente e os pedidos de cada um."""
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+        router = self.assistants[assistant_name].router
+        return router.stats() if router is not None else []
+
+    def cache_stats(self):
+        """Retorna os contadores da cache de respostas partilhada (hits, misses, taxa de acerto)."""
+        return get_default_cache().stats()
+
+    def set_retrieval(self, assistant_name: str, embedder: str = 'openai', top_k: int = 4):
+        """
+        Ativa a pesquisa nos documentos das threads de um assistente.
+
+        Args:
+            assistant_name (str): O nome do assistente.
+            embedder (str, optional): 'openai' ou 'hashing' (local, determinístico).
+            top_k (int, optional): Número de excertos enviados em cada prompt.
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+
+        assistant = self.assistants[assistant_name]
+        assistant.set_retrieval(embedder, top_k)
+        self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+
     def load_instructions_from_folder(self, folder_path: str):
         """Lê todos os arquivos de texto em uma pasta e retorna seu conteúdo combinado."""
         instructions = ""
@@ -228,4 +833,33 @@ class AssistantManager:
         assistant.set_api_key(new_api_key)
 
         # Salvar as alterações após atualizar a chave API
-        self.save_assistants()
+        self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
+
+    def set_key_pool(self, key_pool: KeyPool = None):
+        """
+        Passa a distribuir os pedidos de todos os assistentes pelas chaves do
+        pool (None volta a usar a chave de cada assistente).
+        """
+        self.key_pool = key_pool
+        for assistant in self.assistants.values():
+            assistant.key_pool = key_pool
+
+    def key_usage(self):
+        """Uso de cada chave do pool (ver KeyPool.stats); lista vazia sem pool."""
+        return self.key_pool.stats() if self.key_pool is not None else []
+
+    def set_context_window(self, assistant_name: str, max_context_tokens: int = None, summarize_evicted: bool = False):
+        """
+        Define o orçamento de tokens do contexto de um assistente existente.
+
+        Args:
+            assistant_name (str): O nome do assistente.
+            max_context_tokens (int, optional): Orçamento de tokens; None envia o histórico completo.
+            summarize_evicted (bool, optional): Resume as mensagens que saem da janela.
+        """
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+
+        assistant = self.assistants[assistant_name]
+        assistant.set_context_window(max_context_tokens, summarize_evicted)
+        self.storage.save_assistant(assistant_name, self._assistant_data(assistant))
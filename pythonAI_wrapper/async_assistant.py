@@ -0,0 +1,337 @@
+# async_assistant.py
+
+import asyncio
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from pythonAI_wrapper.assistant import OpenAIAssistant, raw_create
+from pythonAI_wrapper.assistant_manager import AssistantManager
+from pythonAI_wrapper.client_registry import get_client_registry, running_loop
+from pythonAI_wrapper.context_window import estimate_tokens
+from pythonAI_wrapper.hedging import AsyncPrimedStream, ahedged_call
+from pythonAI_wrapper.metrics import get_metrics
+
+
+class AsyncOpenAIAssistant(OpenAIAssistant):
+    """
+    Versão assíncrona do OpenAIAssistant, sobre o cliente AsyncOpenAI.
+
+    get_response e stream_response são corrotinas / geradores assíncronos;
+    o resto (threads, janela de contexto, configuração) é partilhado com o
+    OpenAIAssistant.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._async_client = None
+        self._async_registry = None
+        self._async_loop = None
+        super().__init__(*args, **kwargs)
+
+    @property
+    def async_client(self):
+        """Cliente AsyncOpenAI do event loop em execução, emprestado do registo partilhado."""
+        loop = running_loop()
+        if self._async_client is not None and self._async_loop is not loop:
+            self._async_registry.release(self._async_client)  # Cliente de outro event loop
+            self._async_client = None
+        if self._async_client is None:
+            self._async_registry = get_client_registry()
+            self._async_client = self._async_registry.acquire_async(self.api_key, base_url=self.base_url)
+            self._async_loop = loop
+        return self._async_client
+
+    def release_client(self):
+        super().release_client()
+        if self._async_client is not None:
+            self._async_registry.release(self._async_client)
+            self._async_client = None
+            self._async_loop = None
+
+    async def acreate_completion(self, messages: List[Dict], stream: bool = False, model: str = None,
+                                 thread_id: str = None):
+        """Versão assíncrona de create_completion (mesmo limitador partilhado ou key_pool)."""
+        kwargs = {"model": model or self.model, "messages": messages}
+        if stream:
+            kwargs["stream"] = True
+            kwargs["stream_options"] = {"include_usage": True}
+            return await self._arequest(kwargs, estimate_tokens(messages), thread_id)
+
+        metrics = get_metrics()
+        labels = {"assistant": self.name, "model": kwargs["model"]}
+        start = time.perf_counter()
+        try:
+            response = await self._arequest(kwargs, estimate_tokens(messages), thread_id)
+        except Exception:
+            metrics.increment('request_errors_total', **labels)
+            raise
+        metrics.observe('request_seconds', time.perf_counter() - start, stream=False, **labels)
+        metrics.record_usage(getattr(response, 'usage', None), **labels)
+        return response
+
+    async def _arequest(self, kwargs, estimated_tokens, thread_id=None):
+        """Versão assíncrona de _request: o pedido perdedor é cancelado."""
+        if self.hedge_policy is None:
+            return await self._acall(kwargs, estimated_tokens, thread_id)
+        stream = kwargs.get("stream", False)
+
+        async def attempt(model, sent):
+            result = await self._acall(dict(kwargs, model=model), estimated_tokens, thread_id, on_send=sent)
+            return await AsyncPrimedStream.prime(result) if stream else result
+
+        return await ahedged_call(self.hedge_policy, attempt, kwargs["model"], stream=stream,
+                                  discard=(lambda primed: primed.close()) if stream else None,
+                                  labels={"assistant": self.name, "model": kwargs["model"]}, notify_sent=True)
+
+    async def _acall(self, kwargs, estimated_tokens, thread_id=None, on_send=None):
+        def sending():
+            if on_send is not None:
+                on_send()
+
+        if self.key_pool is not None:
+            def request(key):
+                sending()
+                return raw_create(key.async_client(self.base_url).chat.completions)(**kwargs)
+            return await self.key_pool.acall(request, estimated_tokens,
+                                             sticky_key=(self.name, thread_id) if thread_id else None)
+        create = raw_create(self.async_client.chat.completions)
+
+        def request():
+            sending()
+            return create(**kwargs)
+        return await self.rate_limiter.acall(request, estimated_tokens)
+
+    async def _build_messages_async(self, thread_id: str) -> List[Dict]:
+        summarizes = self.context_window is not None and self.context_window.summarizer is not None
+        if self.retriever is not None or summarizes:
+            # Os embeddings da pesquisa e o resumo usam o cliente síncrono: correm fora do event loop
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.build_messages, thread_id)
+        return self.build_messages(thread_id)
+
+    async def get_response(self, prompt: str, thread_id: str, use_cache: bool = True):
+        """Obtém uma resposta do assistente e atualiza o histórico da thread."""
+        if thread_id not in self.threads:
+            raise ValueError(f"Thread '{thread_id}' não encontrada.")
+
+        # Adiciona a pergunta do usuário ao histórico da thread
+        self.threads[thread_id].append(self.new_message("user", prompt))
+
+        messages = await self._build_messages_async(thread_id)
+        model, route = self.choose_model(messages, thread_id)
+        cache_key = self.cache_key(messages, model) if use_cache and self.response_cache is not None else None
+        assistant_response = self.response_cache.get(cache_key) if cache_key else None
+
+        seconds = None
+        if assistant_response is None:
+            start = time.perf_counter()
+            response = await self.acreate_completion(messages, model=model, thread_id=thread_id)
+            seconds = time.perf_counter() - start
+            assistant_response = response.choices[0].message.content
+            if cache_key:
+                self.response_cache.set(cache_key, assistant_response)
+
+        # Adiciona a resposta do assistente ao histórico da thread
+        self.threads[thread_id].append(self.answer_message(assistant_response, model, route, seconds))
+
+        return assistant_response
+
+    def stream_response(self, prompt: str, thread_id: str, use_cache: bool = True):
+        """
+        Obtém uma resposta em streaming (gerador assíncrono de fragmentos).
+        A resposta, completa ou parcial, é acrescentada à thread no fim.
+
+        Raises:
+            ValueError: Se a thread não existir.
+        """
+        if thread_id not in self.threads:
+            raise ValueError(f"Thread '{thread_id}' não encontrada.")
+
+        # Adiciona a pergunta do usuário ao histórico da thread
+        self.threads[thread_id].append(self.new_message("user", prompt))
+        return self._stream(thread_id, use_cache)
+
+    async def _stream(self, thread_id: str, use_cache: bool = True):
+        messages = await self._build_messages_async(thread_id)
+        model, route = self.choose_model(messages, thread_id)
+        cache_key = self.cache_key(messages, model) if use_cache and self.response_cache is not None else None
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            self.threads[thread_id].append(self.answer_message(cached, model, route, None))
+            yield cached
+            return
+
+        metrics = get_metrics()
+        labels = {"assistant": self.name, "model": model}
+        start = time.perf_counter()
+        try:
+            stream = await self.acreate_completion(messages, stream=True, model=model, thread_id=thread_id)
+        except Exception:
+            metrics.increment('request_errors_total', **labels)
+            raise
+        parts = []
+        completed = False
+        try:
+            async for chunk in stream:
+                metrics.record_usage(getattr(chunk, 'usage', None), **labels)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        metrics.observe('time_to_first_token_seconds', time.perf_counter() - start, **labels)
+                    parts.append(delta)
+                    yield delta
+            completed = True
+        finally:
+            if hasattr(stream, 'close'):
+                await stream.close()
+            seconds = time.perf_counter() - start
+            metrics.observe('request_seconds', seconds, stream=True, **labels)
+            if completed and cache_key and parts:
+                self.response_cache.set(cache_key, "".join(parts))
+            if parts:
+                self.threads[thread_id].append(
+                    self.answer_message("".join(parts), model, route, seconds if completed else None))
+
+
+class AsyncAssistantManager(AssistantManager):
+    """
+    AssistantManager assíncrono: permite vários prompts em curso ao mesmo
+    tempo (por exemplo com asyncio.gather).
+
+    - Mensagens da mesma thread são serializadas, pela ordem de chegada.
+    - No máximo `max_concurrency` pedidos à API estão em curso ao mesmo tempo.
+      O semáforo e os locks são criados para cada event loop, por isso o
+      manager pode ser usado em várias chamadas a asyncio.run.
+    - As escritas no armazenamento correm num executor, fora do event loop.
+    """
+
+    assistant_class = AsyncOpenAIAssistant
+
+    def __init__(self, *args, max_concurrency: int = 8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = max_concurrency
+        # event loop -> (semáforo, {(assistente, thread): lock}); os dos loops fechados são descartados
+        self._loop_primitives: Dict[asyncio.AbstractEventLoop, tuple] = {}
+
+    def _primitives(self) -> Tuple[asyncio.Semaphore, Dict[Tuple[str, str], asyncio.Lock]]:
+        loop = asyncio.get_running_loop()
+        if loop not in self._loop_primitives:
+            for closed in [other for other in self._loop_primitives if other.is_closed()]:
+                del self._loop_primitives[closed]
+            self._loop_primitives[loop] = (asyncio.Semaphore(self.max_concurrency), {})
+        return self._loop_primitives[loop]
+
+    def _slot(self):
+        return self._primitives()[0]
+
+    def _thread_lock(self, assistant_name, thread_id):
+        locks = self._primitives()[1]
+        key = (assistant_name, thread_id)
+        if key not in locks:
+            locks[key] = asyncio.Lock()
+        return locks[key]
+
+    async def _persist(self, assistant_name, thread_id, messages):
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._append_messages, assistant_name, thread_id, messages)
+
+    def _check(self, assistant_name, thread_id):
+        if assistant_name not in self.assistants:
+            raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+        if thread_id not in self.assistants[assistant_name].threads:
+            raise ValueError(f"Thread '{thread_id}' não encontrada.")
+
+    async def send_prompt(self, assistant_name, thread_id, prompt, stream: bool = False, use_cache: bool = True):
+        """
+        Envia um prompt para o assistente na thread especificada.
+
+        Com stream=True retorna um gerador assíncrono de fragmentos; a thread
+        fica bloqueada para outros prompts até o stream terminar.
+        """
+        self._check(assistant_name, thread_id)
+        prompt_content = self._read_prompt(prompt)
+
+        if stream:
+            return self._stream_prompt(assistant_name, thread_id, prompt_content, use_cache)
+
+        assistant = self.assistants[assistant_name]
+        started = time.perf_counter()
+        async with self._thread_lock(assistant_name, thread_id):
+            thread = assistant.threads[thread_id]
+            start = len(thread)
+            async with self._slot():
+                try:
+                    response = await assistant.get_response(prompt_content, thread_id, use_cache)
+                except BaseException:
+                    del thread[start:]  # Pedido falhou: descarta a pergunta
+                    raise
+            await self._persist(assistant_name, thread_id, thread[start:])
+        get_metrics().observe('prompt_seconds', time.perf_counter() - started, assistant=assistant_name)
+        return response
+
+    async def _stream_prompt(self, assistant_name, thread_id, prompt_content, use_cache=True):
+        assistant = self.assistants[assistant_name]
+        async with self._thread_lock(assistant_name, thread_id):
+            thread = assistant.threads[thread_id]
+            start = len(thread)
+            async with self._slot():
+                fragments = assistant.stream_response(prompt_content, thread_id, use_cache)
+                try:
+                    async for fragment in fragments:
+                        yield fragment
+                finally:
+                    await fragments.aclose()
+                    if len(thread) - start == 2:
+                        await self._persist(assistant_name, thread_id, thread[start:])
+                    else:
+                        del thread[start:]
+
+    def sync_folder(self, assistant_name: str, folder_path: str, thread_id: str = None, target: str = 'context',
+                    **kwargs):
+        """
+        Como AssistantManager.sync_folder, exceto target='prompt'.
+
+        Raises:
+            TypeError: Com target='prompt' (send_prompt é uma corrotina aqui):
+                use um AssistantManager síncrono ou envie o prompt com send_prompt.
+        """
+        if target == 'prompt':
+            raise TypeError("sync_folder(target='prompt') não é suportado no AsyncAssistantManager: "
+                            "use um AssistantManager ou 'await send_prompt(...)'.")
+        return super().sync_folder(assistant_name, folder_path, thread_id, target, **kwargs)
+
+    async def fan_out(self, assistant_names: List[str], thread_id: str, prompt, use_cache: bool = True,
+                      return_exceptions: bool = False) -> Dict:
+        """Versão assíncrona de AssistantManager.fan_out."""
+        assistant_names = list(dict.fromkeys(assistant_names))
+        for assistant_name in assistant_names:
+            if assistant_name not in self.assistants:
+                raise ValueError(f"Assistente '{assistant_name}' não encontrado.")
+        prompt_content = self._read_prompt(prompt)
+        for assistant_name in assistant_names:
+            if thread_id not in self.assistants[assistant_name].threads:
+                self.create_thread(assistant_name, thread_id)
+
+        responses = await asyncio.gather(
+            *(self.send_prompt(assistant_name, thread_id, prompt_content, use_cache=use_cache)
+              for assistant_name in assistant_names),
+            return_exceptions=return_exceptions,
+        )
+        return dict(zip(assistant_names, responses))
+
+    async def send_many(self, requests: Iterable[Tuple[str, str, str]], return_exceptions: bool = False):
+        """
+        Envia vários prompts em simultâneo.
+
+        Args:
+            requests: Iterável de (assistant_name, thread_id, prompt).
+            return_exceptions (bool): Como em asyncio.gather.
+
+        Returns:
+            list: As respostas, pela ordem dos pedidos.
+        """
+        return await asyncio.gather(
+            *(self.send_prompt(assistant_name, thread_id, prompt) for assistant_name, thread_id, prompt in requests),
+            return_exceptions=return_exceptions,
+        )
@@ -0,0 +1,368 @@
+# batch.py
+
+import json
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from pythonAI_wrapper.pdfHandler import PDFHandler
+from pythonAI_wrapper.storage import atomic_write
+
+# Limite de pedidos por ficheiro de entrada da Batch API
+MAX_REQUESTS_PER_BATCH = 50000
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def iter_prompts(sources: Iterable[str], thread_id: str = None) -> Iterator[Tuple[str, str]]:
+    """
+    Lê prompts de ficheiros ou pastas, um de cada vez.
+
+    - .txt: o conteúdo do ficheiro é um prompt;
+    - .pdf: o texto do PDF é um prompt;
+    - .jsonl: cada linha {"prompt": ..., "thread_id": ...} é um prompt;
+    - pastas: os ficheiros acima, por ordem alfabética.
+
+    Args:
+        sources: Caminhos de ficheiros ou pastas.
+        thread_id (str, optional): Thread de destino de todos os prompts. Se
+            for None, cada ficheiro vai para a thread 'batch_<nome do ficheiro>'.
+
+    Yields:
+        (thread_id, prompt)
+    """
+    pdf_handler = PDFHandler()
+    for source in sources:
+        if os.path.isdir(source):
+            paths = [os.path.join(source, name) for name in sorted(os.listdir(source))]
+        else:
+            paths = [source]
+
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            stem = os.path.splitext(os.path.basename(path))[0]
+            target = thread_id or f"batch_{stem}"
+            if path.endswith('.jsonl'):
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            item = json.loads(line)
+                            yield item.get('thread_id') or target, item['prompt']
+            elif path.endswith('.txt'):
+                with open(path, 'r', encoding='utf-8') as f:
+                    yield target, f.read()
+            elif path.endswith('.pdf'):
+                yield target, pdf_handler.read_pdf(path)
+
+
+class BatchManager:
+    """
+    Envia prompts independentes pela Batch API da OpenAI e junta as
+    respostas às threads do assistente.
+
+    Cada job local fica numa pasta <jobs_dir>/<job_id>/ com:
+        job.json                estado do job e das suas partes
+        requests_<n>.jsonl      pedidos enviados (um por linha)
+        targets_<n>.jsonl       thread de destino de cada pedido
+        output_<n>.jsonl        resultados descarregados
+        collected_<n>.txt       custom_ids já juntos às threads
+    """
+
+    def __init__(self, manager, jobs_dir: str = 'batches', completion_window: str = '24h'):
+        """
+        Args:
+            manager (AssistantManager): O gestor cujos assistentes e threads são usados.
+            jobs_dir (str): Pasta onde os jobs são guardados.
+            completion_window (str): Janela de conclusão pedida à Batch API.
+        """
+        self.manager = manager
+        self.jobs_dir = jobs_dir
+        self.completion_window = completion_window
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, job_id, 'job.json')
+
+    def load_job(self, job_id: str) -> Dict:
+        """Lê o registo local de um job."""
+        path = self._job_path(job_id)
+        if not os.path.exists(path):
+            raise ValueError(f"Job '{job_id}' não encontrado.")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_job(self, job):
+        atomic_write(self._job_path(job['id']), json.dumps(job, indent=4))
+
+    def list_jobs(self) -> List[str]:
+        """Lista os IDs dos jobs locais."""
+        if not os.path.isdir(self.jobs_dir):
+            return []
+        return sorted(name for name in os.listdir(self.jobs_dir) if os.path.exists(self._job_path(name)))
+
+    def write_requests(self, job_dir: str, assistant, prompts: Iterable[Tuple[str, str]]) -> List[Dict]:
+        """
+        Escreve os pedidos em ficheiros JSONL da Batch API, em streaming,
+        dividindo-os em partes de no máximo MAX_REQUESTS_PER_BATCH pedidos.
+
+        Returns:
+            List[Dict]: As partes criadas ({'input_path', 'targets_path', 'requests'}).
+        """
+        parts = []
+        contexts = {}
+        out = targets = None
+        try:
+            for index, (thread_id, prompt) in enumerate(prompts):
+                if index % MAX_REQUESTS_PER_BATCH == 0:
+                    if out is not None:
+                        out.close()
+                        targets.close()
+                    n = len(parts)
+                    parts.append({
+                        'input_path': os.path.join(job_dir, f"requests_{n}.jsonl"),
+                        'targets_path': os.path.join(job_dir, f"targets_{n}.jsonl"),
+                        'requests': 0,
+                    })
+                    out = open(parts[-1]['input_path'], 'w', encoding='utf-8')
+                    targets = open(parts[-1]['targets_path'], 'w', encoding='utf-8')
+
+                # Contexto da thread no momento do envio (calculado uma vez por thread)
+                if thread_id not in contexts:
+                    if thread_id in assistant.threads:
+                        contexts[thread_id] = assistant.build_messages(thread_id)
+                    else:
+                        contexts[thread_id] = [{"role": "system", "content": assistant.instructions}]
+
+                request = {
+                    "custom_id": f"request-{index}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": assistant.model,
+                        "messages": contexts[thread_id] + [{"role": "user", "content": prompt}],
+                    },
+                }
+                out.write(json.dumps(request, ensure_ascii=False) + "\n")
+                targets.write(json.dumps({"custom_id": request["custom_id"], "thread_id": thread_id}) + "\n")
+                parts[-1]['requests'] += 1
+        finally:
+            if out is not None:
+                out.close()
+                targets.close()
+        return parts
+
+    def submit(self, assistant_name: str, sources: Iterable[str], thread_id: str = None) -> str:
+        """
+        Cria um job: gera os pedidos, envia os ficheiros e cria os batches.
+
+        Args:
+            assistant_name (str): O nome do assistente.
+            sources: Ficheiros ou pastas com os prompts (ver iter_prompts).
+            thread_id (str, optional): Thread de destino de todos os prompts.
+
+        Returns:
+            str: O ID do job local.
+
+        Raises:
+            ValueError: Se o assistente não existir ou não houver prompts.
+        """
+        assistant = self.manager.get_assistant(assistant_name)
+        job_id = f"batch_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        parts = self.write_requests(job_dir, assistant, iter_prompts(sources, thread_id))
+        if not parts:
+            raise ValueError("Nenhum prompt encontrado.")
+
+        for part in parts:
+            with open(part['input_path'], 'rb') as f:
+                input_file = assistant.client.files.create(file=f, purpose="batch")
+            batch = assistant.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window=self.completion_window,
+            )
+            part.update({
+                'input_file_id': input_file.id,
+                'batch_id': batch.id,
+                'status': batch.status,
+                'output_file_id': None,
+                'error_file_id': None,
+                'collected': False,
+            })
+
+        job = {
+            'id': job_id,
+            'assistant': assistant_name,
+            'created_at': time.time(),
+            'parts': parts,
+        }
+        self._save_job(job)
+        return job_id
+
+    def status(self, job_id: str) -> Dict:
+        """
+        Atualiza e retorna o estado de um job.
+
+        Returns:
+            Dict: O registo do job, com o estado de cada parte.
+        """
+        job = self.load_job(job_id)
+        client = self.manager.get_assistant(job['assistant']).client
+        for part in job['parts']:
+            if part['collected']:
+                continue
+            batch = client.batches.retrieve(part['batch_id'])
+            part['status'] = batch.status
+            part['output_file_id'] = batch.output_file_id
+            part['error_file_id'] = batch.error_file_id
+            if batch.request_counts is not None:
+                part['request_counts'] = {
+                    'total': batch.request_counts.total,
+                    'completed': batch.request_counts.completed,
+                    'failed': batch.request_counts.failed,
+                }
+        self._save_job(job)
+        return job
+
+    def _download(self, client, file_id, path):
+        # Descarrega para um ficheiro temporário: um download interrompido não fica como resultado
+        content = client.files.content(file_id)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        if hasattr(content, 'write_to_file'):
+            content.write_to_file(tmp_path)
+        else:
+            with open(tmp_path, 'wb') as f:
+                f.write(content.content)
+        os.replace(tmp_path, path)
+
+    def _request_offsets(self, input_path):
+        """Mapeia custom_id -> posição da linha no ficheiro de pedidos."""
+        offsets = {}
+        with open(input_path, 'rb') as f:
+            offset = f.tell()
+            line = f.readline()
+            while line:
+                custom_id = json.loads(line)['custom_id']
+                offsets[custom_id] = offset
+                offset = f.tell()
+                line = f.readline()
+        return offsets
+
+    def _ordered_results(self, output_path, offsets):
+        """
+        Posições (no ficheiro de saída) dos resultados, pela ordem dos pedidos:
+        a Batch API não garante que a saída siga a ordem da entrada.
+        """
+        positions = []
+        with open(output_path, 'rb') as f:
+            position = f.tell()
+            line = f.readline()
+            while line:
+                if line.strip():
+                    positions.append((offsets.get(json.loads(line)['custom_id'], -1), position))
+                position = f.tell()
+                line = f.readline()
+        return [position for _, position in sorted(positions)]
+
+    def _collected_ids(self, progress_path):
+        """custom_ids já juntos às threads numa recolha anterior (interrompida)."""
+        if not os.path.exists(progress_path):
+            return set()
+        with open(progress_path, 'r', encoding='utf-8') as f:
+            return {line.strip() for line in f if line.endswith('\n')}
+
+    def collect(self, job_id: str) -> Dict:
+        """
+        Descarrega os resultados das partes concluídas e junta cada pergunta
+        e resposta à thread de destino (criando-a se necessário).
+
+        Os resultados são juntos pela ordem dos pedidos e cada custom_id
+        junto fica registado em collected_<n>.txt: se a recolha for
+        interrompida, correr collect de novo continua onde parou, sem
+        repetir mensagens.
+
+        Returns:
+            Dict: {'collected': n, 'failed': n, 'pending': n partes por concluir}
+        """
+        job = self.status(job_id)
+        assistant_name = job['assistant']
+        assistant = self.manager.get_assistant(assistant_name)
+        summary = {'collected': 0, 'failed': 0, 'pending': 0}
+
+        for n, part in enumerate(job['parts']):
+            if part['collected']:
+                continue
+            if part['status'] not in TERMINAL_STATUSES:
+                summary['pending'] += 1
+                continue
+
+            if part['output_file_id']:
+                output_path = os.path.join(self.jobs_dir, job_id, f"output_{n}.jsonl")
+                progress_path = os.path.join(self.jobs_dir, job_id, f"collected_{n}.txt")
+                if not os.path.exists(output_path):
+                    self._download(assistant.client, part['output_file_id'], output_path)
+                offsets = self._request_offsets(part['input_path'])
+                with open(part['targets_path'], 'r', encoding='utf-8') as f:
+                    thread_ids = {item['custom_id']: item['thread_id'] for item in map(json.loads, f)}
+                collected = self._collected_ids(progress_path)
+                # Numa recolha retomada, o primeiro resultado por registar pode já ter sido escrito na thread
+                resumed = os.path.exists(progress_path)
+
+                with open(part['input_path'], 'rb') as requests_file, \
+                        open(output_path, 'rb') as output_file, \
+                        open(progress_path, 'a', encoding='utf-8') as progress:
+                    for position in self._ordered_results(output_path, offsets):
+                        output_file.seek(position)
+                        result = json.loads(output_file.readline())
+                        response = result.get('response') or {}
+                        if result.get('error') or response.get('status_code') != 200:
+                            summary['failed'] += 1
+                            continue
+                        custom_id = result['custom_id']
+                        if custom_id in collected:
+                            continue
+
+                        requests_file.seek(offsets[custom_id])
+                        request = json.loads(requests_file.readline())
+                        thread_id = thread_ids[custom_id]
+                        tag = f"{part['batch_id']}:{custom_id}"
+                        if not (resumed and self._appended(assistant_name, thread_id, tag)):
+                            prompt = request['body']['messages'][-1]['content']
+                            answer = response['body']['choices'][0]['message']['content']
+                            self._append(assistant_name, thread_id, prompt, answer, tag)
+                            summary['collected'] += 1
+                        resumed = False
+                        progress.write(custom_id + "\n")
+                        progress.flush()
+                        os.fsync(progress.fileno())
+
+            # Pedidos que falharam vão para o error file, não para o output
+            summary['failed'] += part.get('request_counts', {}).get('failed', 0)
+            part['collected'] = True
+            self._save_job(job)
+
+        return summary
+
+    def _appended(self, assistant_name, thread_id, tag):
+        """Indica se a resposta com esta marca já é a última mensagem da thread."""
+        assistant = self.manager.get_assistant(assistant_name)
+        if thread_id not in assistant.threads:
+            return False
+        messages = assistant.threads[thread_id]
+        return bool(messages) and messages[-1].get('batch_request') == tag
+
+    def _append(self, assistant_name, thread_id, prompt, answer, tag=None):
+        assistant = self.manager.get_assistant(assistant_name)
+        if thread_id not in assistant.threads:
+            self.manager.create_thread(assistant_name, thread_id)
+        extra = {'batch_request': tag} if tag is not None else {}
+        messages = [assistant.new_message("user", prompt), assistant.new_message("assistant", answer, **extra)]
+        thread = assistant.threads[thread_id]
+        thread.extend(messages)
+        try:
+            self.manager._append_messages(assistant_name, thread_id, messages)
+        except BaseException:
+            del thread[-len(messages):]  # Não ficou guardada: também sai da memória
+            raise
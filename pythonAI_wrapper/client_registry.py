@@ -0,0 +1,157 @@
+# client_registry.py
+
+import asyncio
+import threading
+import weakref
+from typing import Dict, Tuple
+
+
+def running_loop():
+    """O event loop em execução nesta thread, ou None fora de um loop."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class ClientRegistry:
+    """
+    Registo de clientes OpenAI partilhados pelo processo.
+
+    Assistentes com a mesma chave API, organização, base_url e timeout usam o mesmo
+    cliente e, portanto, o mesmo pool de ligações HTTP (keep-alive), em vez
+    de abrirem um pool e novas ligações TLS cada um.
+
+    Cada acquire incrementa um contador de utilizadores do cliente; release
+    decrementa-o e só fecha o cliente quando ninguém o usa e close_idle=True.
+
+    Um cliente AsyncOpenAI (e as suas ligações) pertence ao event loop em que
+    foi criado: os clientes assíncronos são partilhados só dentro do mesmo
+    loop e esquecidos quando o loop é fechado (por exemplo no fim de
+    asyncio.run).
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 60.0, timeout: float = 600.0, max_retries: int = 0,
+                 close_idle: bool = False):
+        """
+        Args:
+            max_connections (int): Ligações simultâneas máximas por cliente.
+            max_keepalive_connections (int): Ligações mantidas abertas por cliente.
+            keepalive_expiry (float): Segundos até uma ligação parada ser fechada.
+            timeout (float): Timeout padrão dos pedidos, em segundos.
+            max_retries (int): Tentativas automáticas do cliente OpenAI. Padrão é 0:
+                as novas tentativas são feitas pelo RateLimiter.
+            close_idle (bool): Fecha um cliente quando deixa de ter utilizadores.
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.close_idle = close_idle
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, list] = {}  # chave -> [cliente, utilizadores, loop (weakref) ou None]
+        self.counters = {'created': 0, 'acquired': 0, 'released': 0, 'closed': 0}
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _create(self, kind, api_key, base_url, timeout, max_retries, organization):
+        import httpx
+        if kind == 'async':
+            from openai import AsyncOpenAI
+            http_client = httpx.AsyncClient(limits=self._limits(), timeout=timeout)
+            return AsyncOpenAI(api_key=api_key, organization=organization, base_url=base_url, timeout=timeout,
+                               max_retries=max_retries, http_client=http_client)
+        from openai import OpenAI
+        http_client = httpx.Client(limits=self._limits(), timeout=timeout)
+        return OpenAI(api_key=api_key, organization=organization, base_url=base_url, timeout=timeout,
+                      max_retries=max_retries, http_client=http_client)
+
+    def _drop_closed_loops(self):
+        # Chamado com o lock adquirido: as ligações de um loop fechado já não podem ser usadas
+        for key, entry in list(self._clients.items()):
+            loop = entry[2]() if entry[2] is not None else None
+            if entry[2] is not None and (loop is None or loop.is_closed()):
+                del self._clients[key]
+                self.counters['closed'] += 1
+
+    def _acquire(self, kind, api_key, base_url, timeout, max_retries, organization=None):
+        timeout = self.timeout if timeout is None else timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+        loop = running_loop() if kind == 'async' else None
+        key = (kind, id(loop) if loop is not None else None, api_key, base_url, timeout, max_retries, organization)
+        with self._lock:
+            self._drop_closed_loops()
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = self._clients[key] = [
+                    self._create(kind, api_key, base_url, timeout, max_retries, organization), 0,
+                    weakref.ref(loop) if loop is not None else None]
+                self.counters['created'] += 1
+            entry[1] += 1
+            self.counters['acquired'] += 1
+            return entry[0]
+
+    def acquire(self, api_key: str, base_url: str = None, timeout: float = None, max_retries: int = None,
+                organization: str = None):
+        """Retorna o cliente OpenAI partilhado para estas definições."""
+        return self._acquire('sync', api_key, base_url, timeout, max_retries, organization)
+
+    def acquire_async(self, api_key: str, base_url: str = None, timeout: float = None, max_retries: int = None,
+                      organization: str = None):
+        """Retorna o cliente AsyncOpenAI partilhado para estas definições, no event loop em execução."""
+        return self._acquire('async', api_key, base_url, timeout, max_retries, organization)
+
+    def release(self, client):
+        """Indica que um utilizador deixou de usar o cliente."""
+        with self._lock:
+            for key, entry in self._clients.items():
+                if entry[0] is client:
+                    entry[1] = max(0, entry[1] - 1)
+                    self.counters['released'] += 1
+                    if entry[1] == 0 and self.close_idle and key[0] == 'sync':
+                        del self._clients[key]
+                        client.close()
+                        self.counters['closed'] += 1
+                    return
+
+    def close_all(self):
+        """Fecha todos os clientes síncronos (por exemplo ao terminar o processo)."""
+        with self._lock:
+            for key, (client, _, _) in list(self._clients.items()):
+                if key[0] == 'sync':
+                    client.close()
+                    del self._clients[key]
+                    self.counters['closed'] += 1
+
+    def stats(self) -> Dict:
+        """Contadores e número de clientes ativos."""
+        with self._lock:
+            self._drop_closed_loops()
+            return dict(self.counters, active=len(self._clients),
+                        users=sum(entry[1] for entry in self._clients.values()))
+
+
+_default_registry = ClientRegistry()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Registo de clientes usado por omissão pelos assistentes."""
+    return _default_registry
+
+
+def configure_client_registry(**options) -> ClientRegistry:
+    """
+    Substitui o registo por omissão por um novo com as opções dadas (ver
+    ClientRegistry). Os clientes já emprestados continuam válidos.
+    """
+    global _default_registry
+    _default_registry = ClientRegistry(**options)
+    return _default_registry
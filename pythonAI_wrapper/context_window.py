@@ -0,0 +1,167 @@
+# context_window.py
+
+from typing import Callable, Dict, List, Optional
+
+# Custo aproximado (em tokens) do envelope de cada mensagem no formato chat
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(messages: List[Dict], completion_tokens: int = 256) -> int:
+    """Estimativa rápida (sem tokenizar) dos tokens de um pedido, incluindo a resposta."""
+    return sum(len(message.get('content') or '') // 4 + MESSAGE_OVERHEAD for message in messages) + completion_tokens
+
+
+class TokenCounter:
+    """
+    Conta tokens com o tiktoken quando está instalado; caso contrário usa a
+    aproximação de ~4 caracteres por token.
+    """
+
+    def __init__(self, model: str = 'gpt-4'):
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('cl100k_base')
+        except ImportError:
+            pass
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return len(text) // 4 + 1
+
+    def count_message(self, message: Dict) -> int:
+        return self.count(message.get('content') or '') + MESSAGE_OVERHEAD
+
+
+class ContextWindow:
+    """
+    Escolhe que mensagens de uma thread são enviadas à API dentro de um
+    orçamento de tokens.
+
+    As instruções (mensagem de sistema) e a última mensagem são sempre
+    enviadas; o resto do orçamento é preenchido com as mensagens mais
+    recentes (janela deslizante). Opcionalmente, as mensagens que saem da
+    janela são condensadas num resumo incremental, enviado como mensagem
+    de sistema.
+
+    A contagem de tokens de cada thread é mantida incrementalmente: só as
+    mensagens novas desde a última chamada são tokenizadas. A contagem
+    guarda a última mensagem contada; se essa já não estiver na mesma
+    posição (thread substituída ou mensagens descartadas e acrescentadas
+    de novo), a thread é contada outra vez.
+    """
+
+    def __init__(self, max_tokens: int, counter: TokenCounter = None,
+                 summarizer: Optional[Callable[[str, List[Dict]], str]] = None,
+                 load_state: Optional[Callable[[str], Dict]] = None,
+                 save_state: Optional[Callable[[str, Dict], None]] = None):
+        """
+        Args:
+            max_tokens (int): Orçamento de tokens do contexto enviado.
+            counter (TokenCounter, optional): Contador de tokens.
+            summarizer (callable, optional): f(resumo_anterior, mensagens_removidas) -> novo resumo.
+            load_state (callable, optional): f(thread_id) -> {'summary', 'summarized'}
+                guardado com a thread, para o resumo sobreviver ao processo.
+            save_state (callable, optional): f(thread_id, estado) para o guardar.
+        """
+        self.max_tokens = max_tokens
+        self.counter = counter or TokenCounter()
+        self.summarizer = summarizer
+        self.load_state = load_state
+        self.save_state = save_state
+        self._counts: Dict[str, tuple] = {}  # thread_id -> (contagens, última mensagem contada)
+        self._summaries: Dict[str, tuple] = {}  # thread_id -> (mensagens resumidas, resumo)
+
+    def token_counts(self, thread_id: str, messages: List[Dict]) -> List[int]:
+        """Retorna a contagem de tokens por mensagem, tokenizando só as novas."""
+        counts, last = self._counts.get(thread_id, ([], None))
+        if counts and (len(counts) > len(messages) or messages[len(counts) - 1] is not last):
+            counts = []  # Thread substituída ou reescrita: recomeça a contagem
+        counts.extend(self.counter.count_message(message) for message in messages[len(counts):])
+        self._counts[thread_id] = (counts, messages[-1] if messages else None)
+        return counts
+
+    def thread_tokens(self, thread_id: str, messages: List[Dict]) -> int:
+        """Total de tokens da thread completa."""
+        return sum(self.token_counts(thread_id, messages))
+
+    def forget(self, thread_id: str):
+        """Descarta o estado em memória (contagens e resumo) de uma thread."""
+        self._counts.pop(thread_id, None)
+        self._summaries.pop(thread_id, None)
+
+    def summary(self, thread_id: str) -> tuple:
+        """(mensagens resumidas, resumo) da thread, lido do armazenamento na primeira vez."""
+        if thread_id not in self._summaries:
+            state = self.load_state(thread_id) if self.load_state is not None else {}
+            self._summaries[thread_id] = (state.get('summarized', 0), state.get('summary', ''))
+        return self._summaries[thread_id]
+
+    def _set_summary(self, thread_id: str, summarized: int, summary: str):
+        self._summaries[thread_id] = (summarized, summary)
+        if self.save_state is not None:
+            self.save_state(thread_id, {'summarized': summarized, 'summary': summary})
+
+    @staticmethod
+    def summary_message(summary: str) -> Dict:
+        return {"role": "system", "content": f"Resumo da conversa anterior: {summary}"}
+
+    @staticmethod
+    def _window_start(counts: List[int], budget: int) -> int:
+        """Início da janela com as mensagens mais recentes que cabem no orçamento (a última entra sempre)."""
+        start = len(counts)
+        used = 0
+        while start > 0 and (start == len(counts) or used + counts[start - 1] <= budget):
+            start -= 1
+            used += counts[start]
+        return start
+
+    def build(self, instructions: str, thread_id: str, messages: List[Dict]) -> List[Dict]:
+        """
+        Constrói a lista de mensagens a enviar à API.
+
+        O resumo é contado antes de escolher a janela, por isso instruções,
+        resumo e mensagens recentes nunca excedem `max_tokens` (a menos que
+        a última mensagem sozinha o exceda).
+
+        Args:
+            instructions (str): Instruções do assistente (sempre enviadas).
+            thread_id (str): O ID da thread.
+            messages (List[Dict]): O histórico completo da thread.
+
+        Returns:
+            List[Dict]: Mensagens {"role", "content"} dentro do orçamento.
+        """
+        counts = self.token_counts(thread_id, messages)
+        system = {"role": "system", "content": instructions}
+        budget = self.max_tokens - self.counter.count_message(system)
+
+        summarized, summary = self.summary(thread_id)
+        if summarized > len(messages):
+            summarized, summary = 0, ''  # Thread substituída por uma mais curta: o resumo já não se aplica
+        summary_tokens = self.counter.count_message(self.summary_message(summary)) if summary else 0
+
+        # Janela deslizante no orçamento que sobra depois do resumo
+        start = self._window_start(counts, budget - summary_tokens)
+        if summary:
+            start = max(start, min(summarized, len(messages) - 1))  # Não repete o que já está resumido
+
+        # O novo resumo pode ser maior: encolhe a janela e resume também o que sai dela
+        while self.summarizer is not None and start > summarized:
+            summary = self.summarizer(summary, messages[summarized:start])
+            summarized = start
+            self._set_summary(thread_id, summarized, summary)
+            summary_tokens = self.counter.count_message(self.summary_message(summary))
+            start = max(start, self._window_start(counts, budget - summary_tokens))
+
+        selected = [system]
+        if summary and start > 0 and sum(counts[start:]) + summary_tokens <= budget:
+            selected.append(self.summary_message(summary))
+        selected.extend({"role": message["role"], "content": message["content"]} for message in messages[start:])
+        return selected
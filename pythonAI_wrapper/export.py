@@ -0,0 +1,111 @@
+# export.py
+
+import gzip
+import json
+import os
+import sys
+from itertools import islice
+from typing import Dict, Iterable
+
+EXPORT_FORMATS = ('jsonl', 'jsonl.gz', 'parquet')
+
+# Colunas fixas de cada registo exportado; as restantes chaves vão para 'extra'
+COLUMNS = ('assistant', 'thread_id', 'position', 'role', 'content')
+
+
+def export_format(path: str) -> str:
+    """Formato de exportação deduzido da extensão do ficheiro ('jsonl' por omissão)."""
+    if path.endswith('.gz'):
+        return 'jsonl.gz'
+    if path.endswith('.parquet'):
+        return 'parquet'
+    return 'jsonl'
+
+
+def export_records(records: Iterable[Dict], path: str, format: str = None, batch_size: int = 1000) -> int:
+    """
+    Escreve registos (ver AssistantManager.iter_records) num ficheiro, à
+    medida que são lidos: a memória usada não depende do tamanho do histórico.
+
+    O ficheiro só aparece quando a exportação termina (é escrito num
+    temporário e renomeado); '-' escreve JSONL para a saída padrão.
+
+    Args:
+        records: Iterável de registos {'assistant', 'thread_id', 'position', 'role', 'content', ...}.
+        path (str): O ficheiro de destino.
+        format (str, optional): 'jsonl', 'jsonl.gz' ou 'parquet' (por omissão, pela extensão).
+        batch_size (int, optional): Registos por grupo de linhas no Parquet.
+
+    Returns:
+        int: O número de registos exportados.
+
+    Raises:
+        ValueError: Se o formato for desconhecido ou o pyarrow não estiver instalado (Parquet).
+    """
+    format = format or export_format(path)
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato '{format}' desconhecido (use {', '.join(EXPORT_FORMATS)}).")
+    if path == '-':
+        if format != 'jsonl':
+            raise ValueError("Só o formato jsonl pode ser escrito para a saída padrão.")
+        return _write_jsonl(records, sys.stdout)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        if format == 'parquet':
+            count = _write_parquet(records, tmp_path, batch_size)
+        elif format == 'jsonl.gz':
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:  # O nível 9 é ~4x mais lento
+                count = _write_jsonl(records, f)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                count = _write_jsonl(records, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def _write_jsonl(records, f):
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def _write_parquet(records, path, batch_size):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("A exportação para Parquet precisa do pyarrow (pip install pyarrow).")
+
+    schema = pa.schema([
+        ('assistant', pa.string()),
+        ('thread_id', pa.string()),
+        ('position', pa.int64()),
+        ('role', pa.string()),
+        ('content', pa.string()),
+        ('extra', pa.string()),  # JSON com as restantes chaves da mensagem, se existirem
+    ])
+    count = 0
+    records = iter(records)
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            columns = {name: [record.get(name) for record in batch] for name in COLUMNS}
+            columns['extra'] = [
+                json.dumps({k: v for k, v in record.items() if k not in COLUMNS}, ensure_ascii=False)
+                if len(record) > len(COLUMNS) else None
+                for record in batch
+            ]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(batch)
+    return count
@@ -0,0 +1,112 @@
+# folder_sync.py
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable
+from urllib.parse import quote
+
+from pythonAI_wrapper.storage import atomic_write
+from pythonAI_wrapper.uploads import file_sha256
+
+# Extensões sincronizadas em cada modo (as mesmas das funções que leem pastas inteiras)
+SYNC_EXTENSIONS = {
+    'context': ('.pdf',),       # AssistantManager.add_context_folder (índice de pesquisa)
+    'files': ('.pdf',),         # OpenAIAssistant.add_context_folder (ficheiros enviados à OpenAI)
+    'prompt': ('.txt',),        # load_prompts_from_folder
+    'instructions': ('.txt',),  # load_instructions_from_folder
+}
+
+
+class FolderSync:
+    """
+    Manifestos das pastas já sincronizadas: para cada (assistente, thread,
+    pasta), o tamanho, mtime e hash SHA-256 de cada ficheiro já enviado.
+
+    Layout em disco:
+        <root>/<assistente>/<thread>/<hash do caminho da pasta>.json
+
+    Um ficheiro com o mesmo tamanho e mtime não volta a ser lido; se só o
+    mtime mudou, o hash decide se o conteúdo mudou.
+    """
+
+    def __init__(self, root: str = '.folder_sync'):
+        self.root = root
+
+    def manifest_path(self, assistant_name: str, thread_id: str, folder_path: str) -> str:
+        folder_key = hashlib.sha1(os.path.abspath(folder_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.root, quote(assistant_name, safe=''), quote(thread_id or '', safe='') or '_',
+                            folder_key + '.json')
+
+    def load(self, assistant_name: str, thread_id: str, folder_path: str) -> Dict[str, Dict]:
+        """Retorna {nome do ficheiro: {'size', 'mtime_ns', 'sha256'}} ({} se a pasta nunca foi sincronizada)."""
+        try:
+            with open(self.manifest_path(assistant_name, thread_id, folder_path), 'r', encoding='utf-8') as f:
+                return json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def save(self, assistant_name: str, thread_id: str, folder_path: str, files: Dict[str, Dict]):
+        data = {'folder': os.path.abspath(folder_path), 'synced_at': time.time(), 'files': files}
+        atomic_write(self.manifest_path(assistant_name, thread_id, folder_path), json.dumps(data, indent=4))
+
+    def scan(self, folder_path: str, extensions: Iterable[str], manifest: Dict[str, Dict],
+             settle: float = 0.0) -> Dict:
+        """
+        Compara a pasta com o manifesto.
+
+        Args:
+            folder_path (str): A pasta (só os ficheiros de topo, como nas outras funções).
+            extensions: Extensões a considerar.
+            manifest (Dict): O manifesto da última sincronização.
+            settle (float, optional): Ficheiros modificados há menos destes
+                segundos ficam para a próxima vez (ainda podem estar a ser escritos).
+
+        Returns:
+            Dict: 'added', 'changed', 'removed' e 'unchanged' (nomes, por ordem
+                alfabética), 'pending' (ainda a ser escritos) e 'entries' (as
+                entradas novas do manifesto para os ficheiros encontrados).
+        """
+        extensions = tuple(extensions)
+        report = {'added': [], 'changed': [], 'removed': [], 'unchanged': [], 'pending': [], 'entries': {}}
+        now = time.time()
+        seen = set()
+        for name in sorted(os.listdir(folder_path)):
+            path = os.path.join(folder_path, name)
+            if not name.endswith(extensions) or not os.path.isfile(path):
+                continue
+            seen.add(name)
+            stat = os.stat(path)
+            previous = manifest.get(name)
+            if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+                report['unchanged'].append(name)
+                report['entries'][name] = previous
+                continue
+            if now - stat.st_mtime_ns / 1e9 < settle:
+                report['pending'].append(name)
+                if previous:
+                    report['entries'][name] = previous
+                continue
+
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_sha256(path)}
+            report['entries'][name] = entry
+            if previous is None:
+                report['added'].append(name)
+            elif previous['sha256'] != entry['sha256']:
+                report['changed'].append(name)
+            else:
+                report['unchanged'].append(name)  # Só o mtime mudou
+        report['removed'] = sorted(name for name in manifest if name not in seen)
+        return report
+
+
+_default_folder_sync = None
+
+
+def get_folder_sync() -> FolderSync:
+    """Manifestos partilhados pelos assistentes do processo."""
+    global _default_folder_sync
+    if _default_folder_sync is None:
+        _default_folder_sync = FolderSync()
+    return _default_folder_sync
@@ -0,0 +1,311 @@
+# hedging.py
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict
+
+from pythonAI_wrapper.metrics import get_metrics
+
+
+class HedgePolicy:
+    """
+    Quando repetir ("hedge") um pedido lento: se a resposta (ou, em
+    streaming, o primeiro token) não chegar ao fim do percentil `quantile`
+    das latências recentes do modelo, é feito um segundo pedido igual, ao
+    mesmo modelo ou a `fallback_model`, e fica a resposta que chegar primeiro.
+
+    Os pedidos repetidos custam tokens: no máximo uma fração `budget` dos
+    pedidos é repetida. Enquanto não houver `min_samples` latências de um
+    modelo, o atraso é `initial_delay`.
+    """
+
+    def __init__(self, quantile: float = 0.95, fallback_model: str = None, budget: float = 0.1,
+                 initial_delay: float = 2.0, min_delay: float = 0.05, max_delay: float = 30.0,
+                 min_samples: int = 20, window: int = 500):
+        """
+        Args:
+            quantile (float): Percentil das latências a partir do qual o pedido é repetido.
+            fallback_model (str, optional): Modelo do pedido repetido (por omissão, o mesmo).
+            budget (float): Fração máxima dos pedidos que são repetidos.
+            initial_delay (float): Atraso usado antes de haver latências suficientes.
+            min_delay, max_delay (float): Limites do atraso, em segundos.
+            min_samples (int): Latências necessárias para usar o percentil.
+            window (int): Número de latências recentes guardadas por modelo.
+        """
+        if not 0 < quantile < 1:
+            raise ValueError("O percentil tem de estar entre 0 e 1 (por exemplo 0.95).")
+        self.quantile = quantile
+        self.fallback_model = fallback_model
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[tuple, deque] = {}
+        self.requests = 0
+        self.hedges = 0
+
+    def config(self) -> Dict:
+        """Configuração guardada com o assistente."""
+        return {'quantile': self.quantile, 'fallback_model': self.fallback_model, 'budget': self.budget}
+
+    def delay(self, model: str, stream: bool = False) -> float:
+        """Segundos a esperar pela resposta antes de repetir o pedido."""
+        with self._lock:
+            latencies = sorted(self._latencies.get((model, stream), ()))
+        if len(latencies) < self.min_samples:
+            return self.initial_delay
+        value = latencies[min(int(self.quantile * len(latencies)), len(latencies) - 1)]
+        return min(max(value, self.min_delay), self.max_delay)
+
+    def observe(self, model: str, seconds: float, stream: bool = False):
+        """Regista a latência de um pedido (até ao primeiro token, em streaming)."""
+        with self._lock:
+            latencies = self._latencies.get((model, stream))
+            if latencies is None:
+                latencies = self._latencies[(model, stream)] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def count(self):
+        """Conta um pedido (para o orçamento de pedidos repetidos)."""
+        with self._lock:
+            self.requests += 1
+
+    def allow(self) -> bool:
+        """Indica se ainda há orçamento para repetir um pedido (e, se houver, gasta-o)."""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def hedge_model(self, model: str) -> str:
+        return self.fallback_model or model
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'requests': self.requests, 'hedges': self.hedges,
+                    'hedge_rate': self.hedges / self.requests if self.requests else 0.0}
+
+
+class PrimedStream:
+    """
+    Stream de chat completion já lido até ao primeiro fragmento com texto
+    (assim "ganha" o pedido que começa a responder primeiro). Itera os
+    fragmentos lidos e depois o resto do stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffered = []
+        self._iterator = iter(stream)
+        try:
+            for chunk in self._iterator:
+                self.buffered.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    break
+        except BaseException:
+            self.close()
+            raise
+
+    def __iter__(self):
+        yield from self.buffered
+        yield from self._iterator
+
+    def close(self):
+        if hasattr(self.stream, 'close'):
+            self.stream.close()
+
+
+class AsyncPrimedStream:
+    """Versão assíncrona de PrimedStream (criar com `await AsyncPrimedStream.prime(stream)`)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffered = []
+        self._iterator = stream.__aiter__()
+
+    @classmethod
+    async def prime(cls, stream):
+        primed = cls(stream)
+        try:
+            async for chunk in primed._iterator:
+                primed.buffered.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    break
+        except BaseException:
+            await primed.close()  # Também quando o pedido perdedor é cancelado
+            raise
+        return primed
+
+    async def __aiter__(self):
+        for chunk in self.buffered:
+            yield chunk
+        async for chunk in self._iterator:
+            yield chunk
+
+    async def close(self):
+        if hasattr(self.stream, 'close'):
+            await self.stream.close()
+
+
+def _start(attempt, model, notify_sent=False) -> Future:
+    """
+    Corre attempt(model) numa thread própria (não espera por workers livres).
+    Com notify_sent, attempt(model, sent) chama sent() quando o pedido sai e
+    `future.sent` é assinalado nesse momento (ou quando o pedido termina).
+    """
+    future = Future()
+    future.sent = threading.Event()
+
+    def sent():
+        if not future.sent.is_set():
+            future.started = time.perf_counter()
+            future.sent.set()
+
+    def run():
+        try:
+            future.set_result(attempt(model, sent) if notify_sent else attempt(model))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            future.sent.set()
+
+    future.started = time.perf_counter()
+    future.model = model
+    if not notify_sent:
+        future.sent.set()
+    threading.Thread(target=run, daemon=True, name='hedged-request').start()
+    return future
+
+
+def _discard_when_done(future, discard):
+    """Liberta o resultado de um pedido perdedor quando ele chegar (por exemplo fecha o stream)."""
+    def done(future):
+        if discard is not None and not future.cancelled() and future.exception() is None:
+            try:
+                discard(future.result())
+            except Exception:
+                pass
+    future.add_done_callback(done)
+
+
+def _record(policy, primary, winner, delay, stream, labels):
+    labels = labels or {}
+    now = time.perf_counter()
+    if winner is not None:
+        policy.observe(winner.model, now - winner.started, stream)
+    if winner is not primary:
+        # O primeiro pedido foi abandonado: a sua latência é pelo menos o tempo que já passou
+        policy.observe(primary.model, now - primary.started, stream)
+    metrics = get_metrics()
+    metrics.observe('hedge_delay_seconds', delay, **labels)
+    outcome = 'primary' if winner is primary else 'hedge' if winner is not None else 'failed'
+    metrics.increment('hedged_requests_total', winner=outcome, **labels)
+
+
+def hedged_call(policy: HedgePolicy, attempt: Callable, model: str, stream: bool = False,
+                discard: Callable = None, labels: Dict = None, notify_sent: bool = False):
+    """
+    Executa attempt(model) e, se não terminar dentro de policy.delay, um
+    segundo attempt(policy.hedge_model(model)); retorna o primeiro resultado.
+
+    Um pedido síncrono já enviado não pode ser interrompido: o perdedor
+    termina numa thread em segundo plano e o seu resultado é passado a
+    `discard` (para um stream, que é fechado logo no primeiro fragmento).
+
+    Args:
+        policy (HedgePolicy): A política (atraso, modelo alternativo, orçamento).
+        attempt (callable): Função (modelo) -> resultado.
+        model (str): O modelo do primeiro pedido.
+        stream (bool): O resultado é um stream (a latência é até ao primeiro token).
+        discard (callable, optional): Chamada com o resultado do pedido perdedor.
+        labels (dict, optional): Labels das métricas.
+        notify_sent (bool): attempt é chamada como attempt(modelo, enviado) e
+            chama enviado() quando o pedido sai para a API, depois de o
+            limitador lhe dar capacidade. O atraso (e a latência medida) só
+            conta a partir daí: um pedido à espera do limitador não é repetido.
+    """
+    policy.count()
+    delay = policy.delay(model, stream)
+    primary = _start(attempt, model, notify_sent)
+    primary.sent.wait()
+    done, _ = wait([primary], timeout=delay)
+    if done or not policy.allow():
+        result = primary.result()  # Sem orçamento: espera pelo primeiro pedido
+        policy.observe(model, time.perf_counter() - primary.started, stream)
+        return result
+
+    hedge = _start(attempt, policy.hedge_model(model), notify_sent)
+    pending = {primary, hedge}
+    winner = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((future for future in (primary, hedge) if future in done and future.exception() is None), None)
+    for future in (primary, hedge):
+        if future is not winner:
+            _discard_when_done(future, discard)
+    _record(policy, primary, winner, delay, stream, labels)
+    if winner is None:
+        return primary.result()  # Os dois falharam: o erro do primeiro pedido
+    return winner.result()
+
+
+def _astart(attempt, model, notify_sent=False):
+    """Versão assíncrona de _start: a tarefa tem `sent` (asyncio.Event), `started` e `model`."""
+    sent_event = asyncio.Event()
+    task = None
+
+    def sent():
+        if not sent_event.is_set():
+            task.started = time.perf_counter()
+            sent_event.set()
+
+    task = asyncio.ensure_future(attempt(model, sent) if notify_sent else attempt(model))
+    task.started, task.model, task.sent = time.perf_counter(), model, sent_event
+    task.add_done_callback(lambda _: sent_event.set())
+    if not notify_sent:
+        sent_event.set()
+    return task
+
+
+async def ahedged_call(policy: HedgePolicy, attempt: Callable, model: str, stream: bool = False,
+                       discard: Callable = None, labels: Dict = None, notify_sent: bool = False):
+    """
+    Versão assíncrona de hedged_call: attempt(model) retorna um awaitable e
+    o pedido perdedor é cancelado (a ligação HTTP é fechada).
+    """
+    policy.count()
+    delay = policy.delay(model, stream)
+    primary = _astart(attempt, model, notify_sent)
+    hedge = None
+    try:
+        await primary.sent.wait()
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not policy.allow():
+            result = await primary
+            policy.observe(model, time.perf_counter() - primary.started, stream)
+            return result
+
+        hedge = _astart(attempt, policy.hedge_model(model), notify_sent)
+        pending = {primary, hedge}
+        winner = None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in (primary, hedge) if task in done and task.exception() is None), None)
+        _record(policy, primary, winner, delay, stream, labels)
+        if winner is None:
+            return primary.result()
+        loser = hedge if winner is primary else primary
+        if loser.done() and not loser.cancelled() and loser.exception() is None and discard is not None:
+            await discard(loser.result())  # Terminou ao mesmo tempo que o vencedor
+        return winner.result()
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()  # O pedido perdedor (ou os dois, se esta corrotina for cancelada)
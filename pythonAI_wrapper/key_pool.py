@@ -0,0 +1,291 @@
+# key_pool.py
+
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Union
+
+from pythonAI_wrapper.client_registry import get_client_registry, running_loop
+from pythonAI_wrapper.metrics import get_metrics
+from pythonAI_wrapper.rate_limiter import RateLimiter
+
+STRATEGIES = ('least_loaded', 'weighted')
+
+
+def mask_key(api_key: str) -> str:
+    """Nome de uma chave para relatórios e métricas, sem a revelar ('sk-...abcd')."""
+    return f"{api_key[:3]}...{api_key[-4:]}" if len(api_key) > 8 else '...'
+
+
+class ApiKey:
+    """
+    Uma chave do pool: o seu limitador de RPM/TPM (ajustado pelos cabeçalhos
+    das respostas dessa chave), os clientes OpenAI e os contadores de uso.
+    """
+
+    def __init__(self, api_key: str, organization: str = None, weight: float = 1.0, name: str = None,
+                 limiter: RateLimiter = None):
+        self.api_key = api_key
+        self.organization = organization
+        self.weight = weight
+        self.name = name or mask_key(api_key)
+        self.limiter = limiter or RateLimiter()
+        self.in_flight = 0
+        self.ejected_until = 0.0
+        self.counters = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'unauthorized': 0, 'ejections': 0,
+                         'tokens': 0}
+        self._clients = {}
+
+    def client(self, base_url: str = None):
+        """Cliente OpenAI desta chave (do registo partilhado do processo)."""
+        if ('sync', base_url) not in self._clients:
+            self._clients[('sync', base_url)] = get_client_registry().acquire(
+                self.api_key, base_url=base_url, organization=self.organization)
+        return self._clients[('sync', base_url)]
+
+    def async_client(self, base_url: str = None):
+        """Cliente AsyncOpenAI desta chave, no event loop em execução."""
+        loop = running_loop()
+        for key in [key for key in self._clients if key[0] == 'async' and key[1] == base_url and key[2] is not loop]:
+            get_client_registry().release(self._clients.pop(key))  # Cliente de outro event loop
+        if ('async', base_url, loop) not in self._clients:
+            self._clients[('async', base_url, loop)] = get_client_registry().acquire_async(
+                self.api_key, base_url=base_url, organization=self.organization)
+        return self._clients[('async', base_url, loop)]
+
+    def release_clients(self):
+        registry = get_client_registry()
+        for client in self._clients.values():
+            registry.release(client)
+        self._clients = {}
+
+
+class KeyPool:
+    """
+    Pool de chaves API (de uma ou várias organizações) usado pelos pedidos
+    de chat completion dos assistentes.
+
+    Cada pedido vai para a chave com mais capacidade livre ('least_loaded':
+    capacidade restante dos buckets RPM/TPM da chave, dividida pelos pedidos
+    em curso, vezes o peso) ou para uma chave sorteada proporcionalmente ao
+    peso e à capacidade livre ('weighted'). Uma chave que recebe um 429 sai
+    do pool durante o Retry-After (ou `eject_seconds`) e o pedido é repetido
+    logo noutra chave; um 401 retira a chave durante `unauthorized_seconds`.
+
+    Com sticky=True, os pedidos de uma thread continuam na mesma chave
+    enquanto ela estiver disponível e com capacidade livre (a cache de
+    prompts da OpenAI é por organização). Os recursos com estado (ficheiros enviados, batches)
+    continuam na chave própria de cada assistente.
+    """
+
+    def __init__(self, keys: List[Union[str, Dict]], strategy: str = 'least_loaded', sticky: bool = True,
+                 eject_seconds: float = 30.0, unauthorized_seconds: float = 3600.0, max_retries: int = 6,
+                 max_sticky_threads: int = 10000, **limiter_options):
+        """
+        Args:
+            keys (list): Chaves API (str) ou dicionários {'api_key', 'organization',
+                'weight', 'name', 'requests_per_minute', 'tokens_per_minute'}.
+            strategy (str): 'least_loaded' ou 'weighted'.
+            sticky (bool): Mantém cada thread na mesma chave.
+            eject_seconds (float): Tempo fora do pool depois de um 429 sem Retry-After.
+            unauthorized_seconds (float): Tempo fora do pool depois de um 401.
+            max_retries (int): Número máximo de novas tentativas por pedido.
+            max_sticky_threads (int): Threads lembradas (as menos recentes são esquecidas).
+            **limiter_options: Opções do RateLimiter de cada chave (ver RateLimiter).
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estratégia '{strategy}' desconhecida (use {', '.join(STRATEGIES)}).")
+        if not keys:
+            raise ValueError("O pool precisa de pelo menos uma chave API.")
+        self.strategy = strategy
+        self.sticky = sticky
+        self.eject_seconds = eject_seconds
+        self.unauthorized_seconds = unauthorized_seconds
+        self.max_retries = max_retries
+        self.max_sticky_threads = max_sticky_threads
+        self.keys = [self._key(key, limiter_options) for key in keys]
+        self._lock = threading.Lock()
+        self._assigned = OrderedDict()  # thread -> ApiKey
+        self._random = random.Random()
+
+    @staticmethod
+    def _key(key, limiter_options):
+        if isinstance(key, ApiKey):
+            return key
+        if isinstance(key, str):
+            key = {'api_key': key}
+        options = dict(limiter_options)
+        for option in ('requests_per_minute', 'tokens_per_minute'):
+            if option in key:
+                options[option] = key[option]
+        return ApiKey(key['api_key'], organization=key.get('organization'), weight=key.get('weight', 1.0),
+                      name=key.get('name'), limiter=RateLimiter(**options))
+
+    def _score(self, key):
+        return key.weight * key.limiter.free_capacity() / (1 + key.in_flight)
+
+    def select(self, sticky_key=None, estimated_tokens: int = 0) -> ApiKey:
+        """
+        Escolhe a chave para um pedido e conta-o como em curso (chamar
+        release a seguir).
+
+        Args:
+            sticky_key (hashable, optional): Identificador da thread, para a stickiness.
+            estimated_tokens (int): Estimativa de tokens do pedido.
+        """
+        with self._lock:
+            now = time.monotonic()
+            key = None
+            if self.sticky and sticky_key is not None:
+                key = self._assigned.get(sticky_key)
+                if key is not None and (key.ejected_until > now or not key.limiter.can_send(estimated_tokens)):
+                    key = None  # Fora do pool ou teria de esperar: a thread muda de chave
+            if key is None:
+                available = [key for key in self.keys if key.ejected_until <= now]
+                if not available:
+                    key = min(self.keys, key=lambda key: key.ejected_until)  # A primeira a voltar
+                elif self.strategy == 'weighted':
+                    weights = [key.weight * max(key.limiter.free_capacity(), 0.01) for key in available]
+                    key = self._random.choices(available, weights=weights)[0]
+                else:
+                    key = max(available, key=self._score)
+            if self.sticky and sticky_key is not None:
+                self._assigned[sticky_key] = key
+                self._assigned.move_to_end(sticky_key)
+                while len(self._assigned) > self.max_sticky_threads:
+                    self._assigned.popitem(last=False)
+            key.in_flight += 1
+            return key
+
+    def release(self, key: ApiKey):
+        with self._lock:
+            key.in_flight -= 1
+
+    def eject(self, key: ApiKey, seconds: float):
+        """Retira uma chave do pool durante `seconds` segundos."""
+        with self._lock:
+            key.ejected_until = max(key.ejected_until, time.monotonic() + seconds)
+            key.counters['ejections'] += 1
+        get_metrics().increment('key_ejections_total', key=key.name)
+
+    def _available(self, exclude: ApiKey) -> bool:
+        now = time.monotonic()
+        return any(key is not exclude and key.ejected_until <= now for key in self.keys)
+
+    def _wait(self, key, estimated_tokens):
+        return max(key.limiter.reserve(estimated_tokens), key.ejected_until - time.monotonic(), 0.0)
+
+    def _succeeded(self, key, raw, estimated_tokens):
+        result = key.limiter.finish(raw, estimated_tokens)
+        usage = getattr(result, 'usage', None)
+        tokens = getattr(usage, 'total_tokens', None) or 0
+        with self._lock:
+            key.counters['requests'] += 1
+            key.counters['tokens'] += tokens
+        metrics = get_metrics()
+        metrics.increment('key_requests_total', key=key.name, outcome='ok')
+        if tokens:
+            metrics.increment('key_tokens_total', tokens, key=key.name)
+        return result
+
+    def _failed(self, key, error, attempt) -> Optional[float]:
+        """
+        Trata um erro de um pedido. Retorna o tempo a esperar antes de
+        repetir (0 para repetir já noutra chave) ou None se não for repetido.
+        """
+        status = getattr(error, 'status_code', None)
+        with self._lock:
+            key.counters['errors'] += 1
+            if status == 429:
+                key.counters['rate_limited'] += 1
+            elif status == 401:
+                key.counters['unauthorized'] += 1
+        outcome = {429: 'rate_limited', 401: 'unauthorized'}.get(status, 'error')
+        get_metrics().increment('key_requests_total', key=key.name, outcome=outcome)
+        if attempt >= self.max_retries:
+            return None
+
+        if status == 401:
+            self.eject(key, self.unauthorized_seconds)
+            return 0.0 if self._available(key) else None
+        if not key.limiter.is_retryable(error):
+            return None
+        delay = key.limiter.backoff(attempt, error)  # Num 429 também pausa o limitador da chave
+        if status == 429:
+            has_retry_after = any(header in (getattr(getattr(error, 'response', None), 'headers', None) or {})
+                                  for header in ('retry-after', 'retry-after-ms'))
+            self.eject(key, delay if has_retry_after else self.eject_seconds)
+            if self._available(key):
+                return 0.0
+        get_metrics().increment('retries_total', status=status or type(error).__name__)
+        return delay
+
+    def call(self, request: Callable, estimated_tokens: int = 0, sticky_key=None):
+        """
+        Executa um pedido numa das chaves, com novas tentativas.
+
+        Args:
+            request (callable): Função (ApiKey) -> resposta (pode ser "raw",
+                com .headers e .parse()), por exemplo
+                lambda key: key.client().chat.completions.create(...).
+            estimated_tokens (int): Estimativa de tokens do pedido.
+            sticky_key (hashable, optional): Identificador da thread.
+
+        Returns:
+            A resposta (já com .parse() aplicado, se for raw).
+        """
+        attempt = 0
+        while True:
+            key = self.select(sticky_key, estimated_tokens)
+            try:
+                time.sleep(self._wait(key, estimated_tokens))
+                try:
+                    return self._succeeded(key, request(key), estimated_tokens)
+                except Exception as e:
+                    delay = self._failed(key, e, attempt)
+                    if delay is None:
+                        raise
+            finally:
+                self.release(key)
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, request: Callable, estimated_tokens: int = 0, sticky_key=None):
+        """Versão assíncrona de call: `request(key)` retorna um awaitable."""
+        attempt = 0
+        while True:
+            key = self.select(sticky_key, estimated_tokens)
+            try:
+                await asyncio.sleep(self._wait(key, estimated_tokens))
+                try:
+                    return self._succeeded(key, await request(key), estimated_tokens)
+                except Exception as e:
+                    delay = self._failed(key, e, attempt)
+                    if delay is None:
+                        raise
+            finally:
+                self.release(key)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> List[Dict]:
+        """Uso de cada chave: pedidos, tokens, erros, pedidos em curso e se está fora do pool."""
+        now = time.monotonic()
+        with self._lock:
+            sticky_threads = {}
+            for key in self._assigned.values():
+                sticky_threads[key.name] = sticky_threads.get(key.name, 0) + 1
+            rows = [dict(key.counters, key=key.name, organization=key.organization, weight=key.weight,
+                         in_flight=key.in_flight, ejected_seconds=max(0.0, key.ejected_until - now),
+                         threads=sticky_threads.get(key.name, 0))
+                    for key in self.keys]
+        for row, key in zip(rows, self.keys):
+            row['free_capacity'] = key.limiter.free_capacity()
+        return rows
+
+    def close(self):
+        """Devolve os clientes das chaves ao registo."""
+        for key in self.keys:
+            key.release_clients()
@@ -0,0 +1,203 @@
+# message.py
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, Optional
+
+# Conteúdos com pelo menos este número de caracteres vão para o BlobStore
+BLOB_THRESHOLD = 4096
+
+
+class BlobStore:
+    """
+    Armazenamento de conteúdos endereçado pelo hash (SHA-256): cada texto
+    grande é guardado uma única vez em <root>/<xx>/<hash>.txt, por muitas
+    mensagens e threads que o usem.
+
+    Os textos lidos ficam numa cache LRU limitada a `cache_bytes`; mensagens
+    com o mesmo conteúdo partilham o mesmo objeto str em memória.
+    """
+
+    def __init__(self, root: str, cache_bytes: int = 32 * 1024 * 1024):
+        self.root = root
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.txt')
+
+    def _remember(self, key, text):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self._cache[key] = text
+            self._cached_bytes += len(text)
+            while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+            return text
+
+    def put(self, text: str) -> str:
+        """Guarda um texto (se ainda não existir) e retorna a sua chave."""
+        from pythonAI_wrapper.storage import atomic_write
+        key = self.key(text)
+        with self._write_lock:
+            if not os.path.exists(self._path(key)):
+                atomic_write(self._path(key), text)
+        self._remember(key, text)
+        return key
+
+    def get(self, key: str) -> str:
+        """Retorna o texto de uma chave."""
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+                return text
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            raise ValueError(f"Conteúdo '{key}' não encontrado em '{self.root}'.")
+        return self._remember(key, text)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+
+class Message(MutableMapping):
+    """
+    Mensagem de uma thread, compacta em memória (__slots__, papel internado).
+
+    Conteúdos grandes ficam no BlobStore e a mensagem guarda só a chave; o
+    texto é lido quando é usado. Comporta-se como o dicionário
+    {"role", "content", ...} de antes: message["content"], message.get(...),
+    dict(message) e comparações com dicionários continuam a funcionar.
+    """
+
+    __slots__ = ('role', '_content', '_blob', '_store', 'extra')
+
+    def __init__(self, role: str, content: Optional[str] = None, store: BlobStore = None,
+                 blob: str = None, **extra):
+        self.role = sys.intern(role)
+        self._store = store
+        self._blob = blob
+        self._content = None
+        self.extra: Optional[Dict] = extra or None
+        if blob is None:
+            self.content = content
+
+    @property
+    def content(self) -> Optional[str]:
+        if self._blob is not None:
+            return self._store.get(self._blob)
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        if self._store is not None and isinstance(content, str) and len(content) >= BLOB_THRESHOLD:
+            self._blob = self._store.put(content)
+            self._content = None
+        else:
+            self._blob = None
+            self._content = content
+
+    @property
+    def blob(self) -> Optional[str]:
+        """Chave do conteúdo no BlobStore (None se o conteúdo estiver na mensagem)."""
+        return self._blob
+
+    @classmethod
+    def from_record(cls, record: Mapping, store: BlobStore = None) -> "Message":
+        """
+        Cria uma mensagem a partir de um registo do armazenamento ({"role", "content" | "blob", ...}).
+
+        Raises:
+            ValueError: Se o registo referir um blob e não houver BlobStore para o ler.
+        """
+        if isinstance(record, Message) and (record._store is store or store is None):
+            return record
+        extra = {key: value for key, value in record.items() if key not in ('role', 'content', 'blob')}
+        if record.get('blob') is not None:
+            if store is None:
+                raise ValueError(f"A mensagem refere o conteúdo '{record['blob']}', mas não há BlobStore para o ler.")
+            return cls(record['role'], store=store, blob=record['blob'], **extra)
+        return cls(record['role'], record.get('content'), store=store, **extra)
+
+    def to_record(self, store: BlobStore = None) -> Dict:
+        """
+        Registo a guardar: conteúdos grandes são substituídos pela chave no
+        BlobStore (o de `store`, ou o da própria mensagem).
+        """
+        store = store or self._store
+        record = {"role": self.role}
+        if self._blob is not None and store is self._store:
+            record["blob"] = self._blob
+        else:
+            content = self.content
+            if store is not None and isinstance(content, str) and len(content) >= BLOB_THRESHOLD:
+                record["blob"] = store.put(content)
+            else:
+                record["content"] = content
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+    def to_dict(self) -> Dict:
+        """A mensagem como dicionário simples (com o conteúdo completo)."""
+        return dict(self.items())
+
+    def __getitem__(self, key):
+        if key == 'role':
+            return self.role
+        if key == 'content':
+            return self.content
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'role':
+            self.role = sys.intern(value)
+        elif key == 'content':
+            self.content = value
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in ('role', 'content') or not self.extra or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+
+    def __iter__(self):
+        yield 'role'
+        yield 'content'
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return 2 + len(self.extra or ())
+
+    def __repr__(self):
+        return f"Message({self.to_dict()!r})"
+
+
+def to_record(message: Mapping, store: BlobStore = None) -> Dict:
+    """Registo a guardar para uma mensagem (Message ou dicionário)."""
+    if isinstance(message, Message):
+        return message.to_record(store)
+    return Message.from_record(message, store).to_record(store)
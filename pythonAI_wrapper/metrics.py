@@ -0,0 +1,304 @@
+# metrics.py
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from pythonAI_wrapper.storage import atomic_write, file_lock
+
+# Cada bucket cobre [BASE^(i-1), BASE^i): erro relativo dos percentis <= ~9%
+BASE = 2 ** 0.25
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _labels_key(labels: Dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+class Histogram:
+    """
+    Histograma com buckets logarítmicos fixos. Como os buckets são iguais
+    em todos os processos, dois histogramas podem ser somados (merge) sem
+    perder precisão, por exemplo para juntar os snapshots de várias execuções.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.buckets: Dict[int, int] = {}
+
+    @staticmethod
+    def bucket_index(value: float) -> int:
+        if value <= 0:
+            return -10 ** 6  # bucket dos zeros
+        return math.ceil(math.log(value, BASE))
+
+    @staticmethod
+    def bucket_bound(index: int) -> float:
+        return 0.0 if index == -10 ** 6 else BASE ** index
+
+    def observe(self, value: float):
+        index = self.bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "Histogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Percentil aproximado (limite superior do bucket, limitado por min/max)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self.bucket_bound(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+                'buckets': {str(index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Histogram":
+        histogram = cls()
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        histogram.buckets = {int(index): count for index, count in data['buckets'].items()}
+        return histogram
+
+
+class Metrics:
+    """
+    Métricas do processo: histogramas (latências, tempos de escrita, ...) e
+    contadores (tokens, tentativas, ...), identificados por nome e labels.
+
+    Os hooks registados com add_hook recebem cada observação
+    (tipo, nome, valor, labels), por exemplo para as enviar a outro sistema.
+    A persistência é opcional (ver enable_persistence): só com `path`
+    definido os valores deste processo são somados ao snapshot em
+    <path>/snapshot.json quando o processo termina.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = None
+        self._lock = threading.Lock()
+        self._hooks: List[Callable] = []
+        self._flush_registered = False
+        self._reset()
+        if path is not None:
+            self.enable_persistence(path)
+
+    def enable_persistence(self, path: str = '.metrics'):
+        """Passa a somar os valores deste processo ao snapshot em <path>/snapshot.json no fim do processo."""
+        self.path = path
+        if not self._flush_registered:
+            atexit.register(self.flush)
+            self._flush_registered = True
+
+    def _reset(self):
+        self.histograms: Dict[tuple, Histogram] = {}
+        self.counters: Dict[tuple, float] = {}
+        self.since = None
+        self.updated = None
+
+    def add_hook(self, hook: Callable[[str, str, float, Dict], None]):
+        """Regista uma função chamada com (tipo, nome, valor, labels) em cada observação."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable):
+        self._hooks.remove(hook)
+
+    def _notify(self, kind, name, value, labels):
+        for hook in self._hooks:
+            try:
+                hook(kind, name, value, labels)
+            except Exception:
+                pass  # Um hook com erros não pode afetar os pedidos
+
+    def _touch(self):
+        now = time.time()
+        self.since = now if self.since is None else self.since
+        self.updated = now
+
+    def observe(self, name: str, value: float, **labels):
+        """Acrescenta um valor ao histograma `name`."""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+            self._touch()
+        self._notify('histogram', name, value, labels)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Soma `value` ao contador `name`."""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self._touch()
+        self._notify('counter', name, value, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Mede a duração do bloco, em segundos, no histograma `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_usage(self, usage, **labels):
+        """Soma os tokens de response.usage aos contadores tokens_total{type=...}."""
+        if usage is None:
+            return
+        for kind in ('prompt', 'completion'):
+            tokens = getattr(usage, f'{kind}_tokens', None)
+            if tokens:
+                self.increment('tokens_total', tokens, type=kind, **labels)
+
+    def snapshot(self) -> Dict:
+        """Os valores deste processo, num dicionário serializável em JSON."""
+        with self._lock:
+            return {
+                'since': self.since,
+                'updated': self.updated,
+                'histograms': [{'name': name, 'labels': dict(labels), **histogram.to_dict()}
+                               for (name, labels), histogram in self.histograms.items()],
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in self.counters.items()],
+            }
+
+    def merge(self, snapshot: Dict):
+        """Soma um snapshot (de outro processo ou do disco) aos valores atuais."""
+        with self._lock:
+            for entry in snapshot.get('histograms', []):
+                key = (entry['name'], _labels_key(entry['labels']))
+                self.histograms.setdefault(key, Histogram()).merge(Histogram.from_dict(entry))
+            for entry in snapshot.get('counters', []):
+                key = (entry['name'], _labels_key(entry['labels']))
+                self.counters[key] = self.counters.get(key, 0) + entry['value']
+            if snapshot.get('since') is not None:
+                self.since = min(filter(None, (self.since, snapshot['since'])))
+                self.updated = max(filter(None, (self.updated, snapshot['updated'])))
+
+    def _snapshot_path(self):
+        return os.path.join(self.path, 'snapshot.json')
+
+    def load(self) -> Dict:
+        """Lê o snapshot acumulado em disco ({} se não existir ou sem persistência)."""
+        if self.path is None:
+            return {}
+        try:
+            with open(self._snapshot_path(), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        """Soma os valores deste processo ao snapshot em disco e limpa-os."""
+        if self.path is None or (not self.histograms and not self.counters):
+            return
+        with file_lock(os.path.join(self.path, '.lock')):
+            current = self.snapshot()
+            with self._lock:
+                self._reset()
+            total = Metrics(path=None)
+            total.merge(self.load())
+            total.merge(current)
+            atomic_write(self._snapshot_path(), json.dumps(total.snapshot()))
+
+    def clear(self):
+        """Apaga os valores deste processo e o snapshot em disco."""
+        with self._lock:
+            self._reset()
+        if self.path is not None and os.path.exists(self._snapshot_path()):
+            os.remove(self._snapshot_path())
+
+    def summary(self) -> List[Dict]:
+        """Uma linha por histograma: contagem, média, p50/p95/p99, máximo e taxa por segundo."""
+        with self._lock:
+            window = (self.updated - self.since) if self.since is not None else 0
+            rows = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                rows.append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                    **{f'p{int(q * 100)}': histogram.quantile(q) for q in QUANTILES},
+                    'max': histogram.max,
+                    'rate': histogram.count / window if window > 0 else None,
+                })
+            return rows
+
+    def to_prometheus(self) -> str:
+        """Exporta os valores no formato de texto do Prometheus."""
+        def label_text(labels, **extra):
+            items = list(labels) + list(extra.items())
+            if not items:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} counter')
+                    typed.add(name)
+                lines.append(f'{name}{label_text(labels)} {value}')
+
+            # Todas as séries de um histograma têm os mesmos buckets: do menor ao maior
+            # usado em qualquer delas, sem saltos (e o dos zeros, se algum foi usado)
+            bounds = {}
+            for (name, _), histogram in self.histograms.items():
+                bounds.setdefault(name, set()).update(histogram.buckets)
+            for name, indexes in bounds.items():
+                zero = -10 ** 6
+                finite = [index for index in indexes if index != zero]
+                bounds[name] = ([zero] if zero in indexes else []) + (
+                    list(range(min(finite), max(finite) + 1)) if finite else [])
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} histogram')
+                    typed.add(name)
+                cumulative = 0
+                for index in bounds[name]:
+                    cumulative += histogram.buckets.get(index, 0)
+                    bound = repr(Histogram.bucket_bound(index))
+                    lines.append(f'{name}_bucket{label_text(labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_bucket{label_text(labels, le="+Inf")} {histogram.count}')
+                lines.append(f'{name}_sum{label_text(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{label_text(labels)} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+_default_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Métricas partilhadas pelos assistentes do processo."""
+    return _default_metrics
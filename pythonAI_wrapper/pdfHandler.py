@@ -1,30 +1,145 @@
 # pdfHandler.py
 
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+from pythonAI_wrapper.storage import atomic_write
+
+
+def _extract_pages(file_path: str) -> Iterator[str]:
+    """Extrai o texto de cada página; ficheiros que não são PDF são lidos como texto."""
+    with open(file_path, 'rb') as f:
+        is_pdf = f.read(5) == b'%PDF-'
+    if not is_pdf:
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            yield f.read()
+        return
+
+    from PyPDF2 import PdfReader
+    with open(file_path, 'rb') as f:
+        reader = PdfReader(f)
+        for page in reader.pages:
+            yield page.extract_text() or ''
+
+
+def _cache_pages(file_path: str, cache_dir: str):
+    """
+    Função de topo (para o ProcessPoolExecutor) que extrai as páginas de um
+    PDF para a cache, sem as devolver ao processo principal.
+    """
+    try:
+        for _ in PDFHandler(cache_dir=cache_dir).iter_pages(file_path):
+            pass
+    except Exception:
+        pass  # O erro volta a aparecer quando o ficheiro for lido
+
 
 class PDFHandler:
-    def read_pdf(self,file_path):
-        """Lê o conteúdo de um arquivo PDF e retorna o texto."""
+    def __init__(self, cache_dir: str = '.pdf_cache', max_workers: int = None):
+        """
+        Args:
+            cache_dir (str, optional): Pasta da cache de texto extraído; None desativa a cache.
+            max_workers (int, optional): Número de processos usados por read_folder.
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+
+    def _content_hash(self, file_path):
+        """
+        Hash SHA-256 do conteúdo. O hash fica guardado junto do tamanho e do
+        mtime do ficheiro, por isso só é recalculado quando o ficheiro muda.
+        """
+        stat = os.stat(file_path)
+        path_key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        stat_path = os.path.join(self.cache_dir, 'stat', path_key + '.json')
+        try:
+            with open(stat_path, 'r') as f:
+                cached = json.load(f)
+            if cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+                return cached['sha256']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        atomic_write(stat_path, json.dumps({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}))
+        return sha256
+
+    def iter_pages(self, file_path) -> Iterator[str]:
+        """
+        Produz o texto do PDF página a página. Se a cache estiver ativa, as
+        páginas de um PDF já lido vêm da cache sem voltar a analisar o PDF.
+        """
+        if self.cache_dir is None:
+            yield from _extract_pages(file_path)
+            return
+
+        pages_path = os.path.join(self.cache_dir, 'pages', self._content_hash(file_path) + '.jsonl')
+        if os.path.exists(pages_path):
+            with open(pages_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+            return
+
+        pages = []
+        for page in _extract_pages(file_path):
+            pages.append(json.dumps(page, ensure_ascii=False) + "\n")
+            yield page
+        atomic_write(pages_path, ''.join(pages))
+
+    @staticmethod
+    def join_pages(pages: Iterator[str]) -> str:
+        """Junta as páginas num texto; se a leitura falhar, mostra o erro e retorna ''."""
         prompt = ""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                prompt += content + "\n"
+            prompt = "\n".join(pages) + "\n"
         except Exception as e:
             print(f"Erro ao ler o arquivo PDF: {e}")
-        
+
         return prompt
+
+    def read_pdf(self, file_path):
+        """Lê o conteúdo de um arquivo PDF e retorna o texto."""
+        return self.join_pages(self.iter_pages(file_path))
+
+    def list_pdfs(self, folder_path) -> List[str]:
+        """Lista os PDFs de um diretório, por ordem alfabética."""
+        return [
+            os.path.join(folder_path, file_name)
+            for file_name in sorted(os.listdir(folder_path))
+            if file_name.endswith('.pdf') and os.path.isfile(os.path.join(folder_path, file_name))
+        ]
+
+    def iter_folder(self, folder_path) -> Iterator[Tuple[str, Iterator[str]]]:
+        """
+        Produz (caminho, páginas) para cada PDF de um diretório, em que
+        páginas é o iterador de iter_pages. Com a cache ativa, os PDFs são
+        extraídos em paralelo para a cache num pool de processos e as
+        páginas de cada um são lidas da cache quando ele fica pronto: o texto
+        de um ficheiro inteiro nunca passa entre processos.
+        """
+        paths = self.list_pdfs(folder_path)
+        if len(paths) <= 1 or self.max_workers == 1 or self.cache_dir is None:
+            for file_path in paths:
+                yield file_path, self.iter_pages(file_path)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for file_path, _ in zip(paths, executor.map(_cache_pages, paths, [self.cache_dir] * len(paths))):
+                yield file_path, self.iter_pages(file_path)
+
     def read_folder(self,folder_path):
         """Lê o conteúdo de um diretório e retorna o texto."""
         prompt = ""
         try:
-            for file_name in os.listdir(folder_path):
-                file_path = os.path.join(folder_path, file_name)
-                if os.path.isfile(file_path) and file_name.endswith('.pdf'):
-                    prompt += self.read_pdf(file_path) + "\n"
+            prompt = "".join(self.join_pages(pages) + "\n" for _, pages in self.iter_folder(folder_path))
         except Exception as e:
             print(f"Erro ao ler o diretório: {e}")
-        
+
         return prompt
-    
-    
@@ -0,0 +1,293 @@
+# rate_limiter.py
+
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from pythonAI_wrapper.metrics import get_metrics
+
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Converte durações como '1s', '6m0s', '20ms' ou '0.5' em segundos."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value)
+    if not parts:
+        return None
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+class TokenBucket:
+    """
+    Token bucket com reservas: reserve(n) desconta já n unidades (o nível
+    pode ficar negativo) e retorna quanto tempo é preciso esperar até elas
+    estarem disponíveis. Assim os pedidos são espaçados em vez de
+    saírem todos em rajada.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float, allow_debt: bool = False) -> float:
+        """
+        Args:
+            allow_debt (bool): Um pedido maior do que a capacidade só espera que o
+                nível volte a 0 e fica a dever o resto (os pedidos seguintes esperam).
+        """
+        self._refill(now)
+        if allow_debt and amount > self.capacity:
+            wait = max(0.0, -self.level)
+            self.level -= amount
+            return wait / self.refill_per_second if self.refill_per_second > 0 else 0.0
+        self.level -= amount
+        if self.level >= 0 or self.refill_per_second <= 0:
+            return 0.0
+        return -self.level / self.refill_per_second
+
+    def set_rate(self, capacity: float, refill_per_second: float, now: float):
+        self._refill(now)
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = min(self.level, capacity)
+
+    def limit_level(self, remaining: float, now: float):
+        """Baixa o nível local se o servidor indicar que resta menos."""
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """
+    Limitador partilhado de pedidos por minuto (RPM) e tokens por minuto
+    (TPM), ajustado pelos cabeçalhos x-ratelimit-* das respostas.
+
+    Os pedidos esperam até haver capacidade nos dois buckets; erros 429 e
+    5xx são repetidos com backoff exponencial com jitter, respeitando o
+    Retry-After quando existe. Enquanto o limite de tokens ainda não veio
+    nos cabeçalhos, um pedido maior do que o bucket não fica à espera de
+    capacidade que o bucket nunca teria: sai e o excesso fica em dívida.
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 90000,
+                 burst_seconds: float = 5.0, headroom: float = 0.95, max_retries: int = 6,
+                 base_delay: float = 0.5, max_delay: float = 60.0):
+        """
+        Args:
+            requests_per_minute (float): Limite inicial de pedidos (ajustado pelos cabeçalhos).
+            tokens_per_minute (float): Limite inicial de tokens (ajustado pelos cabeçalhos).
+            burst_seconds (float): Rajada máxima permitida, em segundos de capacidade.
+            headroom (float): Fração do limite usada, para ficar ligeiramente abaixo dele.
+            max_retries (int): Número máximo de novas tentativas por pedido.
+            base_delay (float): Atraso base do backoff, em segundos.
+            max_delay (float): Atraso máximo do backoff, em segundos.
+        """
+        self.burst_seconds = burst_seconds
+        self.headroom = headroom
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self.requests = TokenBucket(*self._rates(requests_per_minute))
+        self.tokens = TokenBucket(*self._rates(tokens_per_minute))
+        self.requests.updated = self.tokens.updated = now
+        self.paused_until = 0.0
+        self.tokens_limit_known = False  # Limite de tokens confirmado por x-ratelimit-limit-tokens
+        self.counters = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'waited_seconds': 0.0}
+
+    def _rates(self, per_minute):
+        per_second = per_minute * self.headroom / 60.0
+        return max(1.0, per_second * self.burst_seconds), per_second
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """Reserva capacidade para um pedido e retorna o tempo de espera, em segundos."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self.requests.reserve(1, now),
+                self.tokens.reserve(estimated_tokens, now, allow_debt=not self.tokens_limit_known),
+                self.paused_until - now,
+            )
+            self.counters['requests'] += 1
+            self.counters['waited_seconds'] += max(0.0, wait)
+        get_metrics().observe('rate_limit_wait_seconds', max(0.0, wait))
+        return max(0.0, wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Corrige o bucket de tokens com o consumo real (response.usage)."""
+        with self._lock:
+            self.tokens.level += estimated_tokens - actual_tokens
+
+    def update_from_headers(self, headers):
+        """Ajusta os limites a partir dos cabeçalhos x-ratelimit-* de uma resposta."""
+        if headers is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, 'requests'), (self.tokens, 'tokens')):
+                limit = headers.get(f'x-ratelimit-limit-{kind}')
+                remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+                try:
+                    if limit is not None:
+                        capacity, per_second = self._rates(float(limit))
+                        if abs(per_second - bucket.refill_per_second) > 1e-9:
+                            bucket.set_rate(capacity, per_second, now)
+                        if kind == 'tokens':
+                            self.tokens_limit_known = True
+                    if remaining is not None:
+                        bucket.limit_level(float(remaining), now)
+                except ValueError:
+                    continue
+
+    def backoff(self, attempt: int, error=None) -> float:
+        """
+        Tempo de espera antes da tentativa seguinte: o Retry-After do erro,
+        se existir, ou backoff exponencial com jitter total.
+        """
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = parse_duration(headers.get('retry-after-ms'))
+        if retry_after is not None:
+            retry_after /= 1000.0
+        else:
+            retry_after = parse_duration(headers.get('retry-after'))
+
+        if getattr(error, 'status_code', None) == 429:
+            with self._lock:
+                self.counters['rate_limited'] += 1
+                reset = parse_duration(headers.get('x-ratelimit-reset-requests')) or 0.0
+                pause = retry_after if retry_after is not None else reset
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def is_retryable(error) -> bool:
+        """Erros 408/409/429/5xx e falhas de ligação/timeout."""
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+    def finish(self, raw, estimated_tokens: int = 0):
+        """
+        Regista a resposta de um pedido feito fora de call/acall (por exemplo
+        pelo KeyPool): ajusta os limites pelos cabeçalhos e corrige a
+        estimativa de tokens com o uso real.
+
+        Returns:
+            A resposta (já com .parse() aplicado, se for raw).
+        """
+        self.update_from_headers(getattr(raw, 'headers', None))
+        result = raw.parse() if hasattr(raw, 'parse') else raw
+        usage = getattr(result, 'usage', None)
+        if usage is not None and getattr(usage, 'total_tokens', None) is not None:
+            self.record_usage(estimated_tokens, usage.total_tokens)
+        return result
+
+    def call(self, request: Callable, estimated_tokens: int = 0):
+        """
+        Executa um pedido respeitando os limites, com novas tentativas.
+
+        Args:
+            request (callable): Função sem argumentos que faz o pedido. Pode
+                retornar uma resposta "raw" (com .headers e .parse()).
+            estimated_tokens (int): Estimativa de tokens do pedido.
+
+        Returns:
+            A resposta (já com .parse() aplicado, se for raw).
+        """
+        attempt = 0
+        while True:
+            time.sleep(self.reserve(estimated_tokens))
+            try:
+                return self.finish(request(), estimated_tokens)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                with self._lock:
+                    self.counters['retries'] += 1
+                get_metrics().increment('retries_total', status=getattr(e, 'status_code', None) or type(e).__name__)
+                time.sleep(self.backoff(attempt, e))
+                attempt += 1
+
+    async def acall(self, request: Callable, estimated_tokens: int = 0):
+        """Versão assíncrona de call: `request` retorna um awaitable."""
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.reserve(estimated_tokens))
+            try:
+                return self.finish(await request(), estimated_tokens)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                with self._lock:
+                    self.counters['retries'] += 1
+                get_metrics().increment('retries_total', status=getattr(e, 'status_code', None) or type(e).__name__)
+                await asyncio.sleep(self.backoff(attempt, e))
+                attempt += 1
+
+    def can_send(self, estimated_tokens: int = 0) -> bool:
+        """Indica se um pedido com estes tokens sairia já, sem esperar."""
+        with self._lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return False
+            return all(min(bucket.capacity, bucket.level + (now - bucket.updated) * bucket.refill_per_second) >= amount
+                       for bucket, amount in ((self.requests, 1), (self.tokens, estimated_tokens)))
+
+    def free_capacity(self) -> float:
+        """
+        Fração da capacidade ainda disponível (0 a 1): o mínimo dos dois
+        buckets, ou 0 durante uma pausa depois de um 429.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return 0.0
+            fractions = []
+            for bucket in (self.requests, self.tokens):
+                level = min(bucket.capacity, bucket.level + (now - bucket.updated) * bucket.refill_per_second)
+                fractions.append(level / bucket.capacity)
+            return max(0.0, min(fractions))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters,
+                        requests_per_minute=self.requests.refill_per_second * 60 / self.headroom,
+                        tokens_per_minute=self.tokens.refill_per_second * 60 / self.headroom)
+
+
+_default_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Limitador partilhado por todos os assistentes do processo."""
+    return _default_limiter
+
+
+def configure_rate_limiter(**options) -> RateLimiter:
+    """Substitui o limitador partilhado por um novo com as opções dadas (ver RateLimiter)."""
+    global _default_limiter
+    _default_limiter = RateLimiter(**options)
+    return _default_limiter
@@ -0,0 +1,218 @@
+# response_cache.py
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from pythonAI_wrapper.storage import atomic_write, file_lock
+
+
+class ResponseCache:
+    """
+    Cache de respostas para pedidos determinísticos, em dois níveis:
+    memória (LRU) e disco (um ficheiro por entrada).
+
+    A chave é um hash estável do pedido (modelo, instruções e mensagens).
+    As entradas expiram ao fim de `ttl` segundos e o nível de disco é
+    limitado a `max_disk_bytes` (as entradas mais antigas saem primeiro).
+    O nível de disco é opcional (cache_dir ou enable_persistence): com ele,
+    os contadores de hits/misses são acumulados em <cache_dir>/stats.json
+    quando o processo termina.
+    """
+
+    def __init__(self, cache_dir: str = None, max_entries: int = 1000,
+                 max_disk_bytes: int = 100 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        """
+        Args:
+            cache_dir (str, optional): Pasta do nível de disco; None usa só a memória.
+            max_entries (int, optional): Número máximo de entradas em memória.
+            max_disk_bytes (int, optional): Tamanho máximo do nível de disco.
+            ttl (float, optional): Validade das entradas em segundos; None não expira.
+        """
+        self.cache_dir = None
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self._flush_registered = False
+        if cache_dir is not None:
+            self.enable_persistence(cache_dir)
+
+    def enable_persistence(self, cache_dir: str = '.response_cache'):
+        """Ativa o nível de disco em `cache_dir` (e os contadores acumulados em stats.json)."""
+        with self._lock:
+            self.cache_dir = cache_dir
+            self._disk_bytes = None
+        if not self._flush_registered:
+            atexit.register(self.flush_stats)
+            self._flush_registered = True
+
+    @staticmethod
+    def key(payload: Dict) -> str:
+        """Hash estável de um pedido."""
+        data = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def _expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna a resposta guardada, ou None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        if self.cache_dir is not None:
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None and not self._expired(entry['created_at']):
+                with self._lock:
+                    self._remember(key, entry['created_at'], entry['response'])
+                    self.counters['disk_hits'] += 1
+                return entry['response']
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def _remember(self, key, created_at, response):
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def set(self, key: str, response: str):
+        """Guarda uma resposta."""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, response)
+
+        if self.cache_dir is not None:
+            data = json.dumps({'created_at': created_at, 'response': response}, ensure_ascii=False)
+            atomic_write(self._path(key), data)
+            with self._lock:
+                if self._disk_bytes is not None:
+                    self._disk_bytes += len(data.encode('utf-8'))
+            if self.disk_bytes() > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _entries(self):
+        """Lista (mtime, tamanho, caminho) das entradas em disco."""
+        entries = []
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.listdir(self.cache_dir):
+            directory = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def disk_bytes(self) -> int:
+        """Tamanho atual do nível de disco (calculado uma vez e depois mantido)."""
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _ in self._entries())
+        return self._disk_bytes
+
+    def _evict_disk(self):
+        """Remove entradas expiradas e, depois, as mais antigas até caber no limite (90%)."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, path in entries:
+            expired = self.ttl is not None and now - mtime > self.ttl
+            if not expired and total <= self.max_disk_bytes * 0.9:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def clear(self):
+        """Apaga todas as entradas (memória e disco) e os contadores."""
+        with self._lock:
+            self._memory.clear()
+            self.counters = {key: 0 for key in self.counters}
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._disk_bytes = 0
+        if self.cache_dir is not None:
+            atomic_write(os.path.join(self.cache_dir, 'stats.json'), json.dumps(self.counters))
+
+    def flush_stats(self):
+        """Soma os contadores deste processo aos guardados em disco."""
+        if self.cache_dir is None or not any(self.counters.values()):
+            return
+        stats_path = os.path.join(self.cache_dir, 'stats.json')
+        with file_lock(os.path.join(self.cache_dir, '.lock')):
+            stats = self._read_stats(stats_path)
+            with self._lock:
+                for key, value in self.counters.items():
+                    stats[key] = stats.get(key, 0) + value
+                    self.counters[key] = 0
+            atomic_write(stats_path, json.dumps(stats))
+
+    @staticmethod
+    def _read_stats(stats_path):
+        try:
+            with open(stats_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self) -> Dict:
+        """Contadores acumulados (disco + este processo) e taxa de acerto."""
+        stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        if self.cache_dir is not None:
+            stats.update(self._read_stats(os.path.join(self.cache_dir, 'stats.json')))
+        for key, value in self.counters.items():
+            stats[key] = stats.get(key, 0) + value
+        hits = stats['memory_hits'] + stats['disk_hits']
+        total = hits + stats['misses']
+        stats.update({
+            'hits': hits,
+            'hit_rate': hits / total if total else 0.0,
+            'memory_entries': len(self._memory),
+            'disk_bytes': self.disk_bytes() if self.cache_dir is not None else 0,
+        })
+        return stats
+
+
+_default_cache = None
+
+
+def get_default_cache() -> ResponseCache:
+    """Cache partilhada pelos assistentes do processo (só em memória até enable_persistence)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
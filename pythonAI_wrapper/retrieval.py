@@ -0,0 +1,332 @@
+# retrieval.py
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List
+from urllib.parse import quote
+
+from pythonAI_wrapper.storage import atomic_write, file_lock
+
+DEFAULT_TOP_K = 4
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError("A pesquisa nos documentos precisa do numpy (pip install numpy).")
+    return numpy
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """
+    Divide um texto em blocos de ~chunk_size caracteres, com sobreposição,
+    cortando de preferência em espaços.
+
+    Args:
+        text (str): O texto a dividir.
+        chunk_size (int): Tamanho máximo de cada bloco.
+        overlap (int): Número de caracteres repetidos entre blocos seguidos.
+    """
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            space = text.rfind(' ', start + chunk_size // 2, end)
+            if space != -1:
+                end = space
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class HashingEmbedder:
+    """
+    Embedder local e determinístico (hashing trick sobre as palavras).
+    Não precisa de rede; útil para testes e uso offline.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: List[str]):
+        np = _numpy()
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r'\w+', text.lower()):
+                digest = hashlib.md5(word.encode('utf-8')).digest()
+                index = int.from_bytes(digest[:4], 'little') % self.dim
+                vectors[row, index] += 1.0 if digest[4] & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class OpenAIEmbedder:
+    """
+    Embedder que usa a API de embeddings da OpenAI. Os pedidos passam pelo
+    limitador de pedidos e pelo key_pool do assistente (ver
+    OpenAIAssistant.call_api).
+    """
+
+    name = 'openai'
+
+    def __init__(self, call_api, model: str = 'text-embedding-3-small',
+                 dim: int = 1536, batch_size: int = 100):
+        """
+        Args:
+            call_api (callable): f(pedido, tokens_estimados) que executa
+                pedido(cliente OpenAI) pelo limitador, como OpenAIAssistant.call_api.
+        """
+        self.call_api = call_api
+        self.model = model
+        self.dim = dim
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]):
+        np = _numpy()
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = self.call_api(
+                lambda client: getattr(client.embeddings, 'with_raw_response', client.embeddings).create(
+                    model=self.model, input=batch),
+                sum(len(text) // 4 + 1 for text in batch),
+            )
+            vectors.extend(item.embedding for item in response.data)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class VectorIndex:
+    """
+    Índice vetorial em disco, lido por memory-map.
+
+    Layout da pasta:
+        meta.json      dimensão, número de blocos, tamanho de chunks.jsonl e embedder usado
+        vectors.f32    vetores float32 (linha i = bloco i), só acrescentados
+        chunks.jsonl   texto e origem de cada bloco
+        offsets.i64    posição de cada bloco em chunks.jsonl
+        .lock          lock das escritas
+
+    O meta.json é escrito por último (atomicamente): só as primeiras
+    `count` linhas de cada ficheiro fazem parte do índice. Linhas a mais
+    (de uma escrita interrompida) são ignoradas na leitura e cortadas na
+    escrita seguinte.
+    """
+
+    def __init__(self, path: str, dim: int, embedder_name: str = None):
+        self.path = path
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.vectors_path = os.path.join(path, 'vectors.f32')
+        self.chunks_path = os.path.join(path, 'chunks.jsonl')
+        self.offsets_path = os.path.join(path, 'offsets.i64')
+        self.lock_path = os.path.join(path, '.lock')
+
+    def _meta(self):
+        if not os.path.exists(self.meta_path):
+            return {'dim': self.dim, 'count': 0, 'embedder': self.embedder_name}
+        with open(self.meta_path, 'r') as f:
+            return json.load(f)
+
+    def __len__(self):
+        return self._meta()['count']
+
+    def add(self, vectors, chunks: List[Dict]):
+        """
+        Acrescenta blocos ao índice.
+
+        Args:
+            vectors: Matriz (n, dim) de vetores normalizados.
+            chunks (List[Dict]): n dicionários {'text', 'source'}.
+        """
+        np = _numpy()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(chunks), self.dim):
+            raise ValueError(f"Esperados {len(chunks)} vetores de dimensão {self.dim}, recebido {vectors.shape}.")
+
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self.lock_path):
+            meta = self._meta()
+            if meta['dim'] != self.dim or (meta['embedder'] and meta['embedder'] != self.embedder_name):
+                raise ValueError(f"O índice '{self.path}' foi criado com outro embedder.")
+            count = meta['count']
+            chunks_bytes = meta.get('chunks_bytes')
+            if chunks_bytes is None:  # meta.json de uma versão anterior
+                chunks_bytes = os.path.getsize(self.chunks_path) if count else 0
+
+            # Corta as linhas a mais de uma escrita interrompida antes de acrescentar
+            lines = [(json.dumps(chunk, ensure_ascii=False) + "\n").encode('utf-8') for chunk in chunks]
+            offsets = np.cumsum([chunks_bytes] + [len(line) for line in lines[:-1]], dtype=np.int64)
+            data = b''.join(lines)
+            for path, size, new in ((self.chunks_path, chunks_bytes, data),
+                                    (self.offsets_path, count * 8, offsets.tobytes()),
+                                    (self.vectors_path, count * self.dim * 4, vectors.tobytes())):
+                with open(path, 'ab') as f:
+                    f.truncate(size)
+                    f.write(new)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            meta.update({'count': count + len(chunks), 'chunks_bytes': chunks_bytes + len(data),
+                         'embedder': self.embedder_name})
+            atomic_write(self.meta_path, json.dumps(meta))
+
+    def remove(self, sources) -> int:
+        """
+        Remove os blocos de algumas origens (reescreve os ficheiros do índice).
+
+        Returns:
+            int: O número de blocos removidos.
+        """
+        np = _numpy()
+        if len(self) == 0:
+            return 0
+        sources = set(sources)
+        with file_lock(self.lock_path):
+            meta = self._meta()
+            count = meta['count']
+            with open(self.chunks_path, 'rb') as f:
+                lines = [f.readline() for _ in range(count)]
+            keep = [i for i, line in enumerate(lines) if json.loads(line).get('source') not in sources]
+            if len(keep) == count:
+                return 0
+
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(count, self.dim))
+            kept_vectors = np.array(vectors[keep], dtype=np.float32)
+            del vectors
+            chunks_data = b''.join(lines[i] for i in keep)
+            offsets = np.cumsum([0] + [len(lines[i]) for i in keep[:-1]], dtype=np.int64) if keep else np.zeros(0, np.int64)
+            # Os ficheiros são substituídos (não reescritos): quem já os abriu continua a ler os antigos
+            for path, data in ((self.chunks_path, chunks_data),
+                               (self.offsets_path, offsets.tobytes()),
+                               (self.vectors_path, kept_vectors.tobytes())):
+                tmp_path = f"{path}.tmp.{os.getpid()}"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+
+            meta.update({'count': len(keep), 'chunks_bytes': len(chunks_data)})
+            atomic_write(self.meta_path, json.dumps(meta))
+        return count - len(keep)
+
+    def search(self, query_vector, top_k: int = DEFAULT_TOP_K) -> List[Dict]:
+        """
+        Retorna os top_k blocos mais semelhantes (produto interno) ao vetor dado.
+
+        Returns:
+            List[Dict]: {'text', 'source', 'score'} por ordem decrescente de score.
+        """
+        np = _numpy()
+        if len(self) == 0:
+            return []
+
+        # Abre os ficheiros com o lock: meta.json e ficheiros da mesma versão do índice
+        with file_lock(self.lock_path):
+            count = len(self)
+            if count == 0:
+                return []
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(count, self.dim))
+            offsets = np.memmap(self.offsets_path, dtype=np.int64, mode='r', shape=(count,))
+            f = open(self.chunks_path, 'rb')
+        scores = vectors @ np.asarray(query_vector, dtype=np.float32)
+        k = min(top_k, count)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        results = []
+        with f:
+            for index in best:
+                f.seek(int(offsets[index]))
+                chunk = json.loads(f.readline())
+                chunk['score'] = float(scores[index])
+                results.append(chunk)
+        return results
+
+
+class Retriever:
+    """
+    Liga um embedder a um índice vetorial por (assistente, thread) e
+    seleciona os blocos relevantes para um prompt.
+    """
+
+    def __init__(self, embedder, root: str = 'vector_index', top_k: int = DEFAULT_TOP_K,
+                 chunk_size: int = 1000, overlap: int = 200):
+        _numpy()  # Falha já na configuração se o numpy não estiver instalado
+        self.embedder = embedder
+        self.root = root
+        self.top_k = top_k
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def index_for(self, assistant_name: str, thread_id: str) -> VectorIndex:
+        path = os.path.join(self.root, quote(assistant_name, safe=''), quote(thread_id, safe=''))
+        return VectorIndex(path, self.embedder.dim, self.embedder.name)
+
+    def ingest(self, assistant_name: str, thread_id: str, text: str, source: str = '') -> int:
+        """
+        Divide um documento em blocos, calcula os embeddings e adiciona-os
+        ao índice da thread.
+
+        Returns:
+            int: O número de blocos adicionados.
+        """
+        chunks = chunk_text(text, self.chunk_size, self.overlap)
+        if not chunks:
+            return 0
+        vectors = self.embedder.embed(chunks)
+        self.index_for(assistant_name, thread_id).add(vectors, [{'text': chunk, 'source': source} for chunk in chunks])
+        return len(chunks)
+
+    def remove(self, assistant_name: str, thread_id: str, sources) -> int:
+        """Remove do índice da thread os blocos destas origens; retorna quantos foram removidos."""
+        return self.index_for(assistant_name, thread_id).remove(sources)
+
+    def retrieve(self, assistant_name: str, thread_id: str, query: str) -> List[Dict]:
+        """Retorna os blocos mais relevantes para a pergunta (lista vazia se não houver índice)."""
+        index = self.index_for(assistant_name, thread_id)
+        if len(index) == 0:
+            return []
+        return index.search(self.embedder.embed([query])[0], self.top_k)
+
+    def context_for(self, assistant_name: str, thread_id: str, query: str) -> str:
+        """Texto com os blocos relevantes, pronto a juntar às instruções."""
+        chunks = self.retrieve(assistant_name, thread_id, query)
+        if not chunks:
+            return ''
+        excerpts = "\n\n".join(f"[{chunk['source']}]\n{chunk['text']}" for chunk in chunks)
+        return f"Excertos relevantes dos documentos da conversa:\n\n{excerpts}"
+
+
+def create_embedder(name: str, call_api=None):
+    """
+    Cria um embedder pelo nome.
+
+    Args:
+        name (str): 'openai' ou 'hashing'.
+        call_api (callable, optional): Ver OpenAIEmbedder (só para 'openai').
+
+    Raises:
+        ValueError: Se o embedder não for conhecido.
+    """
+    if name == 'openai':
+        return OpenAIEmbedder(call_api)
+    if name == 'hashing':
+        return HashingEmbedder()
+    raise ValueError(f"Embedder '{name}' desconhecido.")
@@ -0,0 +1,148 @@
+# router.py
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+
+class ModelRouter:
+    """
+    Escolhe o modelo de cada pedido de um assistente.
+
+    Os modelos são configurados por ordem de preferência (por exemplo do
+    mais barato/rápido para o maior), cada um com limites opcionais:
+    'max_prompt_tokens' (prompts maiores vão para o modelo seguinte) e
+    'max_latency' (se a latência média recente do modelo passar deste
+    valor, os pedidos vão para o modelo seguinte). Cada thread pode ter
+    restrições próprias: um modelo fixo ('model'), os modelos permitidos
+    ('models') e uma latência máxima ('max_latency').
+
+    A latência de cada modelo é uma média móvel exponencial (EWMA) dos
+    pedidos feitos. Um modelo posto de lado por ser lento volta a ser
+    experimentado quando a sua latência tem mais de `recheck_seconds`.
+    """
+
+    def __init__(self, models: List[Union[str, Dict]], threads: Dict[str, Dict] = None, alpha: float = 0.2,
+                 recheck_seconds: float = 60.0):
+        """
+        Args:
+            models (list): Nomes de modelos ou dicionários {'model', 'max_prompt_tokens',
+                'max_latency'}, por ordem de preferência.
+            threads (dict, optional): thread_id -> {'model', 'models', 'max_latency'}.
+            alpha (float): Peso de cada nova latência na média móvel.
+            recheck_seconds (float): Idade a partir da qual a latência de um modelo deixa de contar.
+        """
+        self.models = [self._model(model) for model in models]
+        if not self.models:
+            raise ValueError("Indique pelo menos um modelo.")
+        self.threads: Dict[str, Dict] = {}
+        for thread_id, constraints in (threads or {}).items():
+            self.set_thread(thread_id, **constraints)
+        self.alpha = alpha
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._latency: Dict[str, List[float]] = {}  # modelo -> [ewma, momento da última latência, pedidos]
+
+    @staticmethod
+    def _model(model):
+        if isinstance(model, str):
+            model = {'model': model}
+        unknown = set(model) - {'model', 'max_prompt_tokens', 'max_latency'}
+        if 'model' not in model or unknown:
+            raise ValueError(f"Modelo inválido: {model!r} (use {{'model', 'max_prompt_tokens', 'max_latency'}}).")
+        return {'model': model['model'], 'max_prompt_tokens': model.get('max_prompt_tokens'),
+                'max_latency': model.get('max_latency')}
+
+    def config(self) -> Dict:
+        """Configuração guardada com o assistente."""
+        return {'models': [dict(model) for model in self.models],
+                'threads': {thread_id: dict(constraints) for thread_id, constraints in self.threads.items()}}
+
+    def set_thread(self, thread_id: str, model: str = None, models: List[str] = None, max_latency: float = None):
+        """
+        Define (ou, sem argumentos, remove) as restrições de uma thread.
+
+        Args:
+            model (str, optional): Usa sempre este modelo.
+            models (List[str], optional): Só estes modelos (de entre os configurados).
+            max_latency (float, optional): Evita modelos com latência média acima destes segundos.
+        """
+        names = {entry['model'] for entry in self.models}
+        unknown = [name for name in models or () if name not in names]
+        if unknown:
+            raise ValueError(f"Modelos não configurados no router: {', '.join(unknown)}.")
+        constraints = {key: value for key, value in
+                       (('model', model), ('models', list(models) if models else None), ('max_latency', max_latency))
+                       if value is not None}
+        if constraints:
+            self.threads[thread_id] = constraints
+        else:
+            self.threads.pop(thread_id, None)
+
+    def latency(self, model: str) -> Optional[float]:
+        """Latência média recente de um modelo (None se for desconhecida ou antiga)."""
+        with self._lock:
+            entry = self._latency.get(model)
+        if entry is None or time.monotonic() - entry[1] > self.recheck_seconds:
+            return None
+        return entry[0]
+
+    def observe(self, model: str, seconds: float):
+        """Regista a duração de um pedido feito a `model`."""
+        with self._lock:
+            entry = self._latency.get(model)
+            if entry is None:
+                self._latency[model] = [seconds, time.monotonic(), 1]
+            else:
+                entry[0] += self.alpha * (seconds - entry[0])
+                entry[1] = time.monotonic()
+                entry[2] += 1
+
+    def choose(self, prompt_tokens: int, thread_id: str = None) -> Tuple[str, str]:
+        """
+        Escolhe o modelo de um pedido.
+
+        Args:
+            prompt_tokens (int): Tokens (estimados) das mensagens enviadas.
+            thread_id (str, optional): A thread, para as suas restrições.
+
+        Returns:
+            (modelo, razão): a razão é 'preferred' (o primeiro modelo permitido),
+                'size' ou 'latency' (os anteriores eram pequenos ou lentos demais),
+                'fastest' (todos lentos: o mais rápido), 'largest' (o prompt não
+                cabe em nenhum: o de maior limite) ou 'pinned' (modelo fixo da thread).
+        """
+        constraints = self.threads.get(thread_id, {}) if thread_id is not None else {}
+        if constraints.get('model'):
+            return constraints['model'], 'pinned'
+        allowed = constraints.get('models')
+        candidates = [entry for entry in self.models if allowed is None or entry['model'] in allowed] or self.models
+
+        reason = 'preferred'
+        fitting = []
+        for entry in candidates:
+            if entry['max_prompt_tokens'] is not None and prompt_tokens > entry['max_prompt_tokens']:
+                reason = 'size'
+                continue
+            fitting.append(entry)
+            limits = [limit for limit in (entry['max_latency'], constraints.get('max_latency')) if limit is not None]
+            latency = self.latency(entry['model']) if limits else None
+            if latency is not None and latency > min(limits):
+                reason = 'latency'
+                continue
+            return entry['model'], reason
+
+        if fitting:
+            fastest = min(fitting, key=lambda entry: self.latency(entry['model']) or 0.0)
+            return fastest['model'], 'fastest'
+        largest = max(candidates, key=lambda entry: entry['max_prompt_tokens'])
+        return largest['model'], 'largest'
+
+    def stats(self) -> List[Dict]:
+        """Latência média recente e número de pedidos de cada modelo."""
+        rows = []
+        for entry in self.models:
+            with self._lock:
+                requests = self._latency.get(entry['model'], [None, None, 0])[2]
+            rows.append(dict(entry, latency=self.latency(entry['model']), requests=requests))
+        return rows
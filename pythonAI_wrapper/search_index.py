@@ -0,0 +1,276 @@
+# search_index.py
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    assistant TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    created_at REAL,
+    UNIQUE (assistant, thread_id, seq)
+);
+CREATE INDEX IF NOT EXISTS entries_created_at ON entries (created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(content, scope, tokenize = 'unicode61 remove_diacritics 2');
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def fts_query(text: str) -> str:
+    """
+    Converte texto livre numa pergunta FTS5: todas as palavras têm de
+    aparecer; "palavra*" procura por prefixo.
+    """
+    terms = re.findall(r'\w+\*?', text)
+    return ' AND '.join(f'content : "{term.rstrip("*")}"' + ('*' if term.endswith('*') else '') for term in terms)
+
+
+def scope_token(kind: str, *values: str) -> str:
+    """Palavra única que identifica um assistente ('a'), uma thread ('t') ou um papel ('r') na coluna scope."""
+    return kind + hashlib.sha1('\0'.join(values).encode('utf-8')).hexdigest()[:16]
+
+
+def scope_tokens(assistant_name: str, thread_id: str, role: str) -> str:
+    return ' '.join((scope_token('a', assistant_name), scope_token('t', assistant_name, thread_id), scope_token('r', role)))
+
+
+class SearchIndex:
+    """
+    Índice de texto das mensagens de todas as threads (SQLite FTS5, ranking
+    BM25), atualizado a cada mensagem guardada.
+
+    `entries` guarda a posição, o papel e a data de cada mensagem; a tabela
+    FTS `fts` guarda, com o mesmo rowid, o texto e uma coluna `scope` com
+    palavras que identificam o assistente, a thread e o papel. Assim os
+    filtros fazem parte da pergunta FTS e são resolvidos pelo índice
+    invertido, em vez de percorrer todas as mensagens encontradas.
+
+    A data de cada mensagem é a do momento em que foi indexada (add) ou a
+    guardada na própria mensagem ('created_at'). Ao indexar de novo
+    threads antigas (update), as mensagens sem data ficam com a data NULL:
+    continuam a ser encontradas, mas não pelas pesquisas com since/until.
+    As threads arquivadas continuam pesquisáveis sem serem rehidratadas.
+    """
+
+    def __init__(self, path: str = 'search.db', timeout: float = 30.0):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        # Índices antigos: created_at era NOT NULL (o SQLite só muda a restrição recriando a tabela)
+        columns = {row[1]: row[3] for row in self.conn.execute("PRAGMA table_info(entries)")}
+        if not columns.get('created_at'):
+            return
+        with self._transaction() as conn:
+            conn.execute("ALTER TABLE entries RENAME TO entries_old")
+            conn.execute("DROP INDEX IF EXISTS entries_created_at")
+            conn.execute(SCHEMA.split(';')[0])
+            conn.execute("CREATE INDEX entries_created_at ON entries (created_at)")
+            conn.execute("INSERT INTO entries SELECT * FROM entries_old")
+            conn.execute("DROP TABLE entries_old")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _insert(self, conn, assistant_name, thread_id, first_seq, messages, created_at, dates=None):
+        # Data de cada mensagem: a guardada na mensagem, a que já tinha no índice ou `created_at`
+        dates = dates or {}
+        for seq, message in enumerate(messages, first_seq):
+            cursor = conn.execute(
+                "INSERT INTO entries (assistant, thread_id, seq, role, created_at) VALUES (?, ?, ?, ?, ?)",
+                (assistant_name, thread_id, seq, message['role'],
+                 message.get('created_at') or dates.get(seq, created_at)),
+            )
+            conn.execute("INSERT INTO fts (rowid, content, scope) VALUES (?, ?, ?)",
+                         (cursor.lastrowid, message['content'] or '', scope_tokens(assistant_name, thread_id, message['role'])))
+
+    def _delete(self, conn, assistant_name, thread_id):
+        conn.execute(
+            "DELETE FROM fts WHERE rowid IN (SELECT id FROM entries WHERE assistant = ? AND thread_id = ?)",
+            (assistant_name, thread_id),
+        )
+        conn.execute("DELETE FROM entries WHERE assistant = ? AND thread_id = ?", (assistant_name, thread_id))
+
+    def add(self, assistant_name: str, thread_id: str, messages: List[Dict], created_at: float = None):
+        """Indexa mensagens acrescentadas ao fim de uma thread."""
+        with self._transaction() as conn:
+            (next_seq,), = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM entries WHERE assistant = ? AND thread_id = ?",
+                (assistant_name, thread_id),
+            ).fetchall()
+            self._insert(conn, assistant_name, thread_id, next_seq, messages, created_at or time.time())
+
+    def replace_thread(self, assistant_name: str, thread_id: str, messages: List[Dict], created_at: float = None):
+        """
+        Volta a indexar uma thread inteira. As mensagens já indexadas mantêm
+        a data; as outras ficam com a sua própria data ('created_at'), com
+        `created_at` ou, sem nenhuma, com a data NULL.
+        """
+        with self._transaction() as conn:
+            dates = dict(conn.execute(
+                "SELECT seq, created_at FROM entries WHERE assistant = ? AND thread_id = ?",
+                (assistant_name, thread_id),
+            ).fetchall())
+            self._delete(conn, assistant_name, thread_id)
+            self._insert(conn, assistant_name, thread_id, 0, messages, created_at, dates)
+
+    def delete_thread(self, assistant_name: str, thread_id: str):
+        with self._transaction() as conn:
+            self._delete(conn, assistant_name, thread_id)
+
+    def count(self, assistant_name: str = None, thread_id: str = None) -> int:
+        """Número de mensagens indexadas (de um assistente ou de uma thread)."""
+        sql, params = "SELECT COUNT(*) FROM entries", []
+        if assistant_name is not None:
+            sql += " WHERE assistant = ?"
+            params.append(assistant_name)
+            if thread_id is not None:
+                sql += " AND thread_id = ?"
+                params.append(thread_id)
+        (count,), = self._query(sql, params)
+        return count
+
+    @property
+    def complete(self) -> bool:
+        """Indica se o índice já foi sincronizado com o armazenamento (ver update)."""
+        return bool(self._query("SELECT 1 FROM meta WHERE key = 'complete' AND value = '1'"))
+
+    def mark_incomplete(self):
+        """Pede uma nova sincronização antes da próxima pesquisa (por exemplo depois de uma escrita falhada)."""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('complete', '0')")
+
+    def update(self, storage, read_thread=None) -> int:
+        """
+        Sincroniza o índice com o armazenamento: volta a indexar as threads
+        com um número de mensagens diferente e remove as que já não existem.
+
+        Args:
+            storage (BaseStorage): O armazenamento.
+            read_thread (callable, optional): Função (assistente, thread) -> mensagens
+                usada para ler as threads (por omissão storage.get_thread).
+
+        Returns:
+            int: O número de threads indexadas de novo.
+        """
+        read_thread = read_thread or storage.get_thread
+        indexed = {}
+        for assistant_name, thread_id, count in self._query(
+                "SELECT assistant, thread_id, COUNT(*) FROM entries GROUP BY assistant, thread_id"):
+            indexed[(assistant_name, thread_id)] = count
+
+        updated = 0
+        for assistant_name in storage.load_assistants():
+            for thread_id in storage.list_threads(assistant_name):
+                messages = read_thread(assistant_name, thread_id)
+                if indexed.pop((assistant_name, thread_id), 0) != len(messages):
+                    self.replace_thread(assistant_name, thread_id, messages)
+                    updated += 1
+        for assistant_name, thread_id in indexed:
+            self.delete_thread(assistant_name, thread_id)
+
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('complete', '1')")
+        return updated
+
+    def search(self, query: str, assistant_name: str = None, thread_id: str = None, role: str = None,
+               since: float = None, until: float = None, limit: int = 20, highlight=('[', ']'),
+               raw: bool = False) -> List[Dict]:
+        """
+        Pesquisa as mensagens, por relevância (BM25).
+
+        Args:
+            query (str): Palavras a procurar (ou uma pergunta FTS5 com raw=True).
+            assistant_name, thread_id, role (str, optional): Filtros.
+            since, until (float, optional): Intervalo de datas (time.time()) da mensagem;
+                exclui as mensagens sem data.
+            limit (int, optional): Número máximo de resultados.
+            highlight (tuple, optional): Marcas à volta das palavras encontradas no excerto.
+
+        Returns:
+            List[Dict]: {'assistant', 'thread_id', 'position', 'role',
+                'created_at', 'snippet', 'score'}, do mais relevante para o menos
+                ('created_at' é None nas mensagens sem data).
+        """
+        match = f"({query})" if raw else fts_query(query)
+        if not match:
+            return []
+        if assistant_name is not None:
+            match += f' AND scope : "{scope_token("a", assistant_name)}"'
+            if thread_id is not None:
+                match += f' AND scope : "{scope_token("t", assistant_name, thread_id)}"'
+        elif thread_id is not None:
+            match += f' AND scope : "{scope_token("t", *self._thread_owner(thread_id))}"'
+        if role is not None:
+            match += f' AND scope : "{scope_token("r", role)}"'
+
+        # Ordenadas pelo FTS5 por BM25 (só sobre o texto), guardando apenas as `limit` melhores
+        sql = "SELECT fts.rowid, bm25(fts, 1.0, 0.0) AS score FROM fts"
+        params = [match]
+        if since is not None or until is not None:
+            sql += " JOIN entries e ON e.id = fts.rowid"
+        sql += " WHERE fts MATCH ?"
+        if since is not None:
+            sql += " AND e.created_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND e.created_at < ?"
+            params.append(until)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        results = []
+        try:
+            with self._lock:
+                for rowid, score in self.conn.execute(sql, params).fetchall():
+                    (assistant, thread, seq, message_role, created_at), = self.conn.execute(
+                        "SELECT assistant, thread_id, seq, role, created_at FROM entries WHERE id = ?", (rowid,)).fetchall()
+                    (snippet,), = self.conn.execute(
+                        "SELECT snippet(fts, 0, ?, ?, '…', 16) FROM fts WHERE fts MATCH ? AND rowid = ?",
+                        (highlight[0], highlight[1], match, rowid)).fetchall()
+                    results.append({'assistant': assistant, 'thread_id': thread, 'position': seq,
+                                    'role': message_role, 'created_at': created_at, 'snippet': snippet,
+                                    'score': -score})
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Pesquisa inválida: {e}")
+        return results
+
+    def _thread_owner(self, thread_id):
+        """(assistente, thread) de uma thread pesquisada sem indicar o assistente."""
+        rows = self._query("SELECT DISTINCT assistant FROM entries WHERE thread_id = ? LIMIT 2", (thread_id,))
+        if len(rows) > 1:
+            raise ValueError(f"A thread '{thread_id}' existe em vários assistentes; indique o assistente.")
+        return (rows[0][0] if rows else ''), thread_id
+
+    def close(self):
+        self.conn.close()
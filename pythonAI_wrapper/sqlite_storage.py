@@ -0,0 +1,262 @@
+# sqlite_storage.py
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from pythonAI_wrapper.message import BlobStore
+from pythonAI_wrapper.storage import BaseStorage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assistants (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS threads (
+    assistant TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL,
+    state TEXT,
+    PRIMARY KEY (assistant, thread_id)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    assistant TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT,
+    extra TEXT,
+    PRIMARY KEY (assistant, thread_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Backend SQLite (modo WAL) com mensagens indexadas por
+    (assistente, thread, sequência).
+
+    Vários processos podem partilhar a mesma base de dados: cada escrita
+    corre numa transação IMMEDIATE e a sequência é calculada dentro dela,
+    por isso escritas concorrentes nunca se sobrepõem.
+    """
+
+    def __init__(self, path='conversations.db', timeout: float = 30.0):
+        self.path = path
+        self.blobs = BlobStore(path + '.blobs')
+        self.archive_root = path + '.archive'
+        self.search_path = path + '.search'
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(threads)")]
+        for column, kind in (('updated_at', 'REAL'), ('state', 'TEXT')):
+            if column not in columns:  # Bases de dados criadas antes desta coluna existir
+                try:
+                    self.conn.execute(f"ALTER TABLE threads ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    pass  # Outro processo acrescentou-a entretanto
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _to_row(self, message: Dict):
+        record = self._record(message)
+        extra = {k: v for k, v in record.items() if k not in ('role', 'content')}
+        return record['role'], record.get('content'), json.dumps(extra) if extra else None
+
+    def _from_row(self, role, content, extra):
+        record = {"role": role, "content": content}
+        if extra:
+            record.update(json.loads(extra))
+        return self._message(record)
+
+    def load_assistants(self):
+        return {name: json.loads(data) for name, data in self._query("SELECT name, data FROM assistants")}
+
+    def save_assistant(self, name, data):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO assistants (name, data) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+                (name, json.dumps(data)),
+            )
+
+    def list_threads(self, assistant_name):
+        rows = self._query(
+            "SELECT thread_id FROM threads WHERE assistant = ? ORDER BY created_at, thread_id",
+            (assistant_name,),
+        )
+        return [thread_id for (thread_id,) in rows]
+
+    def create_thread(self, assistant_name, thread_id):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO threads (assistant, thread_id, created_at) VALUES (?, ?, ?)",
+                (assistant_name, thread_id, time.time()),
+            )
+
+    def _touch_thread(self, conn, assistant_name, thread_id):
+        """Cria a thread se não existir e atualiza o momento da última escrita."""
+        now = time.time()
+        conn.execute(
+            "INSERT INTO threads (assistant, thread_id, created_at, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(assistant, thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (assistant_name, thread_id, now, now),
+        )
+
+    def thread_updated_at(self, assistant_name, thread_id):
+        rows = self._query(
+            "SELECT COALESCE(updated_at, created_at) FROM threads WHERE assistant = ? AND thread_id = ?",
+            (assistant_name, thread_id),
+        )
+        return rows[0][0] if rows else None
+
+    def assistants_version(self):
+        return (self._query("SELECT name, data FROM assistants ORDER BY name"),
+                self._query("SELECT COUNT(*), MAX(created_at) FROM threads"))
+
+    def thread_version(self, assistant_name, thread_id):
+        rows = self._query(
+            "SELECT updated_at, (SELECT MAX(seq) FROM messages WHERE assistant = ? AND thread_id = ?) "
+            "FROM threads WHERE assistant = ? AND thread_id = ?",
+            (assistant_name, thread_id, assistant_name, thread_id),
+        )
+        return rows[0] if rows else None
+
+    def delete_thread(self, assistant_name, thread_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM messages WHERE assistant = ? AND thread_id = ?", (assistant_name, thread_id))
+            conn.execute("DELETE FROM threads WHERE assistant = ? AND thread_id = ?", (assistant_name, thread_id))
+
+    def delete_thread_if_unchanged(self, assistant_name, thread_id, updated_at):
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT COALESCE(updated_at, created_at) FROM threads WHERE assistant = ? AND thread_id = ?",
+                (assistant_name, thread_id),
+            ).fetchall()
+            if not rows or rows[0][0] != updated_at:
+                return False
+            conn.execute("DELETE FROM messages WHERE assistant = ? AND thread_id = ?", (assistant_name, thread_id))
+            conn.execute("DELETE FROM threads WHERE assistant = ? AND thread_id = ?", (assistant_name, thread_id))
+        return True
+
+    def load_thread_state(self, assistant_name, thread_id):
+        rows = self._query(
+            "SELECT state FROM threads WHERE assistant = ? AND thread_id = ?",
+            (assistant_name, thread_id),
+        )
+        return json.loads(rows[0][0]) if rows and rows[0][0] else {}
+
+    def save_thread_state(self, assistant_name, thread_id, state):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE threads SET state = ? WHERE assistant = ? AND thread_id = ?",
+                (json.dumps(state), assistant_name, thread_id),
+            )
+
+    def _thread_exists(self, assistant_name, thread_id):
+        return bool(self._query(
+            "SELECT 1 FROM threads WHERE assistant = ? AND thread_id = ?",
+            (assistant_name, thread_id),
+        ))
+
+    def get_thread(self, assistant_name, thread_id, limit: int = None, before: int = None) -> List[Dict]:
+        if not self._thread_exists(assistant_name, thread_id):
+            raise ValueError(f"Thread {thread_id} não encontrada.")
+
+        sql = "SELECT role, content, extra FROM messages WHERE assistant = ? AND thread_id = ?"
+        params = [assistant_name, thread_id]
+        if before is not None:
+            sql += " AND seq < ?"
+            params.append(before)
+        if limit is None:
+            rows = self._query(sql + " ORDER BY seq", params)
+        else:
+            rows = self._query(sql + " ORDER BY seq DESC LIMIT ?", params + [limit])[::-1]
+        return [self._from_row(*row) for row in rows]
+
+    def iter_thread(self, assistant_name, thread_id, start=0, batch_size=1000):
+        if not self._thread_exists(assistant_name, thread_id):
+            raise ValueError(f"Thread {thread_id} não encontrada.")
+
+        def messages(seq):
+            # Lê por blocos (pela chave primária), sem manter um cursor aberto entre blocos
+            while True:
+                rows = self._query(
+                    "SELECT seq, role, content, extra FROM messages WHERE assistant = ? AND thread_id = ? AND seq >= ? "
+                    "ORDER BY seq LIMIT ?",
+                    (assistant_name, thread_id, seq, batch_size),
+                )
+                for row in rows:
+                    yield self._from_row(*row[1:])
+                if len(rows) < batch_size:
+                    return
+                seq = rows[-1][0] + 1
+        return messages(start)
+
+    def count_messages(self, assistant_name, thread_id):
+        (count,), = self._query(
+            "SELECT COUNT(*) FROM messages WHERE assistant = ? AND thread_id = ?",
+            (assistant_name, thread_id),
+        )
+        return count
+
+    def append_messages(self, assistant_name, thread_id, messages):
+        rows = [self._to_row(message) for message in messages]  # Escreve os blobs fora da transação
+        with self._transaction() as conn:
+            self._touch_thread(conn, assistant_name, thread_id)
+            (next_seq,), = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE assistant = ? AND thread_id = ?",
+                (assistant_name, thread_id),
+            ).fetchall()
+            conn.executemany(
+                "INSERT INTO messages (assistant, thread_id, seq, role, content, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (assistant_name, thread_id, next_seq + i, *row)
+                    for i, row in enumerate(rows)
+                ],
+            )
+
+    def replace_thread(self, assistant_name, thread_id, messages):
+        rows = [self._to_row(message) for message in messages]
+        with self._transaction() as conn:
+            self._touch_thread(conn, assistant_name, thread_id)
+            conn.execute(
+                "UPDATE threads SET state = NULL WHERE assistant = ? AND thread_id = ?",
+                (assistant_name, thread_id),
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE assistant = ? AND thread_id = ?",
+                (assistant_name, thread_id),
+            )
+            conn.executemany(
+                "INSERT INTO messages (assistant, thread_id, seq, role, content, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (assistant_name, thread_id, i, *row)
+                    for i, row in enumerate(rows)
+                ],
+            )
+
+    def close(self):
+        self.conn.close()
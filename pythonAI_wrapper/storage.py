@@ -0,0 +1,679 @@
+# storage.py
+
+import json
+import os
+import time
+from collections import deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+from pythonAI_wrapper.message import BlobStore, Message, to_record
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def atomic_write(path: str, data: str):
+    """
+    Escreve um ficheiro de forma atómica: escreve num ficheiro temporário,
+    faz fsync e substitui o original com os.replace.
+
+    Args:
+        path (str): Caminho do ficheiro de destino.
+        data (str): Conteúdo a escrever.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def file_version(path: str):
+    """(inode, tamanho, mtime) de um ficheiro: muda a cada escrita ou substituição; None se não existir."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+@contextmanager
+def file_lock(path: str):
+    """Bloqueio exclusivo entre processos (no-op onde fcntl não existe)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class BaseStorage:
+    """
+    Interface comum aos backends de armazenamento do AssistantManager.
+
+    Um backend guarda a configuração dos assistentes e as mensagens de cada
+    thread. As mensagens lidas são objetos Message (que se usam como os
+    dicionários {"role", "content"}); na escrita aceitam-se Message ou
+    dicionários. Conteúdos grandes são guardados uma única vez no BlobStore
+    `blobs` e as mensagens guardam só a referência. As threads arquivadas
+    (ver TieredStorage) ficam comprimidas em `archive_root` e o índice de
+    pesquisa (ver SearchIndex) fica em `search_path`.
+    """
+
+    blobs: BlobStore = None
+    archive_root: str = None
+    search_path: str = None
+
+    def _record(self, message) -> Dict:
+        """Registo a escrever para uma mensagem (conteúdos grandes vão para o BlobStore)."""
+        return to_record(message, self.blobs)
+
+    def _message(self, record: Dict) -> Message:
+        """Mensagem a partir de um registo lido."""
+        return Message.from_record(record, self.blobs)
+
+    def load_assistants(self) -> Dict[str, Dict]:
+        """Retorna {nome: {'api_key', 'model', 'instructions'}}."""
+        raise NotImplementedError
+
+    def save_assistant(self, name: str, data: Dict):
+        """Cria ou atualiza a configuração de um assistente."""
+        raise NotImplementedError
+
+    def list_threads(self, assistant_name: str) -> List[str]:
+        """Lista os IDs das threads de um assistente."""
+        raise NotImplementedError
+
+    def create_thread(self, assistant_name: str, thread_id: str):
+        """Regista uma nova thread vazia."""
+        raise NotImplementedError
+
+    def get_thread(self, assistant_name: str, thread_id: str, limit: int = None, before: int = None) -> List[Dict]:
+        """
+        Retorna as mensagens de uma thread, por ordem cronológica.
+
+        Args:
+            limit (int, optional): Número máximo de mensagens (as mais recentes).
+            before (int, optional): Só mensagens com posição inferior a esta
+                (posições começam em 0), para paginar para trás.
+        """
+        raise NotImplementedError
+
+    def iter_thread(self, assistant_name: str, thread_id: str, start: int = 0) -> Iterator[Message]:
+        """
+        Percorre as mensagens de uma thread a partir da posição `start`, sem
+        a carregar toda em memória nos backends que o permitem.
+        """
+        return iter(self.get_thread(assistant_name, thread_id)[start:])
+
+    def append_messages(self, assistant_name: str, thread_id: str, messages: List[Dict]):
+        """Acrescenta mensagens ao fim de uma thread."""
+        raise NotImplementedError
+
+    def replace_thread(self, assistant_name: str, thread_id: str, messages: List[Dict]):
+        """Substitui o conteúdo completo de uma thread."""
+        raise NotImplementedError
+
+    def thread_updated_at(self, assistant_name: str, thread_id: str) -> Optional[float]:
+        """Momento (time.time()) da última escrita numa thread, ou None se não for conhecido."""
+        return None
+
+    def assistants_version(self):
+        """
+        Valor que muda quando a configuração dos assistentes ou a lista de
+        threads é alterada (também por outro processo). None se o backend não
+        o souber indicar: quem guarda uma cópia deve voltar a lê-la.
+        """
+        return None
+
+    def thread_version(self, assistant_name: str, thread_id: str):
+        """Como assistants_version, para as mensagens de uma thread."""
+        return None
+
+    def delete_thread(self, assistant_name: str, thread_id: str):
+        """Remove uma thread e as suas mensagens (os blobs não são apagados)."""
+        raise NotImplementedError
+
+    def delete_thread_if_unchanged(self, assistant_name: str, thread_id: str, updated_at: float) -> bool:
+        """
+        Remove uma thread só se não foi escrita depois de `updated_at` (ver
+        thread_updated_at). Os backends fazem a verificação e a remoção com
+        o lock de escrita, para que uma escrita concorrente não se perca.
+
+        Returns:
+            bool: True se a thread foi removida.
+        """
+        if self.thread_updated_at(assistant_name, thread_id) != updated_at:
+            return False
+        self.delete_thread(assistant_name, thread_id)
+        return True
+
+    def load_thread_state(self, assistant_name: str, thread_id: str) -> Dict:
+        """
+        Estado guardado com uma thread (por exemplo o resumo da janela de
+        contexto), ou {} se não houver.
+        """
+        return {}
+
+    def save_thread_state(self, assistant_name: str, thread_id: str, state: Dict):
+        """
+        Guarda o estado de uma thread. É descartado quando a thread é apagada
+        ou substituída (replace_thread). Os backends que não o guardam
+        ignoram-no: o estado fica só em memória.
+        """
+
+    def load_threads(self, assistant_name: str) -> Dict[str, List[Dict]]:
+        """Carrega todas as threads de um assistente."""
+        return {
+            thread_id: self.get_thread(assistant_name, thread_id)
+            for thread_id in self.list_threads(assistant_name)
+        }
+
+
+class LazyThreads(MutableMapping):
+    """
+    Dicionário {thread_id: mensagens} que só lê do armazenamento o que for
+    usado: a lista de IDs no primeiro acesso e cada thread no primeiro
+    acesso a essa thread.
+    """
+
+    def __init__(self, storage: BaseStorage, assistant_name: str):
+        self.storage = storage
+        self.assistant_name = assistant_name
+        self._ids = None
+        self._loaded: Dict[str, List[Dict]] = {}
+        self._versions: Dict[str, object] = {}  # thread_id -> thread_version quando foi lida
+
+    def _thread_ids(self):
+        if self._ids is None:
+            self._ids = dict.fromkeys(self.storage.list_threads(self.assistant_name))
+        return self._ids
+
+    def __contains__(self, thread_id):
+        return thread_id in self._thread_ids()
+
+    def __getitem__(self, thread_id):
+        if thread_id not in self._loaded:
+            if thread_id not in self._thread_ids():
+                raise KeyError(thread_id)
+            # A versão é lida antes das mensagens: uma escrita a meio obriga a ler de novo
+            self._versions[thread_id] = self.storage.thread_version(self.assistant_name, thread_id)
+            self._loaded[thread_id] = self.storage.get_thread(self.assistant_name, thread_id)
+        return self._loaded[thread_id]
+
+    def __setitem__(self, thread_id, messages):
+        self._thread_ids()[thread_id] = None
+        self._loaded[thread_id] = messages
+
+    def __delitem__(self, thread_id):
+        del self._thread_ids()[thread_id]
+        self.unload(thread_id)
+
+    def __iter__(self):
+        return iter(list(self._thread_ids()))
+
+    def __len__(self):
+        return len(self._thread_ids())
+
+    def is_loaded(self, thread_id):
+        """Indica se a thread já está em memória."""
+        return thread_id in self._loaded
+
+    def unload(self, thread_id):
+        """Liberta as mensagens de uma thread (voltam a ser lidas no próximo acesso)."""
+        self._loaded.pop(thread_id, None)
+        self._versions.pop(thread_id, None)
+
+    def load_state(self, thread_id):
+        """Estado guardado com a thread (ver BaseStorage.load_thread_state)."""
+        return self.storage.load_thread_state(self.assistant_name, thread_id)
+
+    def save_state(self, thread_id, state):
+        """Guarda o estado da thread (ver BaseStorage.save_thread_state)."""
+        self.storage.save_thread_state(self.assistant_name, thread_id, state)
+
+    def mark_written(self, thread_id):
+        """Regista que a cópia em memória de uma thread inclui a última escrita (feita por este processo)."""
+        if thread_id in self._loaded:
+            self._versions[thread_id] = self.storage.thread_version(self.assistant_name, thread_id)
+
+    def refresh(self):
+        """
+        Esquece a lista de threads e as threads alteradas no armazenamento
+        (por exemplo por outro processo) desde que foram lidas.
+        """
+        self._ids = None
+        for thread_id in list(self._loaded):
+            version = self.storage.thread_version(self.assistant_name, thread_id)
+            if version is None or version != self._versions.get(thread_id):
+                self.unload(thread_id)
+
+
+def paginate(messages: List[Dict], limit: int = None, before: int = None) -> List[Dict]:
+    """Aplica limit/before (ver BaseStorage.get_thread) a uma lista de mensagens."""
+    end = len(messages) if before is None else max(0, min(before, len(messages)))
+    start = 0 if limit is None else max(0, end - limit)
+    return messages[start:end]
+
+
+class JSONStorage(BaseStorage):
+    """
+    Backend original: um assistants.json e um threads.json reescritos por
+    inteiro a cada alteração. Mantido por compatibilidade.
+    """
+
+    def __init__(self, filename='assistants.json', threads_filename='threads.json'):
+        self.filename = filename
+        self.threads_filename = threads_filename
+        # Momento da última escrita em cada thread: {assistente: {thread: time.time()}}
+        self.activity_filename = os.path.splitext(threads_filename)[0] + '.activity.json'
+        # Estado de cada thread (ver load_thread_state): {assistente: {thread: estado}}
+        self.state_filename = os.path.splitext(threads_filename)[0] + '.state.json'
+        self.blobs = BlobStore(os.path.join(os.path.dirname(threads_filename), 'blobs'))
+        self.archive_root = os.path.join(os.path.dirname(threads_filename), 'archive')
+        self.search_path = os.path.join(os.path.dirname(threads_filename), 'search.db')
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            content = f.read()
+        return json.loads(content) if content.strip() else {}
+
+    def load_assistants(self):
+        return self._read(self.filename)
+
+    def save_assistant(self, name, data):
+        with file_lock(self.filename + '.lock'):
+            assistants = self._read(self.filename)
+            assistants[name] = data
+            atomic_write(self.filename, json.dumps(assistants, indent=4))
+
+    def _update_threads(self, assistant_name, update, thread_id=None, touch=True):
+        with file_lock(self.threads_filename + '.lock'):
+            self._write_threads(assistant_name, update, thread_id, touch)
+
+    def _write_threads(self, assistant_name, update, thread_id, touch):
+        # Chamado com o lock das threads já adquirido
+        data = self._read(self.threads_filename)
+        update(data.setdefault(assistant_name, {}))
+        atomic_write(self.threads_filename, json.dumps(data, indent=4))
+        if thread_id is not None:
+            activity = self._read(self.activity_filename)
+            if touch:
+                activity.setdefault(assistant_name, {})[thread_id] = time.time()
+            else:
+                activity.get(assistant_name, {}).pop(thread_id, None)
+            atomic_write(self.activity_filename, json.dumps(activity))
+
+    def _update_state(self, assistant_name, thread_id, state):
+        with file_lock(self.threads_filename + '.lock'):
+            self._write_state(assistant_name, thread_id, state)
+
+    def _write_state(self, assistant_name, thread_id, state):
+        # Chamado com o lock das threads já adquirido
+        states = self._read(self.state_filename)
+        if state is not None:
+            states.setdefault(assistant_name, {})[thread_id] = state
+        elif thread_id in states.get(assistant_name, {}):
+            del states[assistant_name][thread_id]
+        else:
+            return
+        atomic_write(self.state_filename, json.dumps(states))
+
+    def list_threads(self, assistant_name):
+        return list(self._read(self.threads_filename).get(assistant_name, {}).keys())
+
+    def create_thread(self, assistant_name, thread_id):
+        self._update_threads(assistant_name, lambda threads: threads.setdefault(thread_id, []), thread_id)
+
+    def thread_updated_at(self, assistant_name, thread_id):
+        return self._read(self.activity_filename).get(assistant_name, {}).get(thread_id)
+
+    def assistants_version(self):
+        return file_version(self.filename), file_version(self.threads_filename)
+
+    def thread_version(self, assistant_name, thread_id):
+        return file_version(self.threads_filename)  # Todas as threads estão no mesmo ficheiro
+
+    def delete_thread(self, assistant_name, thread_id):
+        self._update_threads(assistant_name, lambda threads: threads.pop(thread_id, None), thread_id, touch=False)
+        self._update_state(assistant_name, thread_id, None)
+
+    def delete_thread_if_unchanged(self, assistant_name, thread_id, updated_at):
+        with file_lock(self.threads_filename + '.lock'):
+            if self.thread_updated_at(assistant_name, thread_id) != updated_at:
+                return False
+            self._write_threads(assistant_name, lambda threads: threads.pop(thread_id, None), thread_id, touch=False)
+            self._write_state(assistant_name, thread_id, None)
+        return True
+
+    def load_thread_state(self, assistant_name, thread_id):
+        return self._read(self.state_filename).get(assistant_name, {}).get(thread_id, {})
+
+    def save_thread_state(self, assistant_name, thread_id, state):
+        self._update_state(assistant_name, thread_id, state)
+
+    def get_thread(self, assistant_name, thread_id, limit=None, before=None):
+        threads = self._read(self.threads_filename).get(assistant_name, {})
+        if thread_id not in threads:
+            raise ValueError(f"Thread {thread_id} não encontrada.")
+        return [self._message(record) for record in paginate(threads[thread_id], limit, before)]
+
+    def load_threads(self, assistant_name):
+        return {
+            thread_id: [self._message(record) for record in records]
+            for thread_id, records in self._read(self.threads_filename).get(assistant_name, {}).items()
+        }
+
+    def append_messages(self, assistant_name, thread_id, messages):
+        records = [self._record(message) for message in messages]
+        self._update_threads(assistant_name, lambda threads: threads.setdefault(thread_id, []).extend(records), thread_id)
+
+    def replace_thread(self, assistant_name, thread_id, messages):
+        records = [self._record(message) for message in messages]
+
+        def update(threads):
+            threads[thread_id] = records
+        self._update_threads(assistant_name, update, thread_id)
+        self._update_state(assistant_name, thread_id, None)
+
+
+class AppendOnlyStorage(BaseStorage):
+    """
+    Backend append-only: um segmento JSONL por thread e um pequeno índice.
+
+    Layout em disco:
+        <root>/index.json                          assistentes e threads
+        <root>/threads/<assistente>/<thread>.jsonl  uma mensagem por linha
+        <root>/threads/<assistente>/<thread>.state.json  estado da thread (opcional)
+
+    Enviar uma mensagem acrescenta uma linha ao segmento da thread (custo
+    O(1)); o índice só é reescrito (atomicamente) quando se cria um
+    assistente ou uma thread. As escritas num segmento são feitas com um
+    lock (flock) sobre o próprio segmento.
+    """
+
+    def __init__(self, root='conversations', fsync=True):
+        self.root = root
+        self.fsync = fsync
+        self.index_path = os.path.join(root, 'index.json')
+        self.lock_path = os.path.join(root, '.lock')
+        self.blobs = BlobStore(os.path.join(root, 'blobs'))
+        self.archive_root = os.path.join(root, 'archive')
+        self.search_path = os.path.join(root, 'search.db')
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {"assistants": {}, "threads": {}}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _update_index(self, update):
+        with file_lock(self.lock_path):
+            index = self._read_index()
+            update(index)
+            atomic_write(self.index_path, json.dumps(index, indent=4))
+
+    def _segment_path(self, assistant_name, thread_id):
+        return os.path.join(self.root, 'threads', quote(assistant_name, safe=''), quote(thread_id, safe='') + '.jsonl')
+
+    def _state_path(self, assistant_name, thread_id):
+        return os.path.join(self.root, 'threads', quote(assistant_name, safe=''), quote(thread_id, safe='') + '.state.json')
+
+    def load_assistants(self):
+        return self._read_index()["assistants"]
+
+    def save_assistant(self, name, data):
+        def update(index):
+            index["assistants"][name] = data
+            index["threads"].setdefault(name, [])
+        self._update_index(update)
+
+    def list_threads(self, assistant_name):
+        return list(self._read_index()["threads"].get(assistant_name, []))
+
+    def create_thread(self, assistant_name, thread_id):
+        path = self._segment_path(assistant_name, thread_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'a').close()
+
+        def update(index):
+            threads = index["threads"].setdefault(assistant_name, [])
+            if thread_id not in threads:
+                threads.append(thread_id)
+        self._update_index(update)
+
+    def thread_updated_at(self, assistant_name, thread_id):
+        try:
+            return os.path.getmtime(self._segment_path(assistant_name, thread_id))
+        except OSError:
+            return None
+
+    def assistants_version(self):
+        return file_version(self.index_path)
+
+    def thread_version(self, assistant_name, thread_id):
+        return file_version(self._segment_path(assistant_name, thread_id))
+
+    def delete_thread(self, assistant_name, thread_id):
+        def update(index):
+            threads = index["threads"].get(assistant_name, [])
+            if thread_id in threads:
+                threads.remove(thread_id)
+        self._update_index(update)
+        for path in (self._segment_path(assistant_name, thread_id), self._state_path(assistant_name, thread_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def delete_thread_if_unchanged(self, assistant_name, thread_id, updated_at):
+        path = self._segment_path(assistant_name, thread_id)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            # Com o lock do segmento nenhum append_messages pode escrever entre a verificação e a remoção
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            if self.thread_updated_at(assistant_name, thread_id) != updated_at or not self._is_current(fd, path):
+                return False
+            self.delete_thread(assistant_name, thread_id)
+            return True
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _is_current(fd, path):
+        """Indica se `fd` ainda é o ficheiro em `path` (não foi removido nem substituído)."""
+        try:
+            return os.path.samestat(os.fstat(fd), os.stat(path))
+        except FileNotFoundError:
+            return False
+
+    def load_thread_state(self, assistant_name, thread_id):
+        try:
+            with open(self._state_path(assistant_name, thread_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_thread_state(self, assistant_name, thread_id, state):
+        path = self._state_path(assistant_name, thread_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, json.dumps(state, ensure_ascii=False))
+
+    def _records(self, assistant_name, thread_id):
+        path = self._segment_path(assistant_name, thread_id)
+        if not os.path.exists(path):
+            raise ValueError(f"Thread {thread_id} não encontrada.")
+
+        def records():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # Última linha incompleta (escrita interrompida)
+                    yield line
+        return records()
+
+    def get_thread(self, assistant_name, thread_id, limit=None, before=None):
+        lines = self._records(assistant_name, thread_id)
+        if before is not None:
+            lines = islice(lines, max(0, before))
+        if limit is not None:
+            lines = deque(lines, maxlen=max(0, limit))  # Só as últimas `limit` linhas ficam em memória
+        return [self._message(json.loads(line)) for line in lines]
+
+    def iter_thread(self, assistant_name, thread_id, start=0):
+        lines = islice(self._records(assistant_name, thread_id), start, None)
+        return (self._message(json.loads(line)) for line in lines)
+
+    def load_threads(self, assistant_name):
+        threads = {}
+        for thread_id in self.list_threads(assistant_name):
+            try:
+                threads[thread_id] = self.get_thread(assistant_name, thread_id)
+            except ValueError:
+                threads[thread_id] = []
+        return threads
+
+    def append_messages(self, assistant_name, thread_id, messages):
+        path = self._segment_path(assistant_name, thread_id)
+        data = ''.join(json.dumps(self._record(message), ensure_ascii=False) + '\n' for message in messages)
+        # Uma única escrita em modo append: linhas completas ou nada de novo
+        while True:
+            if not os.path.exists(path):
+                self.create_thread(assistant_name, thread_id)
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+            except FileNotFoundError:
+                continue
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            if self._is_current(fd, path):
+                break
+            os.close(fd)  # Segmento removido ou substituído entretanto: escreve no atual
+        try:
+            self._truncate_torn_tail(fd, path)
+            os.write(fd, data.encode('utf-8'))
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _truncate_torn_tail(self, fd, path):
+        """Remove uma linha final incompleta deixada por uma escrita interrompida."""
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return
+        with open(path, 'rb') as f:
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            # Procura o último '\n' por blocos a partir do fim
+            position = size
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                block = f.read(step)
+                newline = block.rfind(b'\n')
+                if newline != -1:
+                    os.truncate(path, position + newline + 1)
+                    return
+            os.truncate(path, 0)
+
+    @contextmanager
+    def _locked_segment(self, path):
+        """Mantém o lock do segmento atual em `path` (o mesmo de append_messages); sem segmento, não bloqueia."""
+        while True:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                yield
+                return
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                if self._is_current(fd, path):
+                    yield
+                    return
+            finally:
+                os.close(fd)  # Substituído entretanto: tenta de novo com o atual
+
+    def replace_thread(self, assistant_name, thread_id, messages):
+        path = self._segment_path(assistant_name, thread_id)
+        data = ''.join(json.dumps(self._record(message), ensure_ascii=False) + '\n' for message in messages)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._locked_segment(path):
+            atomic_write(path, data)  # Um append à espera do lock escreve depois no segmento novo
+        self.create_thread(assistant_name, thread_id)
+        state_path = self._state_path(assistant_name, thread_id)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+
+def migrate_json_layout(storage: BaseStorage, filename='assistants.json', threads_filename='threads.json'):
+    """
+    Migra (uma única vez) o layout antigo assistants.json/threads.json para
+    outro backend. Os ficheiros antigos não são alterados.
+
+    Cada assistente só é guardado depois de todas as suas threads, por isso
+    um assistente presente no destino está completo. Se a migração for
+    interrompida, a próxima chamada migra os assistentes que faltam (o
+    destino só tem assistentes do layout antigo). Não faz nada se os
+    ficheiros antigos não existirem, se o destino já tiver todos os
+    assistentes ou se tiver outros assistentes (não é um destino migrado).
+
+    Returns:
+        bool: True se alguma coisa foi migrada.
+    """
+    legacy = JSONStorage(filename, threads_filename)
+    assistants = legacy.load_assistants()
+    if not assistants:
+        return False
+    existing = storage.load_assistants()
+    missing = [name for name in assistants if name not in existing]
+    if not missing or any(name not in assistants for name in existing):
+        return False
+
+    for name in missing:
+        for thread_id, messages in legacy.load_threads(name).items():
+            storage.replace_thread(name, thread_id, messages)
+        storage.save_assistant(name, assistants[name])  # Por último: marca o assistente como migrado
+    return True
+
+
+def create_storage(backend: str = 'jsonl', path: str = None) -> BaseStorage:
+    """
+    Cria um backend de armazenamento pelo nome.
+
+    Args:
+        backend (str): 'jsonl' (append-only), 'sqlite' ou 'json' (layout antigo).
+        path (str, optional): Pasta (jsonl), ficheiro .db (sqlite) ou
+            ficheiro de assistentes (json).
+
+    Raises:
+        ValueError: Se o backend não for conhecido.
+    """
+    if backend == 'jsonl':
+        return AppendOnlyStorage(path or 'conversations')
+    if backend == 'sqlite':
+        from pythonAI_wrapper.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(path or 'conversations.db')
+    if backend == 'json':
+        return JSONStorage(path or 'assistants.json')
+    raise ValueError(f"Backend de armazenamento '{backend}' desconhecido.")
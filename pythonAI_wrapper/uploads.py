@@ -0,0 +1,158 @@
+# uploads.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List
+
+from pythonAI_wrapper.storage import atomic_write, file_lock
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Hash SHA-256 do conteúdo, lido em blocos (sem carregar o ficheiro em memória)."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_or_copy(source: str, destination: str) -> str:
+    """
+    Coloca uma cópia de `source` em `destination`: cria um hard link quando
+    possível e, caso contrário (outro sistema de ficheiros, Windows...), usa
+    shutil.copyfile, que copia em blocos (ou com sendfile, sem passar pelo
+    processo). Não faz nada se o destino já for o mesmo ficheiro.
+
+    Returns:
+        str: 'exists', 'link' ou 'copy'.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    if os.path.exists(destination):
+        if os.path.samefile(source, destination):
+            return 'exists'
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+        return 'link'
+    except OSError:
+        shutil.copyfile(source, destination)
+        return 'copy'
+
+
+class FileUploader:
+    """
+    Envia ficheiros para a API de ficheiros da OpenAI sem duplicados.
+
+    Cada ficheiro é identificado pelo hash do conteúdo; o índice
+    <root>/.uploads.json guarda {hash da chave API: {sha256: file_id}}, por
+    isso um ficheiro já enviado (por qualquer thread) reutiliza o file_id
+    em vez de ser enviado outra vez.
+    """
+
+    def __init__(self, root: str = 'thread_files', max_workers: int = 4):
+        """
+        Args:
+            root (str, optional): Pasta onde ficam as cópias por thread e o índice.
+            max_workers (int, optional): Número de envios simultâneos em upload_many.
+        """
+        self.root = root
+        self.max_workers = max_workers
+        self.index_path = os.path.join(root, '.uploads.json')
+        self._lock = threading.Lock()
+        self._pending: Dict[str, threading.Lock] = {}  # sha256 -> lock do envio em curso
+
+    @staticmethod
+    def _account(api_key: str) -> str:
+        # Os file_id pertencem à conta, por isso o índice é separado por chave
+        return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def lookup(self, api_key: str, sha256: str):
+        """Retorna o file_id já enviado para este conteúdo, ou None."""
+        return self._read_index().get(self._account(api_key), {}).get(sha256)
+
+    def remember(self, api_key: str, sha256: str, file_id: str):
+        """Regista o file_id de um conteúdo enviado."""
+        with self._lock, file_lock(self.index_path + '.lock'):
+            index = self._read_index()
+            index.setdefault(self._account(api_key), {})[sha256] = file_id
+            atomic_write(self.index_path, json.dumps(index))
+
+    def upload(self, client, api_key: str, file_path: str, thread_id: str,
+               purpose: str = 'assistants') -> Dict:
+        """
+        Copia o ficheiro para <root>/<thread_id> e envia-o, se o conteúdo
+        ainda não tiver sido enviado.
+
+        Returns:
+            Dict: {'path', 'file_id', 'sha256', 'uploaded', 'bytes'}.
+        """
+        local_path = os.path.join(self.root, thread_id, os.path.basename(file_path))
+        link_or_copy(file_path, local_path)
+
+        sha256 = file_sha256(local_path)
+        with self._lock:
+            pending = self._pending.setdefault(sha256, threading.Lock())
+        # Ficheiros iguais enviados ao mesmo tempo esperam pelo primeiro envio
+        with pending:
+            file_id = self.lookup(api_key, sha256)
+            uploaded = file_id is None
+            if uploaded:
+                with open(local_path, 'rb') as f:
+                    file_id = client.files.create(file=f, purpose=purpose).id
+                self.remember(api_key, sha256, file_id)
+
+        return {'path': file_path, 'file_id': file_id, 'sha256': sha256,
+                'uploaded': uploaded, 'bytes': os.path.getsize(local_path)}
+
+    def upload_many(self, client, api_key: str, file_paths: List[str], thread_id: str,
+                    on_uploaded: Callable[[Dict], None] = None,
+                    progress: Callable[[int, int, Dict], None] = None) -> List[Dict]:
+        """
+        Envia vários ficheiros em paralelo (no máximo max_workers de cada vez).
+
+        Args:
+            on_uploaded (callable, optional): Chamada (na thread de trabalho) com o
+                resultado de cada ficheiro, por exemplo para o anexar à thread.
+            progress (callable, optional): Chamada com (concluídos, total, resultado)
+                à medida que os ficheiros terminam.
+
+        Returns:
+            List[Dict]: Os resultados de upload(), pela ordem de file_paths.
+        """
+        def work(file_path):
+            result = self.upload(client, api_key, file_path, thread_id)
+            if on_uploaded is not None:
+                on_uploaded(result)
+            return result
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(work, file_path): file_path for file_path in file_paths}
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                results[futures[future]] = result
+                if progress is not None:
+                    progress(done, len(file_paths), result)
+        return [results[file_path] for file_path in file_paths]
+
+
+_default_uploader = None
+
+
+def get_file_uploader() -> FileUploader:
+    """FileUploader partilhado pelos assistentes do processo."""
+    global _default_uploader
+    if _default_uploader is None:
+        _default_uploader = FileUploader()
+    return _default_uploader
@@ -12,8 +12,12 @@ setup(
     install_requires=[
         'openai',
         'PyPDF2',
+        'httpx',
         'argparse',
     ],
+    extras_require={
+        'retrieval': ['numpy'],  # Pesquisa nos documentos (set_retrieval)
+    },
     entry_points={
         'console_scripts': [
             'openai-cli=PythonAi.cli_tool:main',  # Registra a ferramenta CLI
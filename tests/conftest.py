@@ -0,0 +1,47 @@
+# conftest.py
+#
+# Fixtures dos testes: cada teste corre numa pasta temporária, com os
+# limitadores e o registo de clientes do processo novos, contra o servidor
+# falso de benchmarks/fake_openai.py.
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_openai import FakeOpenAIServer  # noqa: E402
+from pythonAI_wrapper.assistant_manager import AssistantManager  # noqa: E402
+from pythonAI_wrapper.client_registry import configure_client_registry  # noqa: E402
+from pythonAI_wrapper.metrics import get_metrics  # noqa: E402
+from pythonAI_wrapper.rate_limiter import configure_rate_limiter  # noqa: E402
+from pythonAI_wrapper.storage import create_storage  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Pasta temporária como diretório atual; limitador, clientes e métricas novos."""
+    monkeypatch.chdir(tmp_path)
+    configure_rate_limiter(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+    configure_client_registry()
+    get_metrics().clear()
+    return tmp_path
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Servidor falso da OpenAI; os clientes criados durante o teste usam-no."""
+    with FakeOpenAIServer() as server:
+        monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+        yield server
+
+
+@pytest.fixture
+def manager(fake_openai):
+    """AssistantManager (jsonl) com um assistente 'A'."""
+    manager = AssistantManager(storage=create_storage('jsonl'))
+    manager.create_assistant('sk-test', 'A')
+    return manager
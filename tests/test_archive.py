@@ -0,0 +1,64 @@
+# test_archive.py
+
+import os
+import time
+
+import pytest
+
+from pythonAI_wrapper.archive import TieredStorage
+from pythonAI_wrapper.sqlite_storage import SQLiteStorage
+from pythonAI_wrapper.storage import AppendOnlyStorage, JSONStorage
+
+
+def backends(workdir):
+    return {
+        'jsonl': AppendOnlyStorage(str(workdir / 'conversations')),
+        'sqlite': SQLiteStorage(str(workdir / 'conversations.db')),
+        'json': JSONStorage(str(workdir / 'assistants.json'), str(workdir / 'threads.json')),
+    }
+
+
+@pytest.fixture(params=['jsonl', 'sqlite', 'json'])
+def storage(request, workdir):
+    storage = TieredStorage(backends(workdir)[request.param], root=str(workdir / 'archive'))
+    storage.save_assistant('A', {'name': 'A'})
+    storage.append_messages('A', 't', [{'role': 'user', 'content': "olá"}, {'role': 'assistant', 'content': "bom dia"}])
+    return storage
+
+
+def test_reading_an_archived_thread_does_not_rehydrate_it(storage):
+    assert [row['thread_id'] for row in storage.compact(0)] == ['t']
+
+    assert [message['content'] for message in storage.get_thread('A', 't')] == ["olá", "bom dia"]
+    assert [message['content'] for message in storage.get_thread('A', 't', limit=1)] == ["bom dia"]
+    assert list(storage.load_threads('A')) == ['t']
+    assert storage.archive.entry('A', 't') is not None
+    assert 't' not in storage.storage.list_threads('A')
+
+    storage.append_messages('A', 't', [{'role': 'user', 'content': "adeus"}])
+    assert storage.archive.entry('A', 't') is None
+    assert [message['content'] for message in storage.get_thread('A', 't')] == ["olá", "bom dia", "adeus"]
+
+
+def test_thread_written_during_compaction_stays_live(storage):
+    backend = storage.storage
+    updated_at = backend.thread_updated_at('A', 't')
+    time.sleep(0.01)
+    backend.append_messages('A', 't', [{'role': 'user', 'content': "ainda aqui"}])
+
+    assert not backend.delete_thread_if_unchanged('A', 't', updated_at)
+    assert len(backend.get_thread('A', 't')) == 3
+    assert backend.delete_thread_if_unchanged('A', 't', backend.thread_updated_at('A', 't'))
+    assert 't' not in backend.list_threads('A')
+
+
+def test_append_after_the_segment_was_removed_recreates_the_thread(workdir):
+    storage = AppendOnlyStorage(str(workdir / 'conversations'))
+    storage.save_assistant('A', {'name': 'A'})
+    storage.append_messages('A', 't', [{'role': 'user', 'content': "olá"}])
+    assert storage.delete_thread_if_unchanged('A', 't', storage.thread_updated_at('A', 't'))
+    assert not os.path.exists(storage._segment_path('A', 't'))
+
+    storage.append_messages('A', 't', [{'role': 'user', 'content': "de volta"}])
+    assert storage.list_threads('A') == ['t']
+    assert [message['content'] for message in storage.get_thread('A', 't')] == ["de volta"]
@@ -0,0 +1,49 @@
+# test_assistant_manager.py
+
+import json
+import os
+
+from pythonAI_wrapper.assistant_manager import AssistantManager
+from pythonAI_wrapper.client_registry import configure_client_registry, get_client_registry
+from pythonAI_wrapper.storage import AppendOnlyStorage, create_storage
+
+
+def test_default_storage_lives_next_to_the_legacy_files(workdir, fake_openai):
+    data = workdir / 'dados'
+    data.mkdir()
+    (data / 'assistants.json').write_text(json.dumps({'A': {'api_key': 'sk-test', 'model': 'gpt-4', 'instructions': ''}}))
+    (data / 'threads.json').write_text(json.dumps({'A': {'thread': [{"role": "user", "content": "olá"}]}}))
+
+    manager = AssistantManager(filename=str(data / 'assistants.json'), threads_filename=str(data / 'threads.json'))
+    assert manager.storage.root == os.path.join(str(data), 'conversations')
+    assert manager.get_thread_history('A', 'thread') == [{"role": "user", "content": "olá"}]
+    assert not os.path.exists(workdir / 'conversations')
+
+
+def test_startup_reads_only_the_assistant_configuration(manager, fake_openai, monkeypatch):
+    manager.create_assistant('sk-test', 'B')
+    for name in ('A', 'B'):
+        manager.create_thread(name, 'thread')
+        manager.send_prompt(name, 'thread', "olá")
+    configure_client_registry()
+    reads = []
+    get_thread = AppendOnlyStorage.get_thread
+
+    def counting(self, *args, **kwargs):
+        reads.append(args)
+        return get_thread(self, *args, **kwargs)
+
+    monkeypatch.setattr(AppendOnlyStorage, 'get_thread', counting)
+
+    reloaded = AssistantManager(storage=create_storage('jsonl'))
+    assert sorted(reloaded.list_assistants()) == [('A', 'gpt-4'), ('B', 'gpt-4')]
+    assert get_client_registry().stats()['created'] == 0
+    assert not reads
+    assert all(not assistant.threads.is_loaded('thread') for assistant in reloaded.assistants.values())
+
+    assert len(reloaded.get_thread_history('A', 'thread')) == 2
+    assert reads == [('A', 'thread')]
+    assert get_client_registry().stats()['created'] == 0
+    reloaded.send_prompt('A', 'thread', "outra vez")
+    assert get_client_registry().stats()['created'] == 1
+    assert not reloaded.assistants['B'].threads.is_loaded('thread')
@@ -0,0 +1,60 @@
+# test_async.py
+
+import asyncio
+import threading
+
+import pytest
+
+from pythonAI_wrapper.async_assistant import AsyncAssistantManager
+from pythonAI_wrapper.storage import create_storage
+
+
+@pytest.fixture
+def async_manager(fake_openai):
+    manager = AsyncAssistantManager(storage=create_storage('jsonl'))
+    manager.create_assistant('sk-test', 'A')
+    manager.create_thread('A', 'thread')
+    return manager
+
+
+def test_send_prompt(async_manager):
+    response = asyncio.run(async_manager.send_prompt('A', 'thread', "olá"))
+    assert response.endswith("olá")
+    assert [m['role'] for m in async_manager.get_thread_history('A', 'thread')] == ['user', 'assistant']
+
+
+def test_retrieval_runs_outside_the_event_loop(async_manager, monkeypatch):
+    assistant = async_manager.get_assistant('A')
+    assistant.set_retrieval('hashing')
+    assistant.ingest_document('thread', "O prazo de entrega é sexta-feira.", source='notas.txt')
+    context_for = assistant.retriever.context_for
+    threads = []
+
+    def recording_context_for(*args):
+        threads.append(threading.get_ident())
+        return context_for(*args)
+    monkeypatch.setattr(assistant.retriever, 'context_for', recording_context_for)
+
+    async def send():
+        await async_manager.send_prompt('A', 'thread', "Qual é o prazo?")
+        return threading.get_ident()
+    loop_thread = asyncio.run(send())
+    assert threads and loop_thread not in threads
+
+
+def test_sync_folder_prompt_is_rejected(async_manager, workdir):
+    (workdir / 'pasta').mkdir()
+    (workdir / 'pasta' / 'nota.txt').write_text("texto", encoding='utf-8')
+    with pytest.raises(TypeError):
+        async_manager.sync_folder('A', str(workdir / 'pasta'), 'thread', target='prompt')
+    assert async_manager.get_thread_history('A', 'thread') == []
+
+
+def test_manager_can_be_used_by_several_event_loops(async_manager):
+    async_manager.max_concurrency = 1  # Os pedidos esperam pelo semáforo e pelo lock da thread
+    async_manager.create_thread('A', 'outra')
+    for prompt in ("primeiro", "segundo"):
+        requests = [('A', 'thread', prompt), ('A', 'thread', prompt), ('A', 'outra', prompt)]
+        responses = asyncio.run(async_manager.send_many(requests))
+        assert all(response.endswith(prompt) for response in responses)
+    assert len(async_manager.get_thread_history('A', 'thread')) == 8
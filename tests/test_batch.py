@@ -0,0 +1,104 @@
+# test_batch.py
+
+import json
+import os
+
+import pytest
+
+from pythonAI_wrapper.assistant_manager import AssistantManager
+from pythonAI_wrapper.batch import BatchManager
+from pythonAI_wrapper.storage import create_storage
+
+
+def write_prompts(path, thread_id, prompts):
+    with open(path, 'w', encoding='utf-8') as f:
+        for prompt in prompts:
+            f.write(json.dumps({"prompt": prompt, "thread_id": thread_id}) + "\n")
+
+
+def contents(manager, thread_id, role):
+    return [m['content'] for m in manager.get_thread_history('A', thread_id) if m['role'] == role]
+
+
+def test_submit_poll_collect(manager, fake_openai, workdir):
+    (workdir / 'pergunta.txt').write_text("Quanto é 2+2?", encoding='utf-8')
+    write_prompts(workdir / 'varias.jsonl', 'lote', ["primeira", "segunda"])
+    batches = BatchManager(manager)
+
+    job_id = batches.submit('A', [str(workdir / 'pergunta.txt'), str(workdir / 'varias.jsonl')])
+    job = batches.status(job_id)
+    assert [part['status'] for part in job['parts']] == ['completed']
+    assert job['parts'][0]['request_counts']['completed'] == 3
+
+    assert batches.collect(job_id) == {'collected': 3, 'failed': 0, 'pending': 0}
+    assert contents(manager, 'batch_pergunta', 'user') == ["Quanto é 2+2?"]
+    assert contents(manager, 'lote', 'user') == ["primeira", "segunda"]
+    assert contents(manager, 'lote', 'assistant')[1].endswith("segunda")
+    assert fake_openai.counters['batches'] == 1
+
+    # Já recolhido: uma segunda recolha não junta nada
+    assert batches.collect(job_id)['collected'] == 0
+    assert len(manager.get_thread_history('A', 'lote')) == 4
+
+
+def test_collect_follows_request_order(manager, fake_openai, workdir):
+    prompts = [f"pergunta {i}" for i in range(5)]
+    write_prompts(workdir / 'p.jsonl', 'ordem', prompts)
+    batches = BatchManager(manager)
+    job_id = batches.submit('A', [str(workdir / 'p.jsonl')])
+
+    # A Batch API não garante a ordem da saída
+    output_id = fake_openai.batches[batches.load_job(job_id)['parts'][0]['batch_id']]['output_file_id']
+    output = fake_openai.files[output_id]
+    output['content'] = b"\n".join(reversed(output['content'].strip().split(b"\n"))) + b"\n"
+
+    batches.collect(job_id)
+    assert contents(manager, 'ordem', 'user') == prompts
+
+
+def test_interrupted_collect_resumes_without_duplicates(manager, fake_openai, workdir, monkeypatch):
+    prompts = [f"pergunta {i}" for i in range(4)]
+    write_prompts(workdir / 'p.jsonl', 'retoma', prompts)
+    job_id = BatchManager(manager).submit('A', [str(workdir / 'p.jsonl')])
+
+    # A escrita da terceira resposta falha a meio da recolha
+    append = manager._append_messages
+    calls = []
+
+    def failing_append(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise OSError("disco cheio")
+        append(*args)
+    monkeypatch.setattr(manager, '_append_messages', failing_append)
+    with pytest.raises(OSError):
+        BatchManager(manager).collect(job_id)
+    assert contents(manager, 'retoma', 'user') == prompts[:2]
+
+    # Outro processo retoma a recolha
+    resumed = AssistantManager(storage=create_storage('jsonl'))
+    assert BatchManager(resumed).collect(job_id)['collected'] == 2
+    assert contents(resumed, 'retoma', 'user') == prompts
+
+
+def test_collect_skips_result_written_before_progress_was_recorded(manager, fake_openai, workdir):
+    prompts = [f"pergunta {i}" for i in range(3)]
+    write_prompts(workdir / 'p.jsonl', 'marca', prompts)
+    batches = BatchManager(manager)
+    job_id = batches.submit('A', [str(workdir / 'p.jsonl')])
+    batches.collect(job_id)
+
+    # Interrupção entre a escrita da última resposta e o registo do seu custom_id
+    job_dir = os.path.join(batches.jobs_dir, job_id)
+    progress_path = os.path.join(job_dir, 'collected_0.txt')
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(progress_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:-1])
+    job = batches.load_job(job_id)
+    job['parts'][0]['collected'] = False
+    batches._save_job(job)
+
+    resumed = AssistantManager(storage=create_storage('jsonl'))
+    assert BatchManager(resumed).collect(job_id)['collected'] == 0
+    assert contents(resumed, 'marca', 'user') == prompts
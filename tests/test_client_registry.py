@@ -0,0 +1,50 @@
+# test_client_registry.py
+
+import asyncio
+
+from pythonAI_wrapper.async_assistant import AsyncAssistantManager
+from pythonAI_wrapper.client_registry import configure_client_registry, get_client_registry
+from pythonAI_wrapper.storage import create_storage
+
+
+def test_assistants_with_the_same_key_share_connections(manager, fake_openai):
+    for name in ('B', 'C', 'D'):
+        manager.create_assistant('sk-test', name)
+    for name in ('A', 'B', 'C', 'D'):
+        manager.create_thread(name, 'thread')
+        for _ in range(2):
+            manager.send_prompt(name, 'thread', "olá")
+
+    assert fake_openai.counters['chat'] == 8
+    assert fake_openai.counters['connections'] == 1
+    assert get_client_registry().stats()['created'] == 1
+
+
+def test_a_registry_per_assistant_opens_a_connection_each(manager, fake_openai):
+    for name in ('B', 'C', 'D'):
+        manager.create_assistant('sk-test', name)
+    for name in ('A', 'B', 'C', 'D'):
+        configure_client_registry()  # Como antes do registo partilhado: um cliente por assistente
+        manager.create_thread(name, 'thread')
+        manager.send_prompt(name, 'thread', "olá")
+
+    assert fake_openai.counters['connections'] == 4
+
+
+def test_async_clients_belong_to_their_event_loop(fake_openai):
+    manager = AsyncAssistantManager(storage=create_storage('jsonl'))
+    manager.create_assistant('sk-test', 'A')
+    manager.create_thread('A', 'thread')
+    clients = []
+
+    async def send(prompt):
+        response = await manager.send_prompt('A', 'thread', prompt)
+        clients.append(manager.get_assistant('A').async_client)
+        return response
+
+    assert asyncio.run(send("primeiro")).endswith("primeiro")
+    assert asyncio.run(send("segundo")).endswith("segundo")
+    assert clients[0] is not clients[1]
+    stats = get_client_registry().stats()
+    # Os dois loops já foram fechados: os seus clientes saíram do registo
+    assert stats['created'] == 2 and stats['closed'] == 2 and stats['active'] == 0
@@ -0,0 +1,82 @@
+# test_context_window.py
+
+import pytest
+
+from pythonAI_wrapper.context_window import ContextWindow
+from pythonAI_wrapper.storage import LazyThreads, create_storage
+
+
+def conversation(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"mensagem {i} " + "palavra " * 40}
+            for i in range(n)]
+
+
+def payload_tokens(window, selected):
+    return sum(window.counter.count_message(message) for message in selected)
+
+
+def test_summary_is_counted_in_the_budget():
+    calls = []
+
+    def summarizer(previous, messages):
+        calls.append(len(messages))
+        return "resumo longo " * 60  # Maior do que as mensagens que substitui
+
+    window = ContextWindow(400, summarizer=summarizer)
+    messages = conversation(20)
+    for n in range(1, len(messages) + 1):
+        selected = window.build("instruções", 'thread', messages[:n])
+        assert payload_tokens(window, selected) <= 400
+    assert selected[1]["content"].startswith("Resumo da conversa anterior")
+    summarized, _ = window.summary('thread')
+    assert sum(calls) == summarized  # Cada mensagem removida foi resumida uma única vez
+
+
+@pytest.mark.parametrize('backend', ['jsonl', 'sqlite', 'json'])
+def test_summary_is_persisted_with_the_thread(backend):
+    storage = create_storage(backend, 'conversas.db' if backend == 'sqlite' else None)
+    storage.save_assistant('A', {})
+    storage.append_messages('A', 'thread', conversation(12))
+    calls = []
+
+    def summarizer(previous, messages):
+        calls.append(len(messages))
+        return f"resumo de {len(messages)} mensagens"
+
+    def window():
+        threads = LazyThreads(storage, 'A')
+        return ContextWindow(300, summarizer=summarizer, load_state=threads.load_state, save_state=threads.save_state)
+
+    first = window().build("", 'thread', storage.get_thread('A', 'thread'))
+    assert len(calls) == 1
+
+    # Outro processo: o resumo é lido do armazenamento e não é refeito
+    second = window()
+    assert second.summary('thread') == (calls[0], f"resumo de {calls[0]} mensagens")
+    assert second.build("", 'thread', storage.get_thread('A', 'thread')) == first
+    assert len(calls) == 1
+
+    # Substituir a thread descarta o resumo
+    storage.replace_thread('A', 'thread', conversation(2))
+    assert storage.load_thread_state('A', 'thread') == {}
+
+
+def test_counts_are_redone_after_a_failed_prompt_is_rolled_back(manager, fake_openai):
+    manager.set_context_window('A', max_context_tokens=300)
+    manager.create_thread('A', 'thread')
+    manager.send_prompt('A', 'thread', "olá " * 20)
+
+    fake_openai.invalid_keys.add('sk-test')
+    with pytest.raises(Exception):
+        manager.send_prompt('A', 'thread', "oi")
+    fake_openai.invalid_keys.clear()
+
+    # A pergunta longa ocupa a posição da que foi descartada
+    assistant = manager.get_assistant('A')
+    thread = assistant.threads['thread']
+    thread.append(assistant.new_message("user", "palavra " * 2000))
+    window = assistant.context_window
+    assert window.token_counts('thread', thread) == [window.counter.count_message(m) for m in thread]
+    selected = assistant.build_messages('thread')
+    assert selected[-1]["content"].startswith("palavra")
+    assert len(selected) == 2  # Só as instruções e a pergunta, que sozinha excede o orçamento
@@ -0,0 +1,68 @@
+# test_daemon.py
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import cli_tool
+
+
+def test_socket_path_is_absolute_and_per_folder(workdir, monkeypatch):
+    monkeypatch.delenv('PYTHONAI_SOCKET', raising=False)
+    monkeypatch.setattr(cli_tool, 'DAEMON_SOCKET', None)
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(workdir))
+    (workdir / 'outra').mkdir()
+
+    path = cli_tool.socket_path()
+    assert os.path.isabs(path) and os.path.dirname(path) == str(workdir)
+    monkeypatch.chdir(workdir / 'outra')
+    assert cli_tool.socket_path() != path
+
+    monkeypatch.setattr(cli_tool, 'DAEMON_SOCKET', 'config.sock')
+    assert cli_tool.socket_path() == str(workdir / 'outra' / 'config.sock')
+    monkeypatch.setenv('PYTHONAI_SOCKET', 'env.sock')
+    assert cli_tool.socket_path() == str(workdir / 'outra' / 'env.sock')
+    assert cli_tool.socket_path('/tmp/opcao.sock') == '/tmp/opcao.sock'
+
+
+@pytest.fixture
+def daemon(workdir, monkeypatch):
+    monkeypatch.setattr(cli_tool, 'METRICS_PATH', None)
+    monkeypatch.setattr(cli_tool, 'RESPONSE_CACHE_DIR', None)
+    path = str(workdir / 'daemon.sock')
+    server = threading.Thread(target=cli_tool.serve, args=(cli_tool.build_parser(), path), daemon=True)
+    server.start()
+    deadline = time.monotonic() + 10
+    while not cli_tool.daemon_running(path):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    yield path
+    cli_tool.stop_daemon(path)
+    server.join(10)
+
+
+def run_client(socket_path, *argv):
+    """Corre a CLI noutro processo (o daemon redireciona o stdout deste)."""
+    return subprocess.run([sys.executable, cli_tool.__file__, '--socket', socket_path, *argv],
+                          capture_output=True, text=True, timeout=60)
+
+
+def test_forwarded_command_exits_with_the_status_of_the_daemon(daemon, monkeypatch):
+    result = run_client(daemon, 'list_assistants')
+    assert result.returncode == 0 and "Assistentes disponíveis" in result.stdout
+
+    def fail(args, parser, manager):
+        raise RuntimeError("falhou no daemon")
+
+    monkeypatch.setattr(cli_tool, 'run_command', fail)
+    result = run_client(daemon, 'list_assistants')
+    assert result.returncode == 1
+    assert "RuntimeError: falhou no daemon" in result.stdout
+
+
+def test_forward_without_a_daemon(workdir):
+    assert cli_tool.forward(['list_assistants'], str(workdir / 'nenhum.sock')) is None
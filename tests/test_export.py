@@ -0,0 +1,63 @@
+# test_export.py
+
+import gzip
+import json
+
+import pytest
+
+from pythonAI_wrapper.export import export_records
+
+
+def fill(manager):
+    manager.create_assistant('sk-test', 'B')
+    for name, thread_id in (('A', 't1'), ('A', 't2'), ('B', 't1')):
+        manager.create_thread(name, thread_id)
+        manager.storage.append_messages(name, thread_id, [
+            {'role': 'user', 'content': f"{name}/{thread_id} pergunta"},
+            {'role': 'assistant', 'content': "documento " * 1000 if name == 'B' else "resposta"},
+        ])
+
+
+@pytest.mark.parametrize('path, opener', [('historico.jsonl', open), ('historico.jsonl.gz', gzip.open)])
+def test_export_round_trip(manager, path, opener):
+    fill(manager)
+    assert export_records(manager.iter_records(), path) == 6
+
+    with opener(path, 'rt', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert records == list(manager.iter_records())
+    for (name, thread_id) in (('A', 't1'), ('A', 't2'), ('B', 't1')):
+        exported = [record for record in records if (record['assistant'], record['thread_id']) == (name, thread_id)]
+        assert [record['position'] for record in exported] == [0, 1]
+        assert [{'role': record['role'], 'content': record['content']} for record in exported] == \
+            list(manager.iter_thread_history(name, thread_id))
+
+
+def test_export_filters(manager):
+    fill(manager)
+    assert export_records(manager.iter_records(['A'], thread_id='t2'), 'a.jsonl') == 2
+    with open('a.jsonl', encoding='utf-8') as f:
+        assert {(json.loads(line)['assistant'], json.loads(line)['thread_id']) for line in f} == {('A', 't2')}
+    with pytest.raises(ValueError):
+        list(manager.iter_records(['C']))
+
+
+def test_failed_export_leaves_no_file(manager, workdir):
+    fill(manager)
+
+    def records():
+        yield from manager.iter_records()
+        raise OSError("disco cheio")
+
+    with pytest.raises(OSError):
+        export_records(records(), 'historico.jsonl.gz')
+    assert [path.name for path in workdir.iterdir() if path.name.startswith('historico')] == []
+
+
+def test_parquet_export(manager):
+    pq = pytest.importorskip('pyarrow.parquet')
+    fill(manager)
+    assert export_records(manager.iter_records(), 'historico.parquet', batch_size=4) == 6
+    table = pq.read_table('historico.parquet').to_pylist()
+    assert [(row['assistant'], row['thread_id'], row['position']) for row in table] == \
+        [(record['assistant'], record['thread_id'], record['position']) for record in manager.iter_records()]
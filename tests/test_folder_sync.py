@@ -0,0 +1,65 @@
+# test_folder_sync.py
+
+import os
+
+
+def write(path, text, mtime=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_prompt_sync_sends_only_added_and_changed_files(manager, fake_openai):
+    os.makedirs('pasta')
+    write('pasta/a.txt', "primeiro", 1000)
+    write('pasta/b.txt', "segundo", 1000)
+    write('pasta/ignorado.pdf', "não é um prompt", 1000)
+    manager.create_thread('A', 'thread')
+
+    report = manager.sync_folder('A', 'pasta', 'thread', target='prompt')
+    assert (report['added'], report['changed'], report['removed']) == (['a.txt', 'b.txt'], [], [])
+    assert fake_openai.counters['chat'] == 1
+    assert manager.get_thread_history('A', 'thread')[-2]['content'] == "primeiro\nsegundo\n"
+
+    report = manager.sync_folder('A', 'pasta', 'thread', target='prompt')
+    assert report['unchanged'] == ['a.txt', 'b.txt'] and 'response' not in report
+    os.utime('pasta/a.txt', (2000, 2000))  # Só o mtime: o hash decide que não mudou
+    assert manager.sync_folder('A', 'pasta', 'thread', target='prompt')['unchanged'] == ['a.txt', 'b.txt']
+    assert fake_openai.counters['chat'] == 1
+
+    write('pasta/b.txt', "segundo, revisto", 3000)
+    write('pasta/c.txt', "terceiro", 3000)
+    os.remove('pasta/a.txt')
+    report = manager.sync_folder('A', 'pasta', 'thread', target='prompt')
+    assert (report['added'], report['changed'], report['removed']) == (['c.txt'], ['b.txt'], ['a.txt'])
+    assert manager.get_thread_history('A', 'thread')[-2]['content'] == "terceiro\nsegundo, revisto\n"  # Novos e depois alterados
+    assert fake_openai.counters['chat'] == 2
+
+
+def test_files_still_being_written_wait(manager, fake_openai):
+    os.makedirs('pasta')
+    write('pasta/a.txt', "a meio")
+    manager.create_thread('A', 'thread')
+
+    assert manager.sync_folder('A', 'pasta', 'thread', target='prompt', settle=60)['pending'] == ['a.txt']
+    assert fake_openai.counters['chat'] == 0
+    assert manager.sync_folder('A', 'pasta', 'thread', target='prompt')['added'] == ['a.txt']
+
+
+def test_context_sync_reindexes_changed_and_prunes_removed_files(manager):
+    os.makedirs('docs')
+    write('docs/a.pdf', "O prazo de entrega é sexta-feira.", 1000)
+    write('docs/b.pdf', "A reunião é na sala dois.", 1000)
+    manager.create_thread('A', 'thread')
+    manager.assistants['A'].set_retrieval('hashing')
+
+    assert manager.sync_folder('A', 'docs', 'thread')['chunks'] == 2
+    write('docs/a.pdf', "O prazo de entrega passou para segunda-feira.", 2000)
+    os.remove('docs/b.pdf')
+    report = manager.sync_folder('A', 'docs', 'thread', prune=True)
+    assert (report['changed'], report['removed']) == (['a.pdf'], ['b.pdf'])
+    assert report['removed_chunks'] == 2 and report['chunks'] == 1
+
+    sources = manager.assistants['A'].retriever.retrieve('A', 'thread', "prazo")
+    assert [(chunk['source'], "segunda" in chunk['text']) for chunk in sources] == [('a.pdf', True)]
@@ -0,0 +1,84 @@
+# test_hedging.py
+
+import asyncio
+import time
+
+from pythonAI_wrapper.async_assistant import AsyncAssistantManager
+from pythonAI_wrapper.metrics import get_metrics
+from pythonAI_wrapper.storage import create_storage
+
+
+def hedge_outcomes():
+    outcomes = {}
+    for (name, labels), value in get_metrics().counters.items():
+        if name == 'hedged_requests_total':
+            winner = dict(labels)['winner']
+            outcomes[winner] = outcomes.get(winner, 0) + value
+    return outcomes
+
+
+def slow_model(assistant, server, seconds, **hedging):
+    """O modelo do assistente demora `seconds`; o modelo alternativo responde logo."""
+    server.model_latency = {assistant.model: seconds}
+    assistant.set_hedging(fallback_model='modelo-rapido', **hedging)
+    assistant.hedge_policy.initial_delay = 0.05
+
+
+def test_slow_request_is_answered_by_the_hedge(manager, fake_openai):
+    assistant = manager.get_assistant('A')
+    slow_model(assistant, fake_openai, 1.0, budget=1.0)
+    manager.create_thread('A', 'thread')
+
+    start = time.perf_counter()
+    assert manager.send_prompt('A', 'thread', "olá").endswith("olá")
+    assert time.perf_counter() - start < 0.8
+    assert fake_openai.requests_by_model == {assistant.model: 1, 'modelo-rapido': 1}
+    assert hedge_outcomes() == {'hedge': 1}
+    # Só a resposta vencedora fica na thread
+    assert [m['role'] for m in manager.get_thread_history('A', 'thread')] == ['user', 'assistant']
+
+
+def test_hedges_are_limited_by_the_budget(manager, fake_openai):
+    assistant = manager.get_assistant('A')
+    slow_model(assistant, fake_openai, 0.2, budget=0.5)
+    manager.create_thread('A', 'thread')
+    for _ in range(4):
+        manager.send_prompt('A', 'thread', "olá")
+
+    assert assistant.hedge_policy.stats()['hedges'] == 2
+    assert fake_openai.requests_by_model['modelo-rapido'] == 2
+    assert hedge_outcomes() == {'hedge': 2}
+
+
+def test_async_hedge_does_not_wait_for_the_slow_request(fake_openai):
+    manager = AsyncAssistantManager(storage=create_storage('jsonl'))
+    manager.create_assistant('sk-test', 'A')
+    manager.create_thread('A', 'thread')
+    assistant = manager.get_assistant('A')
+    slow_model(assistant, fake_openai, 1.0, budget=1.0)
+
+    async def send():
+        start = time.perf_counter()
+        response = await manager.send_prompt('A', 'thread', "olá")
+        return response, time.perf_counter() - start
+    response, seconds = asyncio.run(send())
+
+    assert response.endswith("olá") and seconds < 0.8
+    assert hedge_outcomes() == {'hedge': 1}
+    assert fake_openai.requests_by_model == {assistant.model: 1, 'modelo-rapido': 1}
+    assert [m['role'] for m in manager.get_thread_history('A', 'thread')] == ['user', 'assistant']
+
+
+def test_waiting_for_the_rate_limiter_does_not_trigger_a_hedge(manager, fake_openai, monkeypatch):
+    assistant = manager.get_assistant('A')
+    slow_model(assistant, fake_openai, 0.0, budget=1.0)
+    manager.create_thread('A', 'thread')
+    # O primeiro pedido espera 0.3 s por capacidade no limitador; o servidor responde logo
+    waits = [0.3]
+    reserve = assistant.rate_limiter.reserve
+    monkeypatch.setattr(assistant.rate_limiter, 'reserve',
+                        lambda *args, **kwargs: max(reserve(*args, **kwargs), waits.pop() if waits else 0.0))
+
+    manager.send_prompt('A', 'thread', "olá")
+    assert assistant.hedge_policy.stats()['hedges'] == 0
+    assert 'modelo-rapido' not in fake_openai.requests_by_model
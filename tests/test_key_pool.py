@@ -0,0 +1,74 @@
+# test_key_pool.py
+
+import pytest
+
+from pythonAI_wrapper.key_pool import KeyPool
+
+
+def pool_for(manager, keys, **options):
+    pool = KeyPool(keys, requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, **options)
+    manager.set_key_pool(pool)
+    return pool
+
+
+def stats(pool):
+    return {key.api_key: row for key, row in zip(pool.keys, pool.stats())}
+
+
+def test_threads_stay_on_their_key(manager, fake_openai):
+    pool = pool_for(manager, ['sk-chave-a', 'sk-chave-b'], strategy='weighted')
+    threads = [f"thread_{i}" for i in range(10)]
+    for thread_id in threads:
+        manager.create_thread('A', thread_id)
+    for _ in range(3):
+        for thread_id in threads:
+            manager.send_prompt('A', thread_id, "olá")
+
+    # Cada thread fez os três pedidos na chave que lhe calhou no primeiro
+    for row in pool.stats():
+        assert row['requests'] == 3 * row['threads']
+    assert sum(row['threads'] for row in pool.stats()) == 10
+
+
+def test_rate_limited_key_is_ejected_and_the_thread_moves(manager, fake_openai):
+    pool = pool_for(manager, ['sk-chave-a', 'sk-chave-b'])
+    manager.create_thread('A', 't')
+    manager.send_prompt('A', 't', "olá")
+    (first,) = fake_openai.requests_by_key
+    other = 'sk-chave-b' if first == 'sk-chave-a' else 'sk-chave-a'
+
+    fake_openai.inject_rate_limits(1, retry_after=60, api_key=first)
+    assert manager.send_prompt('A', 't', "outra vez").endswith("outra vez")
+    manager.send_prompt('A', 't', "e mais uma")
+
+    assert fake_openai.requests_by_key == {first: 2, other: 2}
+    rows = stats(pool)
+    assert rows[first]['rate_limited'] == rows[first]['ejections'] == 1
+    assert rows[first]['ejected_seconds'] > 50
+    assert rows[other]['ejections'] == 0
+    assert fake_openai.counters['rate_limited'] == 1
+
+
+def test_unauthorized_key_is_removed_from_the_pool(manager, fake_openai):
+    fake_openai.invalid_keys.add('sk-chave-errada')
+    # Com mais peso, a chave inválida é a primeira escolhida
+    pool = pool_for(manager, [{'api_key': 'sk-chave-errada', 'weight': 10}, 'sk-chave-certa'])
+    for thread_id in ('t1', 't2', 't3'):
+        manager.create_thread('A', thread_id)
+        manager.send_prompt('A', thread_id, "olá")
+
+    invalid = stats(pool)['sk-chave-errada']
+    assert invalid['unauthorized'] == 1 and invalid['ejected_seconds'] > 3000
+    assert fake_openai.counters['unauthorized'] == 1
+    assert fake_openai.requests_by_key['sk-chave-certa'] == 3
+
+
+def test_error_is_raised_when_every_key_is_unauthorized(manager, fake_openai):
+    fake_openai.invalid_keys.add('sk-chave-errada')
+    pool = pool_for(manager, ['sk-chave-errada'])
+    manager.create_thread('A', 't')
+    with pytest.raises(Exception) as error:
+        manager.get_assistant('A').get_response("olá", 't')
+    assert getattr(error.value, 'status_code', None) == 401
+    assert fake_openai.counters['unauthorized'] == 1
+    assert stats(pool)['sk-chave-errada']['ejections'] == 1
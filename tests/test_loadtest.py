@@ -0,0 +1,33 @@
+# test_loadtest.py
+
+import json
+import os
+
+import loadtest
+
+
+def test_replay_smoke(workdir, monkeypatch):
+    monkeypatch.setenv('OPENAI_BASE_URL', '')  # run() aponta-o para o seu servidor falso
+    threads = {
+        'A': {'t1': [{'role': 'user', 'content': "olá"}, {'role': 'assistant', 'content': "bom dia"},
+                     {'role': 'user', 'content': "como estás?"}, {'role': 'assistant', 'content': "bem"}],
+              't2': [{'role': 'user', 'content': "adeus"}, {'role': 'assistant', 'content': "até logo"}]},
+        'B': {'t1': [{'role': 'assistant', 'content': "sem perguntas"}]},
+    }
+    (workdir / 'assistants.json').write_text(json.dumps({name: {'api_key': 'sk-real', 'model': 'gpt-4',
+                                                                'instructions': ''} for name in threads}))
+    (workdir / 'threads.json').write_text(json.dumps(threads))
+    before = (workdir / 'threads.json').read_bytes()
+
+    result, = loadtest.run(source=str(workdir / 'threads.json'), conversations=4, concurrency=2, latency=0.0,
+                           windows=2)
+    assert result['conversations'] == 4  # As duas conversas com perguntas, repetidas
+    assert result['requests'] == 6 and result['error_rate'] == 0.0
+    assert result['p50_s'] > 0 and result['write_amplification'] > 0
+    assert sum(row['requests'] for row in result['timeline']) == 6
+
+    result, = loadtest.run(source=str(workdir / 'threads.json'), backend='sqlite', preload=True, max_turns=1,
+                           latency=0.0)
+    assert result['requests'] == 2 and result['error_rate'] == 0.0
+    assert (workdir / 'threads.json').read_bytes() == before  # O histórico reproduzido não é alterado
+    assert os.getcwd() == str(workdir)
@@ -0,0 +1,42 @@
+# test_message.py
+
+import json
+
+import pytest
+
+from pythonAI_wrapper.assistant_manager import AssistantManager
+from pythonAI_wrapper.message import BlobStore, Message, to_record
+from pythonAI_wrapper.storage import create_storage
+
+
+def test_history_is_plain_dicts(manager):
+    document = "documento " * 1000  # Vai para o BlobStore
+    manager.create_thread('A', 'thread')
+    manager.send_prompt('A', 'thread', document)
+
+    history = manager.get_thread_history('A', 'thread')
+    assert all(type(message) is dict for message in history)
+    assert history[0] == {"role": "user", "content": document}
+    assert json.loads(json.dumps(history)) == history
+    assert repr(history[0]).startswith("{")
+
+    reloaded = AssistantManager(storage=create_storage('jsonl'))
+    for messages in (reloaded.get_thread_history('A', 'thread', limit=1),
+                     list(reloaded.iter_thread_history('A', 'thread')),
+                     reloaded.get_assistant_history('A')['threads']['thread']):
+        assert all(type(message) is dict for message in messages)
+    assert list(reloaded.iter_thread_history('A', 'thread')) == history
+
+
+def test_blob_reference_needs_a_store(workdir):
+    store = BlobStore(str(workdir / 'blobs'))
+    document = "documento " * 1000
+    record = to_record({"role": "user", "content": document}, store)
+    assert "content" not in record
+
+    with pytest.raises(ValueError):
+        Message.from_record(record)
+    with pytest.raises(ValueError):
+        to_record(record)
+    assert Message.from_record(record, store)["content"] == document
+    assert to_record(record, store) == record
@@ -0,0 +1,60 @@
+# test_metrics.py
+
+import os
+
+from pythonAI_wrapper.metrics import Metrics, get_metrics
+from pythonAI_wrapper.response_cache import ResponseCache, get_default_cache
+
+
+def buckets(text):
+    """{labels sem le: [(le, valor), ...]} das linhas _bucket."""
+    series = {}
+    for line in text.splitlines():
+        if '_bucket{' not in line:
+            continue
+        labels, value = line.split('} ')
+        items = labels.split('{', 1)[1].split(',')
+        le = next(item for item in items if item.startswith('le='))[4:-1]
+        rest = ','.join(item for item in items if not item.startswith('le='))
+        series.setdefault(rest, []).append((le, int(value)))
+    return series
+
+
+def test_prometheus_histograms_have_every_bucket():
+    metrics = Metrics()
+    for value in (0.001, 1.0, 1.0):
+        metrics.observe('request_seconds', value, model='a')
+    metrics.observe('request_seconds', 0.1, model='b')
+    metrics.observe('request_seconds', 0.0, model='b')
+
+    series = buckets(metrics.to_prometheus())
+    assert set(series) == {'model="a"', 'model="b"'}
+    a, b = series['model="a"'], series['model="b"']
+    assert [le for le, _ in a] == [le for le, _ in b]  # Os mesmos buckets em todas as séries
+    assert a[0][0] == '0.0' and a[-1][0] == '+Inf'
+    bounds = [float(le) for le, _ in a[1:-1]]
+    assert all(abs(upper / lower - 2 ** 0.25) < 1e-9 for lower, upper in zip(bounds, bounds[1:]))  # Sem saltos
+    assert all(x <= y for (_, x), (_, y) in zip(a, a[1:]))  # Cumulativos
+    assert a[-1][1] == 3 and b[-1][1] == 2 and b[0][1] == 1
+
+
+def test_persistence_is_opt_in(workdir):
+    assert get_metrics().path is None
+    metrics = Metrics()
+    metrics.increment('requests_total')
+    metrics.flush()
+    assert metrics.load() == {}
+
+    metrics.enable_persistence(str(workdir / 'metricas'))
+    metrics.flush()
+    assert metrics.load()['counters'][0]['value'] == 1
+
+    cache = get_default_cache()
+    assert cache.cache_dir is None
+    cache = ResponseCache()
+    cache.set('chave', "resposta")
+    assert os.listdir(workdir) == ['metricas']
+
+    cache.enable_persistence(str(workdir / 'cache'))
+    cache.set('chave', "resposta")
+    assert ResponseCache(str(workdir / 'cache')).get('chave') == "resposta"
@@ -0,0 +1,52 @@
+# test_pdf.py
+
+import os
+import shutil
+
+from pythonAI_wrapper import pdfHandler
+from pythonAI_wrapper.pdfHandler import PDFHandler
+
+FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'files')
+
+
+def count_extractions(monkeypatch):
+    calls = []
+    extract_pages = pdfHandler._extract_pages
+
+    def counting(file_path):
+        calls.append(file_path)
+        return extract_pages(file_path)
+
+    monkeypatch.setattr(pdfHandler, '_extract_pages', counting)
+    return calls
+
+
+def test_unchanged_file_is_read_from_the_cache(workdir, monkeypatch):
+    shutil.copy(os.path.join(FILES, 'test.pdf'), 'doc.pdf')
+    calls = count_extractions(monkeypatch)
+    handler = PDFHandler()
+
+    text = handler.read_pdf('doc.pdf')
+    assert text.strip() and len(calls) == 1
+    assert PDFHandler().read_pdf('doc.pdf') == text
+    assert len(calls) == 1
+
+    with open('doc.pdf', 'ab') as f:
+        f.write(b'\n')  # Conteúdo diferente: volta a extrair
+    handler.read_pdf('doc.pdf')
+    assert len(calls) == 2
+
+
+def test_folder_yields_pages_per_file(workdir):
+    shutil.copytree(FILES, 'pasta')
+    sequential = PDFHandler(cache_dir=None)
+    expected = {path: list(sequential.iter_pages(path)) for path in sequential.list_pdfs('pasta')}
+    assert len(expected) == 2
+
+    for handler in (PDFHandler(max_workers=2), PDFHandler(cache_dir=None, max_workers=2)):
+        files = list(handler.iter_folder('pasta'))
+        assert [path for path, _ in files] == sorted(expected)
+        assert all(not isinstance(pages, str) for _, pages in files)
+        assert {path: list(pages) for path, pages in files} == expected
+    assert PDFHandler().read_folder('pasta') == ''.join(
+        "\n".join(pages) + "\n\n" for pages in expected.values())
@@ -0,0 +1,45 @@
+# test_rate_limiter.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pythonAI_wrapper.rate_limiter import RateLimiter
+
+
+def test_large_request_is_not_blocked_before_the_limits_are_known():
+    limiter = RateLimiter()
+    assert limiter.reserve(3 * limiter.tokens.capacity) == 0.0
+    assert limiter.reserve(100) > 0.0  # O excesso ficou em dívida
+
+    limiter = RateLimiter()
+    limiter.update_from_headers({'x-ratelimit-limit-tokens': '90000'})
+    assert limiter.reserve(3 * limiter.tokens.capacity) > 0.0
+
+
+def test_rate_limited_requests_are_retried(manager, fake_openai):
+    assistant = manager.get_assistant('A')
+    # max_retries alto: os 429 podem calhar todos ao mesmo pedido
+    assistant.rate_limiter = RateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, max_retries=20)
+    threads = [f"thread_{i}" for i in range(8)]
+    for thread_id in threads:
+        manager.create_thread('A', thread_id)
+    fake_openai.inject_rate_limits(16, retry_after=0.01)
+
+    with ThreadPoolExecutor(8) as executor:
+        responses = list(executor.map(lambda thread_id: manager.send_prompt('A', thread_id, "olá"), threads))
+    assert all(response.endswith("olá") for response in responses)
+    assert fake_openai.counters['rate_limited'] == 16
+    assert assistant.rate_limiter.counters['retries'] == 16
+    assert assistant.rate_limiter.counters['rate_limited'] == 16
+
+
+def test_custom_limiter_survives_client_release(manager, fake_openai):
+    assistant = manager.get_assistant('A')
+    limiter = RateLimiter()
+    assistant.rate_limiter = limiter
+    manager.create_thread('A', 'thread')
+    manager.send_prompt('A', 'thread', "olá")
+
+    assistant.set_api_key('sk-outra')
+    assert assistant.rate_limiter is limiter
+    manager.send_prompt('A', 'thread', "outra vez")
+    assert limiter.counters['requests'] == 2
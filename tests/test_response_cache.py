@@ -0,0 +1,58 @@
+# test_response_cache.py
+
+import os
+import time
+
+import pytest
+
+from pythonAI_wrapper import response_cache
+from pythonAI_wrapper.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio de response_cache controlado pelo teste."""
+    now = [time.time()]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(workdir, clock):
+    cache = ResponseCache(cache_dir=str(workdir / 'cache'), ttl=60)
+    cache.set('k', "resposta")
+    clock[0] += 30
+    assert cache.get('k') == "resposta"
+
+    reopened = ResponseCache(cache_dir=str(workdir / 'cache'), ttl=60)
+    assert reopened.get('k') == "resposta" and reopened.counters['disk_hits'] == 1
+    clock[0] += 31
+    assert cache.get('k') is None
+    assert reopened.get('k') is None
+
+
+def test_memory_and_disk_are_bounded(workdir):
+    cache = ResponseCache(cache_dir=str(workdir / 'cache'), max_entries=2, max_disk_bytes=1000, ttl=None)
+    for i in range(10):
+        cache.set(f'k{i}', "x" * 200)
+        path = cache._path(f'k{i}')
+        os.utime(path, (1000 + i, 1000 + i))  # Por ordem de escrita, mesmo com mtimes iguais
+
+    assert list(cache._memory) == ['k8', 'k9']
+    assert cache.disk_bytes() <= 1000
+    assert cache.disk_bytes() == sum(size for _, size, _ in cache._entries())
+    assert os.path.exists(cache._path('k9'))
+    assert not os.path.exists(cache._path('k0'))
+
+
+def test_identical_requests_are_answered_from_the_cache(manager, fake_openai, monkeypatch):
+    monkeypatch.setattr(response_cache, '_default_cache', None)
+    manager.create_assistant('sk-test', 'C', cache_responses=True)
+    for thread_id in ('t1', 't2', 't3'):
+        manager.create_thread('C', thread_id)
+
+    first = manager.send_prompt('C', 't1', "olá")
+    assert manager.send_prompt('C', 't2', "olá") == first
+    assert fake_openai.counters['chat'] == 1
+    manager.send_prompt('C', 't3', "olá", use_cache=False)
+    assert fake_openai.counters['chat'] == 2
+    assert response_cache.get_default_cache().stats()['hits'] == 1
@@ -0,0 +1,44 @@
+# test_retrieval.py
+
+import os
+
+import numpy as np
+
+from pythonAI_wrapper.rate_limiter import RateLimiter
+from pythonAI_wrapper.retrieval import HashingEmbedder, VectorIndex
+
+
+def test_openai_embeddings_go_through_the_rate_limiter(manager, fake_openai):
+    assistant = manager.get_assistant('A')
+    assistant.rate_limiter = RateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9)
+    assistant.set_retrieval('openai')
+    manager.create_thread('A', 'thread')
+
+    assert assistant.ingest_document('thread', "O prazo de entrega é sexta-feira.", source='notas.txt') == 1
+    assert assistant.retriever.retrieve('A', 'thread', "prazo")[0]['source'] == 'notas.txt'
+    assert fake_openai.counters['embeddings'] == 2
+    assert assistant.rate_limiter.counters['requests'] == 2
+
+
+def test_interrupted_add_leaves_no_misaligned_rows(workdir):
+    embedder = HashingEmbedder(dim=16)
+    index = VectorIndex(str(workdir / 'indice'), embedder.dim, embedder.name)
+    texts = ["primeiro bloco", "segundo bloco"]
+    index.add(embedder.embed(texts), [{'text': text, 'source': 'a'} for text in texts])
+
+    # Escrita interrompida antes do meta.json: linhas a mais nos ficheiros
+    with open(index.vectors_path, 'ab') as f:
+        f.write(np.ones(16, dtype=np.float32).tobytes())
+    with open(index.chunks_path, 'ab') as f:
+        f.write(b'{"text": "incomp')
+    assert len(index) == 2
+    assert index.search(embedder.embed(["segundo"])[0], top_k=5)[0]['text'] == "segundo bloco"
+
+    index.add(embedder.embed(["terceiro bloco"]), [{'text': "terceiro bloco", 'source': 'b'}])
+    assert len(index) == 3
+    assert os.path.getsize(index.vectors_path) == 3 * 16 * 4
+    assert os.path.getsize(index.offsets_path) == 3 * 8
+    assert [r['text'] for r in index.search(embedder.embed(["terceiro"])[0], top_k=1)] == ["terceiro bloco"]
+
+    assert index.remove(['a']) == 2
+    assert [r['text'] for r in index.search(embedder.embed(["terceiro"])[0], top_k=5)] == ["terceiro bloco"]
@@ -0,0 +1,65 @@
+# test_router.py
+
+import pytest
+
+from pythonAI_wrapper.assistant_manager import AssistantManager
+from pythonAI_wrapper.router import ModelRouter
+from pythonAI_wrapper.storage import create_storage
+
+MODELS = [{'model': 'mini', 'max_prompt_tokens': 100, 'max_latency': 0.5},
+          {'model': 'medio', 'max_prompt_tokens': 1000},
+          {'model': 'grande', 'max_prompt_tokens': 10000}]
+
+
+def test_prompt_size_picks_the_first_model_that_fits():
+    router = ModelRouter(MODELS)
+    assert router.choose(50) == ('mini', 'preferred')
+    assert router.choose(500) == ('medio', 'size')
+    assert router.choose(5000) == ('grande', 'size')
+    assert router.choose(50000) == ('grande', 'largest')
+
+
+def test_slow_models_are_skipped_until_their_latency_is_old():
+    router = ModelRouter(MODELS)
+    router.observe('mini', 2.0)
+    assert router.choose(50) == ('medio', 'latency')
+
+    router.set_thread('urgente', max_latency=0.1)
+    router.observe('medio', 0.3)
+    router.observe('grande', 0.2)
+    assert router.choose(50, 'urgente') == ('grande', 'fastest')  # Todos lentos demais: o mais rápido
+
+    router.recheck_seconds = 0.0
+    assert router.choose(50) == ('mini', 'preferred')
+
+
+def test_thread_constraints():
+    router = ModelRouter(MODELS, threads={'fixa': {'model': 'grande'}})
+    assert router.choose(50, 'fixa') == ('grande', 'pinned')
+    router.set_thread('limitada', models=['medio', 'grande'])
+    assert router.choose(50, 'limitada') == ('medio', 'preferred')
+    assert router.choose(50, 'outra') == ('mini', 'preferred')
+    router.set_thread('fixa')
+    assert router.choose(50, 'fixa') == ('mini', 'preferred')
+    with pytest.raises(ValueError):
+        router.set_thread('t', models=['desconhecido'])
+
+
+def test_routed_requests_use_the_chosen_model(manager, fake_openai):
+    fake_openai.model_latency = {'mini': 0.3, 'medio': 0.0, 'grande': 0.0}
+    manager.set_routing('A', [{'model': 'mini', 'max_prompt_tokens': 100, 'max_latency': 0.1}, 'grande'])
+    manager.create_thread('A', 'thread')
+    manager.create_thread('A', 'fixa')
+    manager.set_thread_route('A', 'fixa', model='mini')
+
+    manager.send_prompt('A', 'thread', "olá")  # Latência do mini ainda desconhecida
+    manager.send_prompt('A', 'thread', "olá outra vez")  # Agora é lento demais
+    manager.send_prompt('A', 'thread', "palavra " * 500)
+    manager.send_prompt('A', 'fixa', "olá")
+    assert fake_openai.requests_by_model == {'mini': 2, 'grande': 2}
+
+    answers = [message for message in manager.get_thread_history('A', 'thread') if message['role'] == 'assistant']
+    assert [(answer['model'], answer['route']) for answer in answers] == \
+        [('mini', 'preferred'), ('grande', 'latency'), ('grande', 'size')]
+    reloaded = AssistantManager(storage=create_storage('jsonl'))
+    assert reloaded.assistants['A'].router.choose(10, 'fixa') == ('mini', 'pinned')
@@ -0,0 +1,51 @@
+# test_search_index.py
+
+import sqlite3
+
+from pythonAI_wrapper.search_index import SearchIndex
+from pythonAI_wrapper.storage import AppendOnlyStorage
+
+
+def test_best_match_is_found_among_many_recent_matches(workdir):
+    index = SearchIndex(str(workdir / 'search.db'))
+    index.add('A', 'antiga', [{'role': 'user', 'content': "fatura fatura fatura"}])
+    index.add('A', 'recentes', [{'role': 'user', 'content': "fatura " + "palavra " * 50}] * 300)
+
+    assert index.search("fatura", limit=1)[0]['thread_id'] == 'antiga'
+
+
+def test_reindexed_messages_keep_their_own_dates(workdir):
+    storage = AppendOnlyStorage(str(workdir / 'conversations'))
+    storage.save_assistant('A', {'name': 'A'})
+    storage.append_messages('A', 't', [{'role': 'user', 'content': "reunião", 'created_at': 1000.0},
+                                       {'role': 'user', 'content': "reunião adiada"}])
+    index = SearchIndex(str(workdir / 'search.db'))
+    index.update(storage)
+
+    dates = {result['position']: result['created_at'] for result in index.search("reunião")}
+    assert dates == {0: 1000.0, 1: None}
+    assert [result['position'] for result in index.search("reunião", until=2000.0)] == [0]
+    assert index.search("reunião", since=2000.0) == []
+
+    # Voltar a indexar a thread mantém as datas que já estavam no índice
+    index.add('A', 't', [{'role': 'user', 'content': "reunião marcada"}])
+    added = index.search("marcada")[0]['created_at']
+    index.replace_thread('A', 't', storage.get_thread('A', 't') + [{'role': 'user', 'content': "reunião marcada"}])
+    assert index.search("marcada")[0]['created_at'] == added
+
+
+def test_old_index_without_nullable_dates_is_migrated(workdir):
+    path = str(workdir / 'search.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE entries (id INTEGER PRIMARY KEY, assistant TEXT NOT NULL, thread_id TEXT NOT NULL,
+            seq INTEGER NOT NULL, role TEXT NOT NULL, created_at REAL NOT NULL, UNIQUE (assistant, thread_id, seq));
+        CREATE INDEX entries_created_at ON entries (created_at);
+        CREATE VIRTUAL TABLE fts USING fts5(content, scope, tokenize = 'unicode61 remove_diacritics 2');
+    """)
+    conn.close()
+
+    index = SearchIndex(path)
+    index.add('A', 't', [{'role': 'user', 'content': "olá", 'created_at': 5.0}])
+    index.replace_thread('A', 'u', [{'role': 'user', 'content': "olá"}])
+    assert sorted(result['created_at'] or 0 for result in index.search("olá")) == [0, 5.0]
@@ -0,0 +1,50 @@
+# test_sqlite_storage.py
+
+import threading
+
+from pythonAI_wrapper.sqlite_storage import SQLiteStorage
+
+
+def test_concurrent_writers_never_overlap(workdir):
+    path = str(workdir / 'conversations.db')
+    SQLiteStorage(path).create_thread('A', 't')
+
+    def writer(n):
+        storage = SQLiteStorage(path)  # Uma ligação por escritor, como processos diferentes
+        for i in range(25):
+            storage.append_messages('A', 't', [{'role': 'user', 'content': f"{n}-{i}"},
+                                               {'role': 'assistant', 'content': f"{n}-{i}"}])
+        storage.close()
+
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+
+    messages = SQLiteStorage(path).get_thread('A', 't')
+    assert len(messages) == 4 * 25 * 2
+    # Cada append fica inteiro e por ordem: pergunta e resposta seguidas
+    for question, answer in zip(messages[::2], messages[1::2]):
+        assert (question['role'], answer['role']) == ('user', 'assistant')
+        assert question['content'] == answer['content']
+    assert len({message['content'] for message in messages}) == 4 * 25
+
+
+def test_history_pagination(workdir):
+    storage = SQLiteStorage(str(workdir / 'conversations.db'))
+    storage.append_messages('A', 't', [{'role': 'user', 'content': str(i)} for i in range(10)])
+
+    def contents(messages):
+        return [message['content'] for message in messages]
+
+    assert contents(storage.get_thread('A', 't', limit=3)) == ['7', '8', '9']
+    assert contents(storage.get_thread('A', 't', limit=3, before=7)) == ['4', '5', '6']
+    assert contents(storage.get_thread('A', 't', before=2)) == ['0', '1']
+    assert contents(storage.get_thread('A', 't', limit=5, before=2)) == ['0', '1']
+    assert contents(storage.iter_thread('A', 't', start=6, batch_size=2)) == ['6', '7', '8', '9']
+    assert storage.count_messages('A', 't') == 10
+
+    document = "documento " * 1000
+    storage.append_messages('A', 't', [{'role': 'user', 'content': document}])
+    assert storage.get_thread('A', 't', limit=1)[0]['content'] == document
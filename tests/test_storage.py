@@ -0,0 +1,66 @@
+# test_storage.py
+
+import fcntl
+import os
+import threading
+
+import pytest
+
+from pythonAI_wrapper.storage import AppendOnlyStorage, JSONStorage, migrate_json_layout
+
+
+@pytest.fixture
+def legacy(workdir):
+    legacy = JSONStorage()
+    for name in ('A', 'B', 'C'):
+        legacy.save_assistant(name, {'name': name})
+        legacy.append_messages(name, 't', [{'role': 'user', 'content': f"olá {name}"}])
+    return legacy
+
+
+def test_interrupted_migration_resumes(legacy, monkeypatch):
+    storage = AppendOnlyStorage()
+    save_assistant = storage.save_assistant
+
+    def crash_on_b(name, data):
+        if name == 'B':
+            raise OSError("disco cheio")
+        save_assistant(name, data)
+
+    monkeypatch.setattr(storage, 'save_assistant', crash_on_b)
+    with pytest.raises(OSError):
+        migrate_json_layout(storage)
+    assert list(storage.load_assistants()) == ['A']
+
+    monkeypatch.setattr(storage, 'save_assistant', save_assistant)
+    assert migrate_json_layout(storage)
+    assert sorted(storage.load_assistants()) == ['A', 'B', 'C']
+    for name in ('A', 'B', 'C'):
+        assert [message['content'] for message in storage.get_thread(name, 't')] == [f"olá {name}"]
+    assert not migrate_json_layout(storage)
+
+
+def test_migration_skips_a_destination_with_other_assistants(legacy):
+    storage = AppendOnlyStorage()
+    storage.save_assistant('Outro', {'name': 'Outro'})
+    assert not migrate_json_layout(storage)
+    assert list(storage.load_assistants()) == ['Outro']
+
+
+def test_replace_thread_waits_for_the_segment_lock(workdir):
+    storage = AppendOnlyStorage()
+    storage.append_messages('A', 't', [{'role': 'user', 'content': "olá"}])
+    fd = os.open(storage._segment_path('A', 't'), os.O_RDONLY)
+    fcntl.flock(fd, fcntl.LOCK_EX)  # Um append_messages de outro processo a meio
+    replacer = threading.Thread(target=storage.replace_thread,
+                                args=('A', 't', [{'role': 'user', 'content': "novo"}]))
+    replacer.start()
+    replacer.join(0.2)
+    assert replacer.is_alive()
+    assert [message['content'] for message in storage.get_thread('A', 't')] == ["olá"]
+
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+    replacer.join(5)
+    storage.append_messages('A', 't', [{'role': 'assistant', 'content': "depois"}])
+    assert [message['content'] for message in storage.get_thread('A', 't')] == ["novo", "depois"]
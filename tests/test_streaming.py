@@ -0,0 +1,47 @@
+# test_streaming.py
+
+from itertools import islice
+
+import openai
+import pytest
+
+from pythonAI_wrapper.assistant_manager import AssistantManager
+from pythonAI_wrapper.storage import create_storage
+
+
+def stored_history(thread_id):
+    return AssistantManager(storage=create_storage('jsonl')).get_thread_history('A', thread_id)
+
+
+def test_streamed_reply_is_saved_whole(manager, fake_openai):
+    manager.create_thread('A', 'thread')
+    fragments = list(manager.send_prompt('A', 'thread', "olá", stream=True))
+
+    assert len(fragments) > 1
+    assert fake_openai.counters['stream'] == 1
+    assert stored_history('thread') == [{"role": "user", "content": "olá"},
+                                        {"role": "assistant", "content": "".join(fragments)}]
+
+
+def test_cancelled_stream_keeps_the_partial_reply(manager, fake_openai):
+    fake_openai.completion_tokens = 50
+    manager.create_thread('A', 'thread')
+    stream = manager.send_prompt('A', 'thread', "olá", stream=True)
+    received = list(islice(stream, 3))
+    stream.close()
+
+    history = stored_history('thread')
+    assert history[0] == {"role": "user", "content": "olá"}
+    assert history[1]["role"] == "assistant"
+    assert history[1]["content"] == "".join(received)
+    assert len(history) == 2 and manager.get_thread_history('A', 'thread') == history
+
+
+def test_stream_without_a_reply_discards_the_question(manager, fake_openai):
+    manager.create_thread('A', 'thread')
+    fake_openai.invalid_keys.add('sk-test')
+    stream = manager.send_prompt('A', 'thread', "olá", stream=True)
+    with pytest.raises(openai.AuthenticationError):
+        list(stream)
+    assert stored_history('thread') == []
+    assert manager.get_thread_history('A', 'thread') == []
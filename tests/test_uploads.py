@@ -0,0 +1,54 @@
+# test_uploads.py
+
+import os
+import time
+
+from pythonAI_wrapper.uploads import FileUploader, get_file_uploader
+
+CONTENTS = {'a.pdf': b"%PDF-1 um", 'b.pdf': b"%PDF-1 um", 'c.pdf': b"%PDF-1 dois"}
+
+
+def write_folder(folder, contents=CONTENTS):
+    os.makedirs(folder)
+    for name, content in contents.items():
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(content)
+    return [os.path.join(folder, name) for name in sorted(contents)]
+
+
+def test_same_content_is_uploaded_once(manager, fake_openai):
+    paths = write_folder('pasta')
+    uploader = get_file_uploader()
+    client = manager.assistants['A'].client
+
+    results = uploader.upload_many(client, 'sk-test', paths, 't1')
+    assert fake_openai.counters['files'] == 2
+    assert [result['uploaded'] for result in results] in ([True, False, True], [False, True, True])
+    assert results[0]['file_id'] == results[1]['file_id'] != results[2]['file_id']
+    assert sorted(os.listdir(os.path.join('thread_files', 't1'))) == ['a.pdf', 'b.pdf', 'c.pdf']
+
+    again = uploader.upload_many(client, 'sk-test', paths, 't2')  # Outra thread: reutiliza os file_id
+    assert [result['file_id'] for result in again] == [result['file_id'] for result in results]
+    assert not any(result['uploaded'] for result in again)
+    assert fake_openai.counters['files'] == 2
+
+    uploader.upload(client, 'sk-outra', paths[2], 't3')  # Os file_id são da conta: outra chave envia de novo
+    assert fake_openai.counters['files'] == 3
+
+
+def test_concurrent_duplicates_wait_for_the_first_upload(workdir):
+    paths = write_folder('pasta', {f"{i}.pdf": b"%PDF-1 " + bytes([65 + i % 3]) for i in range(9)})
+    uploads = []
+
+    class Files:
+        def create(self, file, purpose):
+            time.sleep(0.05)  # Os outros envios do mesmo conteúdo chegam entretanto
+            uploads.append(file.read())
+            return type('File', (), {'id': f"file-{len(uploads)}"})()
+
+    client = type('Client', (), {'files': Files()})()
+    results = FileUploader(max_workers=9).upload_many(client, 'sk-test', paths, 't')
+
+    assert sorted(uploads) == [b"%PDF-1 A", b"%PDF-1 B", b"%PDF-1 C"]
+    assert [result['uploaded'] for result in results].count(True) == 3
+    assert len({result['file_id'] for result in results}) == 3